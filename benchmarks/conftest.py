@@ -0,0 +1,112 @@
+import contextlib
+import logging
+from typing import Generator
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy
+
+from _dependencies import pubsub
+from _dependencies.common.commons import sqlalchemy_get_pool
+from _dependencies.common.db_client import DBClientBase
+from benchmarks.db_round_trips import DBRoundTrips
+from benchmarks.synthetic_data import SyntheticUserBase, remove_user_base, seed_user_base
+from tests.common import get_test_config
+
+DEFAULT_USERS_COUNTS = '10000'
+DEFAULT_ROUNDS = 3
+DEFAULT_SEND_MESSAGES = 1000
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup('la-benchmarks')
+    group.addoption(
+        '--bench-users',
+        default=DEFAULT_USERS_COUNTS,
+        help='comma-separated sizes of the synthetic user base, e.g. 10000,100000',
+    )
+    group.addoption('--bench-rounds', type=int, default=DEFAULT_ROUNDS, help='rounds of every DB-writing benchmark')
+    group.addoption(
+        '--bench-send-messages',
+        type=int,
+        default=DEFAULT_SEND_MESSAGES,
+        help='notifications sent by one round of the send loop benchmark',
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if 'users_count' in metafunc.fixturenames:
+        users_counts = [int(count) for count in metafunc.config.getoption('--bench-users').split(',')]
+        metafunc.parametrize('users_count', users_counts, scope='session', ids=lambda count: f'{count}users')
+
+
+@pytest.fixture(autouse=True, scope='session')
+def patch_app_config():
+    """Benchmarks run against the test DB"""
+
+    with patch('_dependencies.common.commons._get_config', get_test_config):
+        yield
+
+
+@pytest.fixture(autouse=True, scope='session')
+def patch_publish_topic():
+    with patch.object(pubsub, 'publish_to_pubsub'):
+        yield
+
+
+@pytest.fixture(autouse=True, scope='session')
+def quiet_logging():
+    """functions log every user at INFO; benchmarks measure the code, not the log capture"""
+
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture(scope='session')
+def bench_rounds(request: pytest.FixtureRequest) -> int:
+    return request.config.getoption('--bench-rounds')
+
+
+@pytest.fixture(scope='session')
+def bench_send_messages(request: pytest.FixtureRequest) -> int:
+    return request.config.getoption('--bench-send-messages')
+
+
+@pytest.fixture(scope='session')
+def user_base(users_count: int) -> SyntheticUserBase:
+    engine = sqlalchemy_get_pool()
+    with engine.begin() as conn:
+        base = seed_user_base(conn, users_count)
+
+    yield base
+
+    with engine.begin() as conn:
+        remove_user_base(conn)
+
+
+@pytest.fixture
+def db_round_trips() -> Generator[DBRoundTrips, None, None]:
+    counter = DBRoundTrips()
+    engine = sqlalchemy_get_pool()
+    listeners = [
+        (engine, 'before_cursor_execute', counter.on_statement),
+        (engine, 'commit', counter.on_transaction),
+        (engine, 'rollback', counter.on_transaction),
+        (engine.pool, 'checkout', counter.on_checkout),
+    ]
+    for target, name, listener in listeners:
+        sqlalchemy.event.listen(target, name, listener)
+    yield counter
+    for target, name, listener in listeners:
+        sqlalchemy.event.remove(target, name, listener)
+
+
+@pytest.fixture(params=['per_call', 'unit_of_work'])
+def db_calls(request: pytest.FixtureRequest) -> Generator[str, None, None]:
+    """per_call: every repository call in its own connection and transaction, as before units of work"""
+    if request.param == 'per_call':
+        with patch.object(DBClientBase, 'unit_of_work', lambda self: contextlib.nullcontext()):
+            yield request.param
+    else:
+        yield request.param
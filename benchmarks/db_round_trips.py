@@ -0,0 +1,40 @@
+"""Counters of the round trips to the benchmark DB."""
+
+import threading
+from typing import Any
+
+
+class DBRoundTrips:
+    """statements, transactions and pool checkouts of the benchmark DB"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.transactions = 0
+        self.checkouts = 0
+
+    def on_statement(self, *args: Any) -> None:
+        with self._lock:
+            self.statements += 1
+
+    def on_transaction(self, *args: Any) -> None:
+        with self._lock:
+            self.transactions += 1
+
+    def on_checkout(self, *args: Any) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def per_event(self, events: int) -> dict[str, float]:
+        # a checkout pings the connection, a transaction sends BEGIN and COMMIT
+        round_trips = self.statements + self.checkouts + 2 * self.transactions
+        counts = dict(
+            statements=self.statements,
+            transactions=self.transactions,
+            checkouts=self.checkouts,
+            round_trips=round_trips,
+        )
+        return {f'{name}_per_event': round(count / events, 2) for name, count in counts.items()}
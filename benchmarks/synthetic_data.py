@@ -0,0 +1,306 @@
+"""Synthetic user base and change_log records for benchmarks.
+
+All rows live in their own id ranges (users, searches, forum folders), so they can be seeded into
+the test database next to the data of the tests and removed afterwards.
+Seeding is done by `INSERT … SELECT` over `generate_series` with a fixed `setseed`,
+which takes seconds even for 100k users and gives the same data on every run.
+"""
+
+import datetime
+from dataclasses import dataclass
+
+import sqlalchemy
+from sqlalchemy.engine import Connection
+
+from _dependencies.common.commons import ChangeLogSavedValue, ChangeType, SearchFollowingMode, TopicType
+from compose_notifications._utils.commons import Comment, LineInChangeLog
+from compose_notifications._utils.log_record_composer import make_clickable_name, make_emoji
+
+USER_ID_BASE = 7_000_000_000
+USER_ID_RANGE = 1_000_000
+SEARCH_NUM_BASE = 990_000_000
+SEARCHES_COUNT = 20
+FORUM_FOLDER = 9_901  # folder of all benchmark change_log records
+OTHER_FORUM_FOLDERS = list(range(9_902, 9_911))
+
+SEARCH_LATITUDE = '55.75222'
+SEARCH_LONGITUDE = '37.61556'
+
+# `all` is a user preference, not a kind of change
+CHANGE_TYPES = [change_type for change_type in ChangeType if change_type != ChangeType.all]
+
+_SEED_STATEMENTS = [
+    """
+    INSERT INTO users (user_id, internal_user_id, username_telegram, reg_date, status, role)
+    SELECT :base + g, :base + g, 'bench_user_' || g, now() - random() * interval '1000 days',
+        CASE WHEN random() < 0.03 THEN 'blocked' END, 'member'
+    FROM generate_series(1, :count) g
+    """,
+    # 70% follow the folder of the change_log records, half of the users have another folder too
+    """
+    INSERT INTO user_regional_preferences (user_id, forum_folder_num)
+    SELECT :base + g, :folder FROM generate_series(1, :count) g WHERE random() < 0.7
+    """,
+    """
+    INSERT INTO user_regional_preferences (user_id, forum_folder_num)
+    SELECT :base + g, (:other_folders)[1 + floor(random() * cardinality(:other_folders))::int]
+    FROM generate_series(1, :count) g WHERE random() < 0.5
+    """,
+    # notification types: every change type with 50%, 'all' (30) for 20%, 'all in followed search' (9) for 5%
+    """
+    INSERT INTO user_preferences (user_id, pref_id)
+    SELECT :base + g, pref_id
+    FROM generate_series(1, :count) g CROSS JOIN unnest(:change_types) pref_id
+    WHERE random() < 0.5
+    """,
+    """
+    INSERT INTO user_preferences (user_id, pref_id)
+    SELECT :base + g, 30 FROM generate_series(1, :count) g WHERE random() < 0.2
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO user_preferences (user_id, pref_id)
+    SELECT :base + g, 9 FROM generate_series(1, :count) g WHERE random() < 0.05
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO user_pref_topic_type (user_id, topic_type_id, "timestamp")
+    SELECT :base + g, 30, now() FROM generate_series(1, :count) g WHERE random() < 0.4
+    """,
+    """
+    INSERT INTO user_pref_topic_type (user_id, topic_type_id, "timestamp")
+    SELECT :base + g, topic_type_id, now()
+    FROM generate_series(1, :count) g CROSS JOIN unnest(:topic_types) topic_type_id
+    WHERE random() < 0.5
+    ON CONFLICT DO NOTHING
+    """,
+    # home coordinates within ~200 km around the searches
+    """
+    INSERT INTO user_coordinates (user_id, latitude, longitude, upd_time)
+    SELECT :base + g,
+        round((55.75 + (random() - 0.5) * 4)::numeric, 5)::varchar,
+        round((37.62 + (random() - 0.5) * 6)::numeric, 5)::varchar,
+        now()
+    FROM generate_series(1, :count) g WHERE random() < 0.8
+    """,
+    """
+    INSERT INTO user_pref_radius (user_id, type, radius)
+    SELECT :base + g, 'radius', 10 + floor(random() * 290)::int
+    FROM generate_series(1, :count) g WHERE random() < 0.5
+    """,
+    """
+    INSERT INTO user_pref_age (user_id, period_name, period_set_date, period_min, period_max)
+    SELECT :base + g, 'bench', now(), period[1], period[2]
+    FROM generate_series(1, :count) g
+    CROSS JOIN (VALUES (ARRAY[0, 6]), (ARRAY[7, 13]), (ARRAY[14, 20]), (ARRAY[21, 50]), (ARRAY[51, 80]),
+        (ARRAY[81, 120])) AS periods(period)
+    WHERE random() < 0.1
+    """,
+    """
+    INSERT INTO user_stat (user_id, num_of_new_search_notifs)
+    SELECT :base + g, floor(random() * 50)::int FROM generate_series(1, :count) g WHERE random() < 0.5
+    """,
+    # follow lists: 10% of users have following mode on and follow (or block) some of the searches
+    """
+    INSERT INTO user_pref_search_filtering (user_id, filter_name)
+    SELECT :base + g, ARRAY['whitelist'] FROM generate_series(1, :count) g WHERE random() < 0.1
+    """,
+    """
+    INSERT INTO user_pref_search_whitelist (user_id, search_id, "timestamp", search_following_mode)
+    SELECT upsf.user_id, :search_base + s, now(),
+        CASE WHEN random() < 0.9 THEN :following_mode_on ELSE :following_mode_off END
+    FROM user_pref_search_filtering upsf CROSS JOIN generate_series(0, :searches_count - 1) s
+    WHERE upsf.user_id BETWEEN :base AND :base + :count AND random() < 0.2
+    """,
+    # every user has telegram, some of them also vk and max
+    """
+    INSERT INTO user_identity_map (internal_user_id, messenger, messenger_user_id)
+    SELECT :base + g, 'telegram', (:base + g)::varchar FROM generate_series(1, :count) g
+    """,
+    """
+    INSERT INTO user_identity_map (internal_user_id, messenger, messenger_user_id)
+    SELECT :base + g, 'vk', 'bench_vk_' || g FROM generate_series(1, :count) g WHERE random() < 0.1
+    """,
+    """
+    INSERT INTO user_identity_map (internal_user_id, messenger, messenger_user_id)
+    SELECT :base + g, 'max', 'bench_max_' || g FROM generate_series(1, :count) g WHERE random() < 0.05
+    """,
+]
+
+_USER_TABLES = [
+    'user_pref_search_whitelist',
+    'user_pref_search_filtering',
+    'user_regional_preferences',
+    'user_preferences',
+    'user_pref_topic_type',
+    'user_coordinates',
+    'user_pref_radius',
+    'user_pref_age',
+    'user_stat',
+    'notif_by_user',
+    'notif_by_user__history',
+    'dialogs',
+    'msg_from_bot',
+    'communications_last_inline_msg',
+    'user_onboarding',
+    'user_statuses_history',
+    'users',
+]
+
+
+@dataclass
+class SyntheticUserBase:
+    users_count: int
+    change_log_ids: dict[ChangeType, int]
+
+    @property
+    def user_ids(self) -> range:
+        return range(USER_ID_BASE + 1, USER_ID_BASE + self.users_count + 1)
+
+
+def seed_user_base(conn: Connection, users_count: int, seed: float = 0.42) -> SyntheticUserBase:
+    """remove the previous synthetic data and create `users_count` users with searches and change_log records"""
+    if users_count > USER_ID_RANGE:
+        raise ValueError(f'at most {USER_ID_RANGE} synthetic users are supported')
+
+    remove_user_base(conn)
+    conn.execute(sqlalchemy.text('SELECT setseed(:seed)'), dict(seed=seed))
+    _seed_searches(conn)
+
+    params = dict(
+        base=USER_ID_BASE,
+        count=users_count,
+        folder=FORUM_FOLDER,
+        other_folders=OTHER_FORUM_FOLDERS,
+        change_types=[int(change_type) for change_type in CHANGE_TYPES],
+        topic_types=[int(TopicType.search_regular), int(TopicType.search_reverse), int(TopicType.event)],
+        search_base=SEARCH_NUM_BASE,
+        searches_count=SEARCHES_COUNT,
+        following_mode_on=SearchFollowingMode.ON,
+        following_mode_off=SearchFollowingMode.OFF,
+    )
+    for statement in _SEED_STATEMENTS:
+        conn.execute(sqlalchemy.text(statement), params)
+
+    change_log_ids = {change_type: _create_change_log(conn, change_type) for change_type in CHANGE_TYPES}
+    conn.execute(sqlalchemy.text('ANALYZE'))
+    return SyntheticUserBase(users_count=users_count, change_log_ids=change_log_ids)
+
+
+def remove_user_base(conn: Connection) -> None:
+    user_range = dict(user_id_min=USER_ID_BASE, user_id_max=USER_ID_BASE + USER_ID_RANGE)
+    search_range = dict(search_num_min=SEARCH_NUM_BASE, search_num_max=SEARCH_NUM_BASE + SEARCHES_COUNT)
+
+    conn.execute(
+        sqlalchemy.text("""
+            DELETE FROM user_identity_map WHERE internal_user_id BETWEEN :user_id_min AND :user_id_max
+        """),
+        user_range,
+    )
+    for table in _USER_TABLES:
+        conn.execute(
+            sqlalchemy.text(f'DELETE FROM {table} WHERE user_id BETWEEN :user_id_min AND :user_id_max'),
+            user_range,
+        )
+    conn.execute(
+        sqlalchemy.text('DELETE FROM change_log WHERE search_forum_num BETWEEN :search_num_min AND :search_num_max'),
+        search_range,
+    )
+    conn.execute(
+        sqlalchemy.text('DELETE FROM searches WHERE search_forum_num BETWEEN :search_num_min AND :search_num_max'),
+        search_range,
+    )
+
+
+def make_line_in_change_log(change_type: ChangeType, change_log_id: int) -> LineInChangeLog:
+    """record as LogRecordComposer builds it from change_log + searches + comments"""
+
+    search_num = SEARCH_NUM_BASE
+    line = LineInChangeLog(
+        forum_search_num=search_num,
+        new_value=_change_log_value(change_type),
+        change_log_id=change_log_id,
+        change_type=change_type,
+        topic_type_id=TopicType.search_regular,
+        name='Иванов',
+        link=f'https://lizaalert.org/forum/viewtopic.php?t={search_num}',
+        status='Ищем',
+        new_status='Ищем',
+        title='Пропал Иванов Иван Иванович, 35 лет, г. Москва',
+        age=35,
+        age_wording='35 лет',
+        forum_folder=FORUM_FOLDER,
+        activities=['Поиск', 'Выезд'],
+        comments=[_make_comment(search_num, i) for i in range(5)],
+        comments_inforg=[_make_comment(search_num, 100)],
+        managers='["Инфорг Анна 89001234567", "СНМ Петр 89007654321"]',
+        start_time=datetime.datetime.now(),
+        region='Москва и МО',
+        search_latitude=SEARCH_LATITUDE,
+        search_longitude=SEARCH_LONGITUDE,
+        display_name='Иванов 35 лет',
+        age_min=35,
+        age_max=35,
+    )
+    make_clickable_name(line)
+    make_emoji(line)
+    return line
+
+
+def _seed_searches(conn: Connection) -> None:
+    conn.execute(
+        sqlalchemy.text("""
+            INSERT INTO searches (
+                search_forum_num, parsed_time, status_short, forum_search_title, search_start_time,
+                num_of_replies, family_name, age, forum_folder_id, topic_type, display_name,
+                age_min, age_max, status, topic_type_id
+            )
+            SELECT :search_base + s, now(), 'Ищем', 'Пропал Иванов Иван Иванович, 35 лет, г. Москва',
+                now() - interval '1 hour', 10, 'Иванов', 35, :folder, 'search', 'Иванов 35 лет', 35, 35,
+                CASE WHEN s % 3 = 0 THEN 'Найден' ELSE 'Ищем' END, 0
+            FROM generate_series(0, :searches_count - 1) s
+        """),
+        dict(search_base=SEARCH_NUM_BASE, searches_count=SEARCHES_COUNT, folder=FORUM_FOLDER),
+    )
+
+
+def _create_change_log(conn: Connection, change_type: ChangeType) -> int:
+    return conn.execute(
+        sqlalchemy.text("""
+            INSERT INTO change_log (parsed_time, search_forum_num, changed_field, new_value, change_type)
+            VALUES (now(), :search_num, :changed_field, :new_value, :change_type)
+            RETURNING id
+        """),
+        dict(
+            search_num=SEARCH_NUM_BASE,
+            changed_field=change_type.name,
+            new_value=_change_log_value(change_type),
+            change_type=int(change_type),
+        ),
+    ).scalar_one()
+
+
+def _change_log_value(change_type: ChangeType) -> str:
+    if change_type == ChangeType.topic_first_post_change:
+        return ChangeLogSavedValue.model_validate(
+            {
+                'del': ['Штаб: 55.70000 37.50000', 'Сбор в 10:00'],
+                'add': [f'Штаб: {SEARCH_LATITUDE} {SEARCH_LONGITUDE}', 'Сбор в 12:00', 'Телефон 89001234567'],
+            }
+        ).to_db_saved_value()
+    if change_type == ChangeType.topic_status_change:
+        return 'Найден'
+    if change_type == ChangeType.topic_title_change:
+        return 'Найден, жив Иванов Иван Иванович, 35 лет, г. Москва'
+    return ''
+
+
+def _make_comment(search_num: int, num: int) -> Comment:
+    return Comment(
+        url=f'https://lizaalert.org/forum/viewtopic.php?&t={search_num}&start={num}',
+        text=f'Комментарий {num}: выезжаю на место, буду через час, телефон 89001234567',
+        author_nickname=f'Поисковик {num}',
+        author_link=str(1000 + num),
+        search_forum_num=search_num,
+        num=num,
+    )
@@ -0,0 +1,67 @@
+"""archive_notifications: moving a backlog of old notifications to notif_by_user__history."""
+
+import pytest
+import sqlalchemy
+
+from archive_notifications.main import ArchivationStats, DBClient
+from benchmarks.synthetic_data import SEARCH_NUM_BASE, USER_ID_BASE, SyntheticUserBase
+
+ARCHIVE_BACKLOG_ROWS = 100_000
+ARCHIVE_CHANGE_LOGS = 200
+
+
+@pytest.fixture(scope='module')
+def db() -> DBClient:
+    return DBClient()
+
+
+def create_archive_backlog(db: DBClient, users_count: int) -> int:
+    """notifications of ARCHIVE_CHANGE_LOGS change_log records parsed 3 hours ago, synthetic users as recipients"""
+
+    with db.connect() as conn:
+        return conn.execute(
+            sqlalchemy.text("""
+                WITH old_change_log AS (
+                    INSERT INTO change_log (parsed_time, search_forum_num, changed_field, new_value, change_type)
+                    SELECT now() - INTERVAL '3 hour', :search_num, 'topic_new', NULL, 0
+                    FROM generate_series(1, :change_logs)
+                    RETURNING id
+                ),
+                numbered_change_log AS (
+                    SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM old_change_log
+                )
+                INSERT INTO notif_by_user (
+                    user_id, message_content, message_text, message_type, change_log_id, created, completed, messenger
+                )
+                SELECT :user_base + 1 + g % :users_count, '<b>Новый поиск!</b>', 'Новый поиск!', 'text',
+                    cl.id, now() - INTERVAL '3 hour', now() - INTERVAL '2 hour', 'telegram'
+                FROM generate_series(0, :rows - 1) g
+                JOIN numbered_change_log cl ON cl.n = g % :change_logs
+            """),
+            dict(
+                search_num=SEARCH_NUM_BASE,
+                change_logs=ARCHIVE_CHANGE_LOGS,
+                user_base=USER_ID_BASE,
+                users_count=users_count,
+                rows=ARCHIVE_BACKLOG_ROWS,
+            ),
+        ).rowcount
+
+
+def test_move_notifications_to_history(benchmark, db: DBClient, user_base: SyntheticUserBase, bench_rounds: int):
+    """the whole backlog in one invocation"""
+
+    benchmark.extra_info['backlog'] = ARCHIVE_BACKLOG_ROWS
+    stats: list[ArchivationStats] = []
+
+    def prepare_backlog() -> None:
+        create_archive_backlog(db, user_base.users_count)
+
+    def archive() -> None:
+        stats.append(db.move_notifications_to_history())
+
+    benchmark.pedantic(archive, setup=prepare_backlog, rounds=bench_rounds)
+
+    assert all(round_stats.rows >= ARCHIVE_BACKLOG_ROWS for round_stats in stats)
+    benchmark.extra_info['batches'] = stats[-1].batches
+    benchmark.extra_info['rows_per_second'] = round(stats[-1].rows_per_second)
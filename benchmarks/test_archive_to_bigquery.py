@@ -0,0 +1,126 @@
+"""archive_to_bigquery: export of one day of notif_by_user__history to a local s3 stand-in, CSV vs Parquet."""
+
+import datetime
+import resource
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Generator
+
+import pytest
+import sqlalchemy
+
+from _dependencies.common.commons import get_app_config
+from _dependencies.common.partitions import NOTIF_BY_USER_HISTORY, notif_history_partition
+from archive_to_bigquery.main import Archiver, DBClient, run_archivers
+from benchmarks.synthetic_data import USER_ID_BASE, SyntheticUserBase
+from tests.local_s3 import LocalS3Client
+
+EXPORT_DAY_ROWS = 200_000
+# far from the days of the tests; stored in its own daily partition as in production
+EXPORT_DAY = datetime.date(2201, 1, 1)
+BACKLOG_DAYS = 8
+BACKLOG_DAY_ROWS = 50_000
+
+
+@pytest.fixture(scope='module')
+def db() -> Generator[DBClient, None, None]:
+    db = DBClient()
+    yield db
+
+    days = [EXPORT_DAY + datetime.timedelta(days=i) for i in range(BACKLOG_DAYS)]
+    with db.connect() as conn:
+        for day in days:
+            conn.execute(sqlalchemy.text(f'DROP TABLE IF EXISTS {notif_history_partition(day)}'))
+        conn.execute(
+            sqlalchemy.text('DELETE FROM archive_export_checkpoints WHERE day >= :day_from AND day <= :day_to'),
+            dict(day_from=days[0], day_to=days[-1]),
+        )
+
+
+def create_history_day(
+    db: DBClient, users_count: int, day: datetime.date = EXPORT_DAY, rows: int = EXPORT_DAY_ROWS
+) -> int:
+    # the export drops the partition of the day
+    db.create_range_partition(
+        NOTIF_BY_USER_HISTORY, notif_history_partition(day), 'created', day, day + datetime.timedelta(days=1)
+    )
+    with db.connect() as conn:
+        return conn.execute(
+            sqlalchemy.text("""
+                INSERT INTO notif_by_user__history (
+                    message_id, user_id, message_content, message_text, message_type, message_params,
+                    change_log_id, created, completed, messenger
+                )
+                SELECT -g, :user_base + 1 + g % :users_count,
+                    '<b>Новый поиск!</b> Пропал человек, ' || g, 'Новый поиск!', 'text',
+                    '{"parse_mode": "HTML", "disable_web_page_preview": "True"}',
+                    g % 1000, :day + g * INTERVAL '400 millisecond', :day + INTERVAL '1 hour', 'telegram'
+                FROM generate_series(1, :rows) g
+            """),
+            dict(user_base=USER_ID_BASE, users_count=users_count, rows=rows, day=day),
+        ).rowcount
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'parquet'])
+def test_export_day(
+    benchmark, db: DBClient, user_base: SyntheticUserBase, bench_rounds: int, tmp_path: Path, export_format: str
+):
+    """export and deletion (dropping the partition) of a day of history; archive_bytes compares the formats"""
+
+    s3_client = LocalS3Client(tmp_path)
+    archiver = Archiver(archive_date=EXPORT_DAY, db=db, s3_client=s3_client, export_format=export_format)
+    benchmark.extra_info['rows'] = EXPORT_DAY_ROWS
+
+    def prepare_day() -> None:
+        create_history_day(db, user_base.users_count)
+
+    benchmark.pedantic(archiver.run, setup=prepare_day, rounds=bench_rounds)
+
+    # a separate traced run: tracemalloc slows the export down
+    prepare_day()
+    max_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.monotonic()
+    try:
+        rows = archiver._export_to_s3()
+        seconds = time.monotonic() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        archiver.delete_exported()
+
+    assert rows == EXPORT_DAY_ROWS
+    benchmark.extra_info['rows_per_second'] = round(rows / seconds)
+    benchmark.extra_info['archive_bytes'] = (
+        s3_client.object_path(
+            get_app_config().aws_backup_bucket_name, f'{archiver.s3_prefix}/{archiver._unload_file_name}'
+        )
+        .stat()
+        .st_size
+    )
+    benchmark.extra_info['peak_traced_mib'] = round(peak / 2**20, 1)
+    benchmark.extra_info['max_rss_growth_mib'] = round(
+        (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - max_rss_before) / 1024, 1
+    )
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_export_backlog(
+    benchmark, db: DBClient, user_base: SyntheticUserBase, bench_rounds: int, tmp_path: Path, workers: int
+):
+    """a backlog of BACKLOG_DAYS days, sequentially vs by a pool of workers; every day drops its partition"""
+
+    s3_client = LocalS3Client(tmp_path)
+    days = [EXPORT_DAY + datetime.timedelta(days=i) for i in range(BACKLOG_DAYS)]
+    benchmark.extra_info['rows'] = BACKLOG_DAYS * BACKLOG_DAY_ROWS
+
+    def prepare_backlog() -> None:
+        for day in days:
+            create_history_day(db, user_base.users_count, day=day, rows=BACKLOG_DAY_ROWS)
+
+    def export_backlog() -> None:
+        archivers = [Archiver(archive_date=day, db=db, s3_client=s3_client) for day in days]
+        assert run_archivers(archivers, workers=workers).done == BACKLOG_DAYS
+
+    benchmark.pedantic(export_backlog, setup=prepare_backlog, rounds=bench_rounds)
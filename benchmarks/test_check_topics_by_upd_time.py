@@ -0,0 +1,162 @@
+"""check_topics_by_upd_time: crawl of the forum folder tree served by a local HTTP server.
+
+Pages are built from the recorded forum fixtures: a region page (``forum_folder_179_with_subfolders.html``)
+lists generated subfolders, a leaf page (``forum_folder_276.html``) lists searches. Every page is answered
+with its own latency, as the real forum answers unevenly.
+"""
+
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Generator
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+import sqlalchemy
+
+from check_topics_by_upd_time._legacy import main
+from check_topics_by_upd_time._legacy.main import KeyValueStorage, get_db_client, get_updates_of_nested_folders
+
+FIXTURES = Path(__file__).parent.parent / 'tests' / 'fixtures'
+ROOT_FOLDER = 900_000
+REGIONS = 6
+LEAVES_PER_REGION = 5
+CHANGED_LEAVES = 3
+PAGE_LATENCIES_SECONDS = [0.05, 0.1, 0.15, 0.2, 0.4]  # answers of the forum through the proxy
+
+REGION_PAGE = (FIXTURES / 'forum_folder_179_with_subfolders.html').read_text()
+LEAF_PAGE = (FIXTURES / 'forum_folder_276.html').read_text()
+SUBFOLDERS_LIST = re.compile(r'(<ul class="topiclist forums">)(.*?)(</ul>)', re.S)
+SUBFOLDER_ROW = re.compile(r'<li class="row">.*?</li>', re.S)
+SUBFOLDER_TEMPLATE = SUBFOLDER_ROW.search(SUBFOLDERS_LIST.search(REGION_PAGE).group(2)).group(0)  # type: ignore[union-attr]
+SUBFOLDER_TIME = '2025-02-03T21:24:44+00:00'
+LEAF_SEARCH_TITLE = 'Жив Иванов Иван, 10 лет'
+
+
+class Forum:
+    """the folder tree: the root, regions and leaves with searches; change times of every folder"""
+
+    def __init__(self) -> None:
+        self.children: dict[int, list[int]] = {ROOT_FOLDER: []}
+        self.times: dict[int, str] = {}
+        self.requests = 0
+        for region_index in range(REGIONS):
+            region = ROOT_FOLDER + 1 + region_index
+            self.children[ROOT_FOLDER].append(region)
+            self.children[region] = []
+            for leaf_index in range(LEAVES_PER_REGION):
+                leaf = ROOT_FOLDER + 1000 * (region_index + 1) + leaf_index
+                self.children[region].append(leaf)
+        self.folders = [num for children in self.children.values() for num in children]
+        for num in self.folders:
+            self.times[num] = SUBFOLDER_TIME
+        self.leaves = [num for num in self.folders if num not in self.children]
+
+    def touch(self, leaf: int, change_time: str) -> None:
+        """a new message in a search of the leaf; the times of the parents change with it"""
+        for parent, children in self.children.items():
+            if leaf in children and parent != ROOT_FOLDER:
+                self.times[parent] = change_time
+        self.times[leaf] = change_time
+
+    def page(self, folder_num: int) -> str:
+        children = self.children.get(folder_num)
+        if children is None:
+            return LEAF_PAGE.replace(LEAF_SEARCH_TITLE, f'{LEAF_SEARCH_TITLE} {folder_num} {self.times[folder_num]}')
+        rows = ''.join(
+            SUBFOLDER_TEMPLATE.replace('f=236', f'f={child}').replace(SUBFOLDER_TIME, self.times[child])
+            for child in children
+        )
+        return SUBFOLDERS_LIST.sub(lambda m: m.group(1) + rows + m.group(3), REGION_PAGE, count=1)
+
+    def latency(self, folder_num: int) -> float:
+        return PAGE_LATENCIES_SECONDS[folder_num * 7 % len(PAGE_LATENCIES_SECONDS)]
+
+
+@pytest.fixture
+def forum() -> Generator[Forum, None, None]:
+    forum = Forum()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            folder_num = int(parse_qs(urlparse(self.path).query)['f'][0])
+            forum.requests += 1
+            time.sleep(forum.latency(folder_num))
+            body = forum.page(folder_num).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = requests.Session()
+    with (
+        patch.object(main, 'FORUM_URL', f'http://127.0.0.1:{server.server_port}'),
+        patch.object(main, 'get_session', lambda: session),
+    ):
+        yield forum
+    server.shutdown()
+    forget_tree(forum)
+
+
+def forget_tree(forum: Forum) -> None:
+    folder_nums = [ROOT_FOLDER, *forum.folders]
+    with get_db_client().connect() as conn:
+        conn.execute(
+            sqlalchemy.text('DELETE FROM forum_folder_searches WHERE folder_num = ANY(:nums)'), dict(nums=folder_nums)
+        )
+        conn.execute(
+            sqlalchemy.text('DELETE FROM forum_folder_tree WHERE folder_num = ANY(:nums)'), dict(nums=folder_nums)
+        )
+        conn.execute(
+            sqlalchemy.text('DELETE FROM key_value_storage WHERE key = ANY(:keys)'),
+            dict(
+                keys=[KeyValueStorage.FOLDER_TIMESTAMPS_KEY]
+                + [f'{kind}_{num}' for num in folder_nums for kind in ('folders', 'searches')]
+            ),
+        )
+
+
+def test_cold_crawl(benchmark, bench_rounds: int, forum: Forum):
+    """the first run: every folder is fetched and saved"""
+
+    def crawl() -> list:
+        forum.requests = 0
+        return get_updates_of_nested_folders([(str(ROOT_FOLDER), 'cold')])
+
+    updated = benchmark.pedantic(crawl, setup=lambda: forget_tree(forum), rounds=bench_rounds)
+
+    assert len(updated) == 1 + len(forum.folders)  # the root and regions have searches too
+    benchmark.extra_info['pages'] = forum.requests
+
+
+def test_incremental_crawl(benchmark, bench_rounds: int, forum: Forum):
+    """a few searches got new messages since the previous run"""
+    get_updates_of_nested_folders([(str(ROOT_FOLDER), 'run 0')])
+    rounds = iter(range(1, bench_rounds + 1))
+    root_time = ''
+
+    def touch_leaves() -> None:
+        nonlocal root_time
+        round_num = next(rounds)
+        root_time = f'run {round_num}'
+        for leaf in forum.leaves[round_num :: len(forum.leaves) // CHANGED_LEAVES][:CHANGED_LEAVES]:
+            forum.touch(leaf, f'2025-03-01T00:00:{round_num:02}+00:00')
+        forum.requests = 0
+
+    def crawl() -> list:
+        return get_updates_of_nested_folders([(str(ROOT_FOLDER), root_time)])
+
+    updated = benchmark.pedantic(crawl, setup=touch_leaves, rounds=bench_rounds)
+
+    assert len([num for num, _ in updated if int(num) in forum.leaves]) == CHANGED_LEAVES
+    benchmark.extra_info['pages'] = forum.requests
@@ -0,0 +1,102 @@
+"""communicate: DB queries and time per update on a replay of recorded updates of synthetic users.
+
+Updates are processed in a unit of work, as by ``main``.
+"""
+
+import copy
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from telegram import Update
+
+from _dependencies.common.commons import get_app_config
+from _dependencies.user_repository import dialog_history
+from _dependencies.user_repository.dialog_history_buffer import DialogHistoryBuffer
+from benchmarks.db_round_trips import DBRoundTrips
+from benchmarks.synthetic_data import SyntheticUserBase
+from communicate._utils.database import db
+from communicate.main import _get_bot, process_update
+
+RECORDED_UPDATES = Path(__file__).parent / 'communicate_updates.json'
+REPLAY_USERS = 50
+
+
+@pytest.fixture(scope='module')
+def recorded_updates() -> list[dict[str, Any]]:
+    return json.loads(RECORDED_UPDATES.read_text())
+
+
+@pytest.fixture
+def stub_telegram() -> Generator[None, None, None]:
+    with patch('communicate.main.tg_api', return_value=MagicMock()):
+        yield
+
+
+@pytest.fixture(params=['direct', 'buffered'])
+def dialog_history_writes(request: pytest.FixtureRequest) -> Generator[str, None, None]:
+    """direct: every dialog message is inserted at once; buffered: in batches of the default size"""
+    if request.param == 'direct':
+        yield request.param
+        return
+
+    config = get_app_config()
+    buffer = DialogHistoryBuffer(config.dialog_history_buffer_size, config.dialog_history_flush_seconds)
+    with (
+        patch.object(
+            dialog_history, 'get_app_config', return_value=config.model_copy(update=dict(dialog_history_buffered=True))
+        ),
+        patch.object(dialog_history, 'dialog_history_buffer', return_value=buffer),
+    ):
+        yield request.param
+    buffer.flush()
+
+
+def make_updates(recorded_updates: list[dict[str, Any]], user_ids: range) -> list[Update]:
+    """the recorded updates on behalf of every replay user"""
+    updates = []
+    for user_id in user_ids:
+        for recorded in recorded_updates:
+            data = copy.deepcopy(recorded)
+            data['message']['chat']['id'] = data['message']['from']['id'] = user_id
+            updates.append(Update.de_json(data, _get_bot()))
+    return updates
+
+
+def test_replay_updates(
+    benchmark,
+    user_base: SyntheticUserBase,
+    recorded_updates: list[dict[str, Any]],
+    stub_telegram: None,
+    db_calls: str,
+    dialog_history_writes: str,
+    db_round_trips: DBRoundTrips,
+):
+    """every update of the replay goes through process_update, Telegram API is stubbed"""
+
+    updates = make_updates(recorded_updates, user_base.user_ids[:REPLAY_USERS])
+    update_times: list[float] = []
+
+    def replay() -> None:
+        update_times.clear()
+        for update in updates:
+            started = time.perf_counter()
+            with db().unit_of_work():
+                process_update(update)
+            update_times.append(time.perf_counter() - started)
+
+    replay()  # the first replay of every user, nothing cached yet
+    benchmark.extra_info['updates'] = len(updates)
+    benchmark.extra_info['first_replay_queries_per_update'] = round(db_round_trips.statements / len(updates), 2)
+
+    db_round_trips.reset()
+    benchmark.pedantic(replay, rounds=1)
+    benchmark.extra_info['queries_per_update'] = round(db_round_trips.statements / len(updates), 2)
+    benchmark.extra_info.update(db_round_trips.per_event(len(updates)))
+    update_times.sort()
+    benchmark.extra_info['update_p50_ms'] = round(statistics.median(update_times) * 1000, 2)
+    benchmark.extra_info['update_p95_ms'] = round(update_times[int(len(update_times) * 0.95)] * 1000, 2)
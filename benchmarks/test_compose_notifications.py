@@ -0,0 +1,80 @@
+"""compose_notifications: users list, filters and notification records for every change type."""
+
+import pytest
+import sqlalchemy
+
+from _dependencies.common.commons import ChangeType
+from benchmarks.synthetic_data import CHANGE_TYPES, SyntheticUserBase, make_line_in_change_log
+from compose_notifications._utils.commons import LineInChangeLog
+from compose_notifications._utils.database import DBClient
+from compose_notifications._utils.notifications_maker import NotificationMaker
+from compose_notifications._utils.users_list_composer import UserListFilter, UsersListComposer
+
+BENCH_FUNCTION_ID = 1
+STATISTICS_RECIPIENTS = 10_000
+
+
+@pytest.fixture(scope='module')
+def db() -> DBClient:
+    return DBClient()
+
+
+@pytest.fixture(params=CHANGE_TYPES, ids=lambda change_type: change_type.name)
+def line(request: pytest.FixtureRequest, user_base: SyntheticUserBase) -> LineInChangeLog:
+    change_type: ChangeType = request.param
+    return make_line_in_change_log(change_type, user_base.change_log_ids[change_type])
+
+
+def test_users_list_composer(benchmark, db: DBClient, user_base: SyntheticUserBase, line: LineInChangeLog):
+    benchmark.extra_info['users'] = user_base.users_count
+
+    users = benchmark(UsersListComposer(db).get_users_list_for_line_in_change_log, line)
+
+    benchmark.extra_info['recipients'] = len(users)
+
+
+def test_user_list_filter(benchmark, db: DBClient, user_base: SyntheticUserBase, line: LineInChangeLog):
+    users = UsersListComposer(db).get_users_list_for_line_in_change_log(line)
+    benchmark.extra_info['users'] = user_base.users_count
+
+    filtered_users = benchmark(lambda: UserListFilter(db, line, users).apply())
+
+    benchmark.extra_info['recipients'] = len(users)
+    benchmark.extra_info['filtered_recipients'] = len(filtered_users)
+
+
+def test_notification_maker(
+    benchmark, db: DBClient, user_base: SyntheticUserBase, line: LineInChangeLog, bench_rounds: int
+):
+    users = UsersListComposer(db).get_users_list_for_line_in_change_log(line)
+    users = UserListFilter(db, line, users).apply()
+    benchmark.extra_info['users'] = user_base.users_count
+    benchmark.extra_info['filtered_recipients'] = len(users)
+
+    def remove_composed_notifications() -> None:
+        line.processed = False
+        with db.connect() as conn:
+            conn.execute(
+                sqlalchemy.text('DELETE FROM notif_by_user WHERE change_log_id = :change_log_id'),
+                dict(change_log_id=line.change_log_id),
+            )
+
+    def make_notifications() -> None:
+        notification_maker = NotificationMaker(db, line, users)
+        notification_maker.generate_notifications_for_users(BENCH_FUNCTION_ID)
+        notification_maker.record_notification_statistics()
+
+    benchmark.pedantic(make_notifications, setup=remove_composed_notifications, rounds=bench_rounds)
+    remove_composed_notifications()
+
+
+def test_record_notification_statistics(benchmark, db: DBClient, user_base: SyntheticUserBase, bench_rounds: int):
+    """usability-tips counters of a new search sent to up to 10k recipients"""
+
+    line = make_line_in_change_log(ChangeType.topic_new, user_base.change_log_ids[ChangeType.topic_new])
+    notification_maker = NotificationMaker(db, line, [])
+    notification_maker.stat_recipients.update(user_base.user_ids[:STATISTICS_RECIPIENTS])
+    benchmark.extra_info['users'] = user_base.users_count
+    benchmark.extra_info['recipients'] = len(notification_maker.stat_recipients)
+
+    benchmark.pedantic(notification_maker.record_notification_statistics, rounds=bench_rounds)
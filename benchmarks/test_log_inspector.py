@@ -0,0 +1,75 @@
+"""log_inspector: grouping of a synthetic stream of one million log entries, from a list vs streaming."""
+
+import random
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable, Iterator
+
+import pytest
+
+from tools.log_inspector._utils.analytics import ErrorAggregator, ErrorGroup, group_errors
+
+STREAM_ENTRIES = 1_000_000
+TOP_N = 10
+
+# error templates with variable parts, as in the bot logs
+TEMPLATES: list[Callable[[random.Random], str]] = [
+    lambda rnd: f'Failed to send message to telegram_id={rnd.randint(10**8, 10**10)}: status=403 Forbidden',
+    lambda rnd: f"Search '{uuid.UUID(int=rnd.getrandbits(128))}' not found in /api/searches/{rnd.randint(1, 10**5)}/",
+    lambda rnd: f'Connection to {rnd.randint(1, 254)}.{rnd.randint(0, 254)}.0.{rnd.randint(1, 254)} timed out',
+    lambda rnd: f'Topic {rnd.randint(10**10, 10**11)} parse error at 2026-07-0{rnd.randint(1, 9)}T12:00:00',
+    lambda rnd: f'pointer 0x{rnd.getrandbits(48):x} checksum {rnd.getrandbits(128):032x} mismatch',
+    lambda rnd: 'psycopg2.OperationalError: server closed the connection unexpectedly',
+    lambda rnd: 'Telegram API: Too Many Requests',
+]
+
+
+def log_stream(entries: int = STREAM_ENTRIES, seed: int = 49) -> Iterator[dict]:
+    """90% ERROR entries from the templates, 2% of them a long tail of one-off messages"""
+    rnd = random.Random(seed)
+    start = 1_780_000_000
+    for n in range(entries):
+        level = 'ERROR' if rnd.random() < 0.9 else 'INFO'
+        if rnd.random() < 0.02:
+            message = f'Unexpected error in handler_{n}'
+        else:
+            message = rnd.choice(TEMPLATES)(rnd)
+        yield {
+            'uid': f'uid-{n}',
+            'level': level,
+            'message': message,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(start + n // 10)),
+            'json_payload': {'request_id': f'req-{n}'},
+        }
+
+
+def group_list() -> list[ErrorGroup]:
+    return group_errors(list(log_stream()), top_n=TOP_N)
+
+
+def group_stream() -> list[ErrorGroup]:
+    return ErrorAggregator().add_all(log_stream()).top(TOP_N)
+
+
+@pytest.mark.parametrize('grouping', ['list', 'streaming'])
+def test_group_errors(benchmark, bench_rounds: int, grouping: str):
+    run = group_list if grouping == 'list' else group_stream
+    benchmark.extra_info['entries'] = STREAM_ENTRIES
+
+    groups = benchmark.pedantic(run, rounds=bench_rounds)
+
+    assert len(groups) == TOP_N
+    assert groups[0].count > STREAM_ENTRIES // 10
+
+    # a separate traced run: tracemalloc slows the grouping down
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if benchmark.stats:  # no stats with --benchmark-disable
+        benchmark.extra_info['entries_per_second'] = round(STREAM_ENTRIES / benchmark.stats.stats.min)
+    benchmark.extra_info['peak_traced_mib'] = round(peak / 2**20, 1)
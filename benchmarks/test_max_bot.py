@@ -0,0 +1,206 @@
+"""max_bot: throughput of webhook events of simultaneous users, MAX API calls are stubbed with a fixed latency.
+
+The local test DB answers without a network round trip; ``db_round_trip`` adds one to every statement
+(a blocking wait in the calling thread, as of a socket) to compare with a DB on another host.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Generator
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import sqlalchemy
+
+pytest.importorskip('maxapi')
+
+from maxapi import Bot, Dispatcher
+
+from _dependencies.common.commons import sqlalchemy_get_pool
+from _dependencies.user_repository import UserRepository, geo_reference_cache
+from benchmarks.db_round_trips import DBRoundTrips
+from benchmarks.synthetic_data import SyntheticUserBase
+from max_bot import main
+from max_bot._utils import handlers
+
+SIMULTANEOUS_USERS = 100
+REGION_SELECTION_USERS = 20
+API_LATENCY_SECONDS = 0.02  # a round trip to the MAX API
+DB_ROUND_TRIPS_SECONDS = [0, 0.002]
+
+
+async def _api_call(*args: Any, **kwargs: Any) -> None:
+    await asyncio.sleep(API_LATENCY_SECONDS)
+
+
+@pytest.fixture(params=DB_ROUND_TRIPS_SECONDS, ids=lambda seconds: f'db_rtt_{seconds * 1000:g}ms')
+def db_round_trip(request: pytest.FixtureRequest) -> Generator[float, None, None]:
+    def wait(*args: Any) -> None:
+        time.sleep(request.param)
+
+    engine = sqlalchemy_get_pool()
+    if request.param:
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', wait)
+    yield request.param
+    if request.param:
+        sqlalchemy.event.remove(engine, 'before_cursor_execute', wait)
+
+
+@pytest.fixture
+def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
+    """one loop for all rounds, as in a warm function instance"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def dispatcher(event_loop: asyncio.AbstractEventLoop) -> Generator[None, None, None]:
+    """a started dispatcher with the bot router; requests to the MAX API only wait"""
+
+    with (
+        patch.object(Bot, 'send_callback', _api_call),
+        patch.object(Bot, 'send_message', _api_call),
+        patch.object(Bot, 'get_chat_by_id', _api_call),
+        patch.object(Dispatcher, 'check_me', AsyncMock()),
+    ):
+        bot = Bot(token='benchmark')
+        dp = Dispatcher()
+        dp.include_routers(handlers.router)
+        event_loop.run_until_complete(dp.startup(bot))
+        with patch.multiple(main, _bot=bot, _dp=dp, _initialized=True):
+            yield
+
+
+def _user(user_id: int) -> dict[str, Any]:
+    return {'user_id': user_id, 'first_name': 'Bench', 'is_bot': False, 'last_activity_time': 0}
+
+
+def _message(user_id: int, text: str) -> dict[str, Any]:
+    return {
+        'sender': _user(user_id),
+        'recipient': {'chat_id': user_id, 'chat_type': 'dialog'},
+        'timestamp': 0,
+        'body': {'mid': f'mid.{user_id}', 'seq': 0, 'text': text},
+    }
+
+
+def _message_created(user_id: int, text: str) -> dict[str, Any]:
+    return {'update_type': 'message_created', 'timestamp': 0, 'message': _message(user_id, text)}
+
+
+def _message_callback(user_id: int, cmd: str, **payload: Any) -> dict[str, Any]:
+    return {
+        'update_type': 'message_callback',
+        'timestamp': 0,
+        'callback': {
+            'timestamp': 0,
+            'callback_id': f'callback.{user_id}',
+            'payload': json.dumps({'cmd': cmd, **payload}),
+            'user': _user(user_id),
+        },
+        'message': _message(user_id, 'menu'),
+    }
+
+
+def user_session(user_id: int) -> list[dict[str, Any]]:
+    """set the radius, look at the settings, send an unknown text"""
+    return [
+        _message_callback(user_id, 'radius_set'),
+        _message_created(user_id, '25'),
+        _message_callback(user_id, 'radius_view'),
+        _message_callback(user_id, 'coords_view'),
+        _message_created(user_id, 'hello'),
+    ]
+
+
+async def run_sessions(sessions: list[list[dict[str, Any]]]) -> None:
+    async def run_session(events: list[dict[str, Any]]) -> None:
+        for event in events:
+            await main._handle_webhook_async(event)
+
+    await asyncio.gather(*(run_session(events) for events in sessions))
+
+
+def test_simultaneous_users(
+    benchmark,
+    bench_rounds: int,
+    user_base: SyntheticUserBase,
+    event_loop: asyncio.AbstractEventLoop,
+    dispatcher: None,
+    db_round_trip: float,
+    db_calls: str,
+    db_round_trips: DBRoundTrips,
+):
+    """every user goes through the session at the same time as the others"""
+
+    sessions = [user_session(user_id) for user_id in user_base.user_ids[:SIMULTANEOUS_USERS]]
+    events_count = sum(len(events) for events in sessions)
+    durations: list[float] = []
+
+    def replay() -> None:
+        started = time.perf_counter()
+        event_loop.run_until_complete(run_sessions(sessions))
+        durations.append(time.perf_counter() - started)
+
+    db_round_trips.reset()
+    benchmark.pedantic(replay, rounds=bench_rounds)
+    repository = UserRepository()
+    assert all(repository.get_radius(user_id) == 25 for user_id in user_base.user_ids[:SIMULTANEOUS_USERS])
+    benchmark.extra_info['users'] = len(sessions)
+    benchmark.extra_info['events'] = events_count
+    benchmark.extra_info['events_per_second'] = round(events_count / min(durations))
+    benchmark.extra_info.update(db_round_trips.per_event(events_count * bench_rounds))
+
+
+def region_selection(user_id: int, district: str, region: str) -> list[dict[str, Any]]:
+    """open a district, turn the page, subscribe to a region and unsubscribe from it"""
+    return [
+        _message_callback(user_id, 'district_select', district=district),
+        _message_callback(user_id, 'paginate_nav', district=district, page=1),
+        _message_callback(user_id, 'paginate_toggle', district=district, region=region, page=1),
+        _message_callback(user_id, 'paginate_toggle', district=district, region=region, page=1),
+    ]
+
+
+@pytest.mark.parametrize('cache', ['cold', 'warm'])
+def test_region_selection(
+    benchmark,
+    bench_rounds: int,
+    user_base: SyntheticUserBase,
+    event_loop: asyncio.AbstractEventLoop,
+    dispatcher: None,
+    cache: str,
+):
+    """users go through the region screens one after another; cold: the geo reference is reloaded every round"""
+
+    repository = UserRepository()
+    district, folders = max(repository.get_geo_reference().folders_by_district.items(), key=lambda item: len(item[1]))
+    sessions = [
+        region_selection(user_id, district, folders[-1][1]) for user_id in user_base.user_ids[:REGION_SELECTION_USERS]
+    ]
+    interactions = sum(len(events) for events in sessions)
+    statements: list[int] = []
+
+    def count(*args: Any) -> None:
+        statements[-1] += 1
+
+    def setup() -> None:
+        if cache == 'cold':
+            geo_reference_cache.invalidate()
+        statements.append(0)
+
+    def replay() -> None:
+        for events in sessions:
+            event_loop.run_until_complete(run_sessions([events]))
+
+    engine = sqlalchemy_get_pool()
+    sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+    try:
+        benchmark.pedantic(replay, setup=setup, rounds=bench_rounds)
+    finally:
+        sqlalchemy.event.remove(engine, 'before_cursor_execute', count)
+
+    benchmark.extra_info['interactions'] = interactions
+    benchmark.extra_info['queries_per_interaction'] = round(min(statements) / interactions, 2)
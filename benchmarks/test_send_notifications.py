@@ -0,0 +1,132 @@
+"""send_notifications: reading the queue of notifications and the send loop with stubbed messengers."""
+
+import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+import sqlalchemy
+
+from _dependencies.common.commons import ChangeType
+from _dependencies.common.message_params import MessageParams
+from benchmarks.synthetic_data import USER_ID_BASE, USER_ID_RANGE, SyntheticUserBase
+from send_notifications._utils.clients.max_notificator import MaxNotificator
+from send_notifications._utils.clients.telegram_notificator import TelegramNotificator
+from send_notifications._utils.clients.vk_notificator import VKNotificator
+from send_notifications._utils.database import DBClient
+from send_notifications._utils.models import TimeAnalytics
+from send_notifications._utils.services.notification_sender import NotificationSender
+
+BENCH_FUNCTION_ID = 1
+
+
+@pytest.fixture(scope='module')
+def db() -> DBClient:
+    return DBClient()
+
+
+@pytest.fixture
+def change_log_id(user_base: SyntheticUserBase) -> int:
+    return user_base.change_log_ids[ChangeType.topic_new]
+
+
+def create_unsent_notifications(db: DBClient, change_log_id: int, limit: int | None = None) -> int:
+    """a text notification for every messenger of every synthetic user, coordinates for some of them"""
+
+    with db.connect() as conn:
+        remove_unsent_notifications(conn)
+        return conn.execute(
+            sqlalchemy.text("""
+                WITH recipients AS (
+                    SELECT internal_user_id AS user_id, messenger
+                    FROM user_identity_map
+                    WHERE internal_user_id BETWEEN :user_id_min AND :user_id_max
+                    ORDER BY internal_user_id, messenger
+                    LIMIT :limit
+                )
+                INSERT INTO notif_by_user (
+                    user_id, message_content, message_text, message_type, message_params,
+                    change_log_id, created, messenger
+                )
+                SELECT user_id, '<b>Новый поиск!</b> Иванов 35 лет', 'Новый поиск! Иванов 35 лет', 'text',
+                    :text_params, :change_log_id, now(), messenger
+                FROM recipients
+                UNION ALL
+                SELECT user_id, NULL, NULL, 'coords', :coords_params, :change_log_id, now(), messenger
+                FROM recipients WHERE user_id % 5 = 0
+            """),
+            dict(
+                user_id_min=USER_ID_BASE,
+                user_id_max=USER_ID_BASE + USER_ID_RANGE,
+                limit=limit,
+                change_log_id=change_log_id,
+                text_params=MessageParams.new_text(parse_mode='HTML', disable_web_page_preview=True).model_dump_json(
+                    exclude_none=True
+                ),
+                coords_params=MessageParams.new_coords(latitude=55.75222, longitude=37.61556).model_dump_json(
+                    exclude_none=True
+                ),
+            ),
+        ).rowcount
+
+
+def remove_unsent_notifications(conn: sqlalchemy.Connection) -> None:
+    conn.execute(
+        sqlalchemy.text('DELETE FROM notif_by_user WHERE user_id BETWEEN :user_id_min AND :user_id_max'),
+        dict(user_id_min=USER_ID_BASE, user_id_max=USER_ID_BASE + USER_ID_RANGE),
+    )
+
+
+def stubbed_sender(db: DBClient) -> NotificationSender:
+    """real notificators on top of messenger clients which answer instantly"""
+
+    tg_api = MagicMock()
+    tg_api.send_message.return_value = 'completed'
+    tg_api.send_location.return_value = 'completed'
+    max_client = MagicMock()
+    max_client.send_message.return_value.status = 'completed'
+    max_client.send_coordinates.return_value.status = 'completed'
+
+    return NotificationSender(
+        db_client=db,
+        vk_notificator=VKNotificator(MagicMock()),
+        tg_notificator=TelegramNotificator(tg_api),
+        max_notificator=MaxNotificator(max_client),
+    )
+
+
+def test_get_notifs_to_send(benchmark, db: DBClient, user_base: SyntheticUserBase, change_log_id: int):
+    """one batch out of the backlog of unsent notifications for the whole user base"""
+
+    backlog = create_unsent_notifications(db, change_log_id)
+    benchmark.extra_info['users'] = user_base.users_count
+    benchmark.extra_info['backlog'] = backlog
+
+    messages = benchmark(db.get_notifs_to_send, select_doubling=False)
+
+    assert messages
+    with db.connect() as conn:
+        remove_unsent_notifications(conn)
+
+
+def test_send_loop(
+    benchmark,
+    db: DBClient,
+    user_base: SyntheticUserBase,
+    change_log_id: int,
+    bench_rounds: int,
+    bench_send_messages: int,
+):
+    sender = stubbed_sender(db)
+    benchmark.extra_info['users'] = user_base.users_count
+
+    def prepare_notifications() -> None:
+        benchmark.extra_info['messages'] = create_unsent_notifications(db, change_log_id, bench_send_messages)
+
+    def send_all() -> None:
+        sender.send_all(BENCH_FUNCTION_ID, TimeAnalytics(script_start_time=datetime.datetime.now()))
+
+    with patch('send_notifications._utils.services.notification_sender.SLEEP_TIME_FOR_NEW_NOTIFS_RECHECK_SECONDS', 0):
+        benchmark.pedantic(send_all, setup=prepare_notifications, rounds=bench_rounds)
+
+    with db.connect() as conn:
+        remove_unsent_notifications(conn)
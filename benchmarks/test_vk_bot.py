@@ -0,0 +1,244 @@
+"""vk_bot: the callback endpoint under a local VK Callback API simulator.
+
+The simulator sends events of simultaneous users as VK does: the next event of a user after the answer
+to the previous one, and the same event again (with the same event_id) when the answer does not come
+in time. The endpoint is served by a local HTTP server with the concurrency of one function instance.
+Requests to the VK API are stubbed with a fixed latency.
+"""
+
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Generator
+from unittest.mock import patch
+
+import pytest
+import requests
+import sqlalchemy
+
+from _dependencies.bot.vk_api_client import VKApi
+from _dependencies.common.commons import get_app_config, sqlalchemy_get_pool
+from benchmarks.db_round_trips import DBRoundTrips
+from benchmarks.synthetic_data import SyntheticUserBase
+from vk_bot._utils import event_dispatcher
+from vk_bot._utils.database import DBClient
+from vk_bot._utils.event_dedup import EventDedupStore, InMemoryDedupStore, PostgresDedupStore
+from vk_bot._utils.event_dispatcher import VKEventDispatcher
+
+SIMULTANEOUS_USERS = 40
+EVENTS_PER_USER = 5
+VK_ID_BASE = 1_900_000_000  # VK ids of the synthetic users; ids from 2_000_000_000 are group chats
+API_LATENCY_SECONDS = 0.05
+INSTANCE_CONCURRENCY = 8  # requests served by one function instance at a time
+ANSWER_TIMEOUT_SECONDS = 0.5  # VK waits ~10 s; scaled down with the latencies
+MAX_ATTEMPTS = 5
+DEDUP_INSTANCES = 4
+DEDUP_EVENTS = 2000
+DEDUP_RESENT_SHARE = 0.3  # events that VK resent to another instance
+
+
+class VKApiStub:
+    """answers of the VK API after a fixed latency; counts the sent messages"""
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, *args: Any, **kwargs: Any) -> dict:
+        time.sleep(API_LATENCY_SECONDS)
+        with self._lock:
+            self.sent += 1
+        return {'response': 1}
+
+    def answer(self, *args: Any, **kwargs: Any) -> dict:
+        time.sleep(API_LATENCY_SECONDS)
+        return {'response': 1}
+
+
+class CallbackSimulator:
+    """delivers events to the endpoint with the retries of VK"""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.answer_times: list[float] = []
+        self.resends = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, event: dict) -> None:
+        for _ in range(MAX_ATTEMPTS):
+            started = time.perf_counter()
+            try:
+                response = requests.post(self.url, json=event, timeout=ANSWER_TIMEOUT_SECONDS)
+            except requests.Timeout:
+                with self._lock:
+                    self.resends += 1
+                continue
+            assert response.text == 'ok'
+            with self._lock:
+                self.answer_times.append(time.perf_counter() - started)
+            return
+        raise AssertionError(f'VK gave up on event {event["event_id"]}')
+
+    def run_user(self, vk_user_id: int) -> None:
+        for text in ('привет', 'что нового', 'помощь', 'настройки?', 'спасибо')[:EVENTS_PER_USER]:
+            self.deliver(
+                {
+                    'type': 'message_new',
+                    'event_id': f'bench:{uuid.uuid4().hex}',
+                    'object': {'message': {'from_id': vk_user_id, 'peer_id': vk_user_id, 'text': text}},
+                }
+            )
+
+
+@pytest.fixture
+def vk_users(user_base: SyntheticUserBase) -> Generator[list[int], None, None]:
+    """synthetic users linked to VK ids"""
+    user_ids = list(user_base.user_ids[:SIMULTANEOUS_USERS])
+    engine = sqlalchemy_get_pool()
+    with engine.begin() as conn:
+        unlink_users(conn, user_ids)
+        conn.execute(
+            sqlalchemy.text("""
+                INSERT INTO user_identity_map (internal_user_id, messenger, messenger_user_id)
+                SELECT user_id, 'vk', (:vk_id_base + n)::varchar
+                FROM unnest(CAST(:user_ids AS bigint[])) WITH ORDINALITY AS u(user_id, n)
+            """),
+            dict(vk_id_base=VK_ID_BASE, user_ids=user_ids),
+        )
+    yield [VK_ID_BASE + n for n in range(1, len(user_ids) + 1)]
+
+    with engine.begin() as conn:
+        unlink_users(conn, user_ids)
+
+
+def unlink_users(conn: sqlalchemy.Connection, user_ids: list[int]) -> None:
+    conn.execute(
+        sqlalchemy.text("DELETE FROM user_identity_map WHERE messenger = 'vk' AND internal_user_id = ANY(:user_ids)"),
+        dict(user_ids=user_ids),
+    )
+    conn.execute(sqlalchemy.text("DELETE FROM vk_callback_events WHERE event_key LIKE 'bench:%'"))
+
+
+@pytest.fixture
+def vk_api() -> Generator[VKApiStub, None, None]:
+    stub = VKApiStub()
+    with (
+        patch.object(VKApi, 'send', stub.send),
+        patch.object(VKApi, 'edit_message', stub.answer),
+        patch.object(VKApi, 'send_message_event_answer', stub.answer),
+    ):
+        yield stub
+
+
+@pytest.fixture(params=[False, True], ids=['sync', 'fast_ack'])
+def dispatcher(request: pytest.FixtureRequest) -> Generator[VKEventDispatcher, None, None]:
+    config = get_app_config().model_copy(
+        update=dict(vk_fast_ack=request.param, vk_ack_workers=INSTANCE_CONCURRENCY, vk_ack_queue_size=100)
+    )
+    with patch.object(event_dispatcher, 'get_app_config', return_value=config):
+        yield VKEventDispatcher()
+
+
+@pytest.fixture
+def endpoint(dispatcher: VKEventDispatcher) -> Generator[str, None, None]:
+    """the callback endpoint of one function instance"""
+    slots = threading.Semaphore(INSTANCE_CONCURRENCY)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            event = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            with slots:
+                body = dispatcher.dispatch(event).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128  # the default 5 drops connections of simultaneous users
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+
+
+def test_simultaneous_users(
+    benchmark,
+    bench_rounds: int,
+    vk_users: list[int],
+    vk_api: VKApiStub,
+    dispatcher: VKEventDispatcher,
+    endpoint: str,
+    db_calls: str,
+    db_round_trips: DBRoundTrips,
+):
+    """all users chat at once; a round ends when every event is handled"""
+    simulators: list[CallbackSimulator] = []
+
+    def replay() -> None:
+        simulator = CallbackSimulator(endpoint)
+        simulators.append(simulator)
+        with ThreadPoolExecutor(max_workers=len(vk_users)) as pool:
+            list(pool.map(simulator.run_user, vk_users))
+        dispatcher.join()
+
+    db_round_trips.reset()
+    benchmark.pedantic(replay, rounds=bench_rounds)
+
+    events = len(vk_users) * EVENTS_PER_USER
+    answer_times = sorted(t for simulator in simulators for t in simulator.answer_times)
+    assert vk_api.sent == events * bench_rounds  # a reply per event: resent events are not handled again
+    benchmark.extra_info['events'] = events
+    benchmark.extra_info['resends'] = sum(simulator.resends for simulator in simulators) / bench_rounds
+    benchmark.extra_info['answer_p50_ms'] = round(statistics.median(answer_times) * 1000, 1)
+    benchmark.extra_info['answer_p95_ms'] = round(answer_times[int(len(answer_times) * 0.95)] * 1000, 1)
+    benchmark.extra_info.update(db_round_trips.per_event(events * bench_rounds))
+
+
+@pytest.mark.parametrize('backend', ['memory', 'postgres'])
+def test_dedup_of_parallel_instances(benchmark, bench_rounds: int, backend: str):
+    """instances receive the events and their resends at once; only the claim is measured, handlers are no-ops"""
+    handled: list[str] = []
+    deliveries: list[list[dict]] = []
+    dispatchers: list[VKEventDispatcher] = []
+
+    def new_round() -> None:
+        handled.clear()
+        deliveries[:] = [[] for _ in range(DEDUP_INSTANCES)]
+        for i in range(DEDUP_EVENTS):
+            event = {'type': 'message_new', 'event_id': f'bench:{uuid.uuid4().hex}', 'object': {'message': {}}}
+            deliveries[i % DEDUP_INSTANCES].append(event)
+            if i < DEDUP_EVENTS * DEDUP_RESENT_SHARE:
+                deliveries[(i + 1) % DEDUP_INSTANCES].append(event)
+        dispatchers[:] = []
+        for _ in range(DEDUP_INSTANCES):
+            store: EventDedupStore = InMemoryDedupStore() if backend == 'memory' else PostgresDedupStore(DBClient())
+            dispatcher = VKEventDispatcher(store)
+            dispatcher._handlers['message_new'] = lambda event_object: handled.append('') or 'ok'
+            dispatchers.append(dispatcher)
+
+    def deliver() -> None:
+        with ThreadPoolExecutor(max_workers=DEDUP_INSTANCES) as pool:
+            list(
+                pool.map(lambda i: [dispatchers[i].dispatch(event) for event in deliveries[i]], range(DEDUP_INSTANCES))
+            )
+
+    benchmark.pedantic(deliver, setup=new_round, rounds=bench_rounds)
+
+    with sqlalchemy_get_pool().begin() as conn:
+        conn.execute(sqlalchemy.text("DELETE FROM vk_callback_events WHERE event_key LIKE 'bench:%'"))
+    deliveries_count = sum(len(events) for events in deliveries)
+    benchmark.extra_info['deliveries'] = deliveries_count
+    benchmark.extra_info['handled_twice'] = len(handled) - DEDUP_EVENTS
+    if benchmark.stats:  # no stats with --benchmark-disable
+        benchmark.extra_info['claims_per_second'] = round(deliveries_count / benchmark.stats.stats.min)
+    if backend == 'postgres':
+        assert len(handled) == DEDUP_EVENTS
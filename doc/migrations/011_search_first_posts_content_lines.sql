@@ -0,0 +1,26 @@
+-- Migration 011: Store cleaned lines of first posts with per-line hashes
+--
+-- identify_updates_of_first_posts used to re-parse both the current and the previous
+-- version of the first post (BeautifulSoup + cleanup patterns) on every update.
+-- Now it stores the cleaned lines of each version together with their md5 hashes,
+-- so the next update is diffed by hashes and only the text of changed lines is read.
+--
+-- Rows created before this migration have NULL in both columns and are
+-- parsed the old way once.
+--
+-- search_first_posts__history gets the same columns, because archive_notifications
+-- copies rows with `SELECT sfp.*`.
+--
+-- Rollback:
+--   ALTER TABLE search_first_posts DROP COLUMN content_lines, DROP COLUMN content_line_hashes;
+--   ALTER TABLE search_first_posts__history DROP COLUMN content_lines, DROP COLUMN content_line_hashes;
+
+BEGIN;
+
+ALTER TABLE search_first_posts ADD COLUMN IF NOT EXISTS content_lines VARCHAR[] NULL;
+ALTER TABLE search_first_posts ADD COLUMN IF NOT EXISTS content_line_hashes VARCHAR[] NULL;
+
+ALTER TABLE search_first_posts__history ADD COLUMN IF NOT EXISTS content_lines VARCHAR[] NULL;
+ALTER TABLE search_first_posts__history ADD COLUMN IF NOT EXISTS content_line_hashes VARCHAR[] NULL;
+
+COMMIT;
@@ -0,0 +1,154 @@
+-- Migration 012: Recipient index for compose_notifications
+--
+-- compose_notifications used to find recipients of every change_log record with a CTE that
+-- aggregates user_preferences, user_pref_topic_type and user_regional_preferences of ALL users.
+-- notif_recipient_index keeps the result of that aggregation: one row per (forum folder, user)
+-- for active users, with their notification types and topic types as arrays.
+-- Composing a record becomes an index lookup by forum folder plus a filter on the arrays;
+-- coordinates, radius, age periods and stats are joined for the found users only.
+--
+-- The index is refreshed incrementally by statement-level triggers on the source tables:
+-- users, user_preferences, user_pref_topic_type, user_regional_preferences, user_pref_search_filtering.
+-- Only users touched by the statement are recomputed.
+--
+-- user_coordinates gets an index on user_id for the lookup join.
+--
+-- Full rebuild (e.g. after bulk changes with triggers disabled):
+--   SELECT refresh_notif_recipient_index(NULL);
+--
+-- Rollback:
+--   DROP TRIGGER notif_recipient_index_ins ON users; (… _upd, _del and the same on the other 4 tables)
+--   DROP FUNCTION notif_recipient_index_on_change();
+--   DROP FUNCTION refresh_notif_recipient_index(int8[]);
+--   DROP TABLE notif_recipient_index;
+--   DROP INDEX idx_user_coordinates_user_id;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS notif_recipient_index (
+	forum_folder_num int4 NOT NULL,
+	user_id int8 NOT NULL,
+	multi_folder bool NOT NULL,
+	pref_ids _int4 NOT NULL,
+	topic_type_ids _int4 NOT NULL,
+	whitelist_on bool NOT NULL,
+	CONSTRAINT notif_recipient_index_pkey PRIMARY KEY (forum_folder_num, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_notif_recipient_index_user_id ON notif_recipient_index USING btree (user_id);
+
+CREATE INDEX IF NOT EXISTS idx_user_coordinates_user_id ON user_coordinates USING btree (user_id);
+
+
+CREATE OR REPLACE FUNCTION public.refresh_notif_recipient_index(p_user_ids int8[])
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+-- recompute rows of the given users (all users if NULL)
+BEGIN
+    IF p_user_ids IS NULL THEN
+        -- no concurrent changes of settings, they would be lost by the rebuild
+        LOCK TABLE users, user_preferences, user_pref_topic_type, user_regional_preferences, user_pref_search_filtering
+            IN SHARE MODE;
+        DELETE FROM notif_recipient_index;
+    ELSE
+        -- refreshes of the same user are serialized until commit: the one that waited reads the
+        -- settings committed by the other with a new snapshot, so neither leaves stale rows.
+        -- Locks are taken in key order so that refreshes of several users cannot deadlock.
+        PERFORM pg_advisory_xact_lock(lock_key)
+        FROM (
+            SELECT DISTINCT hashtextextended('notif_recipient_index:' || user_id, 0) AS lock_key
+            FROM unnest(p_user_ids) AS changed(user_id)
+            ORDER BY lock_key
+        ) AS user_locks;
+
+        DELETE FROM notif_recipient_index ri
+        USING unnest(p_user_ids) AS changed(user_id)
+        WHERE ri.user_id = changed.user_id;
+    END IF;
+
+    INSERT INTO notif_recipient_index (forum_folder_num, user_id, multi_folder, pref_ids, topic_type_ids, whitelist_on)
+    WITH
+        affected_users AS (
+            SELECT u.user_id
+            FROM users u
+            WHERE (u.status IS NULL OR u.status = 'unblocked')
+                AND (p_user_ids IS NULL OR u.user_id IN (SELECT unnest(p_user_ids)))),
+        user_notif_prefs AS (
+            SELECT up.user_id, array_agg(up.pref_id) AS agg
+            FROM user_preferences up JOIN affected_users au ON au.user_id = up.user_id
+            GROUP BY up.user_id),
+        user_topic_prefs AS (
+            SELECT ut.user_id, array_agg(ut.topic_type_id) AS agg
+            FROM user_pref_topic_type ut JOIN affected_users au ON au.user_id = ut.user_id
+            GROUP BY ut.user_id),
+        user_folders AS (
+            SELECT urp.user_id, urp.forum_folder_num,
+                count(urp.forum_folder_num) OVER (PARTITION BY urp.user_id) > 1 AS multi_folder
+            FROM user_regional_preferences urp JOIN affected_users au ON au.user_id = urp.user_id)
+    SELECT DISTINCT uf.forum_folder_num, uf.user_id, uf.multi_folder, unp.agg, utp.agg,
+        EXISTS (
+            SELECT 1 FROM user_pref_search_filtering upsf
+            WHERE upsf.user_id = uf.user_id AND 'whitelist' = ANY(upsf.filter_name)
+        )
+    FROM user_folders uf
+    JOIN user_notif_prefs unp ON unp.user_id = uf.user_id
+    JOIN user_topic_prefs utp ON utp.user_id = uf.user_id
+    WHERE uf.forum_folder_num IS NOT NULL;
+END;
+$function$
+;
+
+
+CREATE OR REPLACE FUNCTION public.notif_recipient_index_on_change()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_notif_recipient_index(ARRAY(SELECT DISTINCT user_id FROM new_rows WHERE user_id IS NOT NULL));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_notif_recipient_index(ARRAY(SELECT DISTINCT user_id FROM old_rows WHERE user_id IS NOT NULL));
+    ELSE
+        PERFORM refresh_notif_recipient_index(ARRAY(
+            SELECT user_id FROM new_rows WHERE user_id IS NOT NULL
+            UNION
+            SELECT user_id FROM old_rows WHERE user_id IS NOT NULL
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$function$
+;
+
+
+DO $$
+DECLARE
+    source_table text;
+BEGIN
+    FOREACH source_table IN ARRAY ARRAY[
+        'users', 'user_preferences', 'user_pref_topic_type', 'user_regional_preferences', 'user_pref_search_filtering'
+    ]
+    LOOP
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER notif_recipient_index_ins AFTER INSERT ON %I '
+            'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notif_recipient_index_on_change()',
+            source_table
+        );
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER notif_recipient_index_upd AFTER UPDATE ON %I '
+            'REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION notif_recipient_index_on_change()',
+            source_table
+        );
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER notif_recipient_index_del AFTER DELETE ON %I '
+            'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notif_recipient_index_on_change()',
+            source_table
+        );
+    END LOOP;
+END;
+$$;
+
+SELECT refresh_notif_recipient_index(NULL);
+
+COMMIT;
@@ -0,0 +1,162 @@
+-- Migration 013: Range-partitioned notif_by_user and notif_by_user__history
+--
+-- notif_by_user is the send queue and the source of notif_by_user__history; both degrade as they grow.
+--
+-- notif_by_user is partitioned by RANGE (change_log_id), 5000 change_log ids per partition
+-- (notif_by_user_p<lower>). change_log_id is the leading column of notif_by_user_unique_unsent_idx,
+-- so the index stays unique across partitions and ON CONFLICT in compose_notifications keeps working.
+-- A primary key has to include the partition key, and change_log_id is nullable,
+-- so the primary key is replaced with a unique index on (message_id, change_log_id).
+--
+-- notif_by_user__history is partitioned by RANGE (created) into days (notif_by_user__history_pYYYYMMDD).
+-- archive_to_bigquery drops the partition of an exported day instead of deleting its rows.
+--
+-- Both tables have a default partition (<table>_default) for rows out of the created ranges.
+-- create_range_partition() moves such rows into a new partition of their range.
+-- archive_notifications creates partitions ahead on every run. It moves whole partitions of old
+-- change_log records to history and then detaches and drops them.
+--
+-- Run in a maintenance window: compose_notifications, send_notifications, archive_notifications
+-- and archive_to_bigquery must be paused. The data of both tables is copied once.
+--
+-- Rollback:
+--   CREATE TABLE notif_by_user__plain (LIKE notif_by_user INCLUDING DEFAULTS);
+--   INSERT INTO notif_by_user__plain SELECT * FROM notif_by_user;
+--   DROP TABLE notif_by_user; ALTER TABLE notif_by_user__plain RENAME TO notif_by_user;
+--   ALTER TABLE notif_by_user ADD CONSTRAINT notif_by_user_pkey PRIMARY KEY (message_id);
+--   CREATE UNIQUE INDEX notif_by_user_unique_unsent_idx ... (see 008)
+--   (the same for notif_by_user__history with idx_notif_by_user__history_created_message_id, see 009)
+--   DROP FUNCTION create_range_partition(text, text, text, text, text);
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.create_range_partition(p_parent text, p_partition text, p_key text, p_from text, p_to text)
+ RETURNS boolean
+ LANGUAGE plpgsql
+AS $function$
+-- create partition [p_from, p_to) of p_parent if it does not exist;
+-- rows of the range already stored in the default partition <p_parent>_default are moved into it
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext(p_parent));
+    IF to_regclass(p_partition) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', p_partition, p_parent);
+    IF to_regclass(p_parent || '_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved_rows AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved_rows',
+            p_parent || '_default', p_key, p_from, p_key, p_to, p_partition
+        );
+    END IF;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', p_parent, p_partition, p_from, p_to
+    );
+    RETURN true;
+END;
+$function$
+;
+
+
+-- Step 1: notif_by_user
+
+ALTER TABLE notif_by_user RENAME TO notif_by_user__unpartitioned;
+ALTER TABLE notif_by_user__unpartitioned RENAME CONSTRAINT notif_by_user_pkey TO notif_by_user__unpartitioned_pkey;
+ALTER INDEX notif_by_user_unique_unsent_idx RENAME TO notif_by_user__unpartitioned_unique_unsent_idx;
+
+CREATE TABLE notif_by_user (
+	message_id int8 NOT NULL,
+	user_id int8 NOT NULL,
+	message_content varchar NULL,
+	message_text varchar NULL,
+	message_type varchar(50) NOT NULL,
+	message_params varchar NULL,
+	message_group_id int4 NULL,
+	change_log_id int4 NULL,
+	created timestamp NULL,
+	completed timestamp NULL,
+	cancelled timestamp NULL,
+	failed timestamp NULL,
+	num_of_fails int4 NULL,
+	messenger varchar(20) DEFAULT 'telegram'::character varying NOT NULL
+)
+PARTITION BY RANGE (change_log_id);
+
+CREATE UNIQUE INDEX notif_by_user_message_id_idx
+	ON notif_by_user (message_id, change_log_id);
+CREATE UNIQUE INDEX notif_by_user_unique_unsent_idx
+	ON notif_by_user (change_log_id, user_id, message_type, COALESCE(messenger, 'telegram'))
+	WHERE completed IS NULL AND cancelled IS NULL;
+CREATE TABLE notif_by_user_default PARTITION OF notif_by_user DEFAULT;
+
+-- the message_id sequence moves to the new table
+DO $$
+DECLARE
+    message_id_seq text := pg_get_serial_sequence('notif_by_user__unpartitioned', 'message_id');
+BEGIN
+    EXECUTE format('ALTER TABLE notif_by_user ALTER COLUMN message_id SET DEFAULT nextval(%L::regclass)', message_id_seq);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY notif_by_user.message_id', message_id_seq);
+END;
+$$;
+
+-- partitions for the stored notifications, the latest change_log records and 2 ranges ahead
+SELECT create_range_partition('notif_by_user', 'notif_by_user_p' || lower, 'change_log_id', lower::text, (lower + 5000)::text)
+FROM (
+    SELECT DISTINCT change_log_id / 5000 * 5000 AS lower
+    FROM notif_by_user__unpartitioned
+    WHERE change_log_id IS NOT NULL
+    UNION
+    SELECT generate_series(
+        COALESCE(MAX(id), 0) / 5000 * 5000, COALESCE(MAX(id), 0) / 5000 * 5000 + 2 * 5000, 5000
+    )
+    FROM change_log
+) AS ranges
+ORDER BY lower;
+
+INSERT INTO notif_by_user SELECT * FROM notif_by_user__unpartitioned;
+DROP TABLE notif_by_user__unpartitioned;
+
+
+-- Step 2: notif_by_user__history
+
+ALTER TABLE notif_by_user__history RENAME TO notif_by_user__history_unpartitioned;
+ALTER INDEX idx_notif_by_user__history_created_message_id
+    RENAME TO idx_notif_by_user__history_unpartitioned_created_message_id;
+
+CREATE TABLE notif_by_user__history (
+	message_id int8 NULL,
+	user_id int8 NULL,
+	message_content varchar NULL,
+	message_text varchar NULL,
+	message_type varchar(50) NULL,
+	message_params varchar NULL,
+	message_group_id int4 NULL,
+	change_log_id int4 NULL,
+	created timestamp NULL,
+	completed timestamp NULL,
+	cancelled timestamp NULL,
+	failed timestamp NULL,
+	num_of_fails int4 NULL,
+	messenger varchar(20) DEFAULT 'telegram'::character varying NOT NULL
+)
+PARTITION BY RANGE (created);
+
+CREATE INDEX idx_notif_by_user__history_created_message_id
+	ON notif_by_user__history (created, message_id);
+CREATE TABLE notif_by_user__history_default PARTITION OF notif_by_user__history DEFAULT;
+
+-- daily partitions for the days archive_to_bigquery has not exported yet; older rows go to the default partition
+SELECT create_range_partition(
+    'notif_by_user__history', 'notif_by_user__history_p' || to_char(day, 'YYYYMMDD'), 'created',
+    day::date::text, (day::date + 1)::text
+)
+FROM generate_series(CURRENT_DATE - 40, CURRENT_DATE + 1, INTERVAL '1 day') AS day;
+
+INSERT INTO notif_by_user__history SELECT * FROM notif_by_user__history_unpartitioned;
+DROP TABLE notif_by_user__history_unpartitioned;
+
+ANALYZE notif_by_user;
+ANALYZE notif_by_user__history;
+
+COMMIT;
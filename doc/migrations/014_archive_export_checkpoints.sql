@@ -0,0 +1,27 @@
+-- Migration 014: Checkpoints of archive_to_bigquery
+--
+-- archive_to_bigquery exports (table, day) units in parallel. A unit is checkpointed after the upload
+-- (uploaded) and after the exported records are deleted (deleted), so an invocation that timed out
+-- resumes where it stopped: uploaded units are verified in s3 and deleted without a new export.
+-- Records that arrive for an already exported day go to the next part of the day (part + 1):
+-- a part holds the records of the day up to max_message_id, only they are deleted after the upload.
+--
+-- Rollback:
+--   DROP TABLE archive_export_checkpoints;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS archive_export_checkpoints (
+	table_name varchar(100) NOT NULL,
+	"day" date NOT NULL,
+	part int4 DEFAULT 1 NOT NULL,
+	object_key varchar NOT NULL,
+	"rows" int8 NOT NULL,
+	"bytes" int8 NOT NULL,
+	max_message_id int8 NOT NULL,
+	uploaded timestamp NOT NULL,
+	deleted timestamp NULL,
+	CONSTRAINT archive_export_checkpoints_pkey PRIMARY KEY (table_name, day)
+);
+
+COMMIT;
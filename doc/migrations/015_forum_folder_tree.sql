@@ -0,0 +1,31 @@
+-- Migration 015: Folder tree of check_topics_by_upd_time
+--
+-- check_topics_by_upd_time kept the subfolders and searches of every crawled folder as str() of Python lists
+-- in key_value_storage (keys folders_<num> and searches_<num>). They are now rows: a folder per row with its
+-- parent and the time shown on the parent's page, and the searches listed on a folder's page.
+-- A folder without rows is read from the old keys once; the keys are deleted when its rows are written.
+--
+-- Rollback:
+--   DROP TABLE forum_folder_searches;
+--   DROP TABLE forum_folder_tree;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS forum_folder_tree (
+	folder_num int4 NOT NULL,
+	parent_folder_num int4 NULL,
+	change_time_str varchar NULL,
+	folder_name varchar NULL,
+	crawled_at timestamp NULL,
+	CONSTRAINT forum_folder_tree_pkey PRIMARY KEY (folder_num)
+);
+CREATE INDEX IF NOT EXISTS idx_forum_folder_tree_parent_folder_num ON public.forum_folder_tree USING btree (parent_folder_num);
+
+CREATE TABLE IF NOT EXISTS forum_folder_searches (
+	folder_num int4 NOT NULL,
+	title varchar NOT NULL,
+	change_time_str varchar NOT NULL,
+	CONSTRAINT forum_folder_searches_pkey PRIMARY KEY (folder_num, title, change_time_str)
+);
+
+COMMIT;
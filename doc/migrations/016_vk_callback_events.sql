@@ -0,0 +1,19 @@
+-- Migration 016: Processed events of the VK callback endpoint
+--
+-- VK resends a callback event that was not answered in time. The keys of received events were kept
+-- in memory of one function instance, so a cold start or a parallel instance handled a resent event again.
+-- The key is claimed here before the event is handled. The table is UNLOGGED: after a crash of the DB
+-- it is empty, which only loses the deduplication of events VK is resending at that moment.
+--
+-- Rollback:
+--   DROP TABLE vk_callback_events;
+
+BEGIN;
+
+CREATE UNLOGGED TABLE IF NOT EXISTS vk_callback_events (
+	event_key varchar NOT NULL,
+	received_at timestamp DEFAULT now() NOT NULL,
+	CONSTRAINT vk_callback_events_pkey PRIMARY KEY (event_key)
+);
+
+COMMIT;
@@ -6,7 +6,8 @@ used by both the VK bot and Telegram bot:
 - :class:`HandlerConditions` — pure data model describing what conditions
   a handler matches on (text, callback_data, state, etc.)
 - :class:`Handler` — a registered handler with its conditions and priority
-- :class:`HandlerRegistry` — a priority-ordered registry of handlers
+- :class:`HandlerRegistry` — a priority-ordered registry of handlers with a
+  dispatch index built once after registration
 - :func:`match_conditions` — pure matching function that checks conditions
   against a dict of extracted values
 
@@ -15,9 +16,10 @@ and no decorators. Platform-specific decorators (``@vk_handle``, ``@tg_handle``)
 live in their respective bot packages and use this infrastructure.
 """
 
+import heapq
 import re
 from dataclasses import dataclass
-from typing import Any, Callable, Generator
+from typing import Any, Callable, Generator, Iterable
 
 from pydantic import BaseModel
 
@@ -153,6 +155,122 @@ def match_conditions(conditions: HandlerConditions, **values: Any) -> bool:
     return True  # all conditions matched
 
 
+@dataclass(frozen=True)
+class _DispatchIndex:
+    """Handlers in priority order, bucketed by their most selective condition.
+
+    Every handler is put into exactly one bucket, in this order of preference:
+    exact ``text``, ``callback_data``, ``callback_keyboard``, ``state``; handlers
+    with none of them are ``unkeyed``. A bucket only narrows the candidates —
+    every candidate is still checked against all its conditions, so the result
+    is the same as of the linear scan.
+
+    Buckets hold positions in ``handlers`` (ascending), so merging the buckets
+    of one lookup keeps the priority order.
+    """
+
+    handlers: list[Handler]
+    by_text: dict[str, list[int]]
+    by_callback_data: dict[str, list[int]]
+    by_callback_keyboard: dict[str, list[int]]
+    by_state: dict[str, list[int]]
+    unkeyed: list[int]
+    regex_prefilter: re.Pattern | None
+    """Alternation of the group-free regexes of unkeyed handlers: if it does not match the text, none of them does."""
+    prefiltered: frozenset[int]
+    regexes: dict[int, tuple[re.Pattern, HandlerConditions]]
+    """Compiled ``text_regex`` and the rest of the conditions of the handler at the position."""
+
+    @classmethod
+    def build(cls, handlers: list[Handler]) -> '_DispatchIndex':
+        ordered = sorted(handlers, key=lambda h: h.priority)
+        by_text: dict[str, list[int]] = {}
+        by_callback_data: dict[str, list[int]] = {}
+        by_callback_keyboard: dict[str, list[int]] = {}
+        by_state: dict[str, list[int]] = {}
+        unkeyed: list[int] = []
+        regexes: dict[int, tuple[re.Pattern, HandlerConditions]] = {}
+        prefiltered: list[int] = []
+
+        for position, handler in enumerate(ordered):
+            conditions = handler.conditions
+            if conditions.text_regex is not None:
+                rest = conditions.model_copy(update={'text_regex': None})
+                regexes[position] = (re.compile(conditions.text_regex), rest)
+
+            if conditions.text is not None:
+                _add_to_buckets(by_text, conditions.text, position)
+            elif conditions.callback_data is not None:
+                _add_to_buckets(by_callback_data, conditions.callback_data, position)
+            elif conditions.callback_keyboard is not None:
+                _add_to_buckets(by_callback_keyboard, conditions.callback_keyboard, position)
+            elif conditions.state is not None:
+                _add_to_buckets(by_state, conditions.state, position)
+            else:
+                unkeyed.append(position)
+                # numbered groups would be renumbered in the alternation and break backreferences
+                if position in regexes and not regexes[position][0].groups:
+                    prefiltered.append(position)
+
+        regex_prefilter = None
+        if prefiltered:
+            try:
+                regex_prefilter = re.compile(
+                    '|'.join(f'(?:{regexes[position][0].pattern})' for position in prefiltered)
+                )
+            except re.error:  # e.g. global flags in the middle of the alternation
+                prefiltered = []
+
+        return cls(
+            handlers=ordered,
+            by_text=by_text,
+            by_callback_data=by_callback_data,
+            by_callback_keyboard=by_callback_keyboard,
+            by_state=by_state,
+            unkeyed=unkeyed,
+            regex_prefilter=regex_prefilter,
+            prefiltered=frozenset(prefiltered),
+            regexes=regexes,
+        )
+
+    def match(self, values: dict[str, Any]) -> Generator[Handler, None, None]:
+        text = values.get('text')
+        unkeyed = self.unkeyed
+        if self.prefiltered and (text is None or not self.regex_prefilter.search(text)):  # type: ignore[union-attr]
+            unkeyed = [position for position in unkeyed if position not in self.prefiltered]
+
+        candidates: list[Iterable[int]] = [unkeyed]
+        for bucket, key in (
+            (self.by_text, 'text'),
+            (self.by_callback_data, 'callback_data'),
+            (self.by_callback_keyboard, 'callback_keyboard'),
+            (self.by_state, 'state'),
+        ):
+            value = values.get(key)
+            if isinstance(value, str) and value in bucket:
+                candidates.append(bucket[value])
+
+        for position in heapq.merge(*candidates):
+            handler = self.handlers[position]
+            if self._matches(position, handler.conditions, values):
+                yield handler
+
+    def _matches(self, position: int, conditions: HandlerConditions, values: dict[str, Any]) -> bool:
+        if position not in self.regexes:
+            return match_conditions(conditions, **values)
+        # the same check with the compiled regex instead of re.search on the pattern string
+        regex, rest = self.regexes[position]
+        user_text = values.get('text')
+        if user_text is None or not regex.search(user_text):
+            return False
+        return match_conditions(rest, **values)
+
+
+def _add_to_buckets(buckets: dict[str, list[int]], keys: str | list[str], position: int) -> None:
+    for key in dict.fromkeys([keys] if isinstance(keys, str) else keys):
+        buckets.setdefault(key, []).append(position)
+
+
 class HandlerRegistry:
     """Priority-ordered registry of handlers.
 
@@ -162,11 +280,15 @@ class HandlerRegistry:
     matching handlers in priority order.
 
     The registry is **read-only at runtime** — all registration happens
-    during module import.
+    during module import. The first :meth:`match` after registration builds
+    a dispatch index (hash maps by exact text, callback data, keyboard and
+    state, compiled regexes), so a dispatch checks only the handlers that
+    can match instead of all of them.
     """
 
     def __init__(self) -> None:
         self._handlers: list[Handler] = []
+        self._index: _DispatchIndex | None = None
 
     def register(self, handler: Handler) -> None:
         """Register a handler.
@@ -174,6 +296,7 @@ class HandlerRegistry:
         Called by platform-specific decorators at import time.
         """
         self._handlers.append(handler)
+        self._index = None
 
     def match(self, **kwargs: Any) -> Generator[Handler, None, None]:
         """Yield handlers whose conditions match *kwargs*, in priority order.
@@ -185,6 +308,12 @@ class HandlerRegistry:
         Yields:
             :class:`Handler` instances in ascending priority order.
         """
+        if self._index is None:
+            self._index = _DispatchIndex.build(self._handlers)
+        yield from self._index.match(kwargs)
+
+    def match_linear(self, **kwargs: Any) -> Generator[Handler, None, None]:
+        """Same as :meth:`match`, checking every handler (reference for testing)."""
         for handler in sorted(self._handlers, key=lambda h: h.priority):
             if match_conditions(handler.conditions, **kwargs):
                 yield handler
@@ -196,3 +325,4 @@ class HandlerRegistry:
     def clear(self) -> None:
         """Remove all registered handlers (for testing)."""
         self._handlers.clear()
+        self._index = None
@@ -5,6 +5,7 @@ from enum import Enum
 import sqlalchemy
 
 from _dependencies.common.commons import Messenger, sqlalchemy_get_pool
+from _dependencies.common.db_client import transaction
 
 
 class ManageUserAction(str, Enum):
@@ -36,8 +37,7 @@ def register_new_user(user_id: int, user_name: str | None, timestamp: datetime,
         messenger: Messenger enum value for user_identity_map.
     """
 
-    pool = sqlalchemy_get_pool()
-    with pool.begin() as conn:
+    with transaction(sqlalchemy_get_pool()) as conn:
         # compose & execute the query for USER_STATUSES_HISTORY table
         _write_new_user_status(conn, ManageUserAction.new, user_id, timestamp)
 
@@ -53,8 +53,7 @@ def update_user_status(action: ManageUserAction, user_id: int) -> None:
     timestamp = datetime.now()
     action_to_write = action.action_to_write()
 
-    pool = sqlalchemy_get_pool()
-    with pool.begin() as conn:
+    with transaction(sqlalchemy_get_pool()) as conn:
         _change_status_in_table_users(conn, user_id, timestamp, action_to_write)
         _write_new_user_status(conn, action, user_id, timestamp)
 
@@ -74,8 +73,7 @@ def save_onboarding_step(user_id: int, step: str) -> None:
 
     step_id = dict_steps.get(step, 99)
 
-    pool = sqlalchemy_get_pool()
-    with pool.begin() as conn:
+    with transaction(sqlalchemy_get_pool()) as conn:
         conn.execute(
             sqlalchemy.text("""
                 INSERT INTO user_onboarding (user_id, step_id, step_name, timestamp) 
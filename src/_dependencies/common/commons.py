@@ -41,10 +41,20 @@ class AppConfig(BaseSettings):
     aws_access_key_id: str = ''
     aws_secret_access_key: str = ''
     aws_backup_bucket_name: str = 'la-backup-notifications'
+    archive_export_format: str = 'csv'  # csv | parquet, format of archive_to_bigquery files
     vk_api_key: str = ''  # TODO SecretStr
     vk_confirmation_code: str = ''
     vk_group_id: int = 0
+    # answer VK callbacks at once, handle the events in background threads; a Cloud Function waits for them anyway
+    vk_fast_ack: bool = False
+    vk_ack_workers: int = 4
+    vk_ack_queue_size: int = 100  # events waiting for one worker
+    vk_ack_queue_timeout: float = 5.0  # seconds to wait for room in a full queue, then VK resends the event
+    vk_dedup_backend: str = 'postgres'  # postgres | memory, memory does not see events of other instances
     max_bot_token: str = ''
+    dialog_history_buffered: bool = False  # write dialog history in batches, see user_repository.dialog_history_buffer
+    dialog_history_buffer_size: int = 100
+    dialog_history_flush_seconds: float = 5.0
     max_bot_webhook_secret: str = ''
 
     mysql_host: str = ''
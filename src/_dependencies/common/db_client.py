@@ -1,13 +1,66 @@
 import json
 from abc import ABC, abstractmethod
-from contextlib import _GeneratorContextManager
-from typing import Any
+from contextlib import _GeneratorContextManager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
 
 import sqlalchemy
-from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine.base import Connection, Engine
 
 from _dependencies.common.commons import sqlalchemy_get_pool
 
+_current_unit_of_work: ContextVar['UnitOfWork | None'] = ContextVar('unit_of_work', default=None)
+
+
+class UnitOfWork:
+    """One connection and transaction shared by the DB calls of a handler invocation.
+
+    The connection is taken from the pool by the first call, so an unused unit costs nothing.
+    A unit is all or nothing: an exception from a call rolls back everything written in the unit,
+    and the rest of the invocation makes its calls in their own transactions, as without a unit.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self._connection: Connection | None = None
+        self._failed = False
+
+    @contextmanager
+    def connect(self) -> Iterator[Connection]:
+        if self._failed:
+            with self.engine.begin() as connection:
+                yield connection
+            return
+
+        if self._connection is None:
+            self._connection = self.engine.connect()
+            self._connection.begin()
+        try:
+            yield self._connection
+        except BaseException:
+            self._failed = True
+            self.close(commit=False)
+            raise
+
+    def close(self, commit: bool) -> None:
+        """commit or roll back the shared transaction and return the connection to the pool"""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            if commit:
+                connection.commit()
+        finally:
+            connection.close()  # rolls back a transaction that was not committed
+
+
+def transaction(engine: Engine) -> _GeneratorContextManager:
+    """``engine.begin()``, or the shared connection of the unit of work of the engine if one is active"""
+    unit = _current_unit_of_work.get()
+    if unit is not None and unit.engine is engine:
+        return unit.connect()
+    return engine.begin()
+
 
 class DBClientBase:
     def __init__(self, db: Engine | None = None) -> None:
@@ -18,9 +71,34 @@ class DBClientBase:
 
         Uses ``engine.begin()`` internally so that all DML is automatically
         committed when the context exits.  Read‑only transactions commit a
-        no‑op, which is harmless.
+        no‑op, which is harmless.  Inside :meth:`unit_of_work` yields the
+        shared connection of the unit, which commits when the unit exits.
         """
-        return self._db.begin()
+        return transaction(self._db)
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """All DB calls in the block share one connection and transaction, committed at the end.
+
+        Calls of any client of the same engine join the unit, in the current thread or task.
+        A nested unit joins the outer one: only the outermost unit commits.
+        """
+        outer = _current_unit_of_work.get()
+        if outer is not None and outer.engine is self._db:
+            yield
+            return
+
+        unit = UnitOfWork(self._db)
+        token = _current_unit_of_work.set(unit)
+        try:
+            yield
+        except BaseException:
+            unit.close(commit=False)
+            raise
+        else:
+            unit.close(commit=True)
+        finally:
+            _current_unit_of_work.reset(token)
 
 
 class DBClientMixinBase(ABC):
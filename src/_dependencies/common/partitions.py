@@ -0,0 +1,190 @@
+"""Range partitions of notif_by_user (by change_log_id) and notif_by_user__history (by created date).
+
+Partitions are created ahead by archive_notifications; rows without a partition go to the default one
+(<table>_default) and are moved out of it when the partition of their range is created.
+Old partitions are detached and dropped instead of deleting their rows.
+"""
+
+import datetime
+import re
+from dataclasses import dataclass
+
+import sqlalchemy
+from psycopg2 import errorcodes
+
+from _dependencies.common.db_client import DBClientMixinBase
+
+NOTIF_BY_USER = 'notif_by_user'
+NOTIF_BY_USER_HISTORY = 'notif_by_user__history'
+
+NOTIF_BY_USER_PARTITION_SIZE = 5000  # change_log ids per partition of notif_by_user
+NOTIF_BY_USER_PARTITIONS_AHEAD = 2  # empty partitions kept after the one of the latest change_log
+HISTORY_PARTITION_DAYS_BACK = (
+    40  # daily partitions of notif_by_user__history, as long as archive_to_bigquery looks back
+)
+
+# DETACH PARTITION locks the parent table; better to skip a cycle than to stall the queue
+PARTITION_LOCK_TIMEOUT = '5s'
+
+_BOUNDS_PATTERN = re.compile(r"FROM \('?([^')]+)'?\) TO \('?([^')]+)'?\)")
+
+
+def is_lock_timeout(exc: sqlalchemy.exc.OperationalError) -> bool:
+    """the statement gave up waiting for PARTITION_LOCK_TIMEOUT"""
+    return getattr(exc.orig, 'pgcode', None) == errorcodes.LOCK_NOT_AVAILABLE
+
+
+@dataclass
+class RangePartition:
+    name: str
+    lower: str
+    upper: str
+
+
+def notif_by_user_partition(change_log_id: int) -> tuple[str, int, int]:
+    """name and [lower, upper) bounds of the notif_by_user partition for the change_log record"""
+    lower = change_log_id // NOTIF_BY_USER_PARTITION_SIZE * NOTIF_BY_USER_PARTITION_SIZE
+    return f'{NOTIF_BY_USER}_p{lower}', lower, lower + NOTIF_BY_USER_PARTITION_SIZE
+
+
+def notif_history_partition(day: datetime.date) -> str:
+    return f'{NOTIF_BY_USER_HISTORY}_p{day:%Y%m%d}'
+
+
+class DBPartitionsMixin(DBClientMixinBase):
+    """Creation and retention of range partitions."""
+
+    def get_range_partitions(self, parent: str) -> list[RangePartition]:
+        """range partitions of the table, the default partition excluded"""
+        with self.connect() as conn:
+            rows = conn.execute(
+                sqlalchemy.text("""
+                    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = CAST(:parent AS regclass)
+                """),
+                dict(parent=parent),
+            ).fetchall()
+
+        partitions = []
+        for name, bounds in rows:
+            match = _BOUNDS_PATTERN.search(bounds or '')  # no bounds while a partition is being detached
+            if match:
+                partitions.append(RangePartition(name=name, lower=match.group(1), upper=match.group(2)))
+        return partitions
+
+    def create_range_partition(self, parent: str, partition: str, key: str, lower: object, upper: object) -> bool:
+        """True if the partition was created, False if it already exists"""
+        with self.connect() as conn:
+            return conn.execute(
+                sqlalchemy.text('SELECT create_range_partition(:parent, :partition, :key, :lower, :upper)'),
+                dict(parent=parent, partition=partition, key=key, lower=str(lower), upper=str(upper)),
+            ).scalar_one()
+
+    def drop_partition(self, parent: str, partition: str) -> None:
+        with self.connect() as conn:
+            self._detach_and_drop(conn, parent, partition)
+
+    def ensure_notif_by_user_partitions(self) -> list[str]:
+        """partitions of notif_by_user for the latest change_log records and a few next ones"""
+        with self.connect() as conn:
+            latest_change_log_id = conn.execute(sqlalchemy.text('SELECT MAX(id) FROM change_log')).scalar() or 0
+
+        created = []
+        for step in range(NOTIF_BY_USER_PARTITIONS_AHEAD + 1):
+            name, lower, upper = notif_by_user_partition(latest_change_log_id + step * NOTIF_BY_USER_PARTITION_SIZE)
+            if self.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper):
+                created.append(name)
+        return created
+
+    def get_unarchived_change_log_id(self) -> int:
+        """the lowest change_log id of unsent notifications to look for
+
+        Partitions of older change_log records are moved to history and dropped. Unsent rows below
+        the oldest partition are stored in the default partition only.
+        """
+        lower_bounds = [int(partition.lower) for partition in self.get_range_partitions(NOTIF_BY_USER)]
+        with self.connect() as conn:
+            default_min = conn.execute(
+                sqlalchemy.text(f"""
+                    SELECT MIN(change_log_id) FROM {NOTIF_BY_USER}_default
+                    WHERE completed IS NULL AND cancelled IS NULL
+                """)
+            ).scalar()
+        if default_min is not None:
+            lower_bounds.append(default_min)
+        return min(lower_bounds, default=0)
+
+    def ensure_notif_history_partitions(self, today: datetime.date) -> list[str]:
+        """daily partitions of notif_by_user__history from HISTORY_PARTITION_DAYS_BACK days ago up to tomorrow
+
+        Days exported to s3 and deleted by archive_to_bigquery are skipped: their partitions are dropped,
+        the records that arrive for them later go to the default partition.
+        """
+        existing = {partition.name for partition in self.get_range_partitions(NOTIF_BY_USER_HISTORY)}
+        first_day = today - datetime.timedelta(days=HISTORY_PARTITION_DAYS_BACK)
+        with self.connect() as conn:
+            archived_days = set(
+                conn.execute(
+                    sqlalchemy.text("""
+                        SELECT day FROM archive_export_checkpoints
+                        WHERE table_name = :table_name AND day >= :first_day AND deleted IS NOT NULL
+                    """),
+                    dict(table_name=NOTIF_BY_USER_HISTORY, first_day=first_day),
+                ).scalars()
+            )
+
+        created = []
+        for days_ago in range(HISTORY_PARTITION_DAYS_BACK, -2, -1):
+            day = today - datetime.timedelta(days=days_ago)
+            name = notif_history_partition(day)
+            if name in existing or day in archived_days:
+                continue
+            if self.create_range_partition(
+                NOTIF_BY_USER_HISTORY, name, 'created', day, day + datetime.timedelta(days=1)
+            ):
+                created.append(name)
+        return created
+
+    def move_notif_by_user_partition_to_history(self, partition: str) -> int:
+        """detach the partition, then copy it to notif_by_user__history and drop it
+
+        Once detached, the partition gets no writes: rows of its range go to the default partition
+        and are archived batch by batch. Detaching only holds the lock of the parent briefly,
+        the copy runs without it.
+        """
+        with self.connect() as conn:
+            conn.execute(sqlalchemy.text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            conn.execute(sqlalchemy.text(f'ALTER TABLE {NOTIF_BY_USER} DETACH PARTITION {partition}'))
+        return self.move_detached_notif_by_user_partition_to_history(partition)
+
+    def move_detached_notif_by_user_partition_to_history(self, partition: str) -> int:
+        with self.connect() as conn:
+            moved = conn.execute(
+                sqlalchemy.text(f'INSERT INTO {NOTIF_BY_USER_HISTORY} SELECT * FROM {partition}')
+            ).rowcount
+            conn.execute(sqlalchemy.text(f'DROP TABLE {partition}'))
+            return moved
+
+    def get_detached_notif_by_user_partitions(self) -> list[str]:
+        """partitions of notif_by_user left detached by a run that stopped before copying them"""
+        with self.connect() as conn:
+            return list(
+                conn.execute(
+                    sqlalchemy.text("""
+                        SELECT c.relname
+                        FROM pg_class c
+                        WHERE c.relkind = 'r' AND NOT c.relispartition AND pg_table_is_visible(c.oid)
+                            AND c.relname ~ :pattern
+                        ORDER BY c.relname
+                    """),
+                    dict(pattern=f'^{NOTIF_BY_USER}_p[0-9]+$'),
+                ).scalars()
+            )
+
+    @staticmethod
+    def _detach_and_drop(conn: sqlalchemy.Connection, parent: str, partition: str) -> None:
+        conn.execute(sqlalchemy.text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        conn.execute(sqlalchemy.text(f'ALTER TABLE {parent} DETACH PARTITION {partition}'))
+        conn.execute(sqlalchemy.text(f'DROP TABLE {partition}'))
@@ -0,0 +1,35 @@
+"""Structured log events that mark the stages a forum change goes through on its way to users.
+
+Every event is an INFO record with ``pipeline_stage`` and the ids known at that stage in
+``extra``, so they land in the JSON payload of the cloud logs. ``tools/log_inspector``
+correlates them by ``change_log_id`` and ``search_num`` to measure the latency of each stage.
+"""
+
+import logging
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStage(str, Enum):
+    # check_first_posts_for_changes: the topic was seen changed in the forum DB
+    detected = 'detected'
+    # identify_updates_*: the change was saved to change_log
+    change_logged = 'change_logged'
+    # compose_notifications: notifications for the change_log record were created
+    composed = 'composed'
+    # send_notifications: a run delivered its first notification for the change_log record
+    sent = 'sent'
+
+
+def log_pipeline_event(
+    stage: PipelineStage,
+    *,
+    search_num: int | None = None,
+    change_log_id: int | None = None,
+) -> None:
+    """Log that a change reached ``stage``."""
+    logger.info(
+        f'pipeline: {stage.value} search_num={search_num} change_log_id={change_log_id}',
+        extra={'pipeline_stage': stage.value, 'search_num': search_num, 'change_log_id': change_log_id},
+    )
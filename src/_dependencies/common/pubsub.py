@@ -1,16 +1,20 @@
 import logging
+from contextlib import contextmanager
 from enum import Enum
+from typing import Iterator
 
 from pydantic import BaseModel, RootModel
 
 from _dependencies.common.yandex_tools import (
-    Ctx as YandexCtx,
-)
-from _dependencies.common.yandex_tools import (
+    BufferedPublisher,
+    buffered_publishing_cloud,
     make_api_call_cloud,
     process_pubsub_message_cloud,
     send_topic_cloud,
 )
+from _dependencies.common.yandex_tools import (
+    Ctx as YandexCtx,
+)
 
 Ctx = YandexCtx
 
@@ -83,6 +87,13 @@ def publish_to_pubsub(topic_name: Topics, message: str | dict | list | BaseModel
     send_topic_cloud(topic_name_str, message)
 
 
+@contextmanager
+def buffered_publishing() -> Iterator[BufferedPublisher]:
+    """messages published inside the block are grouped per topic and sent in batches on exit"""
+    with buffered_publishing_cloud() as publisher:
+        yield publisher
+
+
 def pubsub_parse_user_profile(user_id: int, got_message: str) -> None:
     message = MessageForParseUserProfile(root=(user_id, got_message))
     publish_to_pubsub(Topics.parse_user_profile_from_forum, message)
@@ -117,6 +128,44 @@ def pubsub_archive_notifications() -> None:
     publish_to_pubsub(Topics.topic_to_archive_notifs, 'go')
 
 
+class TriggerCoalescer:
+    """Collects compose/send triggers of one invocation and publishes at most one per topic on `flush`.
+
+    A topic is published only if some work was requested for it. Nothing is shared between
+    invocations: compose has no schedule, so a trigger skipped because an earlier invocation
+    sent one could leave a fresh change_log record waiting for an unrelated change.
+    """
+
+    def __init__(self, function_id: int) -> None:
+        self._function_id = function_id
+        self._pending: dict[Topics, MessageForComposeNotifications | MessageForSendNotifications] = {}
+
+    def compose_notifications(self, text: str) -> None:
+        message = MessageForComposeNotifications(triggered_by_func_id=self._function_id, text=text)
+        self._pending.setdefault(Topics.topic_for_notification, message)
+
+    def send_notifications(self, text: str) -> None:
+        message = MessageForSendNotifications(triggered_by_func_id=self._function_id, text=text)
+        self._pending.setdefault(Topics.topic_to_send_notifications, message)
+
+    def flush(self) -> list[Topics]:
+        """publish pending triggers, returns published topics"""
+        pending, self._pending = self._pending, {}
+        for topic, message in pending.items():
+            publish_to_pubsub(topic, message)
+        return list(pending)
+
+
+@contextmanager
+def coalesced_triggers(function_id: int) -> Iterator[TriggerCoalescer]:
+    """collect compose/send triggers inside the block and publish them once on exit"""
+    coalescer = TriggerCoalescer(function_id)
+    try:
+        yield coalescer
+    finally:
+        coalescer.flush()
+
+
 def notify_admin(message: str) -> None:
     """send the pub/sub message to Debug to Admin"""
 
@@ -1,8 +1,10 @@
 import json
 import logging
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import lru_cache
-from typing import Any
+from typing import Any, Iterator, NamedTuple, Protocol
 
 import boto3
 import requests
@@ -13,6 +15,10 @@ from retry import retry
 
 Ctx = dict
 
+# limits of SendMessageBatch in Yandex Message Queue (same as in AWS SQS)
+SQS_MAX_BATCH_SIZE = 10
+SQS_MAX_BATCH_PAYLOAD_BYTES = 256 * 1024
+
 
 def setup_logging_cloud(package_name: str | None = None) -> None:
     handler = logging.StreamHandler(sys.stdout)
@@ -47,23 +53,135 @@ def _get_queue_url(client: BaseClient, topic_name: str) -> str:
     return test_queue_url_data['QueueUrl']
 
 
-def _send_serialized_message(topic_name: str, message_text: str) -> None:
-    # Create client
+class PublishFailure(NamedTuple):
+    topic_name: str
+    message: str
+    code: str
+    reason: str
+
+
+class PubSubTransport(Protocol):
+    """Delivers serialized pub/sub messages to queues"""
+
+    def send_message(self, topic_name: str, serialized_message: str) -> None: ...
+
+    def send_message_batch(self, topic_name: str, serialized_messages: list[str]) -> list[PublishFailure]: ...
+
+
+class YandexMessageQueueTransport:
+    """Production transport: Yandex Message Queue through the SQS API"""
+
+    def send_message(self, topic_name: str, serialized_message: str) -> None:
+        client = _get_boto3_client()
+        queue_url = _get_queue_url(client, topic_name)
+        client.send_message(QueueUrl=queue_url, MessageBody=serialized_message)
 
-    client = _get_boto3_client()
+    def send_message_batch(self, topic_name: str, serialized_messages: list[str]) -> list[PublishFailure]:
+        """send up to SQS_MAX_BATCH_SIZE messages in one call, returns messages which were not sent"""
+        client = _get_boto3_client()
+        queue_url = _get_queue_url(client, topic_name)
+        entries = [{'Id': str(i), 'MessageBody': message} for i, message in enumerate(serialized_messages)]
 
-    queue_url = _get_queue_url(client, topic_name)
-    client.send_message(QueueUrl=queue_url, MessageBody=message_text)
-    pass
+        response = client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+        return [
+            PublishFailure(
+                topic_name=topic_name,
+                message=serialized_messages[int(failed['Id'])],
+                code=failed.get('Code', ''),
+                reason=failed.get('Message', ''),
+            )
+            for failed in response.get('Failed', [])
+        ]
+
+
+_transport: PubSubTransport = YandexMessageQueueTransport()
+
+
+def set_pubsub_transport(transport: PubSubTransport) -> PubSubTransport:
+    """replace the transport of all pub/sub messages (e.g. with a local queue), returns the previous one"""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
 
 
 def _send_topic(topic_name: str, serialized_message: str) -> None:
-    _send_serialized_message(topic_name, serialized_message)
+    _transport.send_message(topic_name, serialized_message)
+
+
+def _send_batch(topic_name: str, serialized_messages: list[str]) -> list[PublishFailure]:
+    return _transport.send_message_batch(topic_name, serialized_messages)
+
+
+class BufferedPublisher:
+    """Groups pub/sub messages per queue and sends them with SendMessageBatch.
+
+    A queue is flushed when its batch is full, the rest – on `flush`.
+    """
+
+    def __init__(self) -> None:
+        self._buffers: dict[str, list[str]] = {}
+        self.failures: list[PublishFailure] = []
+
+    def add(self, topic_name: str, serialized_message: str) -> None:
+        buffer = self._buffers.setdefault(topic_name, [])
+        if buffer and _batch_payload_size(buffer) + len(serialized_message.encode()) > SQS_MAX_BATCH_PAYLOAD_BYTES:
+            self._flush_topic(topic_name)
+            buffer = self._buffers.setdefault(topic_name, [])
+
+        buffer.append(serialized_message)
+        if len(buffer) >= SQS_MAX_BATCH_SIZE:
+            self._flush_topic(topic_name)
+
+    def flush(self) -> list[PublishFailure]:
+        """send all buffered messages, returns failures collected since the publisher was created"""
+        for topic_name in list(self._buffers):
+            self._flush_topic(topic_name)
+        return self.failures
+
+    def _flush_topic(self, topic_name: str) -> None:
+        messages = self._buffers.pop(topic_name, [])
+        if not messages:
+            return
+
+        try:
+            failures = _send_batch(topic_name, messages)
+        except Exception as exc:
+            logging.exception(f'Not able to send batch of pub/sub messages to topic {topic_name}')
+            failures = [PublishFailure(topic_name, message, type(exc).__name__, str(exc)) for message in messages]
+
+        for failure in failures:
+            logging.error(f'Not able to send pub/sub message to topic {topic_name}: {failure}')
+        self.failures.extend(failures)
+        logging.info(f'Sent {len(messages) - len(failures)} of {len(messages)} pub/sub messages to topic {topic_name}')
+
+
+def _batch_payload_size(serialized_messages: list[str]) -> int:
+    return sum(len(message.encode()) for message in serialized_messages)
+
+
+_active_publisher: ContextVar[BufferedPublisher | None] = ContextVar('_active_publisher', default=None)
+
+
+@contextmanager
+def buffered_publishing_cloud() -> Iterator[BufferedPublisher]:
+    """messages sent by send_topic_cloud inside the block are batched and flushed on exit"""
+    publisher = BufferedPublisher()
+    token = _active_publisher.set(publisher)
+    try:
+        yield publisher
+    finally:
+        _active_publisher.reset(token)
+        publisher.flush()
 
 
 def send_topic_cloud(topic_name: str, message: Any) -> None:
     serialized_message = to_json(message).decode()
 
+    publisher = _active_publisher.get()
+    if publisher:
+        publisher.add(topic_name, serialized_message)
+        return
+
     try:
         _send_topic(topic_name, serialized_message)
         logging.info(f'Sent pub/sub message to topic {topic_name}: {str(message)}')
@@ -49,3 +49,24 @@ class UserSettingsSummary:
     pref_notif_type: bool
     pref_region_old: bool
     pref_forum: bool
+
+
+@dataclass
+class UserProfileSnapshot:
+    """User's settings with their values, loaded at once.
+
+    The values are those the single-setting getters of the repository return;
+    ``summary`` tells which settings are set.
+    """
+
+    user_id: int
+    role: str | None
+    status: str | None
+    age_periods: list[tuple[int, int]]
+    coordinates: tuple[str, str] | None
+    radius: int | None
+    regions: list[int]
+    topic_types: list[int]
+    notif_preferences: list[str]
+    forum_attributes: tuple[str, int] | None
+    summary: UserSettingsSummary
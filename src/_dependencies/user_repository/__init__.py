@@ -15,6 +15,7 @@ from .dialog_history import DialogHistoryMixin
 from .dialog_state import DialogStateMixin
 from .forum_attribute import ForumAttributeMixin
 from .geo_pref import GeoPrefMixin
+from .geo_reference import GeoReference, geo_reference_cache
 from .notification_pref import NotificationPrefMixin
 from .region import RegionMixin
 from .search_following import SearchFollowingMixin
@@ -1,45 +1,34 @@
 """Dialog history mixin — consolidated."""
 
 import datetime
+from dataclasses import asdict
 
-import sqlalchemy
-
+from _dependencies.common.commons import get_app_config
 from _dependencies.common.db_client import DBClientMixinBase
 
+from .dialog_history_buffer import INSERT_ONE, DialogRecord, dialog_history_buffer
+
 
 class DialogHistoryMixin(DBClientMixinBase):
     """User-bot dialog history operations."""
 
     def save_user_message(self, user_id: int, text: str) -> None:
         """Save user's message to dialog history."""
-        with self.connect() as connection:
-            stmt = sqlalchemy.text(
-                """INSERT INTO dialogs (user_id, author, timestamp, message_text)
-                   values (:user_id, :author, :timestamp, :message_text);"""
-            )
-            connection.execute(
-                stmt,
-                dict(
-                    user_id=user_id,
-                    author='user',
-                    timestamp=datetime.datetime.now(),
-                    message_text=text,
-                ),
-            )
+        self._save_dialog_record(DialogRecord(user_id, 'user', datetime.datetime.now(), text))
 
     def save_bot_reply(self, user_id: int, text: str) -> None:
         """Save bot's reply to dialog history."""
+        self._save_dialog_record(DialogRecord(user_id, 'bot', datetime.datetime.now(), text))
+
+    def _save_dialog_record(self, record: DialogRecord) -> None:
+        """Insert at once, or add to the buffer with ``dialog_history_buffered``."""
+        if get_app_config().dialog_history_buffered:
+            dialog_history_buffer().add(record)
+            return
         with self.connect() as connection:
-            stmt = sqlalchemy.text(
-                """INSERT INTO dialogs (user_id, author, timestamp, message_text)
-                   values (:user_id, :author, :timestamp, :message_text);"""
-            )
-            connection.execute(
-                stmt,
-                dict(
-                    user_id=user_id,
-                    author='bot',
-                    timestamp=datetime.datetime.now(),
-                    message_text=text,
-                ),
-            )
+            connection.execute(INSERT_ONE, asdict(record))
+
+    def flush_dialog_history(self) -> None:
+        """Write the buffered records; called at the end of an invocation, the instance is frozen after it."""
+        if get_app_config().dialog_history_buffered:
+            dialog_history_buffer().flush()
@@ -0,0 +1,152 @@
+"""Buffered writes of the dialog history.
+
+With ``dialog_history_buffered`` the messages of dialogs are collected in memory and inserted into
+``dialogs`` by one multi-row statement when ``dialog_history_buffer_size`` records are collected
+and at the end of every invocation of the bots (``DialogHistoryMixin.flush_dialog_history``): a Cloud
+Function instance is frozen after the answer, its threads do not run until the next request.
+A process that keeps running also flushes when the oldest record has waited
+``dialog_history_flush_seconds`` and when the interpreter exits.
+
+- The timestamp of a record is taken when it is added, and flushes are serialized: the records of
+  a user are inserted in the order they were added.
+- A batch is written in its own transaction, not in the unit of work of a handler: a handler that
+  is rolled back does not lose the records of other users.
+- If a batch is rejected, its records are inserted one by one; a record that is still rejected is
+  logged with its content. Records not written because the DB is unavailable are put back in front
+  of the buffer for the next flush; beyond ``PENDING_BATCHES`` batches the oldest ones are logged and dropped.
+
+Records that are not flushed are lost if the instance is killed, so buffering is off by default.
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+import sqlalchemy
+
+from _dependencies.common.commons import get_app_config, sqlalchemy_get_pool
+
+PENDING_BATCHES = 10  # batches kept in memory while the DB is unavailable
+
+# the DB is unavailable, the records can be written later
+_RETRYABLE_ERRORS = (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError)
+
+INSERT_BATCH = sqlalchemy.text("""
+    INSERT INTO dialogs (user_id, author, timestamp, message_text)
+    SELECT user_id, author, timestamp, message_text
+    FROM unnest(
+        CAST(:user_ids AS bigint[]),
+        CAST(:authors AS varchar[]),
+        CAST(:timestamps AS timestamp[]),
+        CAST(:message_texts AS varchar[])
+    ) WITH ORDINALITY AS r(user_id, author, timestamp, message_text, n)
+    ORDER BY n;
+""")
+
+INSERT_ONE = sqlalchemy.text("""
+    INSERT INTO dialogs (user_id, author, timestamp, message_text)
+    VALUES (:user_id, :author, :timestamp, :message_text);
+""")
+
+
+@dataclass(frozen=True)
+class DialogRecord:
+    user_id: int
+    author: str
+    timestamp: datetime.datetime
+    message_text: str
+
+
+class DialogHistoryBuffer:
+    def __init__(self, max_size: int, flush_seconds: float) -> None:
+        self._max_size = max_size
+        self._max_pending = max_size * PENDING_BATCHES
+        self._flush_seconds = flush_seconds
+        self._records: list[DialogRecord] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # batches are written in the order they were taken
+        self._flusher: threading.Thread | None = None
+
+    def add(self, record: DialogRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= self._max_size
+            if self._flusher is None:
+                self._start_flusher()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """write the collected records; the number of records taken"""
+        with self._flush_lock:
+            with self._lock:
+                records, self._records = self._records, []
+            if records:
+                not_written = self._write(records)
+                if not_written:
+                    self._put_back(not_written)
+            return len(records)
+
+    def _put_back(self, records: list[DialogRecord]) -> None:
+        """keep the records for the next flush, before the ones added meanwhile"""
+        with self._lock:
+            self._records[:0] = records
+            overflow = max(len(self._records) - self._max_pending, 0)
+            dropped, self._records = self._records[:overflow], self._records[overflow:]
+        for record in dropped:
+            logging.error(f'Dialog record dropped, too many records are waiting for the DB: {record}')
+
+    def _start_flusher(self) -> None:
+        self._flusher = threading.Thread(target=self._flush_periodically, name='dialog_history_flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(self._flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logging.exception('Failed to flush the dialog history')
+
+    def _write(self, records: list[DialogRecord]) -> list[DialogRecord]:
+        """insert the records; the ones not written because the DB is unavailable"""
+        engine = sqlalchemy_get_pool()
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    INSERT_BATCH,
+                    dict(
+                        user_ids=[record.user_id for record in records],
+                        authors=[record.author for record in records],
+                        timestamps=[record.timestamp for record in records],
+                        message_texts=[record.message_text for record in records],
+                    ),
+                )
+            return []
+        except _RETRYABLE_ERRORS:
+            logging.exception(f'Failed to write {len(records)} dialog records, keeping them for the next flush')
+            return records
+        except Exception:
+            logging.exception(f'Failed to write {len(records)} dialog records in a batch, writing them one by one')
+
+        for i, record in enumerate(records):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(INSERT_ONE, asdict(record))
+            except _RETRYABLE_ERRORS:
+                logging.exception(f'Failed to write dialog record {record}, keeping it for the next flush')
+                return records[i:]
+            except Exception:
+                logging.exception(f'Failed to write dialog record {record}')
+        return []
+
+
+@lru_cache
+def dialog_history_buffer() -> DialogHistoryBuffer:
+    config = get_app_config()
+    return DialogHistoryBuffer(config.dialog_history_buffer_size, config.dialog_history_flush_seconds)
@@ -0,0 +1,78 @@
+"""Geo reference data — forum folders of searches with their display names and federal districts.
+
+The geo_* tables are edited by hand and rarely, while the region screens of every bot read
+them on each button press. The data is kept in a process-wide cache for
+``GEO_REFERENCE_TTL_SECONDS`` and reloaded after that, or at once after ``invalidate()``.
+
+Every reload that brings changed data gets a new ``version``: structures derived from the
+reference data can be kept by their owners and rebuilt only when the version changes.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+GEO_REFERENCE_TTL_SECONDS = 600
+
+FolderRow = tuple[int, str]
+
+
+@dataclass(frozen=True)
+class GeoReference:
+    version: int
+    folders: tuple[FolderRow, ...]
+    """(folder_id, folder_display_name) of all folders of searches, except finished ones"""
+    folders_by_district: dict[str, tuple[FolderRow, ...]]
+    """the first folder_id of every display name of the district, ordered by name"""
+    folder_ids_by_name: dict[str, tuple[int, ...]] = field(init=False)
+    names_by_folder_id: dict[int, str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        folder_ids_by_name: dict[str, tuple[int, ...]] = {}
+        for folder_id, name in self.folders:
+            if name:
+                folder_ids_by_name[name] = folder_ids_by_name.get(name, ()) + (folder_id,)
+        object.__setattr__(self, 'folder_ids_by_name', folder_ids_by_name)
+        object.__setattr__(self, 'names_by_folder_id', {fid: name for fid, name in self.folders if name})
+
+    def region_names(self, folder_ids: Iterable[int]) -> set[str]:
+        """display names of the given folders"""
+        return {self.names_by_folder_id[fid] for fid in folder_ids if fid in self.names_by_folder_id}
+
+
+class GeoReferenceCache:
+    def __init__(self, ttl_seconds: float = GEO_REFERENCE_TTL_SECONDS) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._reference: GeoReference | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """version of the cached data, 0 before the first load"""
+        return self._reference.version if self._reference else 0
+
+    def get(self, load: Callable[[], tuple[list[FolderRow], dict[str, list[FolderRow]]]]) -> GeoReference:
+        """the cached reference data; ``load`` returns fresh folders and folders by district"""
+        reference = self._reference
+        if reference is not None and time.monotonic() < self._expires_at:
+            return reference
+
+        with self._lock:
+            if self._reference is not None and time.monotonic() < self._expires_at:
+                return self._reference  # loaded by another thread
+            folders, folders_by_district = load()
+            fresh = (tuple(folders), {name: tuple(rows) for name, rows in folders_by_district.items()})
+            if self._reference is None or (self._reference.folders, self._reference.folders_by_district) != fresh:
+                self._reference = GeoReference(self.version + 1, *fresh)
+            self._expires_at = time.monotonic() + self._ttl_seconds
+            return self._reference
+
+    def invalidate(self) -> None:
+        """reload on the next call; to be called after the geo_* tables are changed"""
+        with self._lock:
+            self._expires_at = 0.0
+
+
+geo_reference_cache = GeoReferenceCache()
@@ -6,6 +6,8 @@ import sqlalchemy
 
 from _dependencies.common.db_client import DBClientMixinBase
 
+from .geo_reference import FolderRow, GeoReference, geo_reference_cache
+
 
 class RegionMixin(DBClientMixinBase):
     """User region (forum folder) subscription operations."""
@@ -66,39 +68,47 @@ class RegionMixin(DBClientMixinBase):
                 ),
             )
 
+    def get_geo_reference(self) -> GeoReference:
+        """Geo folders, their display names and federal districts, cached in-process (see ``geo_reference``)."""
+        return geo_reference_cache.get(self._load_geo_reference)
+
     def get_geo_folders(self) -> list[tuple[int, str]]:
-        """Get all geographic folders from the database."""
-        with self.connect() as connection:
-            stmt = sqlalchemy.text(
-                """SELECT folder_id, folder_display_name FROM geo_folders_view
-                   WHERE folder_type = 'searches'
-                     AND folder_subtype != 'searches finished';"""
-            )
-            result = connection.execute(stmt)
-            return result.fetchall()
+        """Get all geographic folders (cached)."""
+        return list(self.get_geo_reference().folders)
 
     def get_geo_folders_by_district(self, federal_district_name: str) -> list[tuple[int, str]]:
-        """Get geographic folders for regions in a given federal district.
+        """Get geographic folders for regions in a given federal district (cached).
 
         Returns a list of ``(folder_id, folder_display_name)`` tuples.
         When multiple folders share the same display name (e.g., multiple
         forum subforums for the same division+subtype), only the first
         folder_id is returned — the keyboard shows each display name once.
         """
+        return list(self.get_geo_reference().folders_by_district.get(federal_district_name, ()))
+
+    def _load_geo_reference(self) -> tuple[list[FolderRow], dict[str, list[FolderRow]]]:
         with self.connect() as connection:
+            stmt = sqlalchemy.text(
+                """SELECT folder_id, folder_display_name FROM geo_folders_view
+                   WHERE folder_type = 'searches'
+                     AND folder_subtype != 'searches finished';"""
+            )
+            folders = [(folder_id, name) for folder_id, name in connection.execute(stmt)]
+
             stmt = sqlalchemy.text("""
-                SELECT MIN(fv.folder_id) AS folder_id, fv.folder_display_name
+                SELECT r.federal_district, MIN(fv.folder_id) AS folder_id, fv.folder_display_name
                 FROM geo_folders_view fv
                 JOIN geo_divisions d ON fv.division_id = d.division_id
                 JOIN geo_regions r ON d.division_id = r.division_id
                 WHERE fv.folder_type = 'searches'
                   AND fv.folder_subtype != 'searches finished'
-                  AND r.federal_district = :district_name
-                GROUP BY fv.folder_display_name
-                ORDER BY fv.folder_display_name;
+                GROUP BY r.federal_district, fv.folder_display_name
+                ORDER BY r.federal_district, fv.folder_display_name;
             """)
-            result = connection.execute(stmt, {'district_name': federal_district_name})
-            return result.fetchall()
+            folders_by_district: dict[str, list[FolderRow]] = {}
+            for district, folder_id, name in connection.execute(stmt):
+                folders_by_district.setdefault(district, []).append((folder_id, name))
+        return folders, folders_by_district
 
     def toggle_region_by_name(self, user_id: int, region_name: str, folder_dict: dict[str, tuple[int, ...]]) -> bool:
         """Toggle a region subscription by its display name.
@@ -3,7 +3,7 @@
 import sqlalchemy
 
 from _dependencies.common.db_client import DBClientMixinBase
-from _dependencies.models import UserSettingsSummary
+from _dependencies.models import UserProfileSnapshot, UserSettingsSummary
 
 
 class SettingsSummaryMixin(DBClientMixinBase):
@@ -41,3 +41,73 @@ class SettingsSummaryMixin(DBClientMixinBase):
             result = connection.execute(stmt, dict(user_id=user_id))
             raw_data = result.fetchone()
             return UserSettingsSummary(*raw_data) if raw_data else None
+
+    def get_profile_snapshot(self, user_id: int) -> UserProfileSnapshot | None:
+        """Get all settings of the user with their values in one query; None for an unknown user."""
+        with self.connect() as connection:
+            stmt = sqlalchemy.text("""
+                SELECT
+                    u.user_id
+                    , u.role
+                    , u.status
+                    , ARRAY(SELECT ARRAY[period_min, period_max] FROM user_pref_age
+                        WHERE user_id=u.user_id ORDER BY period_min, period_max) AS age_periods
+                    , coords.found AS coords_set
+                    , coords.latitude
+                    , coords.longitude
+                    , radius.id IS NOT NULL AS radius_set
+                    , radius.radius
+                    , ARRAY(SELECT forum_folder_num FROM user_regional_preferences
+                        WHERE user_id=u.user_id ORDER BY 1) AS regions
+                    , ARRAY(SELECT topic_type_id FROM user_pref_topic_type
+                        WHERE user_id=u.user_id ORDER BY 1) AS topic_types
+                    , ARRAY(SELECT preference FROM user_preferences
+                        WHERE user_id=u.user_id ORDER BY preference) AS notif_preferences
+                    , forum.found AS forum_set
+                    , forum.forum_username
+                    , forum.forum_user_id
+                    , EXISTS (SELECT 1 FROM user_pref_region WHERE user_id=u.user_id) AS region_set
+                    , EXISTS (SELECT 1 FROM user_pref_urgency WHERE user_id=u.user_id) AS urgency_set
+                FROM users u
+                LEFT JOIN LATERAL (
+                    SELECT TRUE AS found, latitude, longitude FROM user_coordinates
+                    WHERE user_id=u.user_id LIMIT 1
+                ) coords ON TRUE
+                LEFT JOIN user_pref_radius radius ON radius.user_id=u.user_id
+                LEFT JOIN LATERAL (
+                    SELECT TRUE AS found, forum_username, forum_user_id FROM user_forum_attributes
+                    WHERE status='verified' AND user_id=u.user_id
+                    ORDER BY timestamp DESC LIMIT 1
+                ) forum ON TRUE
+                WHERE u.user_id=:user_id;
+            """)
+            row = connection.execute(stmt, dict(user_id=user_id)).fetchone()
+        if not row:
+            return None
+
+        age_periods = [(period_min, period_max) for period_min, period_max in row.age_periods]
+        return UserProfileSnapshot(
+            user_id=row.user_id,
+            role=row.role,
+            status=row.status,
+            age_periods=age_periods,
+            coordinates=(row.latitude, row.longitude) if row.coords_set else None,
+            radius=row.radius,
+            regions=row.regions,
+            topic_types=row.topic_types,
+            notif_preferences=row.notif_preferences,
+            forum_attributes=(row.forum_username, row.forum_user_id) if row.forum_set else None,
+            summary=UserSettingsSummary(
+                user_id=row.user_id,
+                pref_role=row.role is not None,
+                pref_age=bool(age_periods),
+                pref_coords=bool(row.coords_set),
+                pref_radius=row.radius_set,
+                pref_region=row.region_set,
+                pref_topic_type=bool(row.topic_types),
+                pref_urgency=row.urgency_set,
+                pref_notif_type=any(pref not in (None, 'bot_news') for pref in row.notif_preferences),
+                pref_region_old=bool(row.regions),
+                pref_forum=bool(row.forum_set),
+            ),
+        )
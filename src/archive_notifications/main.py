@@ -1,61 +1,161 @@
 import logging
+import time
+from dataclasses import dataclass
+from datetime import date
 
 import sqlalchemy
 
 from _dependencies.common.commons import setup_logging
 from _dependencies.common.db_client import DBClientBase
+from _dependencies.common.lock_manager import FunctionLockError, lock_manager
+from _dependencies.common.partitions import NOTIF_BY_USER, DBPartitionsMixin, is_lock_timeout
 from _dependencies.common.pubsub import Ctx, pubsub_archive_notifications
 
 setup_logging(__package__)
 
+FUNC_NAME = 'archive_notifications'
+
 # How long to keep records in search_first_posts__history before purging them.
 # Data older than this is deleted after each archivation cycle.
 SEARCH_FIRST_POSTS_HISTORY_TTL_DAYS = 30
 
+# notif_by_user rows moved to notif_by_user__history in one transaction
+ARCHIVE_BATCH_SIZE = 5000
+# no new batches after this; the function timeout is 540 s and first posts are archived afterwards
+ARCHIVE_TIME_BUDGET_SECONDS = 420
+
+
+@dataclass
+class ArchivationStats:
+    rows: int = 0
+    partitions: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    backlog_left: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
 
-class DBClient(DBClientBase):
+
+class DBClient(DBClientBase, DBPartitionsMixin):
     """DB client for archive_notifications."""
 
-    def move_notifications_to_history(self) -> None:
-        """move all "completed" notifications to psql table __history"""
+    def get_archivable_change_log_id(self) -> int | None:
+        """the latest change_log record older than 2 hours; notifications up to it can be archived"""
         with self.connect() as conn:
-            # checker – gives us a minimal date in notif_by_user, which is at least 2 hours older than current
             stmt = sqlalchemy.text("""
-                SELECT MIN(cl.parsed_time)
-                FROM notif_by_user AS nm
-                LEFT JOIN change_log AS cl
-                ON nm.change_log_id=cl.id
-                WHERE cl.parsed_time < NOW() - INTERVAL '2 hour' ORDER BY 1 LIMIT 1;
+                SELECT MAX(id) FROM change_log WHERE parsed_time < NOW() - INTERVAL '2 hour';
             """)
-            oldest_date_nbu = conn.execute(stmt).scalar()
-            if oldest_date_nbu is None:
-                return
-
-            logging.info(f'The oldest date in notif_by_user: {oldest_date_nbu}')
-
-            # DEBUG 1
+            return conn.execute(stmt).scalar()
+
+    def get_archivable_partitions(self, archivable_change_log_id: int) -> list[str]:
+        """partitions of notif_by_user with change_log records older than 2 hours only"""
+        candidates = [
+            partition
+            for partition in self.get_range_partitions(NOTIF_BY_USER)
+            if int(partition.upper) - 1 <= archivable_change_log_id
+        ]
+        with self.connect() as conn:
             stmt = sqlalchemy.text("""
-                SELECT MIN(change_log_id) FROM notif_by_user;
+                SELECT EXISTS (
+                    SELECT 1 FROM change_log
+                    WHERE id >= :lower AND id < :upper AND parsed_time >= NOW() - INTERVAL '2 hour'
+                );
             """)
-            change_log_id = conn.execute(stmt).scalar()
-            if change_log_id is None:
-                return
-
-            logging.info(f'The change_log_id to be updated in nbu: {change_log_id}')
-
-            # migrate all records with "lowest" change_log_id from notif_by_user to notif_by_user__history
+            return [
+                partition.name
+                for partition in sorted(candidates, key=lambda partition: int(partition.lower))
+                if not conn.execute(stmt, dict(lower=int(partition.lower), upper=int(partition.upper))).scalar()
+            ]
+
+    def move_notifications_batch_to_history(self, batch_size: int, archivable_change_log_id: int) -> int:
+        """move up to batch_size notifications of change_log records older than 2 hours to __history"""
+        with self.connect() as conn:
+            # the condition on nbu.change_log_id prunes the partitions of fresh change_log records
             stmt = sqlalchemy.text("""
+                WITH batch AS (
+                    SELECT nbu.message_id, nbu.change_log_id
+                    FROM notif_by_user AS nbu
+                    JOIN change_log AS cl
+                    ON nbu.change_log_id=cl.id
+                    WHERE nbu.change_log_id <= :archivable_change_log_id
+                        AND cl.parsed_time < NOW() - INTERVAL '2 hour'
+                    ORDER BY nbu.message_id
+                    LIMIT :batch_size
+                    FOR UPDATE OF nbu SKIP LOCKED
+                ),
+                moved_rows AS (
+                    DELETE FROM notif_by_user AS nbu
+                    USING batch
+                    WHERE nbu.message_id=batch.message_id AND nbu.change_log_id=batch.change_log_id
+                    RETURNING nbu.*
+                )
                 INSERT INTO notif_by_user__history
-                    SELECT  * FROM notif_by_user
-                    WHERE change_log_id = :change_log_id
-                    FOR UPDATE;
-                --
-                DELETE FROM notif_by_user
-                    WHERE change_log_id = :change_log_id
+                    SELECT * FROM moved_rows;
             """)
-            conn.execute(stmt, dict(change_log_id=change_log_id))
-
-        pubsub_archive_notifications()
+            return conn.execute(
+                stmt, dict(batch_size=batch_size, archivable_change_log_id=archivable_change_log_id)
+            ).rowcount
+
+    def move_notifications_to_history(
+        self,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        time_budget_seconds: float = ARCHIVE_TIME_BUDGET_SECONDS,
+    ) -> ArchivationStats:
+        """move notifications to psql table __history while there is time left:
+        whole partitions of old change_log records first, then the rest batch by batch"""
+        stats = ArchivationStats()
+        start = time.monotonic()
+
+        archivable_change_log_id = self.get_archivable_change_log_id()
+        if archivable_change_log_id is None:
+            return stats
+
+        for partition in self.get_detached_notif_by_user_partitions():
+            stats.rows += self.move_detached_notif_by_user_partition_to_history(partition)
+            stats.partitions += 1
+
+        for partition in self.get_archivable_partitions(archivable_change_log_id):
+            try:
+                stats.rows += self.move_notif_by_user_partition_to_history(partition)
+            except sqlalchemy.exc.OperationalError as exc:
+                if not is_lock_timeout(exc):
+                    raise
+                # notif_by_user is busy: its rows are moved batch by batch, the partition is left for the next run
+                logging.warning(f'partition {partition} is not detached: {exc.orig}')
+                break
+            stats.partitions += 1
+            if time.monotonic() - start > time_budget_seconds:
+                stats.backlog_left = True
+                break
+
+        while not stats.backlog_left:
+            moved = self.move_notifications_batch_to_history(batch_size, archivable_change_log_id)
+            stats.rows += moved
+            stats.batches += 1
+            stats.seconds = time.monotonic() - start
+            if moved < batch_size:
+                break
+            if stats.seconds > time_budget_seconds:
+                stats.backlog_left = True
+                break
+
+        stats.seconds = time.monotonic() - start
+        logging.info(
+            f'notif_by_user archivation: {stats.rows} rows in {stats.partitions} partitions '
+            f'and {stats.batches} batches, '
+            f'{stats.seconds:.1f} s, {stats.rows_per_second:.0f} rows/s'
+        )
+        if stats.backlog_left:
+            # the rest goes to the next invocation
+            pubsub_archive_notifications()
+        return stats
+
+    def ensure_partitions(self) -> None:
+        created = self.ensure_notif_by_user_partitions() + self.ensure_notif_history_partitions(date.today())
+        if created:
+            logging.info(f'created partitions: {created}')
 
     def move_first_posts_to_history(self) -> None:
         """move first posts for completed searches to __history, then purge old history records"""
@@ -97,7 +197,8 @@ class DBClient(DBClientBase):
                     (
                         SELECT
                             s1.id, s1.search_id, s1.timestamp, s1.actual, s1.content_hash, s1.content,
-                            s1.num_of_checks, s1.coords, s1.field_trip, s1.content_compact
+                            s1.num_of_checks, s1.coords, s1.field_trip, s1.content_compact,
+                            s1.content_lines, s1.content_line_hashes
                         FROM (
                             SELECT
                                 *, RANK() OVER (PARTITION BY search_id ORDER BY timestamp DESC) AS rank
@@ -135,5 +236,11 @@ def main(event: dict[str, bytes], context: Ctx) -> None:
     """main function"""
 
     db = DBClient()
-    db.move_notifications_to_history()
-    db.move_first_posts_to_history()
+    try:
+        # partitions are detached and copied in separate transactions, one run at a time
+        with lock_manager(db._db, FUNC_NAME):
+            db.ensure_partitions()
+            db.move_notifications_to_history()
+            db.move_first_posts_to_history()
+    except FunctionLockError:
+        logging.info('script cancelled')
@@ -0,0 +1,65 @@
+"""Parquet output of archive_to_bigquery: typed schema from the source columns, one row group per fetched batch."""
+
+import io
+from dataclasses import dataclass
+from typing import Iterable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROW_GROUP_SIZE = 50_000  # rows fetched from the DB and written as one row group
+DICTIONARY_COLUMNS = ['message_type', 'messenger']  # few distinct values per file
+COMPRESSION = 'zstd'
+
+PG_TO_ARROW_TYPES = {
+    'smallint': pa.int16(),
+    'integer': pa.int32(),
+    'bigint': pa.int64(),
+    'real': pa.float32(),
+    'double precision': pa.float64(),
+    'boolean': pa.bool_(),
+    'character varying': pa.string(),
+    'character': pa.string(),
+    'text': pa.string(),
+    'date': pa.date32(),
+    'timestamp without time zone': pa.timestamp('us'),
+    'timestamp with time zone': pa.timestamp('us', tz='UTC'),
+}
+
+
+@dataclass
+class SourceColumn:
+    name: str
+    data_type: str  # information_schema.columns.data_type
+    nullable: bool
+
+
+def arrow_schema(columns: list[SourceColumn]) -> pa.Schema:
+    """columns of unknown types are written as strings, see select_expressions"""
+    return pa.schema(
+        pa.field(column.name, PG_TO_ARROW_TYPES.get(column.data_type, pa.string()), nullable=column.nullable)
+        for column in columns
+    )
+
+
+def select_expressions(columns: list[SourceColumn]) -> list[str]:
+    """columns to select for the schema; values of unknown types are cast to text by the DB"""
+    return [
+        f'"{column.name}"' if column.data_type in PG_TO_ARROW_TYPES else f'"{column.name}"::text' for column in columns
+    ]
+
+
+def write_parquet(output: io.RawIOBase, schema: pa.Schema, batches: Iterable[list[tuple]]) -> int:
+    """write batches of rows (in the order of schema fields) as row groups; returns the number of rows"""
+
+    rows_count = 0
+    dictionary_columns = [name for name in DICTIONARY_COLUMNS if name in schema.names]
+    with pq.ParquetWriter(output, schema, compression=COMPRESSION, use_dictionary=dictionary_columns) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )
+            writer.write_batch(batch, row_group_size=len(rows))
+            rows_count += len(rows)
+    return rows_count
@@ -1,64 +1,355 @@
 """move data from Cloud SQL to S3 bucket for long-term storage & analysis"""
 
-import csv
 import io
 import logging
-from dataclasses import dataclass
-from datetime import date, timedelta
-from typing import Any
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import IO, Any, Iterator
 from zipfile import ZIP_DEFLATED, ZipFile
 
 import boto3
+import sqlalchemy
+from botocore.exceptions import ClientError
 from sqlalchemy import text
 
 from _dependencies.common.commons import get_app_config, setup_logging
 from _dependencies.common.db_client import DBClientBase
+from _dependencies.common.partitions import (
+    NOTIF_BY_USER_HISTORY,
+    PARTITION_LOCK_TIMEOUT,
+    DBPartitionsMixin,
+    is_lock_timeout,
+    notif_history_partition,
+)
 from _dependencies.common.pubsub import Ctx
 
+from ._utils.parquet import ROW_GROUP_SIZE, SourceColumn, arrow_schema, select_expressions, write_parquet
+
 setup_logging(__package__)
 
 
 DAYS_AGO_TO_START = 40  # temporarily increase
 DAYS_AGO_TO_FINISH = 1  # at least 1 day ago to avoid timezone problems
-BATCH_SIZE = 10_000  # rows per paginated query (keeps memory < 100 MB per iteration)
+UPLOAD_PART_SIZE = 8 * 1024 * 1024  # bytes per part of the multipart upload; s3 requires at least 5 MB
+ARCHIVE_WORKERS = 4  # days exported concurrently, each worker holds one DB connection at a time
+EXPORT_TIME_BUDGET_SECONDS = 420  # no new days are started after that, the rest is resumed by the next invocation
+
+
+class UploadNotVerifiedError(Exception):
+    pass
+
+
+@dataclass
+class ExportCheckpoint:
+    table_name: str
+    day: date
+    part: int
+    object_key: str
+    rows: int
+    bytes: int
+    max_message_id: int  # records of the day up to it are in the upload
+    deleted: datetime | None = None
 
 
-class DBClient(DBClientBase):
+@dataclass
+class ExportStats:
+    done: int = 0
+    postponed: int = 0  # not started within the time budget
+    failed: int = 0
+
+
+class DBClient(DBClientBase, DBPartitionsMixin):
     """DB client for archive_to_bigquery."""
 
-    def delete_exported_records(self, date_from: date, date_to: date) -> None:
+    def get_max_message_id(self, date_from: date, date_to: date) -> int | None:
+        with self.connect() as conn:
+            return conn.execute(
+                text("""
+                    SELECT MAX(message_id) FROM notif_by_user__history
+                    WHERE created >= :date_from AND created < :date_to
+                """),
+                dict(date_from=date_from, date_to=date_to),
+            ).scalar()
+
+    def copy_records_to_csv(self, date_from: date, date_to: date, max_message_id: int, output: IO[bytes]) -> int:
+        """Stream records of the dates into output as CSV with a header; returns the number of records."""
+        with self.connect() as conn:
+            cursor = conn.connection.dbapi_connection.cursor()
+            query = cursor.mogrify(
+                """
+                COPY (
+                    SELECT * FROM notif_by_user__history
+                    WHERE created >= %s AND created < %s AND message_id <= %s
+                    ORDER BY message_id
+                ) TO STDOUT WITH (FORMAT csv, HEADER)
+                """,
+                (date_from, date_to, max_message_id),
+            )
+            cursor.copy_expert(query, output)
+            return cursor.rowcount
+
+    def get_source_columns(self) -> list[SourceColumn]:
+        with self.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT column_name, data_type, is_nullable = 'YES'
+                    FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = :table
+                    ORDER BY ordinal_position
+                """),
+                dict(table=NOTIF_BY_USER_HISTORY),
+            ).fetchall()
+        return [SourceColumn(name=name, data_type=data_type, nullable=nullable) for name, data_type, nullable in rows]
+
+    def fetch_records(
+        self, columns: list[SourceColumn], date_from: date, date_to: date, max_message_id: int, batch_size: int
+    ) -> Iterator[list[tuple]]:
+        """Records of the dates in batches, read with a server-side cursor."""
+        with self.connect() as conn:
+            cursor = conn.connection.dbapi_connection.cursor(name='archive_to_bigquery_export')
+            cursor.itersize = batch_size
+            cursor.execute(
+                f"""
+                SELECT {', '.join(select_expressions(columns))} FROM notif_by_user__history
+                WHERE created >= %s AND created < %s AND message_id <= %s
+                ORDER BY message_id
+                """,
+                (date_from, date_to, max_message_id),
+            )
+            while rows := cursor.fetchmany(batch_size):
+                yield rows
+            cursor.close()
+
+    def get_export_checkpoint(self, table_name: str, day: date) -> ExportCheckpoint | None:
+        with self.connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT table_name, day, part, object_key, rows, bytes, max_message_id, deleted
+                    FROM archive_export_checkpoints
+                    WHERE table_name = :table_name AND day = :day
+                """),
+                dict(table_name=table_name, day=day),
+            ).fetchone()
+        return ExportCheckpoint(*row) if row else None
+
+    def save_export_checkpoint(self, checkpoint: ExportCheckpoint) -> None:
+        """the part of the day is uploaded, its records are not deleted yet"""
+        with self.connect() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO archive_export_checkpoints
+                        (table_name, day, part, object_key, rows, bytes, max_message_id, uploaded, deleted)
+                    VALUES (:table_name, :day, :part, :object_key, :rows, :bytes, :max_message_id, NOW(), NULL)
+                    ON CONFLICT (table_name, day) DO UPDATE SET
+                        part = EXCLUDED.part,
+                        object_key = EXCLUDED.object_key,
+                        rows = EXCLUDED.rows,
+                        bytes = EXCLUDED.bytes,
+                        max_message_id = EXCLUDED.max_message_id,
+                        uploaded = EXCLUDED.uploaded,
+                        deleted = NULL
+                """),
+                dict(
+                    table_name=checkpoint.table_name,
+                    day=checkpoint.day,
+                    part=checkpoint.part,
+                    object_key=checkpoint.object_key,
+                    rows=checkpoint.rows,
+                    bytes=checkpoint.bytes,
+                    max_message_id=checkpoint.max_message_id,
+                ),
+            )
+
+    def mark_export_deleted(self, table_name: str, day: date) -> None:
+        with self.connect() as conn:
+            conn.execute(
+                text("""
+                    UPDATE archive_export_checkpoints SET deleted = NOW()
+                    WHERE table_name = :table_name AND day = :day
+                """),
+                dict(table_name=table_name, day=day),
+            )
+
+    def delete_exported_records(self, date_from: date, date_to: date, max_message_id: int) -> None:
+        """drop daily partitions of the range, then delete the rest (stored in the default partition)
+
+        Only records up to max_message_id are in the upload, the later ones are kept for the next part.
+        A partition that cannot be detached while notif_by_user__history is in use is emptied by the delete.
+        """
+        existing = {partition.name for partition in self.get_range_partitions(NOTIF_BY_USER_HISTORY)}
+        day = date_from
+        while day < date_to:
+            partition = notif_history_partition(day)
+            if partition in existing:
+                try:
+                    self._drop_exported_partition(partition, max_message_id)
+                except sqlalchemy.exc.OperationalError as exc:
+                    if not is_lock_timeout(exc):
+                        raise
+                    logging.warning(f'partition {partition} is not dropped: {exc.orig}')
+            day += timedelta(days=1)
+
         stmt = text("""
             DELETE FROM notif_by_user__history
-            WHERE created >= :date_from AND created < :date_to
+            WHERE created >= :date_from AND created < :date_to AND message_id <= :max_message_id
         """)
         with self.connect() as conn:
-            conn.execute(stmt, dict(date_from=date_from, date_to=date_to))
+            conn.execute(stmt, dict(date_from=date_from, date_to=date_to, max_message_id=max_message_id))
+
+    def _drop_exported_partition(self, partition: str, max_message_id: int) -> None:
+        """detach and drop the partition, its records not in the upload are moved to the default partition"""
+        with self.connect() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            conn.execute(text(f'ALTER TABLE {NOTIF_BY_USER_HISTORY} DETACH PARTITION {partition}'))
+            conn.execute(
+                text(f'INSERT INTO {NOTIF_BY_USER_HISTORY} SELECT * FROM {partition} WHERE message_id > :max_id'),
+                dict(max_id=max_message_id),
+            )
+            conn.execute(text(f'DROP TABLE {partition}'))
+
+
+class S3UploadStream(io.RawIOBase):
+    """
+    Write-only stream to an s3 object. Data is uploaded by parts of UPLOAD_PART_SIZE
+    with a multipart upload; an object smaller than one part is uploaded with one request on close.
+    """
+
+    def __init__(self, s3_client: Any, bucket: str, key: str, part_size: int | None = None) -> None:
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or UPLOAD_PART_SIZE
+        self.bytes_uploaded = 0
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[dict[str, Any]] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_uploaded + len(self._buffer)
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def close(self) -> None:
+        """upload the rest of the data and complete the upload"""
+        if self.closed:
+            return
+        if self._upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            self.bytes_uploaded += len(self._buffer)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': self._parts}
+            )
+        self._buffer.clear()
+        super().close()
+
+    def abort(self) -> None:
+        """close without creating the object"""
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._buffer.clear()
+        super().close()
+
+    def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=part_number, Body=data
+        )
+        self._parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.bytes_uploaded += len(data)
 
 
 @dataclass
 class Archiver:
     """
     Archivation algorithm:
-    - Stream all records from table notif_by_user__history by one day into
-      a zip-compressed BytesIO buffer (no temp files).
-    - Upload the compressed buffer directly to s3.
-    - Delete unloaded records.
+    - Stream records of one day from table notif_by_user__history with COPY
+      through a zip compressor into a multipart upload to s3 (memory is bounded by one upload part).
+      Or, for the parquet format, read them with a server-side cursor and write a row group per batch.
+    - Check the upload in s3 and delete unloaded records.
+    Both steps are checkpointed in archive_export_checkpoints: a day uploaded by an interrupted run
+    is deleted without a new export, records that arrive for an exported day go to its next part.
+    run_archivers deletes after all exports: dropping a daily partition waits for the readers of the table.
     """
 
     archive_date: date
     db: DBClient
     s3_client: Any
     s3_prefix: str = 'notif_by_user_archive'  # name of folder inside s3 bucket
+    export_format: str = 'csv'  # csv | parquet
+    part: int = 1
+    uploaded_bytes: int = field(default=0, init=False)
+    max_message_id: int | None = field(default=None, init=False)
 
     def run(self) -> None:
-        data = self._unload_records_to_csv_zip()
-        if data:
-            self._move_to_s3(data)
-            self._delete_old_records()
+        if self.export():
+            self.delete_exported()
+
+    def export(self) -> bool:
+        """upload the records of the day; True if there are uploaded records to delete"""
+        checkpoint = self.db.get_export_checkpoint(NOTIF_BY_USER_HISTORY, self.archive_date)
+        if checkpoint and checkpoint.deleted is None:
+            self.part = checkpoint.part
+            if self._upload_verified(checkpoint.object_key, checkpoint.bytes):
+                logging.info(f'{checkpoint.object_key} is uploaded by a previous run, its records are to delete')
+                self.max_message_id = checkpoint.max_message_id
+                return True
+        elif checkpoint:
+            self.part = checkpoint.part + 1
+
+        records_count = self._export_to_s3()
+        if not records_count:
+            return False
+        assert self.max_message_id is not None
+
+        self.db.save_export_checkpoint(
+            ExportCheckpoint(
+                table_name=NOTIF_BY_USER_HISTORY,
+                day=self.archive_date,
+                part=self.part,
+                object_key=self.object_key,
+                rows=records_count,
+                bytes=self.uploaded_bytes,
+                max_message_id=self.max_message_id,
+            )
+        )
+        if not self._upload_verified(self.object_key, self.uploaded_bytes):
+            raise UploadNotVerifiedError(f'{self.object_key} is not found in s3 or has another size')
+        return True
+
+    def delete_exported(self) -> None:
+        assert self.max_message_id is not None, 'nothing is exported'
+        logging.info('Deleting old records')
+        self.db.delete_exported_records(self._date_from, self._date_to, self.max_message_id)
+        self.db.mark_export_deleted(NOTIF_BY_USER_HISTORY, self.archive_date)
+        logging.info('Old records deleted')
+
+    @property
+    def object_key(self) -> str:
+        return f'{self.s3_prefix}/{self._unload_file_name}'
 
     @property
     def _unload_file_name(self) -> str:
-        return f'notifications-archive-{self.archive_date.isoformat()}.csv.zip'
+        extension = 'parquet' if self.export_format == 'parquet' else 'csv.zip'
+        part = f'-part{self.part}' if self.part > 1 else ''
+        return f'notifications-archive-{self.archive_date.isoformat()}{part}.{extension}'
 
     @property
     def _csv_entry_name(self) -> str:
@@ -72,78 +363,105 @@ class Archiver:
     def _date_to(self) -> date:
         return self.archive_date + timedelta(days=1)
 
-    def _unload_records_to_csv_zip(self) -> io.BytesIO | None:
-        """Stream records into a zip-compressed BytesIO buffer; returns None if no records."""
-
-        paginated_query = text("""
-            SELECT * FROM notif_by_user__history
-            WHERE
-                created >= :date_from
-                AND created < :date_to
-                AND (:last_message_id IS NULL OR message_id > :last_message_id)
-            ORDER BY message_id
-            LIMIT :limit
-        """)
-
-        params = {
-            'date_from': self._date_from,
-            'date_to': self._date_to,
-            'limit': BATCH_SIZE,
-        }
-
-        total_count = 0
-        last_message_id: int | None = None
-        buf = io.BytesIO()
-
-        with self.db.connect() as conn:
-            with ZipFile(buf, 'w', compression=ZIP_DEFLATED, compresslevel=9) as zf:
-                with zf.open(self._csv_entry_name, 'w') as csv_entry:
-                    with io.TextIOWrapper(csv_entry, encoding='utf-8') as text_wrapper:
-                        writer = None
-
-                        while True:
-                            result = conn.execute(
-                                paginated_query,
-                                params | {'last_message_id': last_message_id},
-                            )
-                            rows = result.fetchall()
-
-                            if not rows:
-                                break
-
-                            if writer is None:
-                                columns = list(result.keys())
-                                writer = csv.writer(text_wrapper)
-                                writer.writerow(columns)
-
-                            writer.writerows(rows)
-                            total_count += len(rows)
-                            last_message_id = rows[-1].message_id
-
-        if total_count == 0:
-            return None
-
-        logging.info(f'records to archive: {total_count}')
-        buf.seek(0)
-        return buf
-
-    def _move_to_s3(self, data: io.BytesIO) -> None:
-        result_file_name = self._unload_file_name
-
-        logging.info(f'Uploading to s3: {result_file_name}')
-
-        self.s3_client.upload_fileobj(
-            data,
-            get_app_config().aws_backup_bucket_name,
-            f'{self.s3_prefix}/{result_file_name}',
+    def _export_to_s3(self) -> int:
+        """Stream records into a file in s3; returns the number of records, nothing is uploaded if none."""
+
+        # records that arrive during the export have greater ids, they are left for the next part
+        self.max_message_id = max_message_id = self.db.get_max_message_id(self._date_from, self._date_to)
+        if max_message_id is None:
+            return 0
+
+        upload = S3UploadStream(self.s3_client, get_app_config().aws_backup_bucket_name, self.object_key)
+        start = time.monotonic()
+        try:
+            if self.export_format == 'parquet':
+                records_count = self._write_parquet(upload, max_message_id)
+            else:
+                records_count = self._write_csv_zip(upload, max_message_id)
+            if records_count:
+                upload.close()
+        finally:
+            upload.abort()  # no-op if closed
+
+        if records_count == 0:
+            return 0
+
+        self.uploaded_bytes = upload.bytes_uploaded
+        seconds = time.monotonic() - start
+        logging.info(
+            f'archived {records_count} records to s3: {self._unload_file_name}, {upload.bytes_uploaded} bytes, '
+            f'{seconds:.1f} s, {records_count / seconds if seconds else 0:.0f} records/s'
         )
+        return records_count
+
+    def _write_csv_zip(self, output: S3UploadStream, max_message_id: int) -> int:
+        with ZipFile(output, 'w', compression=ZIP_DEFLATED, compresslevel=9) as zf:
+            with zf.open(self._csv_entry_name, 'w') as csv_entry:
+                return self.db.copy_records_to_csv(self._date_from, self._date_to, max_message_id, csv_entry)
+
+    def _write_parquet(self, output: S3UploadStream, max_message_id: int) -> int:
+        columns = self.db.get_source_columns()
+        batches = self.db.fetch_records(columns, self._date_from, self._date_to, max_message_id, ROW_GROUP_SIZE)
+        return write_parquet(output, arrow_schema(columns), batches)
+
+    def _upload_verified(self, object_key: str, size: int) -> bool:
+        try:
+            response = self.s3_client.head_object(Bucket=get_app_config().aws_backup_bucket_name, Key=object_key)
+        except ClientError:
+            return False
+        return response['ContentLength'] == size
+
+
+def run_archivers(
+    archivers: list[Archiver],
+    workers: int = ARCHIVE_WORKERS,
+    time_budget_seconds: float = EXPORT_TIME_BUDGET_SECONDS,
+) -> ExportStats:
+    """export days concurrently, then delete the exported records day by day; a failed day does not stop the others
+
+    Deletion drops the daily partitions of notif_by_user__history; detaching one locks the table,
+    so it waits until no export reads it.
+    """
 
-        logging.info('Archive saved to s3 bucket')
+    stats = ExportStats()
+    start = time.monotonic()
 
-    def _delete_old_records(self) -> None:
-        logging.info('Deleting old records')
-        self.db.delete_exported_records(self._date_from, self._date_to)
-        logging.info('Old records deleted')
+    def export_in_budget(archiver: Archiver) -> bool | None:
+        """None if the day is not started within the time budget"""
+        if time.monotonic() - start > time_budget_seconds:
+            return None
+        return archiver.export()
+
+    exported = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(export_in_budget, archiver): archiver for archiver in archivers}
+        for future in as_completed(futures):
+            try:
+                to_delete = future.result()
+            except Exception:
+                logging.exception(f'archivation of {futures[future].archive_date} failed')
+                stats.failed += 1
+                continue
+            if to_delete is None:
+                stats.postponed += 1
+            elif to_delete:
+                exported.append(futures[future])
+            else:
+                stats.done += 1
+
+    for archiver in exported:
+        try:
+            archiver.delete_exported()
+            stats.done += 1
+        except Exception:
+            logging.exception(f'deletion of exported records of {archiver.archive_date} failed')
+            stats.failed += 1
+
+    logging.info(
+        f'archivation: {stats.done} days done, {stats.postponed} postponed, {stats.failed} failed, '
+        f'{time.monotonic() - start:.1f} s'
+    )
+    return stats
 
 
 def main(event: dict, context: Ctx) -> None:
@@ -161,12 +479,18 @@ def main(event: dict, context: Ctx) -> None:
 
     db = DBClient()
 
-    for i in range(DAYS_AGO_TO_START)[:DAYS_AGO_TO_FINISH:-1]:
-        archive_date = date.today() - timedelta(days=i)
-        logging.info(f'Processing date: {archive_date}')
-
-        archiver = Archiver(archive_date=archive_date, db=db, s3_client=s3)
-        archiver.run()
+    archivers = [
+        Archiver(
+            archive_date=date.today() - timedelta(days=i),
+            db=db,
+            s3_client=s3,
+            export_format=get_app_config().archive_export_format,
+        )
+        for i in range(DAYS_AGO_TO_START)[:DAYS_AGO_TO_FINISH:-1]
+    ]
+    # every worker holds one connection of the pool at a time
+    workers = min(ARCHIVE_WORKERS, get_app_config().db_pool_size + get_app_config().db_max_overflow)
+    run_archivers(archivers, workers=workers)
 
     logging.info('Done')
 
@@ -14,9 +14,11 @@ from dataclasses import dataclass, field
 from itertools import repeat
 
 from _dependencies.common.commons import get_app_config, setup_logging
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
 from _dependencies.common.pubsub import (
     Ctx,
     MessageForIdentifyUpdatesOfTopics,
+    buffered_publishing,
     pubsub_check_first_posts,
     pubsub_parse_searches,
 )
@@ -168,6 +170,8 @@ def send_updates_to_parse() -> None:
 
     _send_update_first_posts(topics_with_updated_first_posts)
     _send_identify_updates_of_topics(list(set(changed_topic_ids)))
+    for topic_id in unique_changed_topic_ids:
+        log_pipeline_event(PipelineStage.detected, search_num=topic_id)
 
     get_db_client().set_key_value_item(LAST_CHANGE_ID_IN_PHPBB_DB, last_id + fetched_records_count)
 
@@ -194,7 +198,9 @@ def main(event: dict, context: Ctx) -> None:
         return legacy_main(event, context)
 
     # BLOCK 1. for checking if the first posts were changed
-    send_updates_to_parse()
+    # chunks for other functions are sent in batches instead of one request per chunk
+    with buffered_publishing():
+        send_updates_to_parse()
 
     # BLOCK 2. small bonus: check one of topics, which has visibility='hidden' to check if it was not unhidden later.
     # It is done in this script only because there's no better place. Ant these are circa 40 hidden topics at all.
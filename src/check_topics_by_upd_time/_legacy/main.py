@@ -1,15 +1,21 @@
 """Parses the folder-tree on the forum, checking the last update time. Collects the list of leaf-level folders
-which contain updates – and makes a pub/sub call for other script to parse content of these folders"""
+which contain updates – and makes a pub/sub call for other script to parse content of these folders
+
+The tree seen on the previous run is kept in ``forum_folder_tree`` (a row per folder with its parent and the time of
+the last change shown on the parent's page) and ``forum_folder_searches`` (searches listed on a folder's page).
+A folder is crawled when its time changed; its subfolders are scheduled as soon as it is parsed.
+"""
 
 import ast
 import datetime
 import logging
-from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from functools import lru_cache
 from typing import Any, Optional, no_type_check
 
 import requests
+import sqlalchemy
 from bs4 import BeautifulSoup, SoupStrainer, Tag
 from retry.api import retry_call
 
@@ -22,10 +28,115 @@ setup_logging(__package__)
 DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
 USELESS_FOLDERS = {84, 113, 112, 270, 86, 87, 88, 165, 365, 89, 172, 91, 90, 316, 234, 230, 319}
 WORKERS_COUNT = 2
+FORUM_URL = 'https://lizaalert.org/forum'
+
+
+class FolderTreeMixin(DBKeyValueStorageMixin):
+    """Snapshots of forum folders: their subfolders and searches as seen on the previous crawl."""
+
+    def get_folder_snapshot(self, folder_num: int) -> 'FolderSnapshot | None':
+        """None if the folder was never crawled"""
+        with self.connect() as conn:
+            crawled = conn.execute(
+                sqlalchemy.text(
+                    'SELECT 1 FROM forum_folder_tree WHERE folder_num=:folder_num AND crawled_at IS NOT NULL;'
+                ),
+                dict(folder_num=folder_num),
+            ).fetchone()
+            if not crawled:
+                return self._get_legacy_folder_snapshot(conn, folder_num)
+
+            subfolders = conn.execute(
+                sqlalchemy.text("""
+                    SELECT folder_num, change_time_str FROM forum_folder_tree WHERE parent_folder_num=:folder_num;
+                """),
+                dict(folder_num=folder_num),
+            ).fetchall()
+            searches = conn.execute(
+                sqlalchemy.text("""
+                    SELECT title, change_time_str FROM forum_folder_searches WHERE folder_num=:folder_num;
+                """),
+                dict(folder_num=folder_num),
+            ).fetchall()
+        return FolderSnapshot(
+            subfolders={Subfolder(*row) for row in subfolders},
+            searches={Search(*row) for row in searches},
+        )
+
+    def save_folder_snapshot(self, folder_num: int, folder: 'DecomposedFolder') -> None:
+        """replace the snapshot of the folder; subfolders that are not on the page any more are detached"""
+        subfolders = [
+            dict(folder_num=subfolder.folder_num, change_time_str=subfolder.change_time_str)
+            for subfolder in folder.subfolders
+        ]
+        searches = [dict(title=search.title, change_time_str=search.change_time_str) for search in folder.searches]
+        with self.connect() as conn:
+            conn.execute(
+                sqlalchemy.text("""
+                    INSERT INTO forum_folder_tree (folder_num, folder_name, crawled_at)
+                    VALUES (:folder_num, :folder_name, now())
+                    ON CONFLICT (folder_num) DO UPDATE SET folder_name=EXCLUDED.folder_name, crawled_at=now();
+                """),
+                dict(folder_num=folder_num, folder_name=folder.folder_name),
+            )
+            conn.execute(
+                sqlalchemy.text("""
+                    UPDATE forum_folder_tree SET parent_folder_num=NULL
+                    WHERE parent_folder_num=:folder_num AND NOT folder_num = ANY(:folder_nums);
+                """),
+                dict(folder_num=folder_num, folder_nums=[subfolder['folder_num'] for subfolder in subfolders]),
+            )
+            if subfolders:
+                conn.execute(
+                    sqlalchemy.text("""
+                        INSERT INTO forum_folder_tree (folder_num, parent_folder_num, change_time_str)
+                        VALUES (:folder_num, :parent_folder_num, :change_time_str)
+                        ON CONFLICT (folder_num) DO UPDATE
+                        SET parent_folder_num=EXCLUDED.parent_folder_num, change_time_str=EXCLUDED.change_time_str;
+                    """),
+                    [dict(subfolder, parent_folder_num=folder_num) for subfolder in subfolders],
+                )
+            conn.execute(
+                sqlalchemy.text('DELETE FROM forum_folder_searches WHERE folder_num=:folder_num;'),
+                dict(folder_num=folder_num),
+            )
+            if searches:
+                conn.execute(
+                    sqlalchemy.text("""
+                        INSERT INTO forum_folder_searches (folder_num, title, change_time_str)
+                        VALUES (:folder_num, :title, :change_time_str)
+                        ON CONFLICT DO NOTHING;
+                    """),
+                    [dict(search, folder_num=folder_num) for search in searches],
+                )
+            conn.execute(
+                sqlalchemy.text('DELETE FROM key_value_storage WHERE key IN (:folders_key, :searches_key);'),
+                dict(folders_key=f'folders_{folder_num}', searches_key=f'searches_{folder_num}'),
+            )
+
+    def _get_legacy_folder_snapshot(self, conn: sqlalchemy.Connection, folder_num: int) -> 'FolderSnapshot | None':
+        """snapshot saved before forum_folder_tree: ``str()`` of lists in key_value_storage"""
+        rows = conn.execute(
+            sqlalchemy.text('SELECT key, value FROM key_value_storage WHERE key IN (:folders_key, :searches_key);'),
+            dict(folders_key=f'folders_{folder_num}', searches_key=f'searches_{folder_num}'),
+        ).fetchall()
+        values = {key.split('_', 1)[0]: value for key, value in rows}
+        if 'folders' not in values:
+            return None
+        try:
+            return FolderSnapshot(
+                subfolders={Subfolder(int(num), str(time)) for num, time in ast.literal_eval(values['folders'])},
+                searches={
+                    Search(str(title), str(time)) for title, time in ast.literal_eval(values.get('searches', '[]'))
+                },
+            )
+        except (ValueError, SyntaxError, TypeError):
+            logging.warning(f'Legacy snapshot of folder {folder_num} is not readable')
+            return None
 
 
-class DBClient(DBClientBase, DBKeyValueStorageMixin):
-    """Legacy DBClient — now inherits from DBClientBase and DBKeyValueStorageMixin."""
+class DBClient(DBClientBase, FolderTreeMixin):
+    """Legacy DBClient — now inherits from DBClientBase and FolderTreeMixin."""
 
 
 @lru_cache
@@ -40,25 +151,17 @@ class FolderForDecompose:
     mother_folder_timestamp: str | None = None
 
 
-@dataclass
+@dataclass(frozen=True)
 class Subfolder:
     folder_num: int
     change_time_str: str
 
-    def __repr__(self) -> str:
-        """for compatibility with current cloud storage"""
-        return str([self.folder_num, self.change_time_str])
-
 
-@dataclass
+@dataclass(frozen=True)
 class Search:
     title: str
     change_time_str: str
 
-    def __repr__(self) -> str:
-        """for compatibility with current cloud storage"""
-        return str([self.title, self.change_time_str])
-
 
 @dataclass
 class DecomposedFolder:
@@ -67,6 +170,27 @@ class DecomposedFolder:
     folder_name: str
 
 
+@dataclass
+class FolderSnapshot:
+    subfolders: set[Subfolder]
+    searches: set[Search]
+
+
+@dataclass
+class CheckedFolder:
+    folder: FolderForDecompose
+    subfolders_to_check: list[FolderForDecompose]
+    searches_changed: bool
+
+
+def changed_subfolders(new: set[Subfolder], old: set[Subfolder]) -> list[int]:
+    """Numbers of new, removed and changed subfolders.
+
+    A subfolder is in the symmetric difference when it was added, removed or its time changed.
+    """
+    return sorted({subfolder.folder_num for subfolder in new ^ old})
+
+
 @lru_cache
 def get_session() -> requests.Session:
     session = requests.Session()
@@ -82,18 +206,6 @@ class KeyValueStorage:
     def __init__(self) -> None:
         self.db = get_db_client()
 
-    def read_searches(self, folder_num: str) -> str | None:
-        return self._read_snapshot(f'searches_{folder_num}')
-
-    def read_folders(self, folder_num: str) -> str | None:
-        return self._read_snapshot(f'folders_{folder_num}')
-
-    def write_searches(self, data: Any, folder_num: str) -> None:
-        return self._write_snapshot(data, f'searches_{folder_num}')
-
-    def write_folders(self, data: Any, folder_num: str) -> None:
-        return self._write_snapshot(data, f'folders_{folder_num}')
-
     def read_foder_root_modified_times_dict(self) -> dict[str, str]:
         times_dict: dict | None = self._read_snapshot(self.ROOT_MODIFIED_TIMES_KEY)
         return times_dict if times_dict else {}
@@ -117,55 +229,10 @@ class KeyValueStorage:
         self.db.set_key_value_item(snapshot_name, data)
 
 
-class FolderComparator:
-    def compare_folders(self, new_str: str, old_str: str | None) -> list[str]:
-        """Compare if newly parsed folder content equals the previously-saved one."""
-        if not old_str:
-            return self._handle_new_folders(new_str)
-        elif new_str != old_str:
-            return self._handle_updated_folders(new_str, old_str)
-        return []
-
-    def _handle_new_folders(self, new_str: str) -> list[str]:
-        """Handle case when there's no old version."""
-        new_list = ast.literal_eval(new_str)
-        return [n_line[0] for n_line in new_list]
-
-    def _handle_updated_folders(self, new_str: str, old_str: str) -> list[str]:
-        """Handle case when there are updates."""
-        new_list = ast.literal_eval(new_str)
-        old_list = ast.literal_eval(old_str)
-
-        comparison_matrix = self._create_comparison_matrix(old_list, new_list)
-        return self._find_changed_folders(comparison_matrix)
-
-    def _create_comparison_matrix(self, old_list: list, new_list: list) -> list:
-        """Create a matrix for comparing old and new folders."""
-        comparison_matrix = [[o_line[0], o_line[1], ''] for o_line in old_list]
-
-        for n_line in new_list:
-            if not self._update_existing_folder(comparison_matrix, n_line):
-                comparison_matrix.append([n_line[0], '', n_line[1]])
-
-        return comparison_matrix
-
-    def _update_existing_folder(self, comparison_matrix: list, n_line: list) -> bool:
-        """Update existing folder in comparison matrix if found."""
-        for m_line in comparison_matrix:
-            if n_line[0] == m_line[0]:
-                m_line[2] = n_line[1]
-                return True
-        return False
-
-    def _find_changed_folders(self, comparison_matrix: list) -> list[str]:
-        """Find folders that have changed based on comparison matrix."""
-        return [line[0] for line in comparison_matrix if line[1] != line[2]]
-
-
 class FolderDecomposer:
     def decompose_folder(self, start_folder_num: str) -> DecomposedFolder:
         """Check if there are changes in folder that contain other folders"""
-        url = f'https://lizaalert.org/forum/viewforum.php?f={start_folder_num}'
+        url = f'{FORUM_URL}/viewforum.php?f={start_folder_num}'
         soup = self._fetch_and_parse_page(url)
         # we need to receive only text here
         # then we need to get subfolders and/or searches with BS4
@@ -272,7 +339,7 @@ class FolderDecomposer:
     def _extract_search_info(self, tag: Tag) -> tuple[str, str]:
         """Extract search title and time from a search element"""
         search_title_block = tag.find('a', 'topictitle')
-        search_title = search_title_block.next_element if search_title_block else ''
+        search_title = str(search_title_block.next_element) if search_title_block else ''
 
         try:
             search_time_str = tag.find('time')['datetime']
@@ -284,7 +351,7 @@ class FolderDecomposer:
 
 class FolderUpdateChecker:
     def __init__(self) -> None:
-        self.url = 'https://lizaalert.org/forum/index.php'
+        self.url = f'{FORUM_URL}/index.php'
         self.useless_folders = USELESS_FOLDERS
 
     def check_updates_in_folder_with_folders(self) -> list[list]:
@@ -391,80 +458,82 @@ def save_root_timestamps(updated_root_folders: list[tuple[str, str]]) -> None:
     storage.write_foder_root_modified_times_dict(update_times)
 
 
-def process_folder(
-    folders_to_check: list[FolderForDecompose],
-    updated_folders: list,
-    folder: FolderForDecompose,
-    storage: KeyValueStorage,
-    folder_timestamps: dict[str, str],
-) -> None:
+def process_folder(folder: FolderForDecompose, folder_timestamps: dict[str, str]) -> CheckedFolder | None:
+    """parse the folder page and compare it with the snapshot; None if the folder did not change"""
+
     # Skip if this folder's timestamp hasn't changed since last successful check
     if folder.mother_folder_timestamp:
         saved_ts = folder_timestamps.get(folder.mother_folder_num)
         if saved_ts == folder.mother_folder_timestamp:
             logging.info(f'Folder {folder.mother_folder_num}: no change since last check, skipping')
-            return
+            return None
 
     decomposed_folder = FolderDecomposer().decompose_folder(folder.mother_folder_num)
-
-    new_child_folders_str = str(decomposed_folder.subfolders)
-    new_child_searches_str = str(decomposed_folder.searches)
     folder.mother_folder_name = decomposed_folder.folder_name
 
-    old_child_folders_str = storage.read_folders(folder.mother_folder_num)
-    old_child_searches_str = storage.read_searches(folder.mother_folder_num)
+    db = get_db_client()
+    folder_num = int(folder.mother_folder_num)
+    new_snapshot = FolderSnapshot(
+        subfolders=set(decomposed_folder.subfolders), searches=set(decomposed_folder.searches)
+    )
+    old_snapshot = db.get_folder_snapshot(folder_num) or FolderSnapshot(subfolders=set(), searches=set())
 
-    list_of_new_folders = FolderComparator().compare_folders(new_child_folders_str, old_child_folders_str)
-
-    storage.write_folders(new_child_folders_str, folder.mother_folder_num)
-    storage.write_searches(new_child_searches_str, folder.mother_folder_num)
+    list_of_new_folders = changed_subfolders(new_snapshot.subfolders, old_snapshot.subfolders)
+    db.save_folder_snapshot(folder_num, decomposed_folder)
 
     logging.info(f'List of new folders in {folder.mother_folder_num}: {list_of_new_folders}')
 
-    # Save this folder's timestamp
-    if folder.mother_folder_timestamp:
-        folder_timestamps[folder.mother_folder_num] = folder.mother_folder_timestamp
-
-    # Queue only new/changed subfolders (from comparator), carrying their timestamps
+    # Queue only new/changed subfolders, carrying their timestamps
     child_timestamps = {str(sf.folder_num): sf.change_time_str for sf in decomposed_folder.subfolders}
-    for line in list_of_new_folders:
-        folders_to_check.append(
-            FolderForDecompose(
-                mother_folder_num=str(line),
-                mother_folder_timestamp=child_timestamps.get(str(line)),
-            )
-        )
+    return CheckedFolder(
+        folder=folder,
+        subfolders_to_check=[
+            FolderForDecompose(mother_folder_num=str(num), mother_folder_timestamp=child_timestamps.get(str(num)))
+            for num in list_of_new_folders
+        ],
+        searches_changed=new_snapshot.searches != old_snapshot.searches,
+    )
 
-    if new_child_searches_str != old_child_searches_str:
-        updated_folders.append((folder.mother_folder_num, folder.mother_folder_name))
 
+def get_updates_of_nested_folders(folders_list_to_scan: list[tuple[str, str]]) -> list[tuple[str, str | None]]:
+    """Crawl the changed part of the tree from the given root folders.
 
-def get_updates_of_nested_folders(folders_list_to_scan: list[tuple[str, str]]) -> list[list]:
+    A work queue: subfolders of a folder are submitted as soon as it is checked,
+    without waiting for the other folders of its level.
+    """
     storage = KeyValueStorage()
     folder_timestamps = storage.read_folder_timestamps()
-
-    folders_to_check: list[FolderForDecompose] = []
-    updated_folders: list = []
-
-    for folder_num, folder_timestamp in folders_list_to_scan:
-        folders_to_check.append(
-            FolderForDecompose(
-                mother_folder_num=folder_num,
-                mother_folder_timestamp=folder_timestamp,
-            )
-        )
+    updated_folders: list[tuple[str, str | None]] = []
 
     with ThreadPoolExecutor(max_workers=WORKERS_COUNT) as pool:
-        futures = []
-        while folders_to_check:
-            while folders_to_check:
-                folder = folders_to_check.pop()
-                future = pool.submit(
-                    process_folder, folders_to_check, updated_folders, folder, storage, folder_timestamps
-                )
-                futures.append(future)
-            wait(futures)
-            [f.result() for f in futures]  # check that all tasks are done without exceptions
+        pending: set[Future[CheckedFolder | None]] = {
+            pool.submit(
+                process_folder,
+                FolderForDecompose(mother_folder_num=folder_num, mother_folder_timestamp=folder_timestamp),
+                folder_timestamps,
+            )
+            for folder_num, folder_timestamp in folders_list_to_scan
+        }
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    checked = future.result()
+                    if checked is None:
+                        continue
+                    folder = checked.folder
+                    if folder.mother_folder_timestamp:
+                        folder_timestamps[folder.mother_folder_num] = folder.mother_folder_timestamp
+                    pending |= {
+                        pool.submit(process_folder, subfolder, folder_timestamps)
+                        for subfolder in checked.subfolders_to_check
+                    }
+                    if checked.searches_changed:
+                        updated_folders.append((folder.mother_folder_num, folder.mother_folder_name))
+        except Exception:
+            for future in pending:
+                future.cancel()
+            raise
 
     # Save per-folder timestamps for future runs
     storage.write_folder_timestamps(folder_timestamps)
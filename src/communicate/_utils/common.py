@@ -1,5 +1,5 @@
 import math
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, ClassVar, Sequence, Union
 
@@ -120,6 +120,7 @@ class UpdateExtraParams:
     user_is_new: bool
     onboarding_step_id: int
     user_input_state: UserInputState | None
+    user_regions: list[int] = field(default_factory=list)  # as loaded before the handlers
 
 
 @dataclass
@@ -3,6 +3,8 @@ from functools import lru_cache
 
 import sqlalchemy
 
+from _dependencies.bot.users_management import ManageUserAction
+from _dependencies.common.commons import Messenger
 from _dependencies.common.db_client import DBClientBase
 from _dependencies.models import AgePeriod, UserSettingsSummary
 from _dependencies.user_repository import (
@@ -30,6 +32,7 @@ from .search_queries import (
     get_all_last_searches_in_region_limit_20,
     get_all_searches_in_one_region_limit_20,
 )
+from .user_context import UserContextMixin
 
 
 class DBClient(
@@ -49,11 +52,12 @@ class DBClient(
     SettingsSummaryMixin,
     InlineDialogueMixin,
     TelegramRoleMixin,
+    UserContextMixin,
 ):
     """Telegram bot DB client.
 
     Inherits shared methods from consolidated mixins in ``_dependencies.user_repository``,
-    plus Telegram-specific mixins (InlineDialogueMixin, TelegramRoleMixin).
+    plus Telegram-specific mixins (InlineDialogueMixin, TelegramRoleMixin, UserContextMixin).
     Search queries are delegated to module-level functions in ``search_queries.py``.
     """
 
@@ -61,6 +65,18 @@ class DBClient(
     # Adapter methods — map communicate's method names to mixin names
     # ═══════════════════════════════════════════════════════════════════════
 
+    def register_user(self, user_id: int, messenger: Messenger, username: str | None = None) -> None:
+        super().register_user(user_id, messenger, username)
+        self.invalidate_user_context(user_id)
+
+    def save_onboarding_step(self, user_id: int, step: str) -> None:
+        super().save_onboarding_step(user_id, step)
+        self.invalidate_user_context(user_id)
+
+    def update_user_status(self, user_id: int, action: ManageUserAction) -> None:
+        super().update_user_status(user_id, action)
+        self.invalidate_user_context(user_id)
+
     def save_user_message_to_bot(self, user_id: int, got_message: str) -> None:
         """Save user's message to bot in psql"""
         self.save_user_message(user_id, got_message)
@@ -16,7 +16,7 @@ from _dependencies.bot.users_management import ManageUserAction, save_onboarding
 from _dependencies.common.commons import add_tel_link, get_app_config
 from _dependencies.common.pubsub import notify_admin
 from _dependencies.common.telegram_message import TelegramMessage
-from _dependencies.models import AgePeriod
+from _dependencies.models import AgePeriod, UserSettingsSummary
 
 from ..buttons import (
     Commands,
@@ -382,18 +382,10 @@ def handle_help_needed(ctx: TGHandlerContext) -> None:
     ctx.reply(text='', reply_markup=reply_markup_main)
 
 
-def _compose_msg_on_user_setting_fullness(ctx: TGHandlerContext, user_id: int) -> str | None:
+def _compose_msg_on_user_setting_fullness(settings_summary: UserSettingsSummary) -> str | None:
     """Create a text of message, which describes the degree on how complete user's profile is.
     More settings set – more complete profile it. It's done to motivate users to set the most tailored settings."""
 
-    if not user_id:
-        return None
-
-    settings_summary = ctx.db.get_user_settings_summary(user_id)
-
-    if not settings_summary:
-        return None
-
     list_of_settings = [
         settings_summary.pref_notif_type,
         settings_summary.pref_region_old,
@@ -443,13 +435,14 @@ def handle_main_settings(ctx: TGHandlerContext) -> None:
         'момент сможете изменить эти настройки.'
     )
 
-    message_prefix = _compose_msg_on_user_setting_fullness(ctx, ctx.user_id)
+    profile = ctx.db.get_profile_snapshot(ctx.user_id) if ctx.user_id else None
+    message_prefix = _compose_msg_on_user_setting_fullness(profile.summary) if profile else None
     if message_prefix:
         bot_message = f'{bot_message}\n\n{message_prefix}'
 
     delivery_status_button = (
         MainSettingsMenu.b_enable_notifications
-        if ctx.db.get_user_status(ctx.user_id) == 'unsubscribed'
+        if profile and profile.status == 'unsubscribed'
         else MainSettingsMenu.b_disable_notifications
     )
     keyboard = [
@@ -0,0 +1,116 @@
+"""User context mixin — everything ``process_update`` needs about the user, in one query.
+
+Registration and the onboarding step of onboarded users do not change any more (the step is the
+highest one saved), so they are kept in an in-process cache that lives as long as the warm function
+instance, and other instances cannot make it stale. Dialog data (inline messages, input state, regions)
+is changed by handlers of any instance and is read on every update.
+"""
+
+import time
+from dataclasses import dataclass
+
+import sqlalchemy
+
+from _dependencies.common.db_client import DBClientMixinBase
+
+from .common import UserInputState
+
+ONBOARDING_FINISHED_STEP_ID = 80
+USER_CONTEXT_TTL_SECONDS = 600
+USER_CONTEXT_CACHE_SIZE = 10_000
+
+
+@dataclass
+class UserContext:
+    user_is_new: bool
+    onboarding_step_id: int
+    onboarding_step_name: str | None
+    user_input_state: UserInputState | None
+    inline_message_ids: list[int]
+    regions: list[int]
+
+
+@dataclass
+class _CachedProfile:
+    onboarding_step_id: int
+    onboarding_step_name: str | None
+    expires_at: float
+
+
+class UserContextMixin(DBClientMixinBase):
+    """Aggregated load of the user context with a cache of onboarded users."""
+
+    _profile_cache: dict[int, _CachedProfile]
+
+    def get_user_context(self, user_id: int) -> UserContext:
+        cached = self._get_cached_profile(user_id)
+        with self.connect() as connection:
+            stmt = sqlalchemy.text("""
+                SELECT
+                    ARRAY(SELECT message_id FROM communications_last_inline_msg WHERE user_id=:user_id),
+                    (SELECT msg_type FROM msg_from_bot WHERE user_id=:user_id LIMIT 1),
+                    ARRAY(SELECT forum_folder_num FROM user_regional_preferences WHERE user_id=:user_id),
+                    CASE WHEN :with_profile THEN EXISTS (SELECT 1 FROM users WHERE user_id=:user_id) END,
+                    onboarding.step_id,
+                    onboarding.step_name
+                FROM (SELECT 1) AS one
+                LEFT JOIN LATERAL (
+                    SELECT step_id, step_name FROM user_onboarding
+                    WHERE user_id=:user_id AND :with_profile
+                    ORDER BY step_id DESC
+                    LIMIT 1
+                ) AS onboarding ON TRUE;
+            """)
+            row = connection.execute(stmt, dict(user_id=user_id, with_profile=cached is None)).one()
+
+        inline_message_ids, raw_input_state, regions, user_exists, step_id, step_name = row
+        if cached:
+            user_is_new, step_id, step_name = False, cached.onboarding_step_id, cached.onboarding_step_name
+        elif not user_exists:
+            user_is_new, step_id, step_name = True, 0, 'start'
+        else:
+            user_is_new = False
+            if step_id is None:
+                step_id, step_name = 99, None
+            if step_id >= ONBOARDING_FINISHED_STEP_ID:
+                self._cache_profile(user_id, step_id, step_name)
+
+        return UserContext(
+            user_is_new=user_is_new,
+            onboarding_step_id=step_id,
+            onboarding_step_name=step_name,
+            user_input_state=_parse_input_state(raw_input_state),
+            inline_message_ids=list(inline_message_ids),
+            regions=list(regions),
+        )
+
+    def invalidate_user_context(self, user_id: int) -> None:
+        """to be called on writes of registration, onboarding or status of the user"""
+        self._profiles().pop(user_id, None)
+
+    def _get_cached_profile(self, user_id: int) -> _CachedProfile | None:
+        cached = self._profiles().get(user_id)
+        if cached and cached.expires_at < time.monotonic():
+            self.invalidate_user_context(user_id)
+            return None
+        return cached
+
+    def _cache_profile(self, user_id: int, step_id: int, step_name: str | None) -> None:
+        profiles = self._profiles()
+        if len(profiles) >= USER_CONTEXT_CACHE_SIZE:
+            profiles.pop(next(iter(profiles)))  # the oldest one
+        profiles[user_id] = _CachedProfile(step_id, step_name, time.monotonic() + USER_CONTEXT_TTL_SECONDS)
+
+    def _profiles(self) -> dict[int, _CachedProfile]:
+        if not hasattr(self, '_profile_cache'):
+            self._profile_cache = {}
+        return self._profile_cache
+
+
+def _parse_input_state(raw_value: str | None) -> UserInputState | None:
+    if raw_value is None:
+        return None
+    try:
+        return UserInputState(raw_value)
+    except ValueError:
+        return None
@@ -1,18 +1,12 @@
 """receives telegram messages from users, acts accordingly and sends back the reply"""
 
-import datetime
 import logging
 from functools import lru_cache
 from typing import Any, Callable
 
 from telegram import Bot, ReplyKeyboardMarkup, Update
 
-from _dependencies.bot.users_management import (
-    ManageUserAction,
-    register_new_user,
-    save_onboarding_step,
-    update_user_status,
-)
+from _dependencies.bot.users_management import ManageUserAction
 from _dependencies.common.commons import Messenger, get_app_config, setup_logging
 from _dependencies.common.misc import RequestWrapper, ResponseWrapper, request_response_converter
 from _dependencies.common.pubsub import notify_admin
@@ -139,7 +133,7 @@ def _process_block_unblock_user(user_id: int, user_new_status: str) -> None:
     status_dict = {'kicked': ManageUserAction.block_user, 'member': ManageUserAction.unblock_user}
 
     # mark user as blocked / unblocked in psql
-    update_user_status(status_dict[user_new_status], user_id)
+    db().update_user_status(user_id, status_dict[user_new_status])
 
     if user_new_status != 'member':
         return
@@ -171,7 +165,7 @@ def _run_onboarding(user_id: int, username: str, onboarding_step_id: int, got_me
     if onboarding_step_id == 21:  # region_set
         # mark that onboarding is finished
         if got_message:
-            save_onboarding_step(user_id, 'finished')
+            db().save_onboarding_step(user_id, 'finished')
             onboarding_step_id = 80
 
     return onboarding_step_id
@@ -199,10 +193,11 @@ def process_update(update: Update) -> str:
 
     logging.info(f'Before if got_message and not got_callback: {got_message=}')
 
+    user_context = db().get_user_context(user_id)
+
     if got_message and not got_callback:
-        last_inline_message_ids = db().get_last_user_inline_dialogue(user_id)
-        if last_inline_message_ids:
-            for last_inline_message_id in last_inline_message_ids:
+        if user_context.inline_message_ids:
+            for last_inline_message_id in user_context.inline_message_ids:
                 tg_api().edit_message_reply_markup(
                     user_id, last_inline_message_id, 'main() if got_message and not got_callback'
                 )
@@ -215,21 +210,23 @@ def process_update(update: Update) -> str:
         # mark user update as 'received by bot'
         tg_api().send_callback_answer_to_api(user_id, update_params.callback_query.id, '')
 
-    user_is_new = db().check_if_new_user(user_id)
-    logging.info(f'After check_if_new_user: {user_is_new=}')
+    user_is_new = user_context.user_is_new
+    logging.info(f'After get_user_context: {user_is_new=}')
     if user_is_new:
-        register_new_user(user_id, username, datetime.datetime.now(), Messenger.TELEGRAM)
+        db().register_user(user_id, Messenger.TELEGRAM, username)
 
-    onboarding_step_id, onboarding_step_name = db().get_onboarding_step(user_id, user_is_new)
+    onboarding_step_id = user_context.onboarding_step_id
 
     # ONBOARDING PHASE
     if onboarding_step_id < 80:
         onboarding_step_id = _run_onboarding(user_id, username, onboarding_step_id, got_message)
 
     # Check what was last request from bot and if bot is expecting user's input
-    user_input_state = db().get_user_input_state(user_id)
+    user_input_state = user_context.user_input_state
 
-    extra_params = UpdateExtraParams(user_is_new, onboarding_step_id, user_input_state=user_input_state)
+    extra_params = UpdateExtraParams(
+        user_is_new, onboarding_step_id, user_input_state=user_input_state, user_regions=user_context.regions
+    )
 
     if not got_message and not update_params.user_latitude:
         # all other cases when bot was not able to understand the message from user
@@ -328,8 +325,7 @@ def _run_handlers(update_params: UpdateBasicParams, extra_params: UpdateExtraPar
         return
 
     ### CUSTOM TEXT ###
-    user_regions = db().get_user_reg_folders_preferences(update_params.user_id)
-    if not user_regions:
+    if not extra_params.user_regions:
         # force user to input a region
         other_handlers.handle_force_user_to_set_region(ctx)
         return
@@ -362,6 +358,10 @@ def main(request: RequestWrapper, *args: Any, **kwargs: Any) -> ResponseWrapper:
     if update is None:
         return ResponseWrapper(data='failed to parse update', status_code=400)
 
-    with db().connect():
-        result = process_update(update)
-        return ResponseWrapper(data=result)
+    try:
+        with db().unit_of_work():
+            result = process_update(update)
+            return ResponseWrapper(data=result)
+    finally:
+        # the instance is frozen after the answer, the buffer would not be flushed until the next request
+        db().flush_dialog_history()
@@ -39,17 +39,24 @@ class NotificationStatsMixin(DBClientMixinBase):
                     dict(user_id=user_id, num=value),
                 )
 
-    def record_user_stat_notifications(self, user_id: int, number_to_add: int) -> None:
-        """Record +1 into user_stat for new search notifications (usability tips)."""
+    def record_users_stat_notifications(self, numbers_to_add: dict[int, int]) -> None:
+        """Add numbers of new search notifications to user_stat (usability tips) for all users in one statement."""
+        if not numbers_to_add:
+            return
+
         with self.connect() as conn:
             conn.execute(
                 sqlalchemy.text("""
                     INSERT INTO user_stat (user_id, num_of_new_search_notifs)
-                    VALUES(:user_id, :number_to_add)
+                    SELECT user_id, number_to_add
+                    FROM unnest(CAST(:user_ids AS bigint[]), CAST(:numbers_to_add AS int[]))
+                        AS t(user_id, number_to_add)
                     ON CONFLICT (user_id) DO
-                    UPDATE SET num_of_new_search_notifs = :number_to_add +
-                    (SELECT num_of_new_search_notifs from user_stat WHERE user_id = :user_id)
-                    WHERE user_stat.user_id = :user_id;
+                    UPDATE SET num_of_new_search_notifs =
+                        COALESCE(user_stat.num_of_new_search_notifs, 0) + EXCLUDED.num_of_new_search_notifs;
                 """),
-                dict(user_id=int(user_id), number_to_add=int(number_to_add)),
+                dict(
+                    user_ids=[int(user_id) for user_id in numbers_to_add],
+                    numbers_to_add=[int(number) for number in numbers_to_add.values()],
+                ),
             )
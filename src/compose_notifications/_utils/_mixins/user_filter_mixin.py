@@ -54,7 +54,94 @@ class UserFilterMixin(DBClientMixinBase):
         forum_search_num: int,
         following_mode_on: str,
     ) -> list[Any]:
-        """Get users who should receive notifications for a given change_log line."""
+        """Get users who should receive notifications for a given change_log line.
+
+        Candidates come from notif_recipient_index (kept up to date by triggers),
+        per-user settings are joined for them only.
+        """
+        with self.connect() as conn:
+            sql_text_psy = sqlalchemy.text("""
+                WITH
+                    recipients AS (
+                        SELECT ri.user_id, ri.multi_folder, 30 = ANY(ri.pref_ids) AS all_notifs
+                        FROM notif_recipient_index ri
+                        WHERE
+                            ri.forum_folder_num = :forum_folder
+                            AND (30 = ANY(ri.topic_type_ids) OR :topic_type_id = ANY(ri.topic_type_ids))
+                            AND
+                            (30 = ANY(ri.pref_ids) OR :change_type = ANY(ri.pref_ids)
+                                OR
+                                (/* 'all types in a followed search' mode is on*/
+                                    (9 = ANY(ri.pref_ids) OR :change_type = 1)  -- 9 is all_in_followed_search
+                                    AND ri.whitelist_on  /*following mode is on*/
+                                    AND  /*this is followed search*/
+                                        exists(
+                                            select 1 FROM user_pref_search_whitelist upswls
+                                            where
+                                                upswls.user_id=ri.user_id
+                                                and upswls.search_id = :forum_search_num
+                                                and upswls.search_following_mode=:following_mode_on
+                                        )
+                                )
+                            )
+                            AND NOT
+                            (
+                                4 = ANY(ri.pref_ids)  /* 4 is topic_inforg_comment_new */
+                                AND :change_type = 2 /* 2 is topic_title_change */ /*AK20240409:issue13*/
+                            )
+                        ),
+                    ---
+                    user_age_prefs AS (
+                        SELECT upa.user_id, array_agg(array[upa.period_min, upa.period_max]) as age_prefs
+                        FROM user_pref_age upa
+                        JOIN recipients r ON r.user_id=upa.user_id
+                        GROUP BY upa.user_id)
+                ----------------------------------------------------------------
+                SELECT DISTINCT r.user_id, u.username_telegram, uc.latitude, uc.longitude, u.role,
+                        st.num_of_new_search_notifs, r.multi_folder, r.all_notifs,
+                        upr.radius, uap.age_prefs
+                FROM recipients AS r
+                JOIN users u
+                    ON r.user_id=u.user_id
+                LEFT JOIN user_coordinates as uc
+                    ON r.user_id=uc.user_id
+                LEFT JOIN user_stat st
+                    ON r.user_id=st.user_id
+                LEFT JOIN user_pref_radius upr
+                    ON r.user_id=upr.user_id
+                LEFT JOIN user_age_prefs AS uap
+                    ON r.user_id=uap.user_id
+                -----
+                /*action='get_user_list_from_recipient_index' */;
+            """)
+            return conn.execute(
+                sql_text_psy,
+                dict(
+                    change_type=change_type,
+                    forum_folder=forum_folder,
+                    topic_type_id=topic_type_id,
+                    forum_search_num=forum_search_num,
+                    following_mode_on=following_mode_on,
+                ),
+            ).fetchall()
+
+    def rebuild_recipient_index(self) -> None:
+        """Recompute notif_recipient_index for all users."""
+        with self.connect() as conn:
+            conn.execute(sqlalchemy.text('SELECT refresh_notif_recipient_index(NULL);'))
+
+    def compose_users_list_for_change_log_full_scan(
+        self,
+        change_type: int,
+        forum_folder: int,
+        topic_type_id: int,
+        forum_search_num: int,
+        following_mode_on: str,
+    ) -> list[Any]:
+        """Same as compose_users_list_for_change_log, but aggregates preferences of all users.
+
+        Not used for composing; it is the reference for checking notif_recipient_index.
+        """
         with self.connect() as conn:
             sql_text_psy = sqlalchemy.text("""
                 WITH
@@ -1,6 +1,7 @@
 import datetime
 import logging
 import re
+from collections import Counter
 from dataclasses import dataclass
 from typing import Any
 
@@ -43,7 +44,7 @@ RE_LONGITUDE = re.compile(r'(?<=\D)[\d.]{2,12}$')
 class NotificationMaker:
     def __init__(self, db: DBClient, new_record: LineInChangeLog, list_of_users: list[User]) -> None:
         self.db = db
-        self.stat_list_of_recipients: list[int] = []  # list of users who received notification on new search
+        self.stat_recipients: Counter[int] = Counter()  # number of notifications on new search per user
         self.new_record = new_record
         self.list_of_users = list_of_users
         self._batch_buffer: list[NotificationRecord] = []
@@ -114,7 +115,7 @@ class NotificationMaker:
         # save to SQL the sendLocation notification for "new search"
         if change_type == ChangeType.topic_new and topic_type_id in SEARCH_TOPIC_TYPES:
             # for user tips in "new search" notifs – to increase sent messages counter
-            self.stat_list_of_recipients.append(user.user_id)
+            self.stat_recipients[user.user_id] += 1
             self._send_coordinates_for_new_search(change_log_id, user)
         elif change_type == ChangeType.topic_first_post_change:
             self._send_coordinates_for_first_post_change(change_log_id, user, user_message)
@@ -304,14 +305,8 @@ class NotificationMaker:
     def record_notification_statistics(self) -> None:
         """records +1 into users' statistics of new searches notification. needed only for usability tips"""
 
-        dict_of_user_and_number_of_new_notifs = {
-            i: self.stat_list_of_recipients.count(i) for i in self.stat_list_of_recipients
-        }
-
         try:
-            for user_id in dict_of_user_and_number_of_new_notifs:
-                number_to_add = dict_of_user_and_number_of_new_notifs[user_id]
-                self.db.record_user_stat_notifications(int(user_id), int(number_to_add))
+            self.db.record_users_stat_notifications(dict(self.stat_recipients))
 
         except Exception as e:
             logging.error('Recording statistics in notification script failed' + repr(e))
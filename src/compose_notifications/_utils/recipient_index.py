@@ -0,0 +1,67 @@
+"""Consistency check of notif_recipient_index: recipients found via the index vs the full-scan query."""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from _dependencies.common.commons import ChangeType, SearchFollowingMode, TopicType
+
+from .database import DBClient
+
+CHECKED_CHANGE_TYPES = [change_type for change_type in ChangeType if change_type != ChangeType.all]
+CHECKED_TOPIC_TYPES = [topic_type for topic_type in TopicType if topic_type != TopicType.all]
+
+
+@dataclass
+class RecipientIndexDiff:
+    change_type: int
+    topic_type_id: int
+    missing: list[tuple] = field(default_factory=list)  # found by the full scan only
+    extra: list[tuple] = field(default_factory=list)  # found via the index only
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.extra)
+
+
+def compare_recipients(
+    db: DBClient, change_type: int, forum_folder: int, topic_type_id: int, forum_search_num: int
+) -> RecipientIndexDiff:
+    params: dict[str, Any] = dict(
+        change_type=change_type,
+        forum_folder=forum_folder,
+        topic_type_id=topic_type_id,
+        forum_search_num=forum_search_num,
+        following_mode_on=SearchFollowingMode.ON,
+    )
+    expected = {_normalize(row) for row in db.compose_users_list_for_change_log_full_scan(**params)}
+    actual = {_normalize(row) for row in db.compose_users_list_for_change_log(**params)}
+
+    return RecipientIndexDiff(
+        change_type=change_type,
+        topic_type_id=topic_type_id,
+        missing=sorted(expected - actual, key=repr),
+        extra=sorted(actual - expected, key=repr),
+    )
+
+
+def check_recipient_index(db: DBClient, forum_folder: int, forum_search_num: int) -> list[RecipientIndexDiff]:
+    """compare recipients for every change type and topic type of the folder, returns mismatches only"""
+
+    diffs = [
+        compare_recipients(db, change_type, forum_folder, topic_type, forum_search_num)
+        for change_type in CHECKED_CHANGE_TYPES
+        for topic_type in CHECKED_TOPIC_TYPES
+    ]
+    mismatches = [diff for diff in diffs if diff]
+    for diff in mismatches:
+        logging.error(
+            f'notif_recipient_index mismatch for {forum_folder=} {diff.change_type=} {diff.topic_type_id=}: '
+            f'{len(diff.missing)} missing, {len(diff.extra)} extra'
+        )
+    return mismatches
+
+
+def _normalize(row: Any) -> tuple:
+    """rows are compared as tuples; age periods are aggregated in arbitrary order"""
+    *fields, age_prefs = tuple(row)
+    return (*fields, tuple(sorted(tuple(period) for period in age_prefs)) if age_prefs else None)
@@ -6,6 +6,7 @@ import logging
 from _dependencies.common.commons import setup_logging
 from _dependencies.common.lock_manager import FunctionLockError, lock_manager
 from _dependencies.common.misc import generate_random_function_id
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
 from _dependencies.common.pubsub import Ctx, pubsub_compose_notifications
 
 from ._utils.commons import LineInChangeLog, User
@@ -50,6 +51,9 @@ def create_user_notifications_from_change_log_record(
     # check the matrix: new update - user and initiate sending notifications
     notification_maker = NotificationMaker(db, new_record, list_of_users)
     notification_maker.generate_notifications_for_users(function_id)
+    log_pipeline_event(
+        PipelineStage.composed, search_num=new_record.forum_search_num, change_log_id=new_record.change_log_id
+    )
 
     analytics_iterations_finish = datetime.datetime.now()
     duration_iterations = round((analytics_iterations_finish - analytics_match_finish).total_seconds(), 2)
@@ -1,11 +1,18 @@
 import datetime
 from functools import lru_cache
+from typing import NamedTuple
 
 import sqlalchemy
 
 from _dependencies.common.db_client import DBClientBase
 
 
+class FirstPostVersion(NamedTuple):
+    id: int
+    content: str | None  # loaded only for versions without stored lines
+    line_hashes: list[str] | None
+
+
 class DBClient(DBClientBase):
     """DB client for identify_updates_of_first_posts."""
 
@@ -64,16 +71,46 @@ class DBClient(DBClientBase):
             """)
             conn.execute(stmt, dict(content_compact=content_compact, search_id=search_id))
 
-    def get_previous_page_content(self, search_id: int) -> str | None:
+    def save_actual_page_lines(self, search_id: int, content_lines: list[str], line_hashes: list[str]) -> None:
+        """store cleaned lines of the first post, so the next version is compared without re-parsing this one"""
+        with self.connect() as conn:
+            stmt = sqlalchemy.text("""
+                UPDATE search_first_posts
+                SET content_lines=:content_lines, content_line_hashes=:line_hashes
+                WHERE search_id=:search_id AND actual = True;
+            """)
+            conn.execute(stmt, dict(content_lines=content_lines, line_hashes=line_hashes, search_id=search_id))
+
+    def get_previous_page_version(self, search_id: int) -> FirstPostVersion | None:
         with self.connect() as conn:
             stmt = sqlalchemy.text("""
-                SELECT content
+                SELECT
+                    id,
+                    CASE WHEN content_line_hashes IS NULL THEN content END,
+                    content_line_hashes
                 FROM search_first_posts
                 WHERE search_id=:search_id AND actual=False
-                ORDER BY timestamp DESC;
+                ORDER BY timestamp DESC
+                LIMIT 1;
             """)
             row = conn.execute(stmt, dict(search_id=search_id)).fetchone()
-            return row[0] if row else None
+            return FirstPostVersion(id=row[0], content=row[1], line_hashes=row[2]) if row else None
+
+    def get_page_lines(self, post_id: int, line_indexes: list[int]) -> list[str]:
+        """get stored cleaned lines of the first post version by their (zero-based) indexes"""
+        if not line_indexes:
+            return []
+        with self.connect() as conn:
+            stmt = sqlalchemy.text("""
+                SELECT sfp.content_lines[t.line_index + 1]
+                FROM
+                    search_first_posts AS sfp,
+                    unnest(CAST(:line_indexes AS int[])) WITH ORDINALITY AS t(line_index, ord)
+                WHERE sfp.id=:post_id
+                ORDER BY t.ord;
+            """)
+            rows = conn.execute(stmt, dict(post_id=post_id, line_indexes=line_indexes)).fetchall()
+            return [row[0] for row in rows]
 
 
 @lru_cache
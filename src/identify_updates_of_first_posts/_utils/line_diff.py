@@ -0,0 +1,136 @@
+"""Line-level diff of first post versions.
+
+Versions are compared by per-line hashes (stored next to each version in `search_first_posts`),
+so the previous version never has to be re-parsed and only the text of changed lines is needed.
+
+The algorithm is a patience diff: common prefix and suffix are cut off, lines that are unique in both
+versions are used as anchors (the longest chain of them that keeps the order), and the gaps between anchors
+are processed the same way. It runs in O(n log n) for long posts with many small edits, unlike
+`difflib` which is quadratic in the worst case.
+"""
+
+import difflib
+import hashlib
+from bisect import bisect_left
+from collections import Counter
+from typing import NamedTuple
+
+# gaps without unique anchors are diffed by difflib, but only while it stays cheap;
+# bigger gaps are treated as fully replaced
+FALLBACK_MAX_CELLS = 10_000
+
+
+class LineDiff(NamedTuple):
+    deleted: list[int]  # indexes of lines of the previous version
+    added: list[int]  # indexes of lines of the current version
+
+
+def hash_line(line: str) -> str:
+    return hashlib.md5(line.encode()).hexdigest()
+
+
+def hash_lines(lines: list[str]) -> list[str]:
+    return [hash_line(line) for line in lines]
+
+
+def diff_line_hashes(prev_hashes: list[str], curr_hashes: list[str]) -> LineDiff:
+    """find indexes of deleted (in previous version) and added (in current version) lines"""
+
+    deleted: list[int] = []
+    added: list[int] = []
+
+    segments = [(0, len(prev_hashes), 0, len(curr_hashes))]
+    while segments:
+        a_lo, a_hi, b_lo, b_hi = segments.pop()
+
+        while a_lo < a_hi and b_lo < b_hi and prev_hashes[a_lo] == curr_hashes[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and prev_hashes[a_hi - 1] == curr_hashes[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+
+        if a_lo == a_hi or b_lo == b_hi:
+            deleted.extend(range(a_lo, a_hi))
+            added.extend(range(b_lo, b_hi))
+            continue
+
+        anchors = _find_anchors(prev_hashes, curr_hashes, a_lo, a_hi, b_lo, b_hi)
+        if not anchors:
+            _diff_segment_without_anchors(prev_hashes, curr_hashes, a_lo, a_hi, b_lo, b_hi, deleted, added)
+            continue
+
+        for a_anchor, b_anchor in anchors:
+            segments.append((a_lo, a_anchor, b_lo, b_anchor))
+            a_lo, b_lo = a_anchor + 1, b_anchor + 1
+        segments.append((a_lo, a_hi, b_lo, b_hi))
+
+    deleted.sort()
+    added.sort()
+    return LineDiff(deleted=deleted, added=added)
+
+
+def _find_anchors(
+    prev_hashes: list[str], curr_hashes: list[str], a_lo: int, a_hi: int, b_lo: int, b_hi: int
+) -> list[tuple[int, int]]:
+    """pairs of positions of lines, which are unique in both segments, forming the longest ordered chain"""
+
+    prev_counts = Counter(prev_hashes[a_lo:a_hi])
+    curr_counts = Counter(curr_hashes[b_lo:b_hi])
+    prev_positions = {prev_hashes[i]: i for i in range(a_lo, a_hi) if prev_counts[prev_hashes[i]] == 1}
+
+    pairs = [
+        (prev_positions[curr_hashes[j]], j)
+        for j in range(b_lo, b_hi)
+        if curr_counts[curr_hashes[j]] == 1 and curr_hashes[j] in prev_positions
+    ]
+    return _longest_ordered_chain(pairs)
+
+
+def _longest_ordered_chain(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """pairs are ordered by the second item; pick the longest subsequence increasing by the first item"""
+
+    tails: list[int] = []  # smallest last first-item of a chain of each length
+    tail_pair_indexes: list[int] = []
+    predecessors: list[int] = []
+
+    for i, (a_index, _) in enumerate(pairs):
+        length = bisect_left(tails, a_index)
+        predecessors.append(tail_pair_indexes[length - 1] if length else -1)
+        if length == len(tails):
+            tails.append(a_index)
+            tail_pair_indexes.append(i)
+        else:
+            tails[length] = a_index
+            tail_pair_indexes[length] = i
+
+    chain: list[tuple[int, int]] = []
+    i = tail_pair_indexes[-1] if tail_pair_indexes else -1
+    while i >= 0:
+        chain.append(pairs[i])
+        i = predecessors[i]
+    chain.reverse()
+    return chain
+
+
+def _diff_segment_without_anchors(
+    prev_hashes: list[str],
+    curr_hashes: list[str],
+    a_lo: int,
+    a_hi: int,
+    b_lo: int,
+    b_hi: int,
+    deleted: list[int],
+    added: list[int],
+) -> None:
+    if (a_hi - a_lo) * (b_hi - b_lo) > FALLBACK_MAX_CELLS:
+        deleted.extend(range(a_lo, a_hi))
+        added.extend(range(b_lo, b_hi))
+        return
+
+    matcher = difflib.SequenceMatcher(None, prev_hashes[a_lo:a_hi], curr_hashes[b_lo:b_hi], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            deleted.extend(range(a_lo + i1, a_lo + i2))
+        if tag in ('replace', 'insert'):
+            added.extend(range(b_lo + j1, b_lo + j2))
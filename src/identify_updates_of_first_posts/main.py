@@ -6,7 +6,6 @@ import difflib
 import logging
 import re
 from functools import lru_cache
-from typing import Iterator
 
 import requests
 from bs4 import BeautifulSoup
@@ -19,16 +18,18 @@ from _dependencies.common.commons import (
     setup_logging,
 )
 from _dependencies.common.misc import generate_random_function_id
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
 from _dependencies.common.pubsub import (
     Ctx,
     MessageForCheckFirstPosts,
+    coalesced_triggers,
     notify_admin,
     process_pubsub_message,
-    pubsub_compose_notifications,
 )
 from _dependencies.forum.content import clean_up_content_2
 
-from ._utils.database import DBClient, get_db_client
+from ._utils.database import DBClient, FirstPostVersion, get_db_client
+from ._utils.line_diff import diff_line_hashes, hash_lines
 
 setup_logging(__package__)
 
@@ -44,8 +45,15 @@ def compose_diff_message(curr_list: list[str], prev_list: list[str]) -> ChangeLo
     if not curr_list or not prev_list:
         return ChangeLogSavedValue.model_construct()
 
-    diff = difflib.unified_diff(prev_list, curr_list, lineterm='')
-    deletions, additions = _extract_changes(diff)
+    line_diff = diff_line_hashes(hash_lines(prev_list), hash_lines(curr_list))
+    deleted_lines = [prev_list[i] for i in line_diff.deleted]
+    added_lines = [curr_list[i] for i in line_diff.added]
+    return _compose_changes_message(deleted_lines, added_lines)
+
+
+def _compose_changes_message(deleted_lines: list[str], added_lines: list[str]) -> ChangeLogSavedValue:
+    deletions = _extract_changes(deleted_lines)
+    additions = _extract_changes(added_lines)
     message = _format_message(deletions, additions)
 
     return ChangeLogSavedValue.model_construct(
@@ -55,15 +63,11 @@ def compose_diff_message(curr_list: list[str], prev_list: list[str]) -> ChangeLo
     )
 
 
-def _extract_changes(diff: Iterator[str]) -> tuple[list[str], list[str]]:
-    deletions: list[str] = []
-    additions: list[str] = []
-    for line in diff:
-        if line[0] == '-':
-            _append_change(deletions, line)
-        elif line[0] == '+':
-            _append_change(additions, line)
-    return deletions, additions
+def _extract_changes(lines: list[str]) -> list[str]:
+    changes: list[str] = []
+    for line in lines:
+        _append_change(changes, line)
+    return changes
 
 
 def _append_change(change_list: list[str], line: str) -> None:
@@ -94,22 +98,38 @@ def _format_additions(additions: list[str]) -> str:
 
 
 def process_first_page_comparison(
-    db: DBClient, search_id: int, first_page_content_prev: str, first_page_content_curr: str
+    db: DBClient, search_id: int, prev_version: FirstPostVersion, curr_lines: list[str]
 ) -> ChangeLogSavedValue | None:
     """compare first post content to identify any diffs"""
 
     if not db.is_search_status_active(search_id):
         return None
 
-    prev_clean_content = clean_up_content_2(first_page_content_prev)
-    curr_clean_content = clean_up_content_2(first_page_content_curr)
-
-    message_schema = compose_diff_message(curr_clean_content, prev_clean_content)
+    if prev_version.line_hashes is None:
+        # previous version was saved before cleaned lines were stored – parse it the old way
+        prev_clean_content = clean_up_content_2(prev_version.content or '')
+        message_schema = compose_diff_message(curr_lines, prev_clean_content)
+    else:
+        message_schema = _compose_diff_message_from_stored_lines(db, prev_version, curr_lines)
 
     _notify_admin_if_no_changes(message_schema)
     return message_schema
 
 
+def _compose_diff_message_from_stored_lines(
+    db: DBClient, prev_version: FirstPostVersion, curr_lines: list[str]
+) -> ChangeLogSavedValue:
+    """diff by stored line hashes: only the text of deleted lines is fetched for the previous version"""
+
+    if not curr_lines or not prev_version.line_hashes:
+        return ChangeLogSavedValue.model_construct()
+
+    line_diff = diff_line_hashes(prev_version.line_hashes, hash_lines(curr_lines))
+    deleted_lines = db.get_page_lines(prev_version.id, line_diff.deleted)
+    added_lines = [curr_lines[i] for i in line_diff.added]
+    return _compose_changes_message(deleted_lines, added_lines)
+
+
 def _notify_admin_if_no_changes(message_schema: ChangeLogSavedValue) -> None:
     # case when there is only 1 line changed and the change is in one blank space or letter – we don't notify abt it
     if len(message_schema.deletions) != 1 or len(message_schema.additions) != 1:
@@ -176,13 +196,21 @@ def _process_one_update(
 ) -> None:
     # get the Current First Page Content
 
-    first_page_content_curr, first_page_content_prev = _get_actual_and_previous_page_content(db, search_id)
-    if not first_page_content_curr or not first_page_content_prev:
+    curr_lines = _get_actual_page_lines(db, search_id)
+    if not curr_lines:
         return
 
+    # get the Previous First Page Content
+    prev_version = db.get_previous_page_version(search_id)
+    if not prev_version:
+        logging.error(f'No previous content for first post of search {search_id}')
+        return
+
+    logging.info(f'topic id {search_id} has an update of first post')
+
     try:
         # check the difference b/w first posts for current and previous version
-        diff_message = process_first_page_comparison(db, search_id, first_page_content_prev, first_page_content_curr)
+        diff_message = process_first_page_comparison(db, search_id, prev_version, curr_lines)
         if not diff_message or not diff_message.message:
             return
 
@@ -193,17 +221,20 @@ def _process_one_update(
             ChangeType.topic_first_post_change,
         )
         change_log_ids.append(change_log_id)
+        log_pipeline_event(PipelineStage.change_logged, search_num=search_id, change_log_id=change_log_id)
 
     except Exception:
         logging.exception('[ide_posts]: Error fired during output_dict creation.')
         notify_admin('[ide_posts]: Error fired during output_dict creation.')
 
 
-def _get_actual_and_previous_page_content(db: DBClient, search_id: int) -> tuple[str, str]:
+def _get_actual_page_lines(db: DBClient, search_id: int) -> list[str]:
+    """clean up the actual first post and store its lines with hashes for comparison with the next versions"""
+
     first_page_content_curr, first_page_content_curr_compact = db.get_actual_page_content(search_id)
     if not first_page_content_curr:
         logging.error(f'No actual content for first post of search {search_id}')
-        return '', ''
+        return []
 
     # TODO: why we're doing it in this script but not in che_posts??
     # save compact first page content
@@ -211,17 +242,11 @@ def _get_actual_and_previous_page_content(db: DBClient, search_id: int) -> tuple
         content_compact = get_compressed_first_post(first_page_content_curr)
         db.save_compact_content(search_id, content_compact)
 
-    # get the Previous First Page Content
-    first_page_content_prev = db.get_previous_page_content(search_id)
-    if not first_page_content_prev:
-        logging.error(f'No previous content for first post of search {search_id}')
-        return '', ''
-
-    logging.info(f'topic id {search_id} has an update of first post:')
-    logging.info(f'first page content prev: {first_page_content_prev}')
     logging.info(f'first page content curr: {first_page_content_curr}')
 
-    return first_page_content_curr, first_page_content_prev
+    curr_lines = clean_up_content_2(first_page_content_curr)
+    db.save_actual_page_lines(search_id, curr_lines, hash_lines(curr_lines))
+    return curr_lines
 
 
 def main(event: dict, context: Ctx) -> str:  # noqa
@@ -244,9 +269,11 @@ def main(event: dict, context: Ctx) -> str:  # noqa
 
     db = get_db_client()
     change_log_ids: list[int] = []
-    for search_id in list_of_updated_searches:
-        _process_one_update(change_log_ids, db, search_id)
+    with coalesced_triggers(function_id) as triggers:
+        for search_id in list_of_updated_searches:
+            _process_one_update(change_log_ids, db, search_id)
 
-        pubsub_compose_notifications(function_id, '')
+            if change_log_ids:
+                triggers.compose_notifications('')
 
     return 'ok'
@@ -5,11 +5,12 @@ import logging
 
 from _dependencies.common.commons import get_app_config, setup_logging
 from _dependencies.common.misc import generate_random_function_id
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
 from _dependencies.common.pubsub import (
     Ctx,
     MessageForIdentifyUpdatesOfTopics,
+    coalesced_triggers,
     process_pubsub_message,
-    pubsub_compose_notifications,
 )
 
 from ._utils.database import get_db_client
@@ -35,13 +36,16 @@ def main(event: dict[str, bytes], context: Ctx) -> None:  # noqa
     change_log_ids: list[int] = []
 
     search_updater = SearchUpdater(get_db_client(), ForumClient())
-    for topic_id in changed_topics.root:
-        logging.info(f'start checking if search {topic_id} has any updates')
+    with coalesced_triggers(function_id) as triggers:
+        for topic_id in changed_topics.root:
+            logging.info(f'start checking if search {topic_id} has any updates')
 
-        one_folder_change_log_ids = search_updater.update_search(topic_id)
-        change_log_ids.extend(one_folder_change_log_ids)
+            one_folder_change_log_ids = search_updater.update_search(topic_id)
+            for change_log_id in one_folder_change_log_ids:
+                log_pipeline_event(PipelineStage.change_logged, search_num=topic_id, change_log_id=change_log_id)
+            change_log_ids.extend(one_folder_change_log_ids)
 
-    logging.info(f"Here's a list of change_log ids created: {change_log_ids}")
+            if change_log_ids:
+                triggers.compose_notifications("let's compose notifications")
 
-    if change_log_ids:
-        pubsub_compose_notifications(function_id, "let's compose notifications")
+        logging.info(f"Here's a list of change_log ids created: {change_log_ids}")
@@ -0,0 +1,49 @@
+"""Non-blocking access to ``UserRepository`` from the async handlers of the MAX bot.
+
+The repository is synchronous (SQLAlchemy + psycopg2), so every call is run
+in a thread pool and awaited: the event loop keeps serving other users while
+a query waits for the DB. The pool has as many threads as the SQLAlchemy pool
+has connections — more threads would only wait for a free connection.
+
+One repository and one executor are shared by all handlers of the instance.
+A unit of work spans one ``run_db`` call, not a whole handler: a handler keeps
+the connection only while it runs queries, not while it awaits the MAX API.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, ParamSpec, TypeVar
+
+from _dependencies.common.commons import get_app_config
+from _dependencies.user_repository import UserRepository
+
+P = ParamSpec('P')
+T = TypeVar('T')
+
+
+@functools.lru_cache
+def db() -> UserRepository:
+    return UserRepository()
+
+
+@functools.lru_cache
+def _executor() -> ThreadPoolExecutor:
+    config = get_app_config()
+    return ThreadPoolExecutor(max_workers=config.db_pool_size + config.db_max_overflow, thread_name_prefix='max_bot_db')
+
+
+async def run_db(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """Await ``func(*args, **kwargs)`` run in the DB thread pool.
+
+    ``func`` is a repository method or a helper making several DB calls —
+    helpers take one thread hop instead of one per query, and their calls
+    share one connection and transaction.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), functools.partial(_in_unit_of_work, func, *args, **kwargs))
+
+
+def _in_unit_of_work(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    with db().unit_of_work():
+        return func(*args, **kwargs)
@@ -7,6 +7,10 @@ Dialog state (FSM) is persisted in PostgreSQL via ``DialogStateMixin``
 (shared with Telegram and VK bots), so state survives Yandex Cloud Function
 cold starts and container instance switches.
 
+The repository is synchronous: handlers await its calls through
+:func:`~max_bot._utils.database.run_db`, so a query does not block the event
+loop for the other users.
+
 Flow:
     1. ``bot_started`` / ``/start`` → register user → show main menu
     2. Main menu buttons → region / radius / coords sub-menus
@@ -39,8 +43,8 @@ from _dependencies.common.geo import (
     CMD_PAGINATE_TOGGLE,
 )
 from _dependencies.models import DialogState
-from _dependencies.user_repository import UserRepository
 
+from .database import db, run_db
 from .keyboards import MaxKeyboardPresets
 from .message_formatter import (
     COORDS_DELETED,
@@ -131,19 +135,13 @@ class DBStateFilter(BaseFilter):
         user_id = event.message.sender.user_id if event.message.sender else None
         if user_id is None:
             return False
-        db = UserRepository()
-        current_state = db.get_user_state(user_id)
+        current_state = await run_db(db().get_user_state, user_id)
         return current_state == self._state
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────
 
 
-def _get_db() -> UserRepository:
-    """Get a UserRepository instance (lazy, uses AppConfig)."""
-    return UserRepository()
-
-
 def _get_user_id(event: MessageCreated | MessageCallback) -> int | None:
     """Extract user_id from a message or callback event."""
     if isinstance(event, MessageCreated):
@@ -171,6 +169,9 @@ def _parse_payload(payload_str: str | None) -> dict[str, Any]:
         return {}
 
 
+# The helpers below make blocking DB calls: handlers run them via ``run_db``.
+
+
 def _ensure_user_registered(user_id: int) -> bool:
     """Register user if new. Returns True if freshly registered.
 
@@ -179,18 +180,18 @@ def _ensure_user_registered(user_id: int) -> bool:
     /start (e.g., send arbitrary text or location right away) can save
     settings without a corresponding record in the ``users`` table.
     """
-    db = _get_db()
-    is_new = db.check_if_new_user(user_id)
+    repository = db()
+    is_new = repository.check_if_new_user(user_id)
     if is_new:
-        db.register_user(user_id, Messenger.MAX)
-        db.save_default_topic_types(user_id, None)
+        repository.register_user(user_id, Messenger.MAX)
+        repository.save_default_topic_types(user_id, None)
         logger.info('Registered new user %s via ensure_user_registered', user_id)
     return is_new
 
 
 def _notifications_disabled(user_id: int) -> bool:
     """Return whether the user explicitly unsubscribed from notifications."""
-    return _get_db().get_user_status(user_id) == 'unsubscribed'
+    return db().get_user_status(user_id) == 'unsubscribed'
 
 
 def _main_menu_for_user(user_id: int) -> AttachmentButton:
@@ -200,16 +201,13 @@ def _main_menu_for_user(user_id: int) -> AttachmentButton:
 
 def _get_regions_for_district(district: str) -> list[tuple[int, str]]:
     """Get (folder_id, display_name) list for a federal district."""
-    db = _get_db()
-    return db.get_geo_folders_by_district(district)
+    return db().get_geo_folders_by_district(district)
 
 
 def _get_subscribed_region_names(user_id: int) -> set[str]:
     """Get set of region display names the user is subscribed to."""
-    db = _get_db()
-    subscribed_folder_ids = set(db.get_user_regions(user_id))
-    all_folders = db.get_geo_folders()
-    return {name for fid, name in all_folders if fid in subscribed_folder_ids}
+    repository = db()
+    return repository.get_geo_reference().region_names(repository.get_user_regions(user_id))
 
 
 # ─── Registration & Main Menu ────────────────────────────────────────────
@@ -234,7 +232,7 @@ async def on_bot_started(event: BotStarted) -> None:
         await bot.send_message(
             chat_id=chat_id,
             text=WELCOME_TEXT,
-            attachments=[_main_menu_for_user(user_id)],  # type: ignore[arg-type]
+            attachments=[await run_db(_main_menu_for_user, user_id)],  # type: ignore[arg-type]
         )
     except Exception:
         logger.exception('Error in bot_started for user %s', user_id)
@@ -254,7 +252,7 @@ async def on_start(event: MessageCreated) -> None:
     try:
         await event.message.answer(
             text=WELCOME_TEXT,
-            attachments=[_main_menu_for_user(user_id)],
+            attachments=[await run_db(_main_menu_for_user, user_id)],
         )
     except Exception:
         logger.exception('Error in /start for user %s', user_id)
@@ -270,7 +268,7 @@ async def on_back_to_main(event: MessageCallback) -> None:
     await event.ack(notification='...')
     await event.edit(
         text=MAIN_MENU_TEXT,
-        attachments=[_main_menu_for_user(event.callback.user.user_id)],
+        attachments=[await run_db(_main_menu_for_user, event.callback.user.user_id)],
     )
 
 
@@ -311,8 +309,7 @@ async def on_disable_notifications(event: MessageCallback) -> None:
     if user_id is None:
         return
 
-    db = _get_db()
-    db.update_user_status(user_id, ManageUserAction.unsubscribe_user)
+    await run_db(db().update_user_status, user_id, ManageUserAction.unsubscribe_user)
     await event.ack(notification='...')
     await event.edit(
         text=NOTIFICATIONS_DISABLED,
@@ -327,8 +324,7 @@ async def on_enable_notifications(event: MessageCallback) -> None:
     if user_id is None:
         return
 
-    db = _get_db()
-    db.update_user_status(user_id, ManageUserAction.subscribe_user)
+    await run_db(db().update_user_status, user_id, ManageUserAction.subscribe_user)
     await event.ack(notification='...')
     await event.edit(
         text=NOTIFICATIONS_ENABLED,
@@ -346,13 +342,13 @@ async def on_district_select(event: MessageCallback) -> None:
     district = payload.get('district', '')
     logger.info('District selected: %s', district)
 
-    regions = _get_regions_for_district(district)
+    regions = await run_db(_get_regions_for_district, district)
     if not regions:
         await event.ack(notification='В этом округе пока нет доступных регионов.')
         return
 
     user_id = _get_user_id(event)
-    subscribed_names = _get_subscribed_region_names(user_id) if user_id else set()
+    subscribed_names = await run_db(_get_subscribed_region_names, user_id) if user_id else set()
 
     region_names = [name for _fid, name in regions]
 
@@ -382,10 +378,10 @@ async def on_paginate_nav(event: MessageCallback) -> None:
 
     user_id = _get_user_id(event)
 
-    regions = _get_regions_for_district(district)
+    regions = await run_db(_get_regions_for_district, district)
     region_names = [name for _fid, name in regions]
 
-    subscribed_names = _get_subscribed_region_names(user_id) if user_id else set()
+    subscribed_names = await run_db(_get_subscribed_region_names, user_id) if user_id else set()
 
     await event.ack(notification='...')
     await event.edit(
@@ -417,42 +413,33 @@ async def on_paginate_toggle(event: MessageCallback) -> None:
         await event.ack(notification='Ошибка: не удалось определить регион.')
         return
 
-    db = _get_db()
-
-    # Build folder_dict: region_name -> (folder_id, ...).
-    # Use ALL geo folders (not the grouped district list) because a display
-    # name can map to multiple folder IDs (e.g., Москва и МО – Завершенные
-    # поиски has folder_ids 411, 412, 415).  Toggling MUST cover all of
-    # them to avoid stale checkmarks.
-    all_folders = db.get_geo_folders()
-    folder_dict: dict[str, tuple[int, ...]] = {}
-    for fid, name in all_folders:
-        if name:
-            folder_dict[name] = folder_dict.get(name, ()) + (fid,)
+    # folder_dict: region_name -> (folder_id, ...) over ALL geo folders (not
+    # the grouped district list) because a display name can map to multiple
+    # folder IDs (e.g., Москва и МО – Завершенные поиски has folder_ids 411,
+    # 412, 415).  Toggling MUST cover all of them to avoid stale checkmarks.
+    reference = await run_db(db().get_geo_reference)
+    folder_dict = reference.folder_ids_by_name
 
     # Keep the district-scoped list for keyboard building
-    regions = _get_regions_for_district(district)
+    regions = await run_db(_get_regions_for_district, district)
 
     try:
-        success = db.toggle_region_by_name(user_id, region_name, folder_dict)
+        success = await run_db(db().toggle_region_by_name, user_id, region_name, folder_dict)
     except Exception:
         logger.exception('Error toggling region for user %s', user_id)
         await event.ack(notification=INTERNAL_ERROR)
         return
 
+    subscribed_names = await run_db(_get_subscribed_region_names, user_id)
     if not success:
         await event.ack(notification=REGION_CANNOT_REMOVE_LAST)
+    elif region_name in subscribed_names:
+        await event.ack(notification=REGION_TOGGLED_ON)
     else:
-        # Determine if subscribed or unsubscribed
-        subscribed_names = _get_subscribed_region_names(user_id)
-        if region_name in subscribed_names:
-            await event.ack(notification=REGION_TOGGLED_ON)
-        else:
-            await event.ack(notification=REGION_TOGGLED_OFF)
+        await event.ack(notification=REGION_TOGGLED_OFF)
 
     # Refresh the keyboard
     region_names = [name for _fid, name in regions]
-    subscribed_names = _get_subscribed_region_names(user_id)
 
     await event.edit(
         text=REGION_LIST_PROMPT,
@@ -476,7 +463,7 @@ async def on_paginate_finish(event: MessageCallback) -> None:
         return
     await event.edit(
         text=MAIN_MENU_TEXT,
-        attachments=[_main_menu_for_user(user_id)],
+        attachments=[await run_db(_main_menu_for_user, user_id)],
     )
 
 
@@ -492,8 +479,7 @@ async def on_radius_set(event: MessageCallback) -> None:
 
     # Set DB-persisted dialog state (reuses existing radius_input state)
     if user_id is not None:
-        db = _get_db()
-        db.set_user_state(user_id, DialogState.radius_input)
+        await run_db(db().set_user_state, user_id, DialogState.radius_input)
         logger.info('Set DB state radius_input for user %s', user_id)
 
     await event.edit(
@@ -507,8 +493,7 @@ async def on_radius_view(event: MessageCallback) -> None:
     """Show current radius."""
     user_id = _get_user_id(event)
     if user_id:
-        db = _get_db()
-        radius = db.get_radius(user_id)
+        radius = await run_db(db().get_radius, user_id)
         if radius:
             text = RADIUS_VIEW_TEXT.format(radius)
         else:
@@ -528,8 +513,7 @@ async def on_radius_delete(event: MessageCallback) -> None:
     """Delete current radius."""
     user_id = _get_user_id(event)
     if user_id:
-        db = _get_db()
-        db.delete_radius(user_id)
+        await run_db(db().delete_radius, user_id)
 
     await event.ack(notification=RADIUS_DELETED)
     await event.edit(
@@ -549,8 +533,7 @@ async def on_coords_enter(event: MessageCallback) -> None:
     await event.ack(notification='...')
 
     if user_id is not None:
-        db = _get_db()
-        db.set_user_state(user_id, DialogState.input_of_coords_man)
+        await run_db(db().set_user_state, user_id, DialogState.input_of_coords_man)
         logger.info('Set DB state input_of_coords_man for user %s', user_id)
 
     await event.edit(
@@ -564,8 +547,7 @@ async def on_coords_view(event: MessageCallback) -> None:
     """Show current coordinates."""
     user_id = _get_user_id(event)
     if user_id:
-        db = _get_db()
-        coords = db.get_coordinates(user_id)
+        coords = await run_db(db().get_coordinates, user_id)
         if coords:
             lat, lng = coords
             text = COORDS_VIEW_TEXT.format(lat, lng)
@@ -586,8 +568,7 @@ async def on_coords_delete(event: MessageCallback) -> None:
     """Delete current coordinates."""
     user_id = _get_user_id(event)
     if user_id:
-        db = _get_db()
-        db.delete_coordinates(user_id)
+        await run_db(db().delete_coordinates, user_id)
 
     await event.ack(notification=COORDS_DELETED)
     await event.edit(
@@ -618,8 +599,7 @@ async def on_radius_text(event: MessageCreated) -> None:
     text = body.text.strip()
 
     # Clear DB state
-    db = _get_db()
-    db.clear_user_state(user_id)
+    await run_db(db().clear_user_state, user_id)
 
     # Validate: must be integer 1-1000
     try:
@@ -633,7 +613,7 @@ async def on_radius_text(event: MessageCreated) -> None:
         )
         return
 
-    db.save_radius(user_id, radius)
+    await run_db(db().save_radius, user_id, radius)
     logger.info('User %s set radius to %s km', user_id, radius)
 
     await event.message.answer(
@@ -667,8 +647,7 @@ async def on_coords_text(event: MessageCreated) -> None:
     text = body.text.strip()
 
     # Clear DB state
-    db = _get_db()
-    db.clear_user_state(user_id)
+    await run_db(db().clear_user_state, user_id)
 
     # Parse "lat, lng" format
     parts = text.replace(';', ',').split(',')
@@ -697,7 +676,7 @@ async def on_coords_text(event: MessageCreated) -> None:
         )
         return
 
-    db.save_coordinates(user_id, lat, lng)
+    await run_db(db().save_coordinates, user_id, lat, lng)
     logger.info('User %s set coordinates: %s, %s', user_id, lat, lng)
 
     await event.message.answer(
@@ -736,13 +715,12 @@ async def on_geo_location(event: MessageCreated) -> None:
     if location is None:
         # Has attachments but not a location — could be an image, etc.
         # If user is in a DB dialog state, clear it and show menu
-        db = _get_db()
-        current_state = db.get_user_state(user_id)
+        current_state = await run_db(db().get_user_state, user_id)
         if current_state is not None and current_state != DialogState.not_defined:
-            db.clear_user_state(user_id)
+            await run_db(db().clear_user_state, user_id)
             await event.message.answer(
                 text=FSM_CANCELLED,
-                attachments=[_main_menu_for_user(user_id)],
+                attachments=[await run_db(_main_menu_for_user, user_id)],
             )
         return
 
@@ -757,10 +735,9 @@ async def on_geo_location(event: MessageCreated) -> None:
         return
 
     # Clear any DB dialog state
-    db = _get_db()
-    db.clear_user_state(user_id)
+    await run_db(db().clear_user_state, user_id)
 
-    db.save_coordinates(user_id, lat, lng)
+    await run_db(db().save_coordinates, user_id, lat, lng)
     logger.info('User %s set coordinates via geo: %s, %s', user_id, lat, lng)
 
     await event.message.answer(
@@ -786,17 +763,16 @@ async def on_unknown_text(event: MessageCreated) -> None:
         return
 
     # Check if user is in a DB dialog state
-    db = _get_db()
-    current_state = db.get_user_state(user_id)
+    current_state = await run_db(db().get_user_state, user_id)
     if current_state is not None and current_state != DialogState.not_defined:
-        db.clear_user_state(user_id)
+        await run_db(db().clear_user_state, user_id)
         await event.message.answer(
             text=FSM_CANCELLED,
-            attachments=[_main_menu_for_user(user_id)],
+            attachments=[await run_db(_main_menu_for_user, user_id)],
         )
         return
 
     await event.message.answer(
         text=UNKNOWN_COMMAND,
-        attachments=[_main_menu_for_user(user_id)],
+        attachments=[await run_db(_main_menu_for_user, user_id)],
     )
@@ -23,6 +23,8 @@ against ``MAX_BOT_WEBHOOK_SECRET`` env var using constant-time comparison.
 
 Dialog state is persisted in PostgreSQL via ``DialogStateMixin``
 (shared with Telegram and VK bots), not in maxapi's in-memory FSM.
+DB calls are awaited in a thread pool (``_utils/database.py``), so the
+concurrent events of the warm instance do not wait for each other's queries.
 """
 
 import logging
@@ -39,6 +41,7 @@ from _dependencies.common.misc import (
 )
 
 from ._utils import handlers
+from ._utils.database import db, run_db
 
 setup_logging(__package__)
 
@@ -134,7 +137,7 @@ async def _handle_webhook_async(event_json: dict) -> None:
     # Previously each handler called _ensure_user_registered() individually.
     user_id = _extract_user_id(event_json)
     if user_id is not None:
-        handlers._ensure_user_registered(user_id)
+        await run_db(handlers._ensure_user_registered, user_id)
 
     event_object = await process_update_webhook(event_json=event_json, bot=_bot)
     if event_object is None:
@@ -180,5 +183,8 @@ async def main(request: RequestWrapper, *args: object, **kwargs: object) -> Resp
     except Exception:
         logger.exception('Error processing MAX webhook event')
         return ResponseWrapper(data='Internal Server Error', status_code=500)
+    finally:
+        # the instance is frozen after the answer, the buffer would not be flushed until the next request
+        await run_db(db().flush_dialog_history)
 
     return ResponseWrapper(data='ok', status_code=200)
@@ -8,6 +8,7 @@ import sqlalchemy
 
 from _dependencies.common.commons import Messenger
 from _dependencies.common.db_client import DBClientBase
+from _dependencies.common.partitions import DBPartitionsMixin
 
 MESSAGES_BATCH_SIZE = 100
 
@@ -30,18 +31,21 @@ class MessageToSend:
     max_id: str | None = None
 
 
-class DBClient(DBClientBase):
+class DBClient(DBClientBase, DBPartitionsMixin):
     """DB client for send_notifications."""
 
     def get_notifs_to_send(self, select_doubling: bool) -> list[MessageToSend]:
         """Return notifications which should be sent, as MessageToSend objects."""
+        unarchived_change_log_id = self.get_unarchived_change_log_id()
         with self.connect() as conn:
+            # the condition on change_log_id prunes the partitions of old change_log records
             duplicated_notifications_query = """
                 SELECT
                     change_log_id, user_id, message_type, COALESCE(messenger, 'telegram')
                 FROM
                     notif_by_user
                 WHERE
+                    (change_log_id >= :unarchived_change_log_id OR change_log_id IS NULL) AND
                     completed IS NULL AND
                     cancelled IS null
                 GROUP BY change_log_id, user_id, message_type, COALESCE(messenger, 'telegram')
@@ -65,6 +69,7 @@ class DBClient(DBClientBase):
                 FROM
                     notif_by_user
                 WHERE
+                    (change_log_id >= :unarchived_change_log_id OR change_log_id IS NULL) AND
                     completed IS NULL AND
                     cancelled IS NULL AND
                     (failed IS NULL OR failed < :retry_delay) AND
@@ -85,6 +90,7 @@ class DBClient(DBClientBase):
                     stmt,
                     dict(
                         retry_delay=datetime.datetime.now() - delay_to_retry_send_failed_messages,
+                        unarchived_change_log_id=unarchived_change_log_id,
                     ),
                 ).fetchall()
             ]
@@ -135,6 +141,7 @@ class DBClient(DBClientBase):
 
     def check_for_number_of_notifs_to_send(self) -> int:
         """Return a number of notifications to be sent."""
+        unarchived_change_log_id = self.get_unarchived_change_log_id()
         with self.connect() as conn:
             stmt = sqlalchemy.text("""
                 WITH notification AS (
@@ -143,6 +150,7 @@ class DBClient(DBClientBase):
                 FROM
                     notif_by_user
                 WHERE
+                    (change_log_id >= :unarchived_change_log_id OR change_log_id IS NULL) AND
                     completed IS NULL AND
                     cancelled IS NULL
                 )
@@ -153,11 +161,13 @@ class DBClient(DBClientBase):
                     notification
                 /*action='check_for_number_of_notifs_to_send' */
             """)
-            res = conn.execute(stmt).fetchone()
+            res = conn.execute(stmt, dict(unarchived_change_log_id=unarchived_change_log_id)).fetchone()
             return int(res[0]) if res else 0
 
-    def save_sending_status_to_notif_by_user(self, message_id: int, result: str | None) -> None:
-        """Save the sending status to notif_by_user."""
+    def save_sending_status_to_notif_by_user(
+        self, message_id: int, change_log_id: int | None, result: str | None
+    ) -> None:
+        """Save the sending status to notif_by_user; change_log_id narrows the update to one partition."""
         if not result:
             result = 'failed'
 
@@ -173,10 +183,11 @@ class DBClient(DBClientBase):
             stmt = sqlalchemy.text(f"""
                 UPDATE notif_by_user
                 SET {result} = :now
-                WHERE message_id = :message_id;
+                WHERE message_id = :message_id
+                    AND change_log_id {'IS NULL' if change_log_id is None else '= :change_log_id'};
                 /*action='save_sending_status_to_notif_by_user_{result}' */
             """)
-            conn.execute(stmt, dict(now=datetime.datetime.now(), message_id=message_id))
+            conn.execute(stmt, dict(now=datetime.datetime.now(), message_id=message_id, change_log_id=change_log_id))
 
     def get_change_log_update_time(self, change_log_id: int) -> datetime.datetime | None:
         """Get the time of parsing of the change, saved in PSQL."""
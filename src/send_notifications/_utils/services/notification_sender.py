@@ -10,6 +10,7 @@ from typing import Any
 
 from _dependencies.common.commons import Messenger
 from _dependencies.common.message_params import MessageParams
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
 from _dependencies.common.pubsub import notify_admin, pubsub_send_notifications
 from send_notifications._utils.clients.max_notificator import MaxNotificator
 from send_notifications._utils.clients.telegram_notificator import TelegramNotificator
@@ -165,10 +166,14 @@ class NotificationSender:
         analytics_send_start_finish = seconds_between_round_2(analytics_pre_sending_msg)
         logging.debug(f'time: {analytics_send_start_finish:.2f} – sending msg')
 
-        self._db_client.save_sending_status_to_notif_by_user(message_to_send.message_id, result)
+        self._db_client.save_sending_status_to_notif_by_user(
+            message_to_send.message_id, message_to_send.change_log_id, result
+        )
 
         if result == 'completed':
             self._process_logs_with_completed_sending(time_analytics, message_to_send, change_log_upd_time)
+            if message_to_send.change_log_id not in set_of_change_ids:
+                log_pipeline_event(PipelineStage.sent, change_log_id=message_to_send.change_log_id)
             set_of_change_ids.add(message_to_send.change_log_id)
 
         analytics_sm_duration = seconds_between(analytics_sm_start)
@@ -198,7 +203,9 @@ class NotificationSender:
                     f'for key cl={message.change_log_id} type={message.message_type} '
                     f'uid={message.user_id} msgr={message.messenger}'
                 )
-                self._db_client.save_sending_status_to_notif_by_user(message.message_id, 'cancelled_due_to_doubling')
+                self._db_client.save_sending_status_to_notif_by_user(
+                    message.message_id, message.change_log_id, 'cancelled_due_to_doubling'
+                )
             else:
                 seen_keys.add(key)
                 logging.info(
@@ -16,6 +16,7 @@ import sqlalchemy
 
 from _dependencies.bot.users_management import save_onboarding_step
 from _dependencies.common.commons import get_app_config, sqlalchemy_get_pool
+from _dependencies.common.db_client import transaction
 from _dependencies.user_repository import UserRepository
 
 from .common import VKHandlerContext, get_invite_from_message
@@ -41,8 +42,7 @@ def register_vk_only_user(vk_user_id: int, vk_user_name: str | None = None) -> i
         The new ``internal_user_id``.
     """
 
-    pool = sqlalchemy_get_pool()
-    with pool.begin() as conn:
+    with transaction(sqlalchemy_get_pool()) as conn:
         # 1. Generate a new internal_user_id from the users sequence
         result = conn.execute(sqlalchemy.text("SELECT nextval('users_id_seq'::regclass)"))
         internal_user_id = result.scalar()
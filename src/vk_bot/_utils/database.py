@@ -1,13 +1,14 @@
 """VK bot DB client composed from consolidated domain-specific mixins.
 
-All mixins are now imported from ``_dependencies.user_repository``.
-The local mixin files in ``mixins/`` are kept for backward compatibility
-during the transition period and will be removed in a future cleanup.
+User data mixins are imported from ``_dependencies.user_repository``;
+``CallbackEventMixin`` serves the callback endpoint only and lives here.
 """
 
 from functools import lru_cache
 
-from _dependencies.common.db_client import DBClientBase
+import sqlalchemy
+
+from _dependencies.common.db_client import DBClientBase, DBClientMixinBase
 from _dependencies.user_repository import (
     AgePrefMixin,
     DialogHistoryMixin,
@@ -25,6 +26,39 @@ from _dependencies.user_repository import (
 )
 
 
+class CallbackEventMixin(DBClientMixinBase):
+    """Keys of received VK callback events, shared by all function instances."""
+
+    def claim_callback_event(self, event_key: str) -> bool:
+        """Record the event as received; False if it was received before"""
+        with self.connect() as connection:
+            stmt = sqlalchemy.text("""
+                INSERT INTO vk_callback_events (event_key)
+                VALUES (:event_key)
+                ON CONFLICT (event_key) DO NOTHING;
+            """)
+            return connection.execute(stmt, dict(event_key=event_key)).rowcount == 1
+
+    def release_callback_event(self, event_key: str) -> None:
+        """Forget the event, so that its resend is handled"""
+        with self.connect() as connection:
+            stmt = sqlalchemy.text('DELETE FROM vk_callback_events WHERE event_key = :event_key;')
+            connection.execute(stmt, dict(event_key=event_key))
+
+    def delete_expired_callback_events(self, ttl_seconds: int, batch_size: int) -> int:
+        """Delete at most batch_size keys received more than ttl_seconds ago"""
+        with self.connect() as connection:
+            stmt = sqlalchemy.text("""
+                DELETE FROM vk_callback_events
+                WHERE event_key IN (
+                    SELECT event_key FROM vk_callback_events
+                    WHERE received_at < now() - make_interval(secs => :ttl_seconds)
+                    LIMIT :batch_size
+                );
+            """)
+            return connection.execute(stmt, dict(ttl_seconds=ttl_seconds, batch_size=batch_size)).rowcount
+
+
 class DBClient(
     DBClientBase,
     VKIdentityMixin,
@@ -40,6 +74,7 @@ class DBClient(
     SystemRoleMixin,
     DialogHistoryMixin,
     SettingsSummaryMixin,
+    CallbackEventMixin,
 ):
     """VK bot DB client composed from consolidated domain-specific mixins.
 
@@ -0,0 +1,112 @@
+"""Deduplication stores of the VK callback endpoint.
+
+VK resends an event that was not answered in time. The dispatcher claims the key of
+every event in a store, and an event whose key is already claimed is not handled.
+
+- :class:`InMemoryDedupStore` — keys of one function instance; a cold start or a
+  parallel instance does not see them.
+- :class:`PostgresDedupStore` — keys in the ``vk_callback_events`` table, shared by all
+  instances, with an in-memory store in front of it for resends to the same instance.
+
+Keys are kept for ``ttl_seconds``: VK stops resending an event after a few attempts,
+so an older key is never claimed again. Expired keys are removed in batches, not on
+every claim.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+from .database import DBClient
+
+DEDUP_TTL_SECONDS = 24 * 60 * 60
+MEMORY_STORE_MAX_SIZE = 10_000
+DB_CLEANUP_INTERVAL_SECONDS = 5 * 60
+DB_CLEANUP_BATCH_SIZE = 10_000
+
+
+class EventDedupStore(Protocol):
+    def claim(self, event_key: str) -> bool:
+        """Record the event key; False if it was claimed before"""
+        ...
+
+    def release(self, event_key: str) -> None:
+        """Forget the key, so that a resend of the event is handled"""
+        ...
+
+
+class InMemoryDedupStore:
+    def __init__(self, ttl_seconds: float = DEDUP_TTL_SECONDS, max_size: int = MEMORY_STORE_MAX_SIZE) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_size = max_size
+        self._expires_at: OrderedDict[str, float] = OrderedDict()  # in the order of claims
+        self._lock = threading.Lock()
+
+    def claim(self, event_key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if event_key in self._expires_at:
+                return False
+            self._expires_at[event_key] = now + self._ttl_seconds
+            if len(self._expires_at) > self._max_size:
+                self._expires_at.popitem(last=False)
+            return True
+
+    def release(self, event_key: str) -> None:
+        """Forget the key, so that a resend of the event is handled"""
+        with self._lock:
+            self._expires_at.pop(event_key, None)
+
+    def _expire(self, now: float) -> None:
+        """drop the expired keys from the front; every key is dropped once"""
+        while self._expires_at:
+            oldest_key, expires_at = next(iter(self._expires_at.items()))
+            if expires_at > now:
+                return
+            del self._expires_at[oldest_key]
+
+
+class PostgresDedupStore:
+    def __init__(
+        self,
+        db: DBClient,
+        ttl_seconds: int = DEDUP_TTL_SECONDS,
+        cleanup_interval_seconds: float = DB_CLEANUP_INTERVAL_SECONDS,
+    ) -> None:
+        self._db = db
+        self._ttl_seconds = ttl_seconds
+        self._cleanup_interval_seconds = cleanup_interval_seconds
+        self._local = InMemoryDedupStore(ttl_seconds)
+        self._next_cleanup = time.monotonic()
+        self._lock = threading.Lock()
+
+    def claim(self, event_key: str) -> bool:
+        if not self._local.claim(event_key):
+            return False
+        try:
+            claimed = self._db.claim_callback_event(event_key)
+        except Exception:
+            # the event is not handled, VK resends it
+            self._local.release(event_key)
+            raise
+        self._cleanup_if_due()
+        return claimed
+
+    def release(self, event_key: str) -> None:
+        self._local.release(event_key)
+        self._db.release_callback_event(event_key)
+
+    def _cleanup_if_due(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_cleanup:
+                return
+            self._next_cleanup = now + self._cleanup_interval_seconds
+        try:
+            deleted = self._db.delete_expired_callback_events(self._ttl_seconds, DB_CLEANUP_BATCH_SIZE)
+            logging.info(f'Deleted {deleted} expired VK callback events')
+        except Exception:
+            logging.exception('Failed to delete expired VK callback events')
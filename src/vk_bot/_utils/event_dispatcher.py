@@ -5,6 +5,18 @@ The dispatcher handles three stages:
 2. Deduplicate (VK may resend events on timeout)
 3. Route to the appropriate handler based on event_type
 
+The DB calls of one handled event share a connection and a transaction
+(:meth:`DBClientBase.unit_of_work`).
+
+With ``vk_fast_ack`` user events are answered with 'ok' at once and handled by
+:class:`event_queue.UserOrderedQueue` — VK does not wait for the handler chain
+and does not resend slow events. This needs a process that keeps running after
+the answer, e.g. a long-lived HTTP server. vk-bot is deployed as a Yandex Cloud
+Function, whose instance is frozen once the handler returns: the queue would stall
+and the events already answered 'ok' would be lost when the instance is reclaimed.
+So the function entry point (``vk_bot.main.main``) drains the queue before
+returning, and the answer is not sent earlier there.
+
 Event types:
 - ``confirmation`` — VK server handshake (synchronous, returns confirmation code)
 - ``message_new`` — new user message → :func:`message_processing.handle_new_message`
@@ -13,13 +25,14 @@ Event types:
 """
 
 import logging
-import time
-from collections import OrderedDict
 from typing import Callable
 
 from _dependencies.common.commons import get_app_config
 
 from .common import VKMessage
+from .database import db
+from .event_dedup import EventDedupStore, InMemoryDedupStore, PostgresDedupStore
+from .event_queue import EventQueueFullError, UserOrderedQueue
 from .handler_chain import handle_unknown  # noqa: F401 — re-exported via dispatcher
 from .message_processing import handle_callback_event, handle_new_message
 from .message_sending import vk_sender
@@ -37,10 +50,11 @@ class VKEventDispatcher:
     и возвращает код подтверждения, а не 'ok'.
     """
 
-    _EVENT_CACHE_MAX_SIZE = 1000
+    _DEFERRED_EVENT_TYPES = {'message_new', 'message_event'}
 
-    def __init__(self) -> None:
-        self._event_cache: OrderedDict[str, float] = OrderedDict()
+    def __init__(self, dedup_store: EventDedupStore | None = None) -> None:
+        self._dedup_store = dedup_store
+        self._queue: UserOrderedQueue | None = None
         self._handlers: dict[str, Callable[[dict], str]] = {
             'message_new': self._handle_message_new,
             'message_edit': self._handle_message_edit,
@@ -60,15 +74,45 @@ class VKEventDispatcher:
             logging.warning(f'VK event without object: {raw_event}')
             return 'ok'
 
-        if self._is_duplicate(event_type, event_object):
+        event_key = _get_event_key(raw_event, event_type, event_object)
+        if self._is_duplicate(event_key):
             return 'ok'
 
         handler = self._handlers.get(event_type)
-        if handler is not None:
-            return handler(event_object)
+        if handler is None:
+            logging.debug(f'Unhandled VK event type: {event_type}')
+            return 'ok'
 
-        logging.debug(f'Unhandled VK event type: {event_type}')
-        return 'ok'
+        if event_type in self._DEFERRED_EVENT_TYPES and get_app_config().vk_fast_ack:
+            user_id = _get_user_id(event_type, event_object)
+            try:
+                self._get_queue().submit(user_id, handler, event_object, get_app_config().vk_ack_queue_timeout)
+            except EventQueueFullError:
+                # the request fails, the resent event must not be taken for a duplicate
+                if event_key:
+                    self._get_dedup_store().release(event_key)
+                raise
+            return 'ok'
+        return handler(event_object)
+
+    def join(self) -> None:
+        """Wait for the events handled in background; for tests and graceful shutdown"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _get_dedup_store(self) -> EventDedupStore:
+        if self._dedup_store is None:
+            if get_app_config().vk_dedup_backend == 'memory':
+                self._dedup_store = InMemoryDedupStore()
+            else:
+                self._dedup_store = PostgresDedupStore(db())
+        return self._dedup_store
+
+    def _get_queue(self) -> UserOrderedQueue:
+        if self._queue is None:
+            config = get_app_config()
+            self._queue = UserOrderedQueue(config.vk_ack_workers, config.vk_ack_queue_size)
+        return self._queue
 
     def _handle_confirmation(self, raw_event: dict) -> str:
         """Handle VK Callback API confirmation handshake.
@@ -84,30 +128,19 @@ class VKEventDispatcher:
         logging.warning(f'Unexpected group_id in confirmation: {raw_event.get("group_id")}')
         return 'ok'
 
-    def _is_duplicate(self, event_type: str, event_object: dict) -> bool:
+    def _is_duplicate(self, event_key: str) -> bool:
         """Check if an event has already been processed (deduplication).
 
         VK may resend events if the server doesn't respond within 8 seconds,
-        or due to network issues. This cache prevents processing the same
-        event twice.
+        or due to network issues. The first claim of the event key wins,
+        later ones are duplicates.
 
-        Uses OrderedDict for LRU-style eviction when the cache exceeds the
-        max size — oldest entries are removed first, preserving the most
-        recent entries for deduplication.
+        The key is claimed in the dedup store (see :mod:`event_dedup`),
+        shared by all instances unless ``vk_dedup_backend`` is ``memory``.
         """
-        event_id = event_object.get('event_id') or ''
-        if event_type == 'message_new':
-            message_data = event_object.get('message', {}) or {}
-            event_id = str(message_data.get('conversation_message_id', ''))
-        if not event_id:
+        if not event_key:
             return False
-        if event_id in self._event_cache:
-            return True
-        self._event_cache[event_id] = time.time()
-        # LRU-style eviction: remove oldest entries when over limit
-        while len(self._event_cache) > self._EVENT_CACHE_MAX_SIZE:
-            self._event_cache.popitem(last=False)
-        return False
+        return not self._get_dedup_store().claim(event_key)
 
     def _handle_message_new(self, event_object: dict) -> str:
         """Process a new message event.
@@ -132,7 +165,8 @@ class VKEventDispatcher:
             message_id=msg_id,
         )
 
-        handle_new_message(vk_message, sender=vk_sender())
+        with db().unit_of_work():
+            handle_new_message(vk_message, sender=vk_sender())
         return 'ok'
 
     def _handle_message_edit(self, event_object: dict) -> str:
@@ -175,7 +209,8 @@ class VKEventDispatcher:
             event_id=event_id,
         )
 
-        handle_callback_event(vk_message, sender=vk_sender())
+        with db().unit_of_work():
+            handle_callback_event(vk_message, sender=vk_sender())
         return 'ok'
 
     def _handle_message_reply(self, event_object: dict) -> str:
@@ -190,5 +225,28 @@ class VKEventDispatcher:
         return 'ok'
 
 
+def _get_event_key(raw_event: dict, event_type: str, event_object: dict) -> str:
+    """Key of the event, the same for its resends.
+
+    VK Callback API sends a unique event_id with every event (API 5.103+);
+    without it the message is identified within its conversation.
+    """
+    if raw_event.get('event_id'):
+        return str(raw_event['event_id'])
+    if event_type == 'message_new':
+        message_data = event_object.get('message', {}) or {}
+        conversation_message_id = message_data.get('conversation_message_id')
+        if not conversation_message_id:
+            return ''
+        return f'{message_data.get("peer_id", "")}:{conversation_message_id}'
+    return str(event_object.get('event_id') or '')
+
+
+def _get_user_id(event_type: str, event_object: dict) -> int:
+    if event_type == 'message_new':
+        return (event_object.get('message', {}) or {}).get('from_id', 0)
+    return event_object.get('user_id', 0)
+
+
 dispatcher = VKEventDispatcher()
 dispatch_event = dispatcher.dispatch
@@ -0,0 +1,67 @@
+"""Background handling of VK events after the callback is answered.
+
+A fixed set of worker threads, each with its own bounded queue. Events of a user
+always go to the same worker, so they are handled in the order VK sent them, while
+events of different users are handled in parallel.
+
+A full queue is waited for up to a timeout: the event still goes to the queue of
+its worker, after the earlier events of the user. If there is no room by then,
+:class:`EventQueueFullError` fails the request and VK resends the event later —
+handling it in the caller could overtake the queued events of the user.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable
+
+_Task = tuple[Callable[[dict], str], dict]
+
+
+class EventQueueFullError(Exception):
+    pass
+
+
+class UserOrderedQueue:
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self._queues: list[queue.Queue[_Task]] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, user_id: int, handler: Callable[[dict], str], event_object: dict, timeout: float) -> None:
+        """Queue the event for the worker of the user, waiting up to timeout seconds while that worker is full"""
+        self._start()
+        try:
+            self._queues[user_id % len(self._queues)].put((handler, event_object), timeout=timeout)
+        except queue.Full:
+            logging.warning(f'VK event queue is full for {timeout} s, the event of user {user_id} is not handled')
+            raise EventQueueFullError(f'no room for the event of user {user_id}') from None
+
+    def join(self) -> None:
+        """Wait until all queued events are handled"""
+        for worker_queue in self._queues:
+            worker_queue.join()
+
+    def _start(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, args=(worker_queue,), name=f'vk_event_{i}', daemon=True)
+                for i, worker_queue in enumerate(self._queues)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    @staticmethod
+    def _work(worker_queue: 'queue.Queue[_Task]') -> None:
+        while True:
+            handler, event_object = worker_queue.get()
+            try:
+                handler(event_object)
+            except Exception:
+                logging.exception('Failed to handle a VK event in background')
+            finally:
+                worker_queue.task_done()
@@ -9,7 +9,8 @@ from _dependencies.common.misc import (
     request_response_converter,
 )
 
-from ._utils.event_dispatcher import dispatch_event
+from ._utils.database import db
+from ._utils.event_dispatcher import dispatch_event, dispatcher
 
 setup_logging(__package__)
 random.seed()
@@ -19,5 +20,10 @@ random.seed()
 def main(request: RequestWrapper, *args: Any, **kwargs: Any) -> ResponseWrapper:
     logging.info('Incoming http request %s', request)
 
-    response = dispatch_event(request.json_)  # type:ignore[arg-type]
+    try:
+        response = dispatch_event(request.json_)  # type:ignore[arg-type]
+        # the instance is frozen after the answer: events queued with vk_fast_ack are handled before it
+        dispatcher.join()
+    finally:
+        db().flush_dialog_history()
     return ResponseWrapper(data=response)
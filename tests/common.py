@@ -62,6 +62,12 @@ def patched_send_topic(topic_name: Topics, data: dict) -> None:
     receiver({'data': base64.encodebytes(data)}, 'context')
 
 
+def patched_send_batch(topic_name: Topics, messages: list) -> list:
+    for message in messages:
+        patched_send_topic(topic_name, message)
+    return []
+
+
 @lru_cache
 def topic_to_receiver_function(topic_name: Topics):
     # TODO rewrite to decorator
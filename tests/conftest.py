@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 
 from _dependencies import pubsub
 from _dependencies.common.commons import sqlalchemy_get_pool
+from _dependencies.user_repository import geo_reference_cache
 from tests.common import get_test_config
 from tests.factories import db_factories
 
@@ -24,6 +25,12 @@ def patch_publish_topic():
         yield
 
 
+@pytest.fixture(autouse=True)
+def fresh_geo_reference():
+    """tests create geo folders"""
+    geo_reference_cache.invalidate()
+
+
 @pytest.fixture(autouse=True)
 def patch_http():
     with (
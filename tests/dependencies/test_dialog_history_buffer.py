@@ -0,0 +1,140 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from random import randint
+from typing import Generator
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy
+
+from _dependencies.common.commons import get_app_config, sqlalchemy_get_pool
+from _dependencies.user_repository import UserRepository, dialog_history, dialog_history_buffer
+from _dependencies.user_repository.dialog_history_buffer import DialogHistoryBuffer, DialogRecord
+
+
+@pytest.fixture
+def user_id() -> int:
+    return randint(1_000_000_000, 9_000_000_000)
+
+
+def record(user_id: int, text: str, author: str = 'bot') -> DialogRecord:
+    return DialogRecord(user_id, author, datetime.datetime.now(), text)
+
+
+@pytest.fixture
+def unavailable_db() -> Generator[None, None, None]:
+    """the buffer connects to a port nobody listens to"""
+    engine = sqlalchemy.create_engine('postgresql+psycopg2://user@127.0.0.1:1/db')
+    with patch.object(dialog_history_buffer, 'sqlalchemy_get_pool', return_value=engine):
+        yield
+    engine.dispose()
+
+
+def saved_texts(user_ids: list[int]) -> dict[int, list[str]]:
+    """texts of the users in the order of insertion"""
+    with sqlalchemy_get_pool().connect() as conn:
+        rows = conn.execute(
+            sqlalchemy.text('SELECT user_id, message_text FROM dialogs WHERE user_id = ANY(:user_ids) ORDER BY id'),
+            dict(user_ids=user_ids),
+        ).all()
+    texts: dict[int, list[str]] = {user_id: [] for user_id in user_ids}
+    for row_user_id, text in rows:
+        texts[row_user_id].append(text)
+    return texts
+
+
+def test_flushed_when_full(user_id: int):
+    buffer = DialogHistoryBuffer(max_size=3, flush_seconds=60)
+
+    buffer.add(record(user_id, 'a'))
+    buffer.add(record(user_id, 'b'))
+    assert saved_texts([user_id]) == {user_id: []}
+
+    buffer.add(record(user_id, 'c'))
+    assert saved_texts([user_id]) == {user_id: ['a', 'b', 'c']}
+    assert buffer.flush() == 0
+
+
+def test_flushed_in_time(user_id: int):
+    buffer = DialogHistoryBuffer(max_size=100, flush_seconds=0.05)
+
+    buffer.add(record(user_id, 'a'))
+
+    deadline = time.monotonic() + 5
+    while not saved_texts([user_id])[user_id] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert saved_texts([user_id]) == {user_id: ['a']}
+
+
+def test_failed_batch_is_written_row_by_row(user_id: int):
+    buffer = DialogHistoryBuffer(max_size=100, flush_seconds=60)
+    buffer.add(record(user_id, 'a'))
+    buffer.add(record(user_id, 'lost', author='too long author'))  # author is varchar(10)
+    buffer.add(record(user_id, 'c'))
+
+    with patch('_dependencies.user_repository.dialog_history_buffer.logging') as logging:
+        assert buffer.flush() == 3
+
+    assert saved_texts([user_id]) == {user_id: ['a', 'c']}
+    assert 'lost' in logging.exception.call_args.args[0]
+
+
+def test_records_kept_while_db_is_unavailable(user_id: int, unavailable_db: None):
+    buffer = DialogHistoryBuffer(max_size=100, flush_seconds=60)
+    buffer.add(record(user_id, 'a'))
+    buffer.add(record(user_id, 'b'))
+
+    assert buffer.flush() == 2
+    buffer.add(record(user_id, 'c'))
+
+    with patch.object(dialog_history_buffer, 'sqlalchemy_get_pool', return_value=sqlalchemy_get_pool()):
+        assert buffer.flush() == 3
+    assert saved_texts([user_id]) == {user_id: ['a', 'b', 'c']}
+
+
+def test_oldest_records_dropped_when_db_is_unavailable_too_long(user_id: int, unavailable_db: None):
+    with (
+        patch.object(dialog_history_buffer, 'PENDING_BATCHES', 2),
+        patch.object(dialog_history_buffer, 'logging') as logging,
+    ):
+        buffer = DialogHistoryBuffer(max_size=2, flush_seconds=60)
+        for text in 'abcdef':
+            buffer.add(record(user_id, text))  # every second one flushes
+
+    assert [pending.message_text for pending in buffer._records] == ['c', 'd', 'e', 'f']
+    dropped = [call.args[0] for call in logging.error.call_args_list]
+    assert len(dropped) == 2
+    assert "message_text='a'" in dropped[0] and "message_text='b'" in dropped[1]
+
+
+def test_order_of_every_user_is_kept():
+    user_ids = [randint(1_000_000_000, 9_000_000_000) for _ in range(4)]
+    buffer = DialogHistoryBuffer(max_size=7, flush_seconds=60)
+
+    def chat(user_id: int) -> None:
+        for n in range(50):
+            buffer.add(record(user_id, str(n)))
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        list(pool.map(chat, user_ids))
+    buffer.flush()
+
+    assert saved_texts(user_ids) == {user_id: [str(n) for n in range(50)] for user_id in user_ids}
+
+
+def test_repository_uses_buffer_when_enabled(user_id: int):
+    config = get_app_config().model_copy(update=dict(dialog_history_buffered=True))
+    buffer = DialogHistoryBuffer(max_size=100, flush_seconds=60)
+
+    with (
+        patch.object(dialog_history, 'get_app_config', return_value=config),
+        patch.object(dialog_history, 'dialog_history_buffer', return_value=buffer),
+    ):
+        UserRepository().save_user_message(user_id, 'hi')
+        UserRepository().save_bot_reply(user_id, 'hello')
+
+        assert saved_texts([user_id]) == {user_id: []}
+
+        UserRepository().flush_dialog_history()  # at the end of the invocation
+    assert saved_texts([user_id]) == {user_id: ['hi', 'hello']}
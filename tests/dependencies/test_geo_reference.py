@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock
+
+import pytest
+import sqlalchemy
+
+from _dependencies.user_repository import UserRepository
+from _dependencies.user_repository.geo_reference import GeoReferenceCache
+
+FOLDERS = [(1, 'Москва и МО'), (2, 'Москва и МО'), (3, 'Тула'), (4, None)]
+BY_DISTRICT = {'Центральный': [(1, 'Москва и МО'), (3, 'Тула')]}
+
+
+@pytest.fixture
+def load() -> MagicMock:
+    return MagicMock(return_value=(FOLDERS, BY_DISTRICT))
+
+
+def test_loaded_once(load: MagicMock):
+    cache = GeoReferenceCache()
+
+    first = cache.get(load)
+
+    assert cache.get(load) is first
+    load.assert_called_once()
+    assert first.folders == tuple(FOLDERS)
+    assert first.folders_by_district == {'Центральный': ((1, 'Москва и МО'), (3, 'Тула'))}
+
+
+def test_lookups(load: MagicMock):
+    reference = GeoReferenceCache().get(load)
+
+    assert reference.folder_ids_by_name == {'Москва и МО': (1, 2), 'Тула': (3,)}
+    assert reference.region_names([2, 4, 100]) == {'Москва и МО'}
+
+
+def test_reload_after_ttl(load: MagicMock):
+    cache = GeoReferenceCache(ttl_seconds=0)
+
+    cache.get(load)
+    cache.get(load)
+
+    assert load.call_count == 2
+
+
+def test_version_changes_with_data(load: MagicMock):
+    cache = GeoReferenceCache()
+    assert cache.version == 0
+
+    cache.get(load)
+    cache.invalidate()
+    cache.get(load)
+    assert cache.version == 1  # the same data
+
+    load.return_value = (FOLDERS[:1], BY_DISTRICT)
+    cache.invalidate()
+    assert cache.get(load).folders == ((1, 'Москва и МО'),)
+    assert cache.version == 2
+
+
+def test_repository_matches_queries():
+    """the cached lookups return what the queries of the geo folders return"""
+    repository = UserRepository()
+    with repository.connect() as conn:
+        districts = conn.execute(sqlalchemy.text('SELECT DISTINCT federal_district FROM geo_regions')).scalars().all()
+        folders = conn.execute(
+            sqlalchemy.text("""
+                SELECT folder_id, folder_display_name FROM geo_folders_view
+                WHERE folder_type = 'searches' AND folder_subtype != 'searches finished'
+            """)
+        ).all()
+
+    assert districts
+    assert sorted(repository.get_geo_folders(), key=str) == sorted([tuple(row) for row in folders], key=str)
+    for district in districts:
+        with repository.connect() as conn:
+            expected = conn.execute(
+                sqlalchemy.text("""
+                    SELECT MIN(fv.folder_id), fv.folder_display_name
+                    FROM geo_folders_view fv
+                    JOIN geo_divisions d ON fv.division_id = d.division_id
+                    JOIN geo_regions r ON d.division_id = r.division_id
+                    WHERE fv.folder_type = 'searches'
+                      AND fv.folder_subtype != 'searches finished'
+                      AND r.federal_district = :district
+                    GROUP BY fv.folder_display_name
+                    ORDER BY fv.folder_display_name
+                """),
+                dict(district=district),
+            ).all()
+        assert repository.get_geo_folders_by_district(district) == [tuple(row) for row in expected]
+    assert repository.get_geo_folders_by_district('Несуществующий') == []
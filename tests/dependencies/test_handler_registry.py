@@ -3,16 +3,22 @@
 Tests cover:
 - :func:`match_conditions` — all condition types and combinations
 - :class:`HandlerRegistry` — registration, matching, priority, clear
+- dispatch index — same results as the linear scan for the bot registries
 """
 
+import itertools
+import random
 from typing import Any
 
+import pytest
+
 from _dependencies.bot.handler_registry import (
     Handler,
     HandlerConditions,
     HandlerRegistry,
     match_conditions,
 )
+from _dependencies.models import DialogState
 
 # ═══════════════════════════════════════════════════════════════════════
 # match_conditions — text exact match
@@ -435,3 +441,100 @@ class TestHandlerRegistryEdgeCases:
         registry.register(Handler(func=h2, conditions=HandlerConditions(text='b')))
         assert len(registry.all()) == 1
         assert registry.all()[0].func == h2
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# HandlerRegistry — dispatch index vs linear scan
+# ═══════════════════════════════════════════════════════════════════════
+
+
+def _tg_registry() -> HandlerRegistry:
+    from communicate.main import tg_registry
+
+    return tg_registry
+
+
+def _vk_registry() -> HandlerRegistry:
+    from vk_bot._utils import handler_chain  # noqa: F401 — registers the handlers
+    from vk_bot._utils.decorators import vk_registry
+
+    return vk_registry
+
+
+def _random_registry() -> HandlerRegistry:
+    """handlers sharing texts, states and priorities, with lists, prefixes and regexes (with groups, too)"""
+    rnd = random.Random(39)
+    choices: dict[str, list[Any]] = {
+        'text': [None, None, 'a', 'b', ['a', 'c'], ['b', 'b']],
+        'text_startswith': [None, None, None, 'a', '+'],
+        'text_regex': [None, None, None, r'^[+-]\d+$', r'(a)\1?', r'b|c'],
+        'callback_data': [None, None, 'x', ['x', 'y']],
+        'callback_keyboard': [None, None, 'kb'],
+        'state': [None, None, 'radius_input', 'not_defined'],
+    }
+    registry = HandlerRegistry()
+    for number in range(200):
+        conditions = HandlerConditions(**{key: rnd.choice(values) for key, values in choices.items()})
+        registry.register(Handler(func=lambda ctx, n=number: n, conditions=conditions, priority=rnd.randint(-2, 2)))
+    return registry
+
+
+def _sample_values(registry: HandlerRegistry) -> list[dict[str, Any]]:
+    """kwargs of dispatches: values of every registered condition, their near misses and absent values"""
+    texts: set[str | None] = {None, '', 'no such text', '+12345', '-1', '12', 'aa'}
+    callbacks: set[str | None] = {None, 'no such callback'}
+    keyboards: set[str | None] = {None, 'no such keyboard'}
+    states: set[Any] = {None, 'no such state', *DialogState}
+    for handler in registry.all():
+        conditions = handler.conditions
+        for text in [conditions.text] if isinstance(conditions.text, str) else conditions.text or []:
+            texts.update([text, text.upper(), f' {text}', f'{text}!'])
+        if conditions.text_startswith is not None:
+            texts.update(
+                [conditions.text_startswith, f'{conditions.text_startswith} 1', conditions.text_startswith[:-1]]
+            )
+        for callback in (
+            [conditions.callback_data] if isinstance(conditions.callback_data, str) else conditions.callback_data or []
+        ):
+            callbacks.add(callback)
+        keyboards.add(conditions.callback_keyboard)
+        states.add(conditions.state)
+
+    samples = []
+    for text, state in itertools.product(texts, states):
+        samples.append(dict(text=text, state=state))
+        samples.append(dict(text=text))
+    for callback, keyboard, state in itertools.product(callbacks, keyboards, states):
+        samples.append(dict(callback_data=callback, callback_keyboard=keyboard, state=state))
+    for text, callback in itertools.product(texts, callbacks):
+        samples.append(dict(text=text, callback_data=callback))
+    samples.append({})
+    return samples
+
+
+class TestHandlerRegistryIndex:
+    @pytest.mark.parametrize('get_registry', [_tg_registry, _vk_registry, _random_registry])
+    def test_index_matches_linear_scan(self, get_registry: Any) -> None:
+        registry = get_registry()
+        assert registry.all()
+
+        for values in _sample_values(registry):
+            assert list(registry.match(**values)) == list(registry.match_linear(**values)), values
+
+    def test_every_handler_is_reachable(self) -> None:
+        """the corpus is not trivial: each handler of the bots matches at least one sample"""
+        for registry in (_tg_registry(), _vk_registry()):
+            matched = set()
+            for values in _sample_values(registry):
+                matched.update(id(handler) for handler in registry.match(**values))
+            assert matched == {id(handler) for handler in registry.all()}
+
+    def test_register_after_match_rebuilds_index(self) -> None:
+        registry = HandlerRegistry()
+        first = Handler(func=lambda ctx: None, conditions=HandlerConditions(text='a'), priority=1)
+        registry.register(first)
+        assert list(registry.match(text='a')) == [first]
+
+        second = Handler(func=lambda ctx: None, conditions=HandlerConditions(text_regex='^a'), priority=0)
+        registry.register(second)
+        assert list(registry.match(text='a')) == [second, first]
@@ -0,0 +1,159 @@
+import datetime
+import random
+from typing import Generator
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from _dependencies.common.db_client import DBClientBase
+from _dependencies.common.partitions import (
+    HISTORY_PARTITION_DAYS_BACK,
+    NOTIF_BY_USER,
+    NOTIF_BY_USER_HISTORY,
+    NOTIF_BY_USER_PARTITION_SIZE,
+    DBPartitionsMixin,
+    notif_by_user_partition,
+    notif_history_partition,
+)
+
+# archive_notifications tests drop the partitions of old change_log records and clean notif_by_user__history
+pytestmark = pytest.mark.xdist_group('archive_notifications')
+
+
+class DBClient(DBClientBase, DBPartitionsMixin):
+    pass
+
+
+def insert_notification(conn: Connection, change_log_id: int, user_id: int = 1) -> int:
+    return conn.execute(
+        text("""
+            INSERT INTO notif_by_user (user_id, message_type, change_log_id, created)
+            VALUES (:user_id, 'text', :change_log_id, NOW())
+            ON CONFLICT (change_log_id, user_id, message_type, (COALESCE(messenger, 'telegram')))
+            WHERE completed IS NULL AND cancelled IS NULL
+            DO NOTHING
+            RETURNING message_id
+        """),
+        dict(user_id=user_id, change_log_id=change_log_id),
+    ).scalar()
+
+
+def stored_in(conn: Connection, table: str, message_id: int) -> str | None:
+    return conn.execute(
+        text(f'SELECT tableoid::regclass::text FROM {table} WHERE message_id = :message_id'),
+        dict(message_id=message_id),
+    ).scalar()
+
+
+class TestNotifByUserPartitions:
+    @pytest.fixture
+    def db(self, connection_pool: Engine) -> DBClient:
+        return DBClient(db=connection_pool)
+
+    @pytest.fixture
+    def change_log_id(self, db: DBClient) -> Generator[int, None, None]:
+        """a change_log id far above the ids of other tests, its partition is dropped afterwards"""
+        change_log_id = random.randint(200_000, 400_000) * NOTIF_BY_USER_PARTITION_SIZE + 7
+        yield change_log_id
+
+        name, _, _ = notif_by_user_partition(change_log_id)
+        with db.connect() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS {name}'))
+            conn.execute(text('DELETE FROM notif_by_user WHERE ABS(change_log_id) = :id'), dict(id=change_log_id))
+            conn.execute(text('DELETE FROM notif_by_user__history WHERE change_log_id = :id'), dict(id=change_log_id))
+
+    def test_rows_move_from_default_partition(self, db: DBClient, change_log_id: int):
+        with db.connect() as conn:
+            message_id = insert_notification(conn, change_log_id)
+            assert stored_in(conn, NOTIF_BY_USER, message_id) == 'notif_by_user_default'
+
+        name, lower, upper = notif_by_user_partition(change_log_id)
+        assert db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        assert not db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+
+        with db.connect() as conn:
+            assert stored_in(conn, NOTIF_BY_USER, message_id) == name
+            # the unique index of unsent notifications still works for the partition
+            assert insert_notification(conn, change_log_id) is None
+        partitions = {partition.name: partition for partition in db.get_range_partitions(NOTIF_BY_USER)}
+        assert (partitions[name].lower, partitions[name].upper) == (str(lower), str(upper))
+
+    def test_update_by_change_log_id_is_pruned(self, db: DBClient, change_log_id: int):
+        name, lower, upper = notif_by_user_partition(change_log_id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+
+        with db.connect() as conn:
+            plan = conn.execute(
+                text("""
+                    EXPLAIN UPDATE notif_by_user SET completed = NOW()
+                    WHERE message_id = 1 AND change_log_id = :change_log_id
+                """),
+                dict(change_log_id=change_log_id),
+            ).fetchall()
+
+        plan_text = '\n'.join(line for (line,) in plan)
+        assert name in plan_text
+        assert 'notif_by_user_default' not in plan_text
+
+    def test_unarchived_change_log_id(self, db: DBClient, change_log_id: int):
+        name, lower, upper = notif_by_user_partition(change_log_id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        assert db.get_unarchived_change_log_id() <= lower
+
+        with db.connect() as conn:
+            insert_notification(conn, -change_log_id)  # below all the partitions, stored in the default one
+
+        assert db.get_unarchived_change_log_id() == -change_log_id
+
+    def test_move_partition_to_history(self, db: DBClient, change_log_id: int):
+        name, lower, upper = notif_by_user_partition(change_log_id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        with db.connect() as conn:
+            message_ids = [insert_notification(conn, change_log_id, user_id) for user_id in (1, 2)]
+
+        assert db.move_notif_by_user_partition_to_history(name) == 2
+
+        assert name not in {partition.name for partition in db.get_range_partitions(NOTIF_BY_USER)}
+        with db.connect() as conn:
+            for message_id in message_ids:
+                assert stored_in(conn, NOTIF_BY_USER_HISTORY, message_id)
+                assert not stored_in(conn, NOTIF_BY_USER, message_id)
+
+
+class TestNotifHistoryPartitions:
+    @pytest.fixture
+    def db(self, connection_pool: Engine) -> DBClient:
+        return DBClient(db=connection_pool)
+
+    @pytest.fixture
+    def today(self, db: DBClient) -> Generator[datetime.date, None, None]:
+        """a day far in the future, so that partitions of other tests are not touched"""
+        today = datetime.date(2090, 1, 1) + datetime.timedelta(days=random.randint(0, 3650))
+        yield today
+
+        with db.connect() as conn:
+            for days_ago in range(HISTORY_PARTITION_DAYS_BACK, -2, -1):
+                name = notif_history_partition(today - datetime.timedelta(days=days_ago))
+                conn.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+    def test_daily_partitions(self, db: DBClient, today: datetime.date):
+        yesterday = today - datetime.timedelta(days=1)
+        with db.connect() as conn:
+            conn.execute(
+                text('INSERT INTO notif_by_user__history (message_id, created) VALUES (-1, :created)'),
+                dict(created=datetime.datetime.combine(yesterday, datetime.time(12))),
+            )
+
+        created = db.ensure_notif_history_partitions(today)
+
+        assert len(created) == HISTORY_PARTITION_DAYS_BACK + 2
+        assert notif_history_partition(today + datetime.timedelta(days=1)) in created
+        assert db.ensure_notif_history_partitions(today) == []
+        with db.connect() as conn:
+            assert stored_in(conn, NOTIF_BY_USER_HISTORY, -1) == notif_history_partition(yesterday)
+
+        db.drop_partition(NOTIF_BY_USER_HISTORY, notif_history_partition(yesterday))
+
+        with db.connect() as conn:
+            assert not stored_in(conn, NOTIF_BY_USER_HISTORY, -1)
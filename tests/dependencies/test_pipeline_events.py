@@ -0,0 +1,15 @@
+import logging
+
+import pytest
+
+from _dependencies.common.pipeline_events import PipelineStage, log_pipeline_event
+
+
+def test_log_pipeline_event_puts_ids_in_record(caplog: pytest.LogCaptureFixture):
+    with caplog.at_level(logging.INFO):
+        log_pipeline_event(PipelineStage.change_logged, search_num=123, change_log_id=45)
+
+    [record] = caplog.records
+    assert record.pipeline_stage == 'change_logged'
+    assert record.search_num == 123
+    assert record.change_log_id == 45
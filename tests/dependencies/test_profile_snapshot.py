@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from _dependencies.user_repository import UserRepository
+from tests.factories import db_factories
+
+SEEDED_USERS = 30
+
+
+def seed_user(rnd: random.Random) -> int:
+    """a user with a random subset of settings, edge cases included"""
+    user = db_factories.UserFactory.create_sync(role=rnd.choice([None, 'member', 'relative']), status=None)
+    user_id = user.user_id
+
+    for period_min in rnd.sample([0, 7, 18, 60], rnd.randint(0, 3)):
+        db_factories.UserPrefAgeFactory.create_sync(user_id=user_id, period_min=period_min, period_max=period_min + 10)
+    if rnd.random() < 0.6:
+        db_factories.UserCoordinateFactory.create_sync(user_id=user_id, latitude='55.75', longitude='37.61')
+    if rnd.random() < 0.6:
+        db_factories.UserPrefRadiusFactory.create_sync(user_id=user_id, radius=rnd.choice([None, 50, 150]))
+    for folder in rnd.sample([276, 41, 1180, 411], rnd.randint(0, 3)):
+        db_factories.UserRegionalPreferenceFactory.create_sync(user_id=user_id, forum_folder_num=folder)
+    if rnd.random() < 0.3:
+        db_factories.UserPrefRegionFactory.create_sync(user_id=user_id, region_id=1)
+    for topic_type in rnd.sample([0, 1, 2, 3, 4], rnd.randint(0, 3)):
+        db_factories.UserPrefTopicTypeFactory.create_sync(user_id=user_id, topic_type_id=topic_type)
+    for pref_id, preference in rnd.sample([(0, 'new_searches'), (1, 'status_changes'), (20, 'bot_news')], 2):
+        if rnd.random() < 0.5:
+            db_factories.UserPreferenceFactory.create_sync(user_id=user_id, preference=preference, pref_id=pref_id)
+    for status in rnd.sample(['verified', 'non-varified', 'verified'], rnd.randint(0, 2)):
+        db_factories.UserForumAttributeFactory.create_sync(user_id=user_id, status=status)
+    return user_id
+
+
+@pytest.fixture(scope='module')
+def seeded_user_ids() -> list[int]:
+    rnd = random.Random(46)
+    return [seed_user(rnd) for _ in range(SEEDED_USERS)]
+
+
+def test_snapshot_matches_getters(seeded_user_ids: list[int]):
+    repository = UserRepository()
+
+    for user_id in seeded_user_ids:
+        snapshot = repository.get_profile_snapshot(user_id)
+        assert snapshot is not None
+
+        assert snapshot.role == repository.get_user_role(user_id)
+        assert snapshot.status == repository.get_user_status(user_id)
+        assert snapshot.age_periods == sorted(tuple(row) for row in repository.get_age_preferences(user_id))
+        coordinates = repository.get_coordinates(user_id)
+        assert snapshot.coordinates == (tuple(coordinates) if coordinates else None)
+        assert snapshot.radius == repository.get_radius(user_id)
+        assert snapshot.regions == sorted(repository.get_user_regions(user_id))
+        assert snapshot.topic_types == repository.get_topic_types(user_id)
+        assert snapshot.notif_preferences == repository.get_all_user_preferences(user_id)
+        forum_attributes = repository.get_forum_attributes(user_id)
+        assert snapshot.forum_attributes == (tuple(forum_attributes) if forum_attributes else None)
+
+
+def test_snapshot_summary_matches_settings_summary(seeded_user_ids: list[int]):
+    repository = UserRepository()
+
+    for user_id in seeded_user_ids:
+        snapshot = repository.get_profile_snapshot(user_id)
+        assert snapshot is not None
+        assert snapshot.summary == repository.get_settings_summary(user_id)
+
+
+def test_unknown_user():
+    repository = UserRepository()
+
+    assert repository.get_profile_snapshot(-1) is None
+    assert repository.get_settings_summary(-1) is None
@@ -0,0 +1,48 @@
+import pytest
+
+from _dependencies.common import pubsub
+from _dependencies.common.pubsub import (
+    MessageForComposeNotifications,
+    Topics,
+    TriggerCoalescer,
+    coalesced_triggers,
+)
+
+
+class TestTriggerCoalescer:
+    def test_publishes_one_trigger_per_invocation(self):
+        with coalesced_triggers(1) as triggers:
+            for _ in range(10):
+                triggers.compose_notifications('')
+
+        pubsub.publish_to_pubsub.assert_called_once_with(
+            Topics.topic_for_notification, MessageForComposeNotifications(triggered_by_func_id=1, text='')
+        )
+
+    def test_nothing_published_without_work(self):
+        with coalesced_triggers(1):
+            pass
+
+        pubsub.publish_to_pubsub.assert_not_called()
+
+    def test_one_trigger_per_topic(self):
+        triggers = TriggerCoalescer(1)
+        triggers.compose_notifications('')
+        triggers.send_notifications('')
+
+        assert triggers.flush() == [Topics.topic_for_notification, Topics.topic_to_send_notifications]
+
+    def test_every_invocation_publishes_its_trigger(self):
+        for function_id in (1, 2):
+            with coalesced_triggers(function_id) as triggers:
+                triggers.compose_notifications('')
+
+        assert pubsub.publish_to_pubsub.call_count == 2
+
+    def test_flushes_on_exception(self):
+        with pytest.raises(ValueError):
+            with coalesced_triggers(1) as triggers:
+                triggers.compose_notifications('')
+                raise ValueError()
+
+        pubsub.publish_to_pubsub.assert_called_once()
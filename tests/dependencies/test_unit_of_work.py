@@ -0,0 +1,96 @@
+from random import randint
+from typing import Generator
+
+import pytest
+import sqlalchemy
+
+from _dependencies.bot.users_management import ManageUserAction, update_user_status
+from _dependencies.common.commons import sqlalchemy_get_pool
+from _dependencies.user_repository import UserRepository
+from tests.factories.db_factories import UserFactory
+
+
+@pytest.fixture
+def user_id() -> int:
+    user_id = randint(1_000_000_000, 9_000_000_000)
+    UserFactory.create_sync(user_id=user_id, status='unblocked')
+    return user_id
+
+
+@pytest.fixture
+def checkouts() -> Generator[list[object], None, None]:
+    """connections taken from the pool by this thread"""
+    taken: list[object] = []
+
+    def on_checkout(dbapi_connection: object, *args: object) -> None:
+        taken.append(dbapi_connection)
+
+    pool = sqlalchemy_get_pool().pool
+    sqlalchemy.event.listen(pool, 'checkout', on_checkout)
+    yield taken
+    sqlalchemy.event.remove(pool, 'checkout', on_checkout)
+
+
+def committed_status(user_id: int) -> str:
+    """the status seen by another connection"""
+    with sqlalchemy_get_pool().connect() as conn:
+        return conn.execute(
+            sqlalchemy.text('SELECT status FROM users WHERE user_id=:user_id'), dict(user_id=user_id)
+        ).scalar_one()
+
+
+def test_calls_share_one_connection(user_id: int, checkouts: list[object]):
+    repository = UserRepository()
+
+    with repository.unit_of_work():
+        repository.get_user_status(user_id)
+        repository.update_user_status(user_id, ManageUserAction.unsubscribe_user)  # users_management joins too
+        assert repository.get_user_status(user_id) == 'unsubscribed'
+        assert committed_status(user_id) == 'unblocked'
+
+    assert len(checkouts) == 2  # the unit and committed_status
+    assert committed_status(user_id) == 'unsubscribed'
+
+
+def test_unit_without_calls_takes_no_connection(checkouts: list[object]):
+    with UserRepository().unit_of_work():
+        pass
+
+    assert checkouts == []
+
+
+def test_exception_rolls_back_unit(user_id: int):
+    repository = UserRepository()
+
+    with pytest.raises(RuntimeError):
+        with repository.unit_of_work():
+            repository.update_user_status(user_id, ManageUserAction.unsubscribe_user)
+            raise RuntimeError
+
+    assert committed_status(user_id) == 'unblocked'
+
+
+def test_calls_after_failed_call_use_own_transactions(user_id: int):
+    repository = UserRepository()
+
+    with repository.unit_of_work():
+        repository.update_user_status(user_id, ManageUserAction.unsubscribe_user)
+        with pytest.raises(sqlalchemy.exc.ProgrammingError):
+            with repository.connect() as conn:
+                conn.execute(sqlalchemy.text('SELECT * FROM no_such_table'))
+
+        update_user_status(ManageUserAction.block_user, user_id)
+        assert committed_status(user_id) == 'blocked'
+
+
+def test_nested_unit_joins_outer(user_id: int, checkouts: list[object]):
+    repository = UserRepository()
+
+    with repository.unit_of_work():
+        with UserRepository().unit_of_work():
+            repository.update_user_status(user_id, ManageUserAction.unsubscribe_user)
+        assert committed_status(user_id) == 'unblocked'
+        repository.get_user_status(user_id)
+
+    assert len(checkouts) == 2
+    assert committed_status(user_id) == 'unsubscribed'
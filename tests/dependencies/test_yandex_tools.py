@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from _dependencies.common import yandex_tools
+from _dependencies.common.yandex_tools import PublishFailure, buffered_publishing_cloud, send_topic_cloud
+
+
+@pytest.fixture
+def sqs_client() -> MagicMock:
+    client = MagicMock()
+    client.get_queue_url.side_effect = lambda QueueName: {'QueueUrl': f'url/{QueueName}'}
+    client.send_message_batch.return_value = {'Successful': [], 'Failed': []}
+    with patch.object(yandex_tools, '_get_boto3_client', return_value=client):
+        yield client
+
+
+class TestBufferedPublishing:
+    def test_messages_grouped_per_queue(self, sqs_client: MagicMock):
+        with buffered_publishing_cloud():
+            send_topic_cloud('topic_a', [1])
+            send_topic_cloud('topic_b', [2])
+            send_topic_cloud('topic_a', [3])
+
+        sqs_client.send_message.assert_not_called()
+        assert sqs_client.send_message_batch.call_count == 2
+        first_call = sqs_client.send_message_batch.call_args_list[0].kwargs
+        assert first_call['QueueUrl'] == 'url/topic_a'
+        assert [entry['MessageBody'] for entry in first_call['Entries']] == ['[1]', '[3]']
+
+    def test_full_batch_is_flushed_immediately(self, sqs_client: MagicMock):
+        with buffered_publishing_cloud():
+            for i in range(yandex_tools.SQS_MAX_BATCH_SIZE):
+                send_topic_cloud('topic_a', [i])
+            assert sqs_client.send_message_batch.call_count == 1
+
+            send_topic_cloud('topic_a', ['last'])
+
+        assert sqs_client.send_message_batch.call_count == 2
+        assert len(sqs_client.send_message_batch.call_args.kwargs['Entries']) == 1
+
+    def test_large_payload_split_into_batches(self, sqs_client: MagicMock):
+        big_message = 'x' * (yandex_tools.SQS_MAX_BATCH_PAYLOAD_BYTES // 2)
+        with buffered_publishing_cloud():
+            send_topic_cloud('topic_a', big_message)
+            send_topic_cloud('topic_a', big_message)
+
+        assert sqs_client.send_message_batch.call_count == 2
+
+    def test_failures_reported_per_message(self, sqs_client: MagicMock):
+        sqs_client.send_message_batch.return_value = {
+            'Successful': [{'Id': '0'}],
+            'Failed': [{'Id': '1', 'Code': 'InternalError', 'Message': 'oops', 'SenderFault': False}],
+        }
+
+        with buffered_publishing_cloud() as publisher:
+            send_topic_cloud('topic_a', 'ok')
+            send_topic_cloud('topic_a', 'bad')
+
+        assert publisher.failures == [PublishFailure('topic_a', '"bad"', 'InternalError', 'oops')]
+
+    def test_exception_marks_whole_batch_as_failed(self, sqs_client: MagicMock):
+        sqs_client.send_message_batch.side_effect = ConnectionError('no network')
+
+        with buffered_publishing_cloud() as publisher:
+            send_topic_cloud('topic_a', 1)
+            send_topic_cloud('topic_a', 2)
+
+        assert [failure.message for failure in publisher.failures] == ['1', '2']
+        assert all(failure.code == 'ConnectionError' for failure in publisher.failures)
+
+    def test_unbuffered_outside_of_block(self, sqs_client: MagicMock):
+        with buffered_publishing_cloud():
+            pass
+
+        send_topic_cloud('topic_a', 1)
+
+        sqs_client.send_message.assert_called_once_with(QueueUrl='url/topic_a', MessageBody='1')
+        sqs_client.send_message_batch.assert_not_called()
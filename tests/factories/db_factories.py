@@ -73,6 +73,8 @@ class SearchFactory(BaseFactory[db_models.Search]):
 
 class SearchFirstPostFactory(BaseFactory[db_models.SearchFirstPost]):
     search_id = Use(faker.pyint, min_value=1_000_000_000, max_value=2_000_000_000)
+    content_lines = None
+    content_line_hashes = None
 
 
 class GeoFolderFactory(BaseFactory[db_models.GeoFolder]):
@@ -5,6 +5,7 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
@@ -286,6 +287,8 @@ class SearchFirstPost(Base):
     coords = Column(String)
     field_trip = Column(String)
     content_compact = Column(String)
+    content_lines = Column(ARRAY(String()))
+    content_line_hashes = Column(ARRAY(String()))
 
 
 t_search_first_posts__history = Table(
@@ -301,6 +304,8 @@ t_search_first_posts__history = Table(
     Column('coords', String),
     Column('field_trip', String),
     Column('content_compact', String),
+    Column('content_lines', ARRAY(String())),
+    Column('content_line_hashes', ARRAY(String())),
 )
 
 
@@ -599,6 +604,56 @@ class UserPrefSearchWhitelist(Base):
     user = relationship('User')
 
 
+class NotifRecipientIndex(Base):
+    __tablename__ = 'notif_recipient_index'
+
+    forum_folder_num = Column(Integer, primary_key=True, nullable=False)
+    user_id = Column(BigInteger, primary_key=True, nullable=False, index=True)
+    multi_folder = Column(Boolean, nullable=False)
+    pref_ids = Column(ARRAY(Integer()), nullable=False)
+    topic_type_ids = Column(ARRAY(Integer()), nullable=False)
+    whitelist_on = Column(Boolean, nullable=False)
+
+
+class ArchiveExportCheckpoint(Base):
+    __tablename__ = 'archive_export_checkpoints'
+
+    table_name = Column(String(100), primary_key=True, nullable=False)
+    day = Column(Date, primary_key=True, nullable=False)
+    part = Column(Integer, nullable=False, server_default=text('1'))
+    object_key = Column(String, nullable=False)
+    rows = Column(BigInteger, nullable=False)
+    bytes = Column(BigInteger, nullable=False)
+    max_message_id = Column(BigInteger, nullable=False)
+    uploaded = Column(DateTime, nullable=False)
+    deleted = Column(DateTime)
+
+
+class ForumFolderTree(Base):
+    __tablename__ = 'forum_folder_tree'
+
+    folder_num = Column(Integer, primary_key=True)
+    parent_folder_num = Column(Integer)
+    change_time_str = Column(String)
+    folder_name = Column(String)
+    crawled_at = Column(DateTime)
+
+
+class ForumFolderSearch(Base):
+    __tablename__ = 'forum_folder_searches'
+
+    folder_num = Column(Integer, primary_key=True, nullable=False)
+    title = Column(String, primary_key=True, nullable=False)
+    change_time_str = Column(String, primary_key=True, nullable=False)
+
+
+class VkCallbackEvent(Base):
+    __tablename__ = 'vk_callback_events'
+
+    event_key = Column(String, primary_key=True)
+    received_at = Column(DateTime, nullable=False, server_default=text('now()'))
+
+
 class NotifByUser(Base):
     __tablename__ = 'notif_by_user'
 
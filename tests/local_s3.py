@@ -0,0 +1,74 @@
+"""Local stand-in for the s3 client: objects are files in a directory, multipart uploads are files of parts."""
+
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+
+class LocalS3Client:
+    """Implements the calls of the boto3 s3 client used by the functions: put/head object and multipart upload."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.requests: list[str] = []
+
+    def object_path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes) -> dict[str, Any]:
+        self.requests.append('put_object')
+        path = self.object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body)
+        return {'ETag': hashlib.md5(Body).hexdigest()}
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        self.requests.append('head_object')
+        path = self.object_path(Bucket, Key)
+        if not path.exists():
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        return {'ContentLength': path.stat().st_size}
+
+    def create_multipart_upload(self, Bucket: str, Key: str) -> dict[str, Any]:
+        self.requests.append('create_multipart_upload')
+        upload_id = uuid.uuid4().hex
+        self._upload_dir(upload_id).mkdir(parents=True)
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes) -> dict[str, Any]:
+        self.requests.append('upload_part')
+        (self._upload_dir(UploadId) / f'{PartNumber:05}').write_bytes(Body)
+        return {'ETag': hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict[str, Any]
+    ) -> dict[str, Any]:
+        self.requests.append('complete_multipart_upload')
+        upload_dir = self._upload_dir(UploadId)
+        path = self.object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('wb') as output:
+            for part in sorted(MultipartUpload['Parts'], key=lambda part: part['PartNumber']):
+                part_path = upload_dir / f'{part["PartNumber"]:05}'
+                output.write(part_path.read_bytes())
+                part_path.unlink()
+        upload_dir.rmdir()
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict[str, Any]:
+        self.requests.append('abort_multipart_upload')
+        upload_dir = self._upload_dir(UploadId)
+        for part_path in upload_dir.iterdir():
+            part_path.unlink()
+        upload_dir.rmdir()
+        return {}
+
+    def pending_uploads(self) -> list[str]:
+        uploads_dir = self.root / '.uploads'
+        return [path.name for path in uploads_dir.iterdir()] if uploads_dir.exists() else []
+
+    def _upload_dir(self, upload_id: str) -> Path:
+        return self.root / '.uploads' / upload_id
@@ -1,4 +1,7 @@
+import random
 from datetime import datetime, timedelta
+from typing import Callable, Generator
+from unittest.mock import patch
 
 import pytest
 from sqlalchemy import text
@@ -6,9 +9,12 @@ from sqlalchemy.orm import Session
 
 # All tests in this file share tables (change_log, notif_by_user, etc.)
 # and must not run in parallel with each other.
-pytestmark = pytest.mark.skip(reason='off')  # temporarily off
-# pytestmark = pytest.mark.xdist_group('archive_notifications')
+pytestmark = pytest.mark.xdist_group('archive_notifications')
 
+import archive_notifications.main
+from _dependencies.common import partitions
+from _dependencies.common.lock_manager import lock_manager
+from _dependencies.common.partitions import NOTIF_BY_USER, NOTIF_BY_USER_PARTITION_SIZE, notif_by_user_partition
 from archive_notifications.main import DBClient
 from tests.common import find_model
 from tests.factories import db_models
@@ -26,31 +32,69 @@ class TestMoveNotificationsToHistory:
     def db(self, connection_pool) -> DBClient:
         return DBClient(db=connection_pool)
 
-    @pytest.fixture(autouse=True)
-    def _cleanup(self, connection_pool):
-        """Clean notif_by_user tables before each test to avoid cross-test contamination."""
-        with connection_pool.begin() as conn:
-            conn.execute(text('DELETE FROM notif_by_user'))
-            conn.execute(text('DELETE FROM notif_by_user__history'))
+    @pytest.fixture
+    def change_logs(self, db: DBClient) -> Generator[list[int], None, None]:
+        """ids of the change_log records a test creates; they are deleted afterwards with their notifications"""
+        change_log_ids: list[int] = []
+        yield change_log_ids
+
+        with db.connect() as conn:
+            for table in ('notif_by_user', 'notif_by_user__history'):
+                conn.execute(text(f'DELETE FROM {table} WHERE change_log_id = ANY(:ids)'), dict(ids=change_log_ids))
+            conn.execute(text('DELETE FROM change_log WHERE id = ANY(:ids)'), dict(ids=change_log_ids))
+
+    @pytest.fixture
+    def old_change_log(self, change_logs: list[int]) -> Callable[..., db_models.ChangeLog]:
+        """creates a change_log record old enough to be archived"""
+
+        def create(**kwargs) -> db_models.ChangeLog:
+            clog = ChangeLogFactory.create_sync(parsed_time=datetime.now() - timedelta(hours=3), **kwargs)
+            change_logs.append(clog.id)
+            return clog
+
+        return create
+
+    @pytest.fixture
+    def drained(self, db: DBClient) -> None:
+        """notifications left by other tests are archived, so that the stats count the rows of the test only"""
+        db.move_notifications_to_history()
+
+    @pytest.fixture
+    def partition_change_log_id(self, db: DBClient, session: Session) -> Generator[int, None, None]:
+        """the first change_log id of a partition far above the ids of other tests; cleaned up afterwards"""
+        change_log_id = random.randint(410_000, 420_000) * NOTIF_BY_USER_PARTITION_SIZE
+        yield change_log_id
+
+        session.rollback()  # its reads lock notif_by_user, dropping a partition would wait for them
+        with db.connect() as conn:
+            for id_ in (change_log_id, change_log_id + NOTIF_BY_USER_PARTITION_SIZE):
+                name, _, _ = notif_by_user_partition(id_)
+                conn.execute(text(f'DROP TABLE IF EXISTS {name}'))
+            for table in ('notif_by_user', 'notif_by_user__history', 'change_log'):
+                column = 'id' if table == 'change_log' else 'change_log_id'
+                conn.execute(
+                    text(f'DELETE FROM {table} WHERE {column} >= :id AND {column} < :id + 2 * :size'),
+                    dict(id=change_log_id, size=NOTIF_BY_USER_PARTITION_SIZE),
+                )
 
     def test_no_records(self, db: DBClient):
         """No records in notif_by_user — method returns quietly."""
         db.move_notifications_to_history()
 
-    def test_no_old_enough_records(self, db: DBClient, session: Session):
+    def test_no_old_enough_records(self, db: DBClient, session: Session, change_logs: list[int]):
         """parsed_time is too recent (< 2h) — nothing moved."""
         recent = datetime.now() - timedelta(hours=1)
         clog = ChangeLogFactory.create_sync(parsed_time=recent)
+        change_logs.append(clog.id)
         nbu = NotifByUserFactory.create_sync(change_log_id=clog.id)
 
         db.move_notifications_to_history()
 
         assert find_model(session, db_models.NotifByUser, message_id=nbu.message_id)
 
-    def test_moves_old_notifications_to_history(self, db: DBClient, session: Session):
+    def test_moves_old_notifications_to_history(self, db: DBClient, session: Session, old_change_log):
         """old parsed_time — records moved to history, deleted from notif_by_user."""
-        old = datetime.now() - timedelta(hours=3)
-        clog = ChangeLogFactory.create_sync(parsed_time=old)
+        clog = old_change_log()
         nbu = NotifByUserFactory.create_sync(change_log_id=clog.id)
 
         assert find_model(session, db_models.NotifByUser, message_id=nbu.message_id)
@@ -62,6 +106,107 @@ class TestMoveNotificationsToHistory:
         # Deleted from notif_by_user
         assert not find_model(session, db_models.NotifByUser, message_id=nbu.message_id)
 
+    def test_moves_many_change_logs_in_batches(self, db: DBClient, session: Session, drained, old_change_log):
+        """notifications of several change_log records are moved in one invocation, batch by batch."""
+        clogs = [old_change_log() for _ in range(3)]
+        # notifications are archived in the order of message_id: the first batches are these ones
+        first_message_id = -random.randint(1, 10**9)
+        nbus = [
+            NotifByUserFactory.create_sync(change_log_id=clog.id, message_id=first_message_id + 2 * i + j)
+            for i, clog in enumerate(clogs)
+            for j in range(2)
+        ]
+
+        with patch('archive_notifications.main.pubsub_archive_notifications') as pubsub_mock:
+            stats = db.move_notifications_to_history(batch_size=4)
+
+        # tests running in parallel may add notifications of their old change_log records
+        assert stats.rows >= 6
+        assert stats.batches >= 2
+        assert not stats.backlog_left
+        pubsub_mock.assert_not_called()
+        for nbu in nbus:
+            assert find_model(session, NotifByUserHistory, message_id=nbu.message_id)
+            assert not find_model(session, db_models.NotifByUser, message_id=nbu.message_id)
+
+    def test_out_of_time_budget(self, db: DBClient, session: Session, drained, old_change_log):
+        """the rest of the backlog is left to the next invocation."""
+        clog = old_change_log()
+        # notifications are archived in the order of message_id: the first batch is one of these
+        first_message_id = -random.randint(1, 10**9)
+        nbus = [
+            NotifByUserFactory.create_sync(change_log_id=clog.id, message_id=first_message_id + i) for i in range(3)
+        ]
+
+        with patch('archive_notifications.main.pubsub_archive_notifications') as pubsub_mock:
+            stats = db.move_notifications_to_history(batch_size=1, time_budget_seconds=0)
+
+        assert stats.rows == 1
+        assert stats.backlog_left
+        pubsub_mock.assert_called_once()
+        remaining = [nbu for nbu in nbus if find_model(session, db_models.NotifByUser, message_id=nbu.message_id)]
+        assert len(remaining) == 2
+
+    def test_moves_whole_partitions_of_old_change_logs(
+        self, db: DBClient, session: Session, drained, partition_change_log_id: int
+    ):
+        """a partition with old change_log records only is moved to history and dropped."""
+        old = datetime.now() - timedelta(hours=3)
+        clog = ChangeLogFactory.create_sync(id=partition_change_log_id, parsed_time=old)
+        ChangeLogFactory.create_sync(
+            id=clog.id + NOTIF_BY_USER_PARTITION_SIZE, parsed_time=old
+        )  # the next partition has old records as well
+        name, lower, upper = notif_by_user_partition(clog.id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        nbu = NotifByUserFactory.create_sync(change_log_id=clog.id)
+
+        stats = db.move_notifications_to_history()
+
+        assert stats.partitions == 1
+        assert stats.rows == 1
+        assert find_model(session, NotifByUserHistory, message_id=nbu.message_id)
+        assert name not in {partition.name for partition in db.get_range_partitions(NOTIF_BY_USER)}
+
+    def test_busy_notif_by_user_falls_back_to_batches(
+        self, db: DBClient, session: Session, connection_pool, partition_change_log_id: int
+    ):
+        """the partition cannot be detached while notif_by_user is in use, its rows are moved batch by batch."""
+        old = datetime.now() - timedelta(hours=3)
+        clog = ChangeLogFactory.create_sync(id=partition_change_log_id, parsed_time=old)
+        ChangeLogFactory.create_sync(id=clog.id + NOTIF_BY_USER_PARTITION_SIZE, parsed_time=old)
+        name, lower, upper = notif_by_user_partition(clog.id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        nbu = NotifByUserFactory.create_sync(change_log_id=clog.id)
+
+        with connection_pool.connect() as writer, patch.object(partitions, 'PARTITION_LOCK_TIMEOUT', '100ms'):
+            # an open transaction of compose or send
+            writer.execute(text('LOCK TABLE notif_by_user IN ROW EXCLUSIVE MODE'))
+            stats = db.move_notifications_to_history()
+            writer.rollback()
+
+        assert stats.partitions == 0
+        assert find_model(session, NotifByUserHistory, message_id=nbu.message_id)
+        assert not find_model(session, db_models.NotifByUser, message_id=nbu.message_id)
+        assert name in {partition.name for partition in db.get_range_partitions(NOTIF_BY_USER)}
+
+    def test_moves_partition_left_detached(
+        self, db: DBClient, session: Session, connection_pool, partition_change_log_id: int
+    ):
+        """a partition detached by a run that stopped before the copy is moved by the next run."""
+        old = datetime.now() - timedelta(hours=3)
+        clog = ChangeLogFactory.create_sync(id=partition_change_log_id, parsed_time=old)
+        name, lower, upper = notif_by_user_partition(clog.id)
+        db.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        nbu = NotifByUserFactory.create_sync(change_log_id=clog.id)
+        with connection_pool.begin() as conn:
+            conn.execute(text(f'ALTER TABLE notif_by_user DETACH PARTITION {name}'))
+
+        assert name in db.get_detached_notif_by_user_partitions()
+        db.move_notifications_to_history()
+
+        assert find_model(session, NotifByUserHistory, message_id=nbu.message_id)
+        assert name not in db.get_detached_notif_by_user_partitions()
+
 
 class TestMoveFirstPostsToHistory:
     @pytest.fixture
@@ -172,3 +317,14 @@ class TestMoveFirstPostsToHistory:
         assert not find_model(session, db_models.t_search_first_posts__history, id=99901)
         # Recent record kept
         assert find_model(session, db_models.t_search_first_posts__history, id=99902)
+
+
+def test_main_is_cancelled_while_another_run_archives(connection_pool):
+    """partitions are detached and copied in separate transactions, so only one run may move them."""
+    with (
+        lock_manager(connection_pool, archive_notifications.main.FUNC_NAME),
+        patch.object(DBClient, 'move_notifications_to_history') as move,
+    ):
+        archive_notifications.main.main({}, None)
+
+    move.assert_not_called()
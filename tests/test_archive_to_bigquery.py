@@ -1,25 +1,76 @@
 import csv
 import io
-from datetime import datetime, timedelta
+import random
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Generator
 from unittest.mock import Mock, patch
 from zipfile import ZipFile
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from sqlalchemy import text
 from sqlalchemy.orm.session import Session
 
-from archive_to_bigquery.main import Archiver, DBClient, main
+import archive_to_bigquery.main as main_module
+from _dependencies.common.commons import get_app_config
+from _dependencies.common.partitions import NOTIF_BY_USER_HISTORY, notif_history_partition
+from archive_to_bigquery.main import (
+    Archiver,
+    DBClient,
+    ExportCheckpoint,
+    S3UploadStream,
+    UploadNotVerifiedError,
+    main,
+    run_archivers,
+)
 from tests.common import find_model
-from tests.factories.db_factories import NotifByUserHistory, NotifByUserHistoryFactory, faker
+from tests.factories.db_factories import NotifByUserHistory, NotifByUserHistoryFactory
+from tests.factories.db_models import ArchiveExportCheckpoint
+from tests.local_s3 import LocalS3Client
+
+# the history table is shared with the archive_notifications tests, which clean it up
+pytestmark = pytest.mark.xdist_group('archive_notifications')
+
+
+def unused_day() -> date:
+    """a day far in the future, out of the dates of the records of other tests"""
+    return date(2500, 1, 1) + timedelta(days=random.randint(0, 100_000))
+
+
+def cleanup_day(archiver: Archiver) -> None:
+    with archiver.db.connect() as conn:
+        conn.execute(text('DELETE FROM archive_export_checkpoints WHERE day = :day'), dict(day=archiver.archive_date))
+        conn.execute(
+            text('DELETE FROM notif_by_user__history WHERE created >= :day AND created < :next_day'),
+            dict(day=archiver.archive_date, next_day=archiver.archive_date + timedelta(days=1)),
+        )
 
 
 class TestArchiveNotifications:
     @pytest.fixture
-    def archiver(self, connection_pool) -> Archiver:
-        return Archiver(
-            archive_date=faker.date_object(),
+    def s3_client(self, tmp_path: Path) -> LocalS3Client:
+        return LocalS3Client(tmp_path)
+
+    @pytest.fixture
+    def archiver(self, connection_pool, s3_client: LocalS3Client) -> Generator[Archiver, None, None]:
+        archiver = Archiver(
+            archive_date=unused_day(),
             db=DBClient(db=connection_pool),
-            s3_client=Mock(),
+            s3_client=s3_client,
+        )
+        yield archiver
+        cleanup_day(archiver)
+
+    def read_archive(self, archiver: Archiver, s3_client: LocalS3Client) -> list[list[str]]:
+        path = s3_client.object_path(
+            get_app_config().aws_backup_bucket_name, f'{archiver.s3_prefix}/{archiver._unload_file_name}'
         )
+        with ZipFile(path) as zf:
+            with zf.open(archiver._csv_entry_name) as csv_file:
+                return list(csv.reader(io.TextIOWrapper(csv_file, encoding='utf-8')))
 
     @pytest.mark.skip(reason='real run')
     def test_main_real(self):
@@ -35,54 +86,373 @@ class TestArchiveNotifications:
         NotifByUserHistoryFactory.create_batch_sync(3, created=datetime.now())
         main('event', 'context')
 
-    def test_records_unloaded(self, archiver: Archiver, session: Session):
-        """unload old records — returns zipped BytesIO, then deletes"""
+    def test_records_exported_and_deleted(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        """records of the day are uploaded as zipped CSV, then deleted"""
         records_count = 3
-        first_notif, *others = NotifByUserHistoryFactory.create_batch_sync(
-            records_count,
-            created=archiver.archive_date,
+        notifs = NotifByUserHistoryFactory.create_batch_sync(records_count, created=archiver.archive_date)
+
+        archiver.run()
+
+        rows = self.read_archive(archiver, s3_client)
+        assert len(rows) == 1 + records_count  # header + data
+        assert rows[0][0] == 'message_id'
+        assert [int(row[0]) for row in rows[1:]] == sorted(notif.message_id for notif in notifs)
+        assert s3_client.requests == ['put_object', 'head_object']
+        assert not find_model(session, NotifByUserHistory, message_id=notifs[0].message_id, created=notifs[0].created)
+
+    def test_no_records(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        """records are not enough old to unload — nothing is uploaded or deleted"""
+
+        notif = NotifByUserHistoryFactory.create_sync(created=archiver.archive_date - timedelta(days=1))
+
+        archiver.run()
+
+        assert s3_client.requests == []
+        assert find_model(session, NotifByUserHistory, message_id=notif.message_id)
+
+    def test_multipart_upload(self, archiver: Archiver, s3_client: LocalS3Client):
+        """an archive larger than one part is uploaded by parts"""
+
+        records_count = 20
+        NotifByUserHistoryFactory.create_batch_sync(records_count, created=archiver.archive_date)
+
+        with patch('archive_to_bigquery.main.UPLOAD_PART_SIZE', 100):
+            assert archiver._export_to_s3() == records_count
+
+        assert s3_client.requests[0] == 'create_multipart_upload'
+        assert s3_client.requests.count('upload_part') > 1
+        assert s3_client.requests[-1] == 'complete_multipart_upload'
+        assert len(self.read_archive(archiver, s3_client)) == 1 + records_count
+
+    def test_failed_export_aborts_upload(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        """no partial object is left in s3 and records are kept"""
+
+        notif = NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+        archiver.db.delete_exported_records = Mock()
+
+        with (
+            patch('archive_to_bigquery.main.UPLOAD_PART_SIZE', 1),
+            patch.object(s3_client, 'complete_multipart_upload', side_effect=ConnectionError),
+            pytest.raises(ConnectionError),
+        ):
+            archiver.run()
+
+        assert s3_client.requests[-1] == 'abort_multipart_upload'
+        assert s3_client.pending_uploads() == []
+        archiver.db.delete_exported_records.assert_not_called()
+        assert find_model(session, NotifByUserHistory, message_id=notif.message_id)
+
+
+class TestCheckpoints:
+    @pytest.fixture
+    def s3_client(self, tmp_path: Path) -> LocalS3Client:
+        return LocalS3Client(tmp_path)
+
+    @pytest.fixture
+    def archiver(self, connection_pool, s3_client: LocalS3Client) -> Generator[Archiver, None, None]:
+        archiver = Archiver(archive_date=unused_day(), db=DBClient(db=connection_pool), s3_client=s3_client)
+        yield archiver
+        cleanup_day(archiver)
+
+    def test_checkpoint_saved(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        NotifByUserHistoryFactory.create_batch_sync(2, created=archiver.archive_date)
+
+        archiver.run()
+
+        checkpoint = find_model(session, ArchiveExportCheckpoint, day=archiver.archive_date)
+        assert (checkpoint.part, checkpoint.object_key, checkpoint.rows) == (1, archiver.object_key, 2)
+        assert (
+            checkpoint.bytes
+            == s3_client.object_path(get_app_config().aws_backup_bucket_name, archiver.object_key).stat().st_size
+        )
+        assert checkpoint.deleted
+
+    def test_resume_uploaded_day(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        """the previous run uploaded the day and stopped before the deletion — no new export"""
+        notif = NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+        assert archiver._export_to_s3() == 1
+        archiver.db.save_export_checkpoint(
+            ExportCheckpoint(
+                'notif_by_user__history',
+                archiver.archive_date,
+                1,
+                archiver.object_key,
+                1,
+                archiver.uploaded_bytes,
+                max_message_id=notif.message_id,
+            )
+        )
+        late = NotifByUserHistoryFactory.create_sync(
+            created=archiver.archive_date, message_id=notif.message_id + 100_000
         )
-        data = archiver._unload_records_to_csv_zip()
+        s3_client.requests.clear()
 
-        assert data is not None
-        assert isinstance(data, io.BytesIO)
+        archiver.run()
 
-        assert find_model(session, NotifByUserHistory, message_id=first_notif.message_id)
-        archiver._delete_old_records()
-        assert not find_model(session, NotifByUserHistory, message_id=first_notif.message_id)
+        assert s3_client.requests == ['head_object']
+        assert not find_model(session, NotifByUserHistory, message_id=notif.message_id, created=notif.created)
+        assert find_model(session, NotifByUserHistory, message_id=late.message_id)  # not in the upload
+        assert find_model(session, ArchiveExportCheckpoint, day=archiver.archive_date).deleted
 
-    def test_no_records(self, archiver: Archiver):
-        """records are not enough old to unload"""
+    def test_lost_upload_exported_again(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        notif = NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+        archiver.db.save_export_checkpoint(
+            ExportCheckpoint(
+                'notif_by_user__history', archiver.archive_date, 1, archiver.object_key, 1, 100, notif.message_id
+            )
+        )
 
-        NotifByUserHistoryFactory.create_sync(created=archiver.archive_date - timedelta(days=1))
-        data = archiver._unload_records_to_csv_zip()
-        assert data is None
+        archiver.run()
 
-    def test_backup_file_upload(self, archiver: Archiver):
-        """upload zipped BytesIO to s3 storage"""
+        assert s3_client.requests == ['head_object', 'put_object', 'head_object']
+        assert find_model(session, ArchiveExportCheckpoint, day=archiver.archive_date).deleted
 
-        buf = io.BytesIO(b'fake,compressed,data')
-        archiver._move_to_s3(buf)
-        archiver.s3_client.upload_fileobj.assert_called_once()
+    def test_late_records_go_to_next_part(self, archiver: Archiver, s3_client: LocalS3Client):
+        NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+        archiver.run()
+        first_key = archiver.object_key
 
-    @patch('archive_to_bigquery.main.BATCH_SIZE', 2)
-    def test_batch_unload(self, archiver: Archiver):
-        """unload more records than batch size — verifies keyset pagination"""
+        NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+        archiver.run()
 
-        batch_override = 2
-        records_count = batch_override * 2 + 1  # 5 records, 3 batches
+        assert archiver.part == 2
+        assert archiver.object_key != first_key
+        bucket = get_app_config().aws_backup_bucket_name
+        assert s3_client.object_path(bucket, first_key).exists()
+        assert s3_client.object_path(bucket, archiver.object_key).exists()
 
-        NotifByUserHistoryFactory.create_batch_sync(records_count, created=archiver.archive_date)
+    def test_not_verified_upload_keeps_records(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        notif = NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
 
-        data = archiver._unload_records_to_csv_zip()
+        with (
+            patch.object(s3_client, 'head_object', return_value={'ContentLength': 0}),
+            pytest.raises(UploadNotVerifiedError),
+        ):
+            archiver.run()
 
-        assert data is not None
+        assert find_model(session, NotifByUserHistory, message_id=notif.message_id)
+        assert not find_model(session, ArchiveExportCheckpoint, day=archiver.archive_date).deleted
 
-        with ZipFile(data) as zf:
-            csv_entry = archiver._csv_entry_name
-            assert csv_entry in zf.namelist()
-            with zf.open(csv_entry) as csv_file:
-                reader = csv.reader(io.TextIOWrapper(csv_file, encoding='utf-8'))
-                rows = list(reader)
 
-        assert len(rows) == 1 + records_count  # header + data
+class TestRunArchivers:
+    def test_failed_day_does_not_stop_others(self):
+        archivers = [Mock(), Mock(), Mock()]
+        archivers[1].export.side_effect = ConnectionError
+
+        stats = run_archivers(archivers, workers=2)
+
+        assert (stats.done, stats.failed, stats.postponed) == (2, 1, 0)
+        assert all(archiver.export.called for archiver in archivers)
+        assert not archivers[1].delete_exported.called
+
+    def test_days_out_of_time_budget_are_postponed(self):
+        archivers = [Mock(), Mock()]
+
+        stats = run_archivers(archivers, workers=2, time_budget_seconds=-1)
+
+        assert (stats.done, stats.postponed) == (0, 2)
+        assert not any(archiver.export.called for archiver in archivers)
+
+    def test_days_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        archivers = [Mock(export=barrier.wait) for _ in range(3)]
+
+        stats = run_archivers(archivers, workers=3)
+
+        assert stats.done == 3
+
+    def test_records_deleted_after_all_exports(self):
+        """deletion drops partitions, it must not wait for the exports of other days"""
+        calls = []
+        archivers = [Mock(), Mock(), Mock(export=Mock(return_value=False))]
+        for n, archiver in enumerate(archivers):
+            archiver.export.side_effect = lambda n=n: calls.append(('export', n)) or n < 2
+            archiver.delete_exported.side_effect = lambda n=n: calls.append(('delete', n))
+
+        stats = run_archivers(archivers, workers=3)
+
+        assert stats.done == 3
+        assert sorted(calls[:3]) == [('export', 0), ('export', 1), ('export', 2)]
+        assert sorted(calls[3:]) == [('delete', 0), ('delete', 1)]
+
+
+class TestDailyPartitions:
+    """days of the HISTORY_PARTITION_DAYS_BACK window are stored in their own partitions"""
+
+    @pytest.fixture
+    def s3_client(self, tmp_path: Path) -> LocalS3Client:
+        return LocalS3Client(tmp_path)
+
+    @pytest.fixture
+    def db(self, connection_pool) -> DBClient:
+        return DBClient(db=connection_pool)
+
+    @pytest.fixture
+    def days(self, db: DBClient, session: Session) -> Generator[list[date], None, None]:
+        """days far in the future, out of the dates of other tests, with their partitions"""
+        first = date(2200, 1, 1) + timedelta(days=random.randint(0, 100_000))
+        days = [first + timedelta(days=i) for i in range(4)]
+        for day in days:
+            db.create_range_partition(
+                NOTIF_BY_USER_HISTORY, notif_history_partition(day), 'created', day, day + timedelta(days=1)
+            )
+        yield days
+
+        session.rollback()  # its reads lock the history table, dropping a partition would wait for them
+        with db.connect() as conn:
+            for day in days:
+                conn.execute(text(f'DROP TABLE IF EXISTS {notif_history_partition(day)}'))
+            conn.execute(text('DELETE FROM notif_by_user__history WHERE created >= :day_from'), dict(day_from=days[0]))
+            conn.execute(text('DELETE FROM archive_export_checkpoints WHERE day >= :day_from'), dict(day_from=days[0]))
+
+    def partitions(self, db: DBClient) -> set[str]:
+        return {partition.name for partition in db.get_range_partitions(NOTIF_BY_USER_HISTORY)}
+
+    def test_partitions_dropped_after_concurrent_exports(
+        self, db: DBClient, s3_client: LocalS3Client, session: Session, days: list[date]
+    ):
+        notifs = [NotifByUserHistoryFactory.create_sync(created=day) for day in days]
+        archivers = [Archiver(archive_date=day, db=db, s3_client=s3_client) for day in days]
+
+        stats = run_archivers(archivers, workers=4)
+
+        assert (stats.done, stats.failed) == (len(days), 0)
+        assert not {notif_history_partition(day) for day in days} & self.partitions(db)
+        assert not any(
+            find_model(session, NotifByUserHistory, message_id=notif.message_id, created=notif.created)
+            for notif in notifs
+        )
+
+    def test_dropped_partition_is_not_recreated(self, db: DBClient, s3_client: LocalS3Client, days: list[date]):
+        """archive_notifications ensures the partitions of the last days, an exported day stays dropped"""
+        day = days[0]
+        NotifByUserHistoryFactory.create_sync(created=day)
+        archiver = Archiver(archive_date=day, db=db, s3_client=s3_client)
+        assert archiver.export()
+        archiver.delete_exported()
+
+        created = db.ensure_notif_history_partitions(days[-1])
+        db_partitions = self.partitions(db)
+        with db.connect() as conn:
+            for name in created:
+                conn.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+        assert notif_history_partition(day) not in created
+        assert notif_history_partition(day) not in db_partitions
+        assert notif_history_partition(days[-1] + timedelta(days=1)) in created
+
+    def test_records_not_in_upload_are_kept(self, db: DBClient, s3_client: LocalS3Client, session: Session, days):
+        """a record that arrived after the export is moved out of the dropped partition to the next part"""
+        day = days[0]
+        notif = NotifByUserHistoryFactory.create_sync(created=day)
+        archiver = Archiver(archive_date=day, db=db, s3_client=s3_client)
+        assert archiver.export()
+        late = NotifByUserHistoryFactory.create_sync(created=day, message_id=notif.message_id + 100_000)
+
+        archiver.delete_exported()
+
+        assert notif_history_partition(day) not in self.partitions(db)
+        assert not find_model(session, NotifByUserHistory, message_id=notif.message_id, created=notif.created)
+        assert find_model(session, NotifByUserHistory, message_id=late.message_id)
+
+    def test_busy_history_deleted_without_dropping_partition(
+        self, db: DBClient, s3_client: LocalS3Client, session: Session, connection_pool, days: list[date]
+    ):
+        day = days[0]
+        notif = NotifByUserHistoryFactory.create_sync(created=day)
+        archiver = Archiver(archive_date=day, db=db, s3_client=s3_client)
+        assert archiver.export()
+
+        with connection_pool.connect() as reader, patch.object(main_module, 'PARTITION_LOCK_TIMEOUT', '100ms'):
+            # archive_notifications moving records to the history
+            reader.execute(text('LOCK TABLE notif_by_user__history IN ROW EXCLUSIVE MODE'))
+            archiver.delete_exported()
+            reader.rollback()
+
+        assert notif_history_partition(day) in self.partitions(db)
+        assert not find_model(session, NotifByUserHistory, message_id=notif.message_id, created=notif.created)
+        assert find_model(session, ArchiveExportCheckpoint, day=day).deleted
+
+
+class TestS3UploadStream:
+    def test_small_object_uploaded_at_once(self, tmp_path: Path):
+        s3_client = LocalS3Client(tmp_path)
+        with S3UploadStream(s3_client, 'bucket', 'key', part_size=10) as upload:
+            upload.write(b'12345')
+
+        assert s3_client.requests == ['put_object']
+        assert s3_client.object_path('bucket', 'key').read_bytes() == b'12345'
+
+    def test_parts(self, tmp_path: Path):
+        s3_client = LocalS3Client(tmp_path)
+        with S3UploadStream(s3_client, 'bucket', 'key', part_size=10) as upload:
+            for _ in range(5):
+                upload.write(b'1234567')
+
+        assert s3_client.requests.count('upload_part') == 4  # 3 full parts and the rest
+        assert s3_client.object_path('bucket', 'key').read_bytes() == b'1234567' * 5
+        assert upload.bytes_uploaded == 35
+
+
+class TestParquetExport:
+    @pytest.fixture
+    def s3_client(self, tmp_path: Path) -> LocalS3Client:
+        return LocalS3Client(tmp_path)
+
+    @pytest.fixture
+    def archiver(self, connection_pool, s3_client: LocalS3Client) -> Generator[Archiver, None, None]:
+        archiver = Archiver(
+            archive_date=unused_day(),
+            db=DBClient(db=connection_pool),
+            s3_client=s3_client,
+            export_format='parquet',
+        )
+        yield archiver
+        cleanup_day(archiver)
+
+    def read_archive(self, archiver: Archiver, s3_client: LocalS3Client) -> pq.ParquetFile:
+        return pq.ParquetFile(
+            s3_client.object_path(
+                get_app_config().aws_backup_bucket_name, f'{archiver.s3_prefix}/{archiver._unload_file_name}'
+            )
+        )
+
+    def test_records_exported_and_deleted(self, archiver: Archiver, s3_client: LocalS3Client, session: Session):
+        notifs = NotifByUserHistoryFactory.create_batch_sync(3, created=archiver.archive_date, message_type='status')
+
+        archiver.run()
+
+        assert archiver._unload_file_name.endswith('.parquet')
+        table = self.read_archive(archiver, s3_client).read()
+        assert table.column('message_id').to_pylist() == sorted(notif.message_id for notif in notifs)
+        assert table.column('message_type').to_pylist() == ['status'] * 3
+        assert {created.date() for created in table.column('created').to_pylist()} == {archiver.archive_date}
+        assert not find_model(session, NotifByUserHistory, message_id=notifs[0].message_id, created=notifs[0].created)
+
+    def test_typed_schema(self, archiver: Archiver, s3_client: LocalS3Client):
+        NotifByUserHistoryFactory.create_sync(created=archiver.archive_date)
+
+        archiver._export_to_s3()
+
+        schema = self.read_archive(archiver, s3_client).schema_arrow
+        assert schema.field('message_id').type == pa.int64()
+        assert schema.field('change_log_id').type == pa.int32()
+        assert schema.field('created').type == pa.timestamp('us')
+        assert schema.field('message_type').type == pa.string()
+        assert not schema.field('messenger').nullable
+
+    def test_row_groups_and_dictionary_encoding(self, archiver: Archiver, s3_client: LocalS3Client):
+        records_count = 5
+        NotifByUserHistoryFactory.create_batch_sync(records_count, created=archiver.archive_date)
+
+        with patch('archive_to_bigquery.main.ROW_GROUP_SIZE', 2):
+            assert archiver._export_to_s3() == records_count
+
+        metadata = self.read_archive(archiver, s3_client).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2, 1]
+        columns = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        row_group = metadata.row_group(0)
+        encodings = {name: row_group.column(i).encodings for i, name in enumerate(columns)}
+        assert 'RLE_DICTIONARY' in encodings['message_type']
+        assert 'RLE_DICTIONARY' in encodings['messenger']
+        assert 'RLE_DICTIONARY' not in encodings['message_text']
@@ -1,71 +1,119 @@
 """Tests for check_topics_by_upd_time._legacy.main.
 
-Covers FolderComparator, process_folder timestamp skip logic,
-get_updated_root_folders, save_root_timestamps, and main().
+Covers changed_subfolders, folder snapshots, process_folder timestamp skip logic,
+the crawl of nested folders, get_updated_root_folders, save_root_timestamps, and main().
 """
 
 import datetime
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import patch
 
 import pytest
 
 from check_topics_by_upd_time._legacy.main import (
     DecomposedFolder,
-    FolderComparator,
     FolderForDecompose,
+    FolderSnapshot,
     FolderUpdateChecker,
     KeyValueStorage,
+    Search,
     Subfolder,
+    changed_subfolders,
+    get_db_client,
     get_updated_root_folders,
+    get_updates_of_nested_folders,
     process_folder,
     save_root_timestamps,
 )
+from tests.factories import db_factories
 
 pytestmark = pytest.mark.xdist_group('legacy_db')
 
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# FolderComparator — pure logic
-# ═══════════════════════════════════════════════════════════════════════════════
+def _subfolders(*items: tuple[int, str]) -> set[Subfolder]:
+    return {Subfolder(folder_num=num, change_time_str=time) for num, time in items}
 
 
-class TestFolderComparator:
-    """FolderComparator returns int folder nums (from ast.literal_eval).
+def _folder_num() -> int:
+    return db_factories.faker.unique.pyint(min_value=1_000_000, max_value=9_999_999)
 
-    A folder that exists in old but NOT in new appears as "changed" because
-    its old timestamp != the empty string in the comparison matrix.
-    """
 
-    @staticmethod
-    def _list(*items: tuple[str, str]) -> str:
-        return str([Subfolder(folder_num=int(k), change_time_str=v) for k, v in items])
+# ═══════════════════════════════════════════════════════════════════════════════
+# changed_subfolders — pure logic
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class TestChangedSubfolders:
+    """A folder that exists in old but NOT in new appears as "changed"."""
 
     def test_new_folders_all_returned(self):
-        assert FolderComparator().compare_folders(self._list(('100', 't1'), ('200', 't2')), None) == [100, 200]
+        assert changed_subfolders(_subfolders((100, 't1'), (200, 't2')), set()) == [100, 200]
 
     def test_no_changes_returns_empty(self):
-        s = self._list(('100', 't1'))
-        assert FolderComparator().compare_folders(s, s) == []
+        assert changed_subfolders(_subfolders((100, 't1')), _subfolders((100, 't1'))) == []
 
     def test_new_folder_added(self):
-        old = self._list(('100', 't1'))
-        new = self._list(('100', 't1'), ('200', 't2'))
-        assert FolderComparator().compare_folders(new, old) == [200]
+        assert changed_subfolders(_subfolders((100, 't1'), (200, 't2')), _subfolders((100, 't1'))) == [200]
 
     def test_removed_folder_appears_as_changed(self):
-        old = self._list(('100', 't1'), ('200', 't2'))
-        new = self._list(('100', 't1'))
-        assert FolderComparator().compare_folders(new, old) == [200]
+        assert changed_subfolders(_subfolders((100, 't1')), _subfolders((100, 't1'), (200, 't2'))) == [200]
 
     def test_timestamp_changed(self):
-        old = self._list(('100', 't1'))
-        new = self._list(('100', 't2'))
-        assert FolderComparator().compare_folders(new, old) == [100]
+        assert changed_subfolders(_subfolders((100, 't2')), _subfolders((100, 't1'))) == [100]
 
     def test_mixed(self):
-        old = self._list(('100', 't1'), ('200', 't2'), ('300', 't3'))
-        new = self._list(('100', 't1'), ('200', 'tc'), ('400', 't4'))
-        assert sorted(FolderComparator().compare_folders(new, old)) == [200, 300, 400]
+        old = _subfolders((100, 't1'), (200, 't2'), (300, 't3'))
+        new = _subfolders((100, 't1'), (200, 'tc'), (400, 't4'))
+        assert changed_subfolders(new, old) == [200, 300, 400]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Folder snapshots in the DB
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class TestFolderSnapshot:
+    def test_never_crawled(self):
+        assert get_db_client().get_folder_snapshot(_folder_num()) is None
+
+    def test_saved_snapshot(self):
+        folder_num, child_num = _folder_num(), _folder_num()
+        folder = DecomposedFolder(
+            subfolders=[Subfolder(child_num, 't1')],
+            searches=[Search('Пропал Иванов', 't2'), Search('Пропал Иванов', 't2')],
+            folder_name='Центральный',
+        )
+
+        get_db_client().save_folder_snapshot(folder_num, folder)
+
+        assert get_db_client().get_folder_snapshot(folder_num) == FolderSnapshot(
+            subfolders={Subfolder(child_num, 't1')}, searches={Search('Пропал Иванов', 't2')}
+        )
+
+    def test_removed_subfolder_is_detached(self):
+        folder_num, kept_num, removed_num = _folder_num(), _folder_num(), _folder_num()
+        db = get_db_client()
+        db.save_folder_snapshot(
+            folder_num, DecomposedFolder([Subfolder(kept_num, 't1'), Subfolder(removed_num, 't1')], [], '')
+        )
+
+        db.save_folder_snapshot(folder_num, DecomposedFolder([Subfolder(kept_num, 't2')], [], ''))
+
+        assert db.get_folder_snapshot(folder_num).subfolders == {Subfolder(kept_num, 't2')}
+
+    def test_legacy_snapshot_is_read_and_replaced(self):
+        folder_num, child_num = _folder_num(), _folder_num()
+        db = get_db_client()
+        db.set_key_value_item(f'folders_{folder_num}', str([[child_num, 't1']]))
+        db.set_key_value_item(f'searches_{folder_num}', str([["Пропала Петрова 'Аня'", 't2']]))
+
+        assert db.get_folder_snapshot(folder_num) == FolderSnapshot(
+            subfolders={Subfolder(child_num, 't1')}, searches={Search("Пропала Петрова 'Аня'", 't2')}
+        )
+
+        db.save_folder_snapshot(folder_num, DecomposedFolder([], [], ''))
+        assert db.get_key_value_item(f'folders_{folder_num}') is None
+        assert db.get_folder_snapshot(folder_num) == FolderSnapshot(subfolders=set(), searches=set())
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -77,7 +125,6 @@ class TestProcessFolderTimestampSkip:
     """process_folder should skip HTTP fetch when the folder timestamp hasn't changed.
 
     The skip check works on the *in-memory* folder_timestamps dict.
-    storage is mocked to avoid DB / HTTP dependencies.
     """
 
     def _run(self, folder, folder_timestamps=None, child_subfolders=None):
@@ -86,13 +133,6 @@ class TestProcessFolderTimestampSkip:
         if child_subfolders is None:
             child_subfolders = [Subfolder(folder_num=111, change_time_str='child_ts')]
 
-        folders_to_check: list = []
-        updated_folders: list = []
-        storage = MagicMock(spec=KeyValueStorage)
-        # storage.read_folders / read_searches must return strings for FolderComparator
-        storage.read_folders.return_value = None
-        storage.read_searches.return_value = None
-
         with patch('check_topics_by_upd_time._legacy.main.FolderDecomposer', autospec=True) as mock_cls:
             inst = mock_cls.return_value
             inst.decompose_folder.return_value = DecomposedFolder(
@@ -100,56 +140,146 @@ class TestProcessFolderTimestampSkip:
                 searches=[],
                 folder_name='test',
             )
-            process_folder(folders_to_check, updated_folders, folder, storage, folder_timestamps)
+            checked = process_folder(folder, folder_timestamps)
 
-        return folders_to_check, updated_folders, inst
+        return checked, inst
 
     def test_skip_when_timestamp_matches(self):
         """Saved ts == mother_folder_timestamp → skip."""
-        folders_to_check, updated_folders, mock_inst = self._run(
+        checked, mock_inst = self._run(
             FolderForDecompose(mother_folder_num='123', mother_folder_timestamp='ts1'),
             {'123': 'ts1'},
         )
         mock_inst.decompose_folder.assert_not_called()
-        assert folders_to_check == []
-        assert updated_folders == []
+        assert checked is None
 
     def test_process_when_no_timestamp(self):
         """mother_folder_timestamp is None → process."""
-        folders_to_check, updated_folders, mock_inst = self._run(
-            FolderForDecompose(mother_folder_num='999', mother_folder_timestamp=None),
+        folder_num = str(_folder_num())
+        checked, mock_inst = self._run(
+            FolderForDecompose(mother_folder_num=folder_num, mother_folder_timestamp=None),
         )
-        mock_inst.decompose_folder.assert_called_once_with('999')
-        assert len(folders_to_check) == 1
+        mock_inst.decompose_folder.assert_called_once_with(folder_num)
+        assert len(checked.subfolders_to_check) == 1
 
     def test_process_when_timestamp_mismatch(self):
         """Saved ts != mother_folder_timestamp → process."""
-        folders_to_check, updated_folders, mock_inst = self._run(
-            FolderForDecompose(mother_folder_num='789', mother_folder_timestamp='ts_new'),
-            {'789': 'ts_old'},
+        folder_num = str(_folder_num())
+        checked, mock_inst = self._run(
+            FolderForDecompose(mother_folder_num=folder_num, mother_folder_timestamp='ts_new'),
+            {folder_num: 'ts_old'},
         )
         mock_inst.decompose_folder.assert_called_once()
 
-    def test_saves_timestamp_after_process(self):
-        """After processing, folder_timestamps gets the folder's timestamp."""
-        ts: dict = {}
-        self._run(
-            FolderForDecompose(mother_folder_num='111', mother_folder_timestamp='ts_new'),
-            ts,
-        )
-        assert ts.get('111') == 'ts_new'
-
     def test_queues_subfolders_with_timestamps(self):
-        folder = FolderForDecompose(mother_folder_num='555', mother_folder_timestamp='ts_parent')
+        folder = FolderForDecompose(mother_folder_num=str(_folder_num()), mother_folder_timestamp='ts_parent')
         children = [
             Subfolder(folder_num=111, change_time_str='child_ts1'),
             Subfolder(folder_num=222, change_time_str='child_ts2'),
         ]
-        folders_to_check, *_ = self._run(folder, child_subfolders=children)
-        assert folders_to_check[0].mother_folder_num == '111'
-        assert folders_to_check[0].mother_folder_timestamp == 'child_ts1'
-        assert folders_to_check[1].mother_folder_num == '222'
-        assert folders_to_check[1].mother_folder_timestamp == 'child_ts2'
+        checked, _ = self._run(folder, child_subfolders=children)
+        assert checked.subfolders_to_check[0].mother_folder_num == '111'
+        assert checked.subfolders_to_check[0].mother_folder_timestamp == 'child_ts1'
+        assert checked.subfolders_to_check[1].mother_folder_num == '222'
+        assert checked.subfolders_to_check[1].mother_folder_timestamp == 'child_ts2'
+
+    def test_unchanged_subfolders_not_queued(self):
+        folder = FolderForDecompose(mother_folder_num=str(_folder_num()))
+        self._run(folder)
+
+        checked, _ = self._run(folder)
+
+        assert checked.subfolders_to_check == []
+        assert not checked.searches_changed
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# get_updates_of_nested_folders — crawl of a fake forum tree
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class FakeForum:
+    """folder pages by folder number; page_hooks run when a page is fetched"""
+
+    def __init__(self, tree: dict[int, DecomposedFolder]) -> None:
+        self.tree = tree
+        self.fetched: list[int] = []
+        self.page_hooks: dict[int, object] = {}
+
+    def decompose_folder(self, folder_num: str) -> DecomposedFolder:
+        self.fetched.append(int(folder_num))
+        hook = self.page_hooks.get(int(folder_num))
+        if hook:
+            hook()  # type: ignore[operator]
+        return self.tree[int(folder_num)]
+
+
+class TestGetUpdatesOfNestedFolders:
+    @pytest.fixture
+    def folder_timestamps(self):
+        saved: dict[str, str] = {}
+        with (
+            patch.object(KeyValueStorage, 'read_folder_timestamps', side_effect=lambda: dict(saved)),
+            patch.object(KeyValueStorage, 'write_folder_timestamps', side_effect=saved.update),
+        ):
+            yield saved
+
+    def _crawl(self, forum: FakeForum, roots: list[tuple[str, str]]) -> list:
+        with patch('check_topics_by_upd_time._legacy.main.FolderDecomposer') as decomposer:
+            decomposer.return_value.decompose_folder.side_effect = forum.decompose_folder
+            return get_updates_of_nested_folders(roots)
+
+    def _tree(self) -> tuple[list[int], dict[int, DecomposedFolder]]:
+        root, region, leaf_1, leaf_2 = (_folder_num() for _ in range(4))
+        tree = {
+            root: DecomposedFolder([Subfolder(region, 't1')], [], 'root'),
+            region: DecomposedFolder([Subfolder(leaf_1, 't1'), Subfolder(leaf_2, 't1')], [], 'region'),
+            leaf_1: DecomposedFolder([], [Search('search 1', 't1')], 'leaf 1'),
+            leaf_2: DecomposedFolder([], [Search('search 2', 't1')], 'leaf 2'),
+        }
+        return [root, region, leaf_1, leaf_2], tree
+
+    def test_incremental_crawl(self, folder_timestamps: dict):
+        (root, region, leaf_1, leaf_2), tree = self._tree()
+        forum = FakeForum(tree)
+
+        updated = self._crawl(forum, [(str(root), 'r1')])
+        assert sorted(updated) == sorted([(str(leaf_1), 'leaf 1'), (str(leaf_2), 'leaf 2')])
+        assert sorted(forum.fetched) == sorted([root, region, leaf_1, leaf_2])
+
+        # a new search in leaf 2 changes the times on the way to it
+        tree[root] = DecomposedFolder([Subfolder(region, 't2')], [], 'root')
+        tree[region] = DecomposedFolder([Subfolder(leaf_1, 't1'), Subfolder(leaf_2, 't2')], [], 'region')
+        tree[leaf_2] = DecomposedFolder([], [Search('search 2', 't1'), Search('search 3', 't2')], 'leaf 2')
+        forum.fetched.clear()
+
+        assert self._crawl(forum, [(str(root), 'r2')]) == [(str(leaf_2), 'leaf 2')]
+        assert forum.fetched == [root, region, leaf_2]
+        assert folder_timestamps[str(leaf_2)] == 't2'
+
+    def test_subfolders_do_not_wait_for_other_folders(self, folder_timestamps: dict):
+        """a slow root does not hold back the subtree of another root"""
+        (fast_root, region, leaf_1, leaf_2), tree = self._tree()
+        slow_root = _folder_num()
+        tree[slow_root] = DecomposedFolder([], [], 'slow root')
+        forum = FakeForum(tree)
+        leaf_fetched = threading.Event()
+        waited: list[bool] = []
+        forum.page_hooks[slow_root] = lambda: waited.append(leaf_fetched.wait(timeout=5))
+        forum.page_hooks[leaf_2] = leaf_fetched.set
+
+        self._crawl(forum, [(str(slow_root), 's1'), (str(fast_root), 'f1')])
+
+        assert waited == [True]
+
+    def test_failure_is_raised(self, folder_timestamps: dict):
+        (root, *_), tree = self._tree()
+        forum = FakeForum(tree)
+        forum.page_hooks[root] = lambda: 1 / 0
+
+        with pytest.raises(ZeroDivisionError):
+            self._crawl(forum, [(str(root), 'r1')])
+        assert folder_timestamps == {}
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
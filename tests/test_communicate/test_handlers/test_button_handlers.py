@@ -22,12 +22,13 @@ def tg_handler_context(db_client: DBClient, user_id: int) -> TGHandlerContext:
     )
 
 
-def test_compose_msg_on_user_setting_fullness(
-    session, db_client: DBClient, user_id: int, user_model: db_models.User, tg_handler_context: TGHandlerContext
-):
+def test_compose_msg_on_user_setting_fullness(session, db_client: DBClient, user_id: int, user_model: db_models.User):
     db_factories.UserPrefAgeFactory.create_sync(user_id=user_id)
 
-    message = button_handlers._compose_msg_on_user_setting_fullness(tg_handler_context, user_id)
+    settings_summary = db_client.get_user_settings_summary(user_id)
+    assert settings_summary is not None
+
+    message = button_handlers._compose_msg_on_user_setting_fullness(settings_summary)
 
     assert message is not None
     assert 'Вы настроили бот' in message
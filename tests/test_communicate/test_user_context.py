@@ -0,0 +1,60 @@
+from unittest.mock import patch
+
+from communicate._utils.common import UserInputState
+from communicate._utils.database import DBClient
+from tests.factories import db_factories
+
+
+def test_new_user(db_client: DBClient):
+    context = db_client.get_user_context(-db_factories.faker.pyint(min_value=1))
+
+    assert context.user_is_new
+    assert (context.onboarding_step_id, context.onboarding_step_name) == (0, 'start')
+    assert context.user_input_state is None
+
+
+def test_user_context(db_client: DBClient, user_id: int):
+    db_factories.UserOnboardingFactory.create_sync(user_id=user_id, step_id=21, step_name='region_set')
+    db_factories.UserRegionalPreferenceFactory.create_sync(user_id=user_id, forum_folder_num=276)
+    db_factories.CommunicationsLastInlineMsgFactory.create_sync(user_id=user_id, message_id=42)
+    db_client.set_user_input_state(user_id, UserInputState.radius_input)
+
+    context = db_client.get_user_context(user_id)
+
+    assert not context.user_is_new
+    assert (context.onboarding_step_id, context.onboarding_step_name) == (21, 'region_set')
+    assert context.user_input_state == UserInputState.radius_input
+    assert context.inline_message_ids == [42]
+    assert context.regions == [276]
+
+
+def test_onboarded_user_is_cached(db_client: DBClient, user_id: int):
+    db_factories.UserOnboardingFactory.create_sync(user_id=user_id, step_id=80, step_name='finished')
+    db_client.get_user_context(user_id)
+
+    with patch.object(db_client, '_cache_profile') as cache_profile:
+        context = db_client.get_user_context(user_id)
+
+    cache_profile.assert_not_called()
+    assert context.onboarding_step_id == 80
+    # dialog data is read on every update
+    db_client.set_user_input_state(user_id, UserInputState.input_of_coords_man)
+    assert db_client.get_user_context(user_id).user_input_state == UserInputState.input_of_coords_man
+
+
+def test_onboarding_user_is_not_cached(db_client: DBClient, user_id: int):
+    db_factories.UserOnboardingFactory.create_sync(user_id=user_id, step_id=21, step_name='region_set')
+    db_client.get_user_context(user_id)
+
+    db_client.save_onboarding_step(user_id, 'finished')
+
+    assert db_client.get_user_context(user_id).onboarding_step_id == 80
+
+
+def test_cache_invalidated_on_write(db_client: DBClient, user_id: int):
+    db_factories.UserOnboardingFactory.create_sync(user_id=user_id, step_id=80, step_name='finished')
+    db_client.get_user_context(user_id)
+
+    db_client.save_onboarding_step(user_id, 'unrecognized')
+
+    assert db_client.get_user_context(user_id).onboarding_step_id == 99
@@ -328,6 +328,7 @@ class TestNotificationMaker:
             session.execute(
                 select(db_models.NotifByUser).filter(
                     db_models.NotifByUser.change_log_id == record.change_log_id,
+                    db_models.NotifByUser.user_id.in_([user_both.user_id, user_tg.user_id]),
                 )
             )
             .scalars()
@@ -438,3 +439,22 @@ class TestNotificationMaker:
         vk_notifs = [n for n in notifs if n.user_id == user_vk.user_id]
         assert len(vk_notifs) == 1
         assert vk_notifs[0].messenger == 'vk'
+
+    def test_record_notification_statistics(self, db_client: DBClient, session: Session):
+        existing_user_id, new_user_id = random.sample(range(10_000_000, 99_999_999), 2)
+        session.add(db_models.UserStat(user_id=existing_user_id, num_of_new_search_notifs=5))
+        session.commit()
+
+        record = LineInChangeLogFactory.build(change_type=ChangeType.topic_new, topic_type_id=TopicType.search_regular)
+        composer = NotificationMaker(db_client, record, [])
+        composer.stat_recipients.update([existing_user_id, new_user_id, new_user_id])
+        composer.record_notification_statistics()
+
+        stats = dict(
+            session.execute(
+                select(db_models.UserStat.user_id, db_models.UserStat.num_of_new_search_notifs).filter(
+                    db_models.UserStat.user_id.in_([existing_user_id, new_user_id])
+                )
+            ).all()
+        )
+        assert stats == {existing_user_id: 6, new_user_id: 2}
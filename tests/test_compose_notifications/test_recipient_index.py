@@ -0,0 +1,153 @@
+import random
+import threading
+
+import pytest
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from _dependencies.common.commons import ChangeType, SearchFollowingMode, TopicType
+from compose_notifications._utils.database import DBClient
+from compose_notifications._utils.recipient_index import check_recipient_index, compare_recipients
+from tests.factories import db_factories, db_models
+from tests.test_compose_notifications.test_users_list_composer import create_user_with_preferences
+
+
+@pytest.fixture
+def db_client() -> DBClient:
+    return DBClient()
+
+
+@pytest.fixture
+def forum_folder() -> int:
+    return random.randint(1_000_000, 2_000_000_000)
+
+
+def _recipient_ids(db_client: DBClient, forum_folder: int, change_type: ChangeType, search_num: int = 0) -> set[int]:
+    rows = db_client.compose_users_list_for_change_log(
+        change_type=change_type,
+        forum_folder=forum_folder,
+        topic_type_id=TopicType.search_regular,
+        forum_search_num=search_num,
+        following_mode_on=SearchFollowingMode.ON,
+    )
+    return {row[0] for row in rows}
+
+
+def test_index_matches_full_scan(db_client: DBClient, forum_folder: int):
+    search_num = random.randint(1_000_000, 2_000_000_000)
+    other_folder = forum_folder + 1
+
+    create_user_with_preferences(
+        pref_ids=[ChangeType.all], topic_type_ids=[TopicType.all], forum_folder_ids=[forum_folder]
+    )
+    create_user_with_preferences(
+        pref_ids=[ChangeType.topic_new, ChangeType.topic_inforg_comment_new],
+        topic_type_ids=[TopicType.search_regular, TopicType.event],
+        forum_folder_ids=[forum_folder, other_folder],
+        user_coordinates=('55.75', '37.61'),
+        age_periods=[(0, 6), (21, 50)],
+        radius=100,
+    )
+    create_user_with_preferences(
+        pref_ids=[ChangeType.topic_status_change],
+        topic_type_ids=[TopicType.search_reverse],
+        forum_folder_ids=[forum_folder, forum_folder],
+    )
+    create_user_with_preferences(
+        pref_ids=[ChangeType.all], topic_type_ids=[TopicType.all], forum_folder_ids=[forum_folder], status='blocked'
+    )
+    follower = create_user_with_preferences(
+        pref_ids=[9], topic_type_ids=[TopicType.all], forum_folder_ids=[forum_folder]
+    )
+    db_factories.UserPrefSearchFilteringFactory.create_sync(user_id=follower.user_id, filter_name=['whitelist'])
+    db_factories.UserPrefSearchWhitelistFactory.create_sync(
+        user=follower, search_id=search_num, search_following_mode=SearchFollowingMode.ON
+    )
+
+    assert check_recipient_index(db_client, forum_folder, search_num) == []
+    assert check_recipient_index(db_client, other_folder, search_num) == []
+    assert follower.user_id in _recipient_ids(db_client, forum_folder, ChangeType.topic_comment_new, search_num)
+
+
+def test_index_follows_settings_changes(db_client: DBClient, forum_folder: int, session: Session):
+    user = create_user_with_preferences(
+        pref_ids=[ChangeType.topic_new], topic_type_ids=[TopicType.search_regular], forum_folder_ids=[forum_folder]
+    )
+    assert _recipient_ids(db_client, forum_folder, ChangeType.topic_new) == {user.user_id}
+
+    session.execute(
+        update(db_models.UserPreference)
+        .where(db_models.UserPreference.user_id == user.user_id)
+        .values(pref_id=ChangeType.topic_comment_new)
+    )
+    session.commit()
+    assert _recipient_ids(db_client, forum_folder, ChangeType.topic_new) == set()
+    assert _recipient_ids(db_client, forum_folder, ChangeType.topic_comment_new) == {user.user_id}
+
+    session.execute(update(db_models.User).where(db_models.User.user_id == user.user_id).values(status='blocked'))
+    session.commit()
+    assert _recipient_ids(db_client, forum_folder, ChangeType.topic_comment_new) == set()
+
+    session.execute(update(db_models.User).where(db_models.User.user_id == user.user_id).values(status='unblocked'))
+    session.execute(
+        delete(db_models.UserRegionalPreference).where(db_models.UserRegionalPreference.user_id == user.user_id)
+    )
+    session.commit()
+    assert _recipient_ids(db_client, forum_folder, ChangeType.topic_comment_new) == set()
+    assert not session.execute(
+        select(db_models.NotifRecipientIndex).where(db_models.NotifRecipientIndex.user_id == user.user_id)
+    ).all()
+
+
+def test_compare_recipients_reports_stale_index(db_client: DBClient, forum_folder: int, session: Session):
+    user = create_user_with_preferences(
+        pref_ids=[ChangeType.topic_new], topic_type_ids=[TopicType.search_regular], forum_folder_ids=[forum_folder]
+    )
+    session.execute(delete(db_models.NotifRecipientIndex).where(db_models.NotifRecipientIndex.user_id == user.user_id))
+    session.commit()
+
+    diff = compare_recipients(db_client, ChangeType.topic_new, forum_folder, TopicType.search_regular, 0)
+
+    assert [row[0] for row in diff.missing] == [user.user_id]
+    assert not diff.extra
+
+    db_client.rebuild_recipient_index()
+    assert not compare_recipients(db_client, ChangeType.topic_new, forum_folder, TopicType.search_regular, 0)
+
+
+def test_concurrent_refreshes_of_one_user(forum_folder: int, connection_pool: Engine, session: Session):
+    """two transactions change settings of the same user at once: the index has the result of both"""
+    other_folder = forum_folder + 1
+    user = create_user_with_preferences(pref_ids=[ChangeType.topic_new], forum_folder_ids=[forum_folder])
+    errors: list[Exception] = []
+
+    def add_region() -> None:
+        try:
+            with connection_pool.connect() as conn:
+                conn.execute(
+                    insert(db_models.UserRegionalPreference).values(user_id=user.user_id, forum_folder_num=other_folder)
+                )
+                conn.commit()
+        except Exception as exc:
+            errors.append(exc)
+
+    with connection_pool.connect() as conn:
+        conn.execute(
+            insert(db_models.UserPrefTopicType).values(user_id=user.user_id, topic_type_id=TopicType.search_regular)
+        )
+        second = threading.Thread(target=add_region)
+        second.start()
+        second.join(0.5)
+        # the refresh of the second transaction waits until this one commits
+        assert second.is_alive()
+        conn.commit()
+    second.join()
+
+    assert not errors
+    rows = session.execute(
+        select(db_models.NotifRecipientIndex.forum_folder_num, db_models.NotifRecipientIndex.multi_folder).where(
+            db_models.NotifRecipientIndex.user_id == user.user_id
+        )
+    ).all()
+    assert sorted(rows) == [(forum_folder, True), (other_folder, True)]
@@ -2,7 +2,7 @@ import datetime
 
 from sqlalchemy.orm import Session
 
-from identify_updates_of_first_posts._utils.database import DBClient
+from identify_updates_of_first_posts._utils.database import DBClient, FirstPostVersion
 from tests.common import find_model
 from tests.factories import db_factories, db_models
 
@@ -121,21 +121,21 @@ class TestSaveCompactContent:
         assert new_model.content_compact == 'updated compact'
 
 
-class TestGetPreviousPageContent:
+class TestGetPreviousPageVersion:
     def test_returns_previous_content(self, db_client: DBClient):
-        db_factories.SearchFirstPostFactory.create_sync(
-            actual=False, content='previous content', search_id=123, timestamp=datetime.datetime(2024, 1, 1)
+        prev = db_factories.SearchFirstPostFactory.create_sync(
+            actual=False, content='previous content', timestamp=datetime.datetime(2024, 1, 1)
         )
         db_factories.SearchFirstPostFactory.create_sync(
-            actual=True, content='current content', search_id=123, timestamp=datetime.datetime(2024, 1, 2)
+            actual=True, content='current content', search_id=prev.search_id, timestamp=datetime.datetime(2024, 1, 2)
         )
 
-        result = db_client.get_previous_page_content(123)
+        result = db_client.get_previous_page_version(prev.search_id)
 
-        assert result == 'previous content'
+        assert result == FirstPostVersion(id=prev.id, content='previous content', line_hashes=None)
 
     def test_returns_none_when_no_previous(self, db_client: DBClient):
-        result = db_client.get_previous_page_content(999999999)
+        result = db_client.get_previous_page_version(999999999)
 
         assert result is None
 
@@ -151,6 +151,43 @@ class TestGetPreviousPageContent:
             actual=True, content='current', search_id=search_id, timestamp=datetime.datetime(2024, 1, 4)
         )
 
-        result = db_client.get_previous_page_content(search_id)
+        result = db_client.get_previous_page_version(search_id)
+
+        assert result.content == 'newer'
+
+    def test_skips_content_when_lines_are_stored(self, db_client: DBClient):
+        prev = db_factories.SearchFirstPostFactory.create_sync(
+            actual=False, content='previous', content_lines=['a'], content_line_hashes=['h']
+        )
+
+        result = db_client.get_previous_page_version(prev.search_id)
+
+        assert result.content is None
+        assert result.line_hashes == ['h']
+
+
+class TestSaveActualPageLines:
+    def test_updates_only_actual_post(self, db_client: DBClient, session: Session):
+        old_post = db_factories.SearchFirstPostFactory.create_sync(actual=False, content='old')
+        search_id = old_post.search_id
+        db_factories.SearchFirstPostFactory.create_sync(actual=True, content='new', search_id=search_id)
+
+        db_client.save_actual_page_lines(search_id, ['line 1', 'line 2'], ['h1', 'h2'])
+
+        old_model = find_model(session, db_models.SearchFirstPost, search_id=search_id, actual=False)
+        new_model = find_model(session, db_models.SearchFirstPost, search_id=search_id, actual=True)
+        assert old_model.content_lines is None
+        assert new_model.content_lines == ['line 1', 'line 2']
+        assert new_model.content_line_hashes == ['h1', 'h2']
+
+
+class TestGetPageLines:
+    def test_returns_lines_by_indexes_in_requested_order(self, db_client: DBClient):
+        post = db_factories.SearchFirstPostFactory.create_sync(
+            content_lines=['line 0', 'line 1', 'line 2'], content_line_hashes=['h0', 'h1', 'h2']
+        )
+
+        assert db_client.get_page_lines(post.id, [2, 0]) == ['line 2', 'line 0']
 
-        assert result == 'newer'
+    def test_empty_indexes(self, db_client: DBClient):
+        assert db_client.get_page_lines(1, []) == []
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+from identify_updates_of_first_posts._utils import line_diff
+from identify_updates_of_first_posts._utils.line_diff import LineDiff, diff_line_hashes, hash_lines
+
+
+def _diff(prev: list[str], curr: list[str]) -> LineDiff:
+    return diff_line_hashes(hash_lines(prev), hash_lines(curr))
+
+
+def test_no_changes():
+    assert _diff(['a', 'b', 'c'], ['a', 'b', 'c']) == LineDiff(deleted=[], added=[])
+
+
+def test_replaced_line():
+    assert _diff(['a', 'b', 'c'], ['a', 'x', 'c']) == LineDiff(deleted=[1], added=[1])
+
+
+def test_inserted_and_deleted_lines():
+    assert _diff(['a', 'b', 'c', 'd'], ['x', 'a', 'c', 'd', 'y']) == LineDiff(deleted=[1], added=[0, 4])
+
+
+def test_moved_line_is_reported_once():
+    assert _diff(['a', 'b', 'c', 'd'], ['b', 'c', 'd', 'a']) == LineDiff(deleted=[0], added=[3])
+
+
+def test_repeated_lines_without_anchors():
+    assert _diff(['-', 'a', '-', 'a'], ['-', 'a', '-', 'b', '-', 'a']) == LineDiff(deleted=[], added=[3, 4])
+
+
+def test_empty_versions():
+    assert _diff([], ['a']) == LineDiff(deleted=[], added=[0])
+    assert _diff(['a'], []) == LineDiff(deleted=[0], added=[])
+
+
+def test_long_post_with_many_small_edits():
+    """the work is linear in the length of the post: no quadratic matching of the whole versions"""
+    prev = [f'line {i}' for i in range(50_000)]
+    curr = [f'line {i} edited' if i % 100 == 0 else line for i, line in enumerate(prev)]
+
+    with (
+        patch.object(line_diff, '_find_anchors', wraps=line_diff._find_anchors) as find_anchors,
+        patch.object(
+            line_diff, '_diff_segment_without_anchors', wraps=line_diff._diff_segment_without_anchors
+        ) as without_anchors,
+    ):
+        result = _diff(prev, curr)
+
+    assert result.deleted == list(range(0, 50_000, 100))
+    assert result.added == list(range(0, 50_000, 100))
+    # lines scanned for anchors: both versions once, then the one-line gaps around the edits
+    scanned = sum((c.args[3] - c.args[2]) + (c.args[5] - c.args[4]) for c in find_anchors.call_args_list)
+    assert scanned <= 2 * (len(prev) + len(curr))
+    # every edit is a 1x1 gap matched by difflib
+    cells = [(c.args[3] - c.args[2]) * (c.args[5] - c.args[4]) for c in without_anchors.call_args_list]
+    assert len(cells) == 500 and max(cells) == 1
@@ -4,13 +4,18 @@ from unittest.mock import patch
 import pytest
 from sqlalchemy.orm import Session
 
+from _dependencies.common import pubsub
+from _dependencies.common.pubsub import Topics
+from _dependencies.forum.content import clean_up_content_2
 from identify_updates_of_first_posts import main
+from identify_updates_of_first_posts._utils.database import FirstPostVersion
+from identify_updates_of_first_posts._utils.line_diff import hash_lines
 from src.identify_updates_of_first_posts.main import (
     process_first_page_comparison,
     split_text_to_deleted_and_regular_parts,
 )
-from tests.common import get_event_with_data
-from tests.factories import db_factories
+from tests.common import find_model, get_event_with_data
+from tests.factories import db_factories, db_models
 
 
 def test_main():
@@ -64,12 +69,10 @@ class TestProcessFirstPageComparison:
             display_name='Test Name', status='Ищем', family_name='Family Name', age=30
         )
 
-        first_page_content_prev = '<p>Ищем человека</p>'
-        first_page_content_curr = '<p>Ищем человека</p>'
+        prev_version = FirstPostVersion(id=0, content='<p>Ищем человека</p>', line_hashes=None)
+        curr_lines = clean_up_content_2('<p>Ищем человека</p>')
 
-        changes = process_first_page_comparison(
-            db_client, search.search_forum_num, first_page_content_prev, first_page_content_curr
-        )
+        changes = process_first_page_comparison(db_client, search.search_forum_num, prev_version, curr_lines)
 
         assert not changes.message
         assert not changes.additions
@@ -80,12 +83,10 @@ class TestProcessFirstPageComparison:
             display_name='Test Name', status='Ищем', family_name='Family Name', age=30
         )
 
-        first_page_content_prev = '<p>Ищем человека</p>'
-        first_page_content_curr = '<p>Ищем человека. Найден жив.</p>'
+        prev_version = FirstPostVersion(id=0, content='<p>Ищем человека</p>', line_hashes=None)
+        curr_lines = clean_up_content_2('<p>Ищем человека. Найден жив.</p>')
 
-        changes = process_first_page_comparison(
-            db_client, search.search_forum_num, first_page_content_prev, first_page_content_curr
-        )
+        changes = process_first_page_comparison(db_client, search.search_forum_num, prev_version, curr_lines)
 
         assert changes is not None
         assert 'Добавлено:' in changes.message
@@ -95,15 +96,41 @@ class TestProcessFirstPageComparison:
         search = db_factories.SearchFactory.create_sync(
             display_name='Test Name', status='Завершен', family_name='Family Name', age=30
         )
-        first_page_content_prev = '<p>Ищем человека</p>'
-        first_page_content_curr = '<p>Ищем человека. Найден жив.</p>'
+        prev_version = FirstPostVersion(id=0, content='<p>Ищем человека</p>', line_hashes=None)
+        curr_lines = clean_up_content_2('<p>Ищем человека. Найден жив.</p>')
 
-        changes = process_first_page_comparison(
-            db_client, search.search_forum_num, first_page_content_prev, first_page_content_curr
-        )
+        changes = process_first_page_comparison(db_client, search.search_forum_num, prev_version, curr_lines)
 
         assert changes is None
 
+    def test_process_first_page_comparison_with_stored_lines(self, db_client):
+        search = db_factories.SearchFactory.create_sync(status='Ищем')
+        prev_lines = ['Ищем человека', 'Выезд в 10:00', 'Штаб: деревня']
+        prev_post = db_factories.SearchFirstPostFactory.create_sync(
+            actual=False,
+            search_id=search.search_forum_num,
+            content_lines=prev_lines,
+            content_line_hashes=hash_lines(prev_lines),
+        )
+        prev_version = FirstPostVersion(id=prev_post.id, content=None, line_hashes=hash_lines(prev_lines))
+        curr_lines = ['Ищем человека', 'Выезд в 12:00', 'Штаб: деревня']
+
+        changes = process_first_page_comparison(db_client, search.search_forum_num, prev_version, curr_lines)
+
+        assert changes.deletions == ['Выезд в 10:00']
+        assert changes.additions == ['Выезд в 12:00']
+
+
+def test_main_triggers_compose_once_only_with_new_change_log():
+    with patch.object(main, '_process_one_update') as process_mock, patch.object(pubsub, 'publish_to_pubsub') as pub:
+        main.main(get_event_with_data([1, 2, 3]), 'context')
+        pub.assert_not_called()
+
+        process_mock.side_effect = lambda change_log_ids, db, search_id: change_log_ids.append(search_id)
+        main.main(get_event_with_data([1, 2, 3]), 'context')
+        pub.assert_called_once()
+        assert pub.call_args.args[0] == Topics.topic_for_notification
+
 
 def test_empty_list_of_updated_searches():
     with patch('identify_updates_of_first_posts.main.process_pubsub_message', return_value=[]):
@@ -150,18 +177,39 @@ class TestProcessOneUpdate:
         assert len(change_log_ids) == 1
 
 
-def test__get_actual_and_previous_page_content(db_client):
-    prev_search_first_post = db_factories.SearchFirstPostFactory.create_sync(
-        actual=False, timestamp=datetime.datetime.now()
-    )
+def test__get_actual_page_lines(db_client, session: Session):
     search_first_post = db_factories.SearchFirstPostFactory.create_sync(
-        actual=True, timestamp=datetime.datetime.now(), search_id=prev_search_first_post.search_id
+        actual=True, timestamp=datetime.datetime.now(), content='<p>Ищем человека</p>\n<p>Выезд в 10:00</p>'
     )
-    db_factories.SearchFactory.create_sync(search_forum_num=prev_search_first_post.search_id, status='Ищем')
 
-    actual, prev = main._get_actual_and_previous_page_content(
-        db_client,
+    lines = main._get_actual_page_lines(db_client, search_id=search_first_post.search_id)
+
+    assert lines == ['Ищем человека', 'Выезд в 10:00']
+    model = find_model(session, db_models.SearchFirstPost, id=search_first_post.id)
+    assert model.content_lines == lines
+    assert model.content_line_hashes == hash_lines(lines)
+
+
+def test__process_one_update_uses_stored_lines_of_previous_version(db_client):
+    prev_lines = ['Ищем человека', 'Выезд в 10:00']
+    prev_search_first_post = db_factories.SearchFirstPostFactory.create_sync(
+        actual=False,
+        timestamp=datetime.datetime.now(),
+        content='<p>unparseable</p>',
+        content_lines=prev_lines,
+        content_line_hashes=hash_lines(prev_lines),
+    )
+    db_factories.SearchFirstPostFactory.create_sync(
+        actual=True,
+        timestamp=datetime.datetime.now(),
         search_id=prev_search_first_post.search_id,
+        content='<p>Ищем человека</p>\n<p>Выезд в 12:00</p>',
     )
-    assert prev == prev_search_first_post.content
-    assert actual == search_first_post.content
+    db_factories.SearchFactory.create_sync(search_forum_num=prev_search_first_post.search_id, status='Ищем')
+    change_log_ids = []
+
+    with patch.object(main, 'clean_up_content_2', wraps=main.clean_up_content_2) as clean_up_mock:
+        main._process_one_update(change_log_ids, db_client, prev_search_first_post.search_id)
+
+    clean_up_mock.assert_called_once_with('<p>Ищем человека</p>\n<p>Выезд в 12:00</p>')
+    assert len(change_log_ids) == 1
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from _dependencies.common import yandex_tools
+from tools.local_pubsub._utils.dispatcher import Delivery, LocalDispatcher, local_pubsub
+from tools.local_pubsub._utils.queues import InMemoryQueue, QueuedMessage, SQLiteQueue
+from tools.local_pubsub._utils.report import LatencyStats, build_report
+
+
+@pytest.mark.parametrize('queue_class', [InMemoryQueue, SQLiteQueue])
+def test_queue_is_fifo(queue_class):
+    queue = queue_class()
+    queue.put(QueuedMessage('topic_a', '1', trace_id='t1'))
+    queue.put(QueuedMessage('topic_b', '2'))
+
+    assert len(queue) == 2
+    first, second = queue.get(), queue.get()
+    assert (first.topic_name, first.body, first.trace_id) == ('topic_a', '1', 't1')
+    assert (second.topic_name, second.body, second.trace_id) == ('topic_b', '2', None)
+    assert queue.get() is None
+
+
+def test_sqlite_queue_enqueue_time_is_wall_clock(tmp_path):
+    """comparable with the time of another process reading the queue"""
+    path = str(tmp_path / 'queue.db')
+    before = time.time()
+    SQLiteQueue(path).put(QueuedMessage('topic_a', '1'))
+
+    message = SQLiteQueue(path).get()
+
+    assert message is not None
+    assert before <= message.enqueued_at <= time.time()
+
+
+def test_dispatcher_delivers_cloud_event():
+    received = []
+    dispatcher = LocalDispatcher(
+        InMemoryQueue(),
+        {'topic_a': lambda event, context: received.append(yandex_tools.process_pubsub_message_cloud(event))},
+    )
+
+    dispatcher.publish('topic_a', {'text': 'hello'}, trace_id='t1')
+    deliveries = dispatcher.run()
+
+    assert received == [{'text': 'hello'}]
+    assert [(d.topic_name, d.trace_id, d.error) for d in deliveries] == [('topic_a', 't1', None)]
+
+
+def test_published_messages_inherit_trace_id():
+    def first_stage(event, context):
+        yandex_tools.send_topic_cloud('topic_b', {'text': 'next'})
+        yandex_tools.send_topic_cloud('topic_without_receiver', {'text': 'lost'})
+
+    dispatcher = LocalDispatcher(InMemoryQueue(), {'topic_a': first_stage, 'topic_b': lambda event, context: None})
+    with local_pubsub(dispatcher):
+        dispatcher.publish('topic_a', {}, trace_id='change-0')
+        deliveries = dispatcher.run()
+
+    assert [(d.topic_name, d.trace_id) for d in deliveries] == [('topic_a', 'change-0'), ('topic_b', 'change-0')]
+    assert [(m.topic_name, m.trace_id) for m in dispatcher.undelivered] == [('topic_without_receiver', 'change-0')]
+    assert isinstance(yandex_tools._transport, yandex_tools.YandexMessageQueueTransport)
+
+
+def test_receiver_error_is_recorded():
+    def failing(event, context):
+        raise ValueError('boom')
+
+    dispatcher = LocalDispatcher(InMemoryQueue(), {'topic_a': failing})
+    dispatcher.publish('topic_a', {})
+
+    assert dispatcher.run()[0].error == "ValueError('boom')"
+
+
+def test_build_report():
+    deliveries = [
+        Delivery('topic_for_first_post_processing', 't1', enqueued_at=0.0, started_at=0.0, finished_at=1.0),
+        Delivery('topic_for_notification', 't1', enqueued_at=1.0, started_at=1.5, finished_at=3.0),
+        Delivery('topic_for_first_post_processing', 't2', enqueued_at=3.0, started_at=3.0, finished_at=4.0, error='x'),
+    ]
+
+    report = build_report(deliveries)
+
+    assert [(s.stage, s.errors, s.duration.count) for s in report.stages] == [
+        ('identify_updates_of_first_posts', 1, 2),
+        ('compose_notifications', 0, 1),
+    ]
+    assert report.end_to_end == LatencyStats(count=2, p50=1.0, p95=3.0, max=3.0)
+    assert report.wall_time == 4.0
+    assert report.traces_per_second == 0.5
+    assert report.not_measured == ['check_first_posts_for_changes']
+
+
+def test_latency_stats_percentiles():
+    stats = LatencyStats.from_values([float(i) for i in range(1, 101)])
+
+    assert (stats.p50, stats.p95, stats.max) == (50.0, 95.0, 100.0)
+    assert LatencyStats.from_values([]) == LatencyStats(count=0, p50=0.0, p95=0.0, max=0.0)
@@ -0,0 +1,115 @@
+"""Local stand-in for the YC Logging reading API: an in-process gRPC server over a list of entries."""
+
+import threading
+import time
+import uuid
+from concurrent import futures
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from unittest.mock import MagicMock
+
+import grpc
+from google.protobuf.struct_pb2 import Struct
+from yandex.cloud.logging.v1.log_entry_pb2 import LogEntry, LogLevel
+from yandex.cloud.logging.v1.log_reading_service_pb2 import Criteria, ReadRequest, ReadResponse
+from yandex.cloud.logging.v1.log_reading_service_pb2_grpc import (
+    LogReadingServiceServicer,
+    add_LogReadingServiceServicer_to_server,
+)
+
+
+def make_entries(from_time: datetime, to_time: datetime, step: timedelta) -> list[LogEntry]:
+    """An entry every ``step``: every third is an ERROR, every entry has its own request_id."""
+    entries = []
+    t = from_time
+    while t < to_time:
+        n = len(entries)
+        entry = LogEntry(
+            uid=f'uid-{n}',
+            level=LogLevel.ERROR if n % 3 == 0 else LogLevel.INFO,
+            message=f'message {n}',
+        )
+        entry.timestamp.FromDatetime(t)
+        payload = Struct()
+        payload.update({'request_id': f'req-{n}'})
+        entry.json_payload.CopyFrom(payload)
+        entries.append(entry)
+        t += step
+    return entries
+
+
+class FakeLoggingAPI(LogReadingServiceServicer):
+    """Implements ``Read``: since / until / levels / ``request_id="..."`` filter, pages and page tokens.
+
+    Every request waits ``latency`` seconds. ``failing_since`` makes requests for windows starting
+    at these times fail.
+    """
+
+    def __init__(self, entries: list[LogEntry], latency: float = 0.0) -> None:
+        self.entries = sorted(entries, key=lambda entry: entry.timestamp.ToDatetime())
+        self.latency = latency
+        self.failing_since: set[datetime] = set()
+        self.requests: list[ReadRequest] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pages: dict[str, tuple[Criteria, int]] = {}
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+        add_LogReadingServiceServicer_to_server(self, self._server)
+        self.port = self._server.add_insecure_port('127.0.0.1:0')
+
+    def __enter__(self) -> 'FakeLoggingAPI':
+        self._server.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._server.stop(grace=None)
+
+    def sdk(self) -> MagicMock:
+        """Stand-in for ``yandexcloud.SDK`` whose stubs talk to this server."""
+        channel = grpc.insecure_channel(f'127.0.0.1:{self.port}')
+        sdk = MagicMock()
+        sdk.client.side_effect = lambda stub_cls: stub_cls(channel)
+        return sdk
+
+    def Read(self, request: ReadRequest, context: grpc.ServicerContext) -> ReadResponse:
+        with self._lock:
+            self.requests.append(request)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            if request.page_token:
+                criteria, offset = self._pages.pop(request.page_token)
+            else:
+                criteria, offset = request.criteria, 0
+            if criteria.since.ToDatetime(tzinfo=timezone.utc) in self.failing_since:
+                context.abort(grpc.StatusCode.UNAVAILABLE, 'could not handle request')
+
+            matches = [entry for entry in self.entries if self._matches(entry, criteria)]
+            page = matches[offset : offset + criteria.page_size]
+            response = ReadResponse(log_group_id=criteria.log_group_id, entries=page)
+            if offset + criteria.page_size < len(matches):
+                token = uuid.uuid4().hex
+                self._pages[token] = (criteria, offset + criteria.page_size)
+                response.next_page_token = token
+            return response
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @staticmethod
+    def _matches(entry: LogEntry, criteria: Criteria) -> bool:
+        ts = entry.timestamp.ToDatetime()
+        if criteria.HasField('since') and ts < criteria.since.ToDatetime():
+            return False
+        if criteria.HasField('until') and ts >= criteria.until.ToDatetime():
+            return False
+        if criteria.levels and entry.level not in criteria.levels:
+            return False
+        if criteria.filter:
+            field, _, value = criteria.filter.partition('=')
+            payload: dict[str, Any] = dict(entry.json_payload)
+            if payload.get(field) != value.strip('"'):
+                return False
+        return True
@@ -1,6 +1,10 @@
 """Tests for YC Log Inspector — analytics module."""
 
+import random
+
 from tools.log_inspector._utils.analytics import (
+    _NORMALIZE_PATTERNS,
+    ErrorAggregator,
     extract_request_id,
     group_errors,
     normalize_error,
@@ -51,6 +55,25 @@ class TestNormalizeError:
     def test_returns_unmatched_text(self) -> None:
         assert normalize_error('plain text without variables') == 'plain text without variables'
 
+    def test_skipped_patterns_do_not_change_result(self) -> None:
+        """Patterns skipped by their required substrings would not have matched."""
+
+        def every_pattern(message: str) -> str:
+            for pattern, replacement, _ in _NORMALIZE_PATTERNS:
+                message = pattern.sub(replacement, message)
+            return message
+
+        rnd = random.Random(49)
+        alphabet = '0123456789abcdefxT:-./\'" _=Status_ID telegram'
+        messages = [''.join(rnd.choices(alphabet, k=rnd.randint(1, 80))) for _ in range(5000)]
+        messages += [
+            'STATUS: 404 from /api/v1/123/',
+            'Telegram_ID=123456789012 at 2026-07-04T18:30:00 from 10.0.0.1',
+            "deadbeef-dead-beef-dead-beefdeadbeef 'deadbeef-dead-beef-dead-beefdeadbeef'",
+        ]
+        for message in messages:
+            assert normalize_error(message) == every_pattern(message), message
+
 
 class TestExtractRequestId:
     def test_from_json_payload(self) -> None:
@@ -157,3 +180,57 @@ class TestGroupErrors:
         ]
         groups = group_errors(entries)
         assert groups[0].sample_message == real_message
+
+
+class TestErrorAggregator:
+    def test_matches_group_errors(self) -> None:
+        rnd = random.Random(1)
+        entries = [
+            {
+                'level': rnd.choice(['ERROR', 'ERROR', 'INFO']),
+                'message': f'error {rnd.randint(0, 5)} for user 12345678901{rnd.randint(0, 9)}',
+                'json_payload': {'request_id': f'req-{i}'},
+            }
+            for i in range(200)
+        ]
+
+        aggregator = ErrorAggregator(max_groups=None).add_all(iter(entries))
+
+        assert aggregator.top(3) == group_errors(entries, top_n=3)
+        assert aggregator.entries_seen == 200
+        assert aggregator.errors_seen == sum(entry['level'] == 'ERROR' for entry in entries)
+
+    def test_first_and_last_seen(self) -> None:
+        aggregator = ErrorAggregator()
+        for timestamp in ['2026-07-04T12:00:00', '2026-07-04T10:00:00', '2026-07-04T18:00:00']:
+            aggregator.add({'level': 'ERROR', 'message': 'boom', 'timestamp': timestamp})
+
+        [group] = aggregator.top()
+        assert group.first_seen == '2026-07-04T10:00:00'
+        assert group.last_seen == '2026-07-04T18:00:00'
+
+    def test_bounded_groups_keep_frequent_patterns(self) -> None:
+        rnd = random.Random(2)
+        messages = [f'frequent {n}' for n in range(3) for _ in range(300)]
+        messages += [f'rare {word}' for word in rnd.sample(range(10**6), 2000)]
+        rnd.shuffle(messages)
+
+        aggregator = ErrorAggregator(max_groups=20)
+        for message in messages:
+            aggregator.add({'level': 'ERROR', 'message': message})
+
+        top = aggregator.top(3)
+        assert {group.pattern for group in top} == {'frequent 0', 'frequent 1', 'frequent 2'}
+        for group in top:
+            assert group.count - group.overcount <= 300 <= group.count
+        assert len(aggregator.top(100)) == 20
+
+    def test_evicts_group_with_lowest_count(self) -> None:
+        aggregator = ErrorAggregator(max_groups=2)
+        for message in ['a', 'a', 'b', 'c']:
+            aggregator.add({'level': 'ERROR', 'message': message})
+
+        assert [(group.pattern, group.count, group.overcount) for group in aggregator.top()] == [
+            ('a', 2, 0),
+            ('c', 2, 1),
+        ]
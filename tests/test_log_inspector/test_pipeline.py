@@ -0,0 +1,187 @@
+"""Pipeline latency: correlation of pipeline_stage events, percentiles, slowest items and regressions."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from click.testing import CliRunner
+
+from tools.log_inspector._utils.pipeline import (
+    Regression,
+    SpanStats,
+    correlate,
+    find_regressions,
+    slowest,
+    span_stats,
+)
+from tools.log_inspector.main import cli
+
+T0 = datetime(2026, 7, 4, 12, 0, tzinfo=timezone.utc)
+
+
+def event(stage: str, at: datetime, *, search_num: int | None = None, change_log_id: int | None = None) -> dict:
+    payload: dict = {'pipeline_stage': stage}
+    # the YC payload comes back through MessageToDict, so numbers are floats
+    if search_num is not None:
+        payload['search_num'] = float(search_num)
+    if change_log_id is not None:
+        payload['change_log_id'] = float(change_log_id)
+    return {
+        'uid': f'{stage}-{search_num}-{change_log_id}-{at.timestamp()}',
+        'level': 'INFO',
+        'message': f'pipeline: {stage}',
+        'timestamp': at.replace(tzinfo=None).isoformat(),
+        'json_payload': payload,
+    }
+
+
+def change(
+    change_log_id: int,
+    search_num: int,
+    detected: datetime,
+    identify: float,
+    compose: float,
+    send: float | None,
+) -> list[dict]:
+    """Events of one change with the given stage latencies (seconds)."""
+    logged = detected + timedelta(seconds=identify)
+    composed = logged + timedelta(seconds=compose)
+    events = [
+        event('detected', detected, search_num=search_num),
+        event('change_logged', logged, search_num=search_num, change_log_id=change_log_id),
+        event('composed', composed, search_num=search_num, change_log_id=change_log_id),
+    ]
+    if send is not None:
+        events.append(event('sent', composed + timedelta(seconds=send), change_log_id=change_log_id))
+    return events
+
+
+class TestCorrelate:
+    def test_stage_latencies(self) -> None:
+        entries = change(1, 100, T0, identify=30, compose=5, send=12)
+        entries.append({'uid': 'x', 'message': 'unrelated', 'timestamp': T0.isoformat()})
+
+        [item] = correlate(entries)
+
+        assert (item.change_log_id, item.search_num) == (1, 100)
+        assert item.latency('identify') == 30
+        assert item.latency('compose') == 5
+        assert item.latency('send') == 12
+        assert item.latency('end_to_end') == 47
+        assert item.delivered
+
+    def test_detection_is_latest_before_change_log(self) -> None:
+        entries = [
+            event('detected', T0, search_num=100),
+            event('detected', T0 + timedelta(minutes=5), search_num=100),
+            event('change_logged', T0 + timedelta(minutes=6), search_num=100, change_log_id=1),
+            # a later detection of the same search belongs to the next change
+            event('detected', T0 + timedelta(minutes=7), search_num=100),
+            # another search
+            event('detected', T0 + timedelta(minutes=5, seconds=30), search_num=200),
+        ]
+
+        [item] = correlate(entries)
+
+        assert item.latency('identify') == 60
+
+    def test_events_from_several_log_groups_in_any_order(self) -> None:
+        entries = change(1, 100, T0, identify=10, compose=2, send=3)
+        entries += change(2, 200, T0 + timedelta(minutes=1), identify=20, compose=2, send=3)
+
+        items = correlate(reversed(entries))
+
+        assert [(item.change_log_id, item.latency('end_to_end')) for item in items] == [(1, 15), (2, 25)]
+
+    def test_repeated_stage_counts_by_earliest(self) -> None:
+        entries = change(1, 100, T0, identify=10, compose=2, send=3)
+        entries.append(event('sent', T0 + timedelta(minutes=30), change_log_id=1))
+
+        [item] = correlate(entries)
+
+        assert item.latency('send') == 3
+
+    def test_undelivered_and_undetected_changes(self) -> None:
+        entries = change(1, 100, T0, identify=10, compose=2, send=None)
+        entries.append(event('change_logged', T0, search_num=300, change_log_id=3))
+
+        items = correlate(entries)
+
+        assert not any(item.delivered for item in items)
+        assert [item.latency('end_to_end') for item in items] == [None, None]
+        assert items[1].latency('identify') is None
+
+
+def test_span_stats_percentiles() -> None:
+    entries = []
+    for n in range(100):
+        entries += change(n, n, T0 + timedelta(minutes=n), identify=n + 1, compose=1, send=2)
+
+    stats = {row.span: row for row in span_stats(correlate(entries))}
+
+    assert stats['identify'] == SpanStats('identify', 100, p50=50, p90=90, p99=99, max=100)
+    assert stats['compose'] == SpanStats('compose', 100, p50=1, p90=1, p99=1, max=1)
+    assert stats['end_to_end'].p90 == 93
+
+
+def test_span_stats_skip_unmeasured_spans() -> None:
+    stats = span_stats(correlate(change(1, 100, T0, identify=10, compose=2, send=None)))
+
+    assert [row.span for row in stats] == ['identify', 'compose']
+
+
+def test_slowest() -> None:
+    entries = []
+    for n, identify in enumerate([5, 50, 20, 1]):
+        entries += change(n, n, T0, identify=identify, compose=1, send=1)
+    entries += change(9, 9, T0, identify=500, compose=1, send=None)
+
+    assert [item.change_log_id for item in slowest(correlate(entries), 2)] == [1, 2]
+
+
+@pytest.mark.parametrize(
+    'before,after,expected',
+    [
+        (10.0, 30.0, [Regression('send', 'p50', 10.0, 30.0)]),
+        (10.0, 14.0, []),  # below the ratio
+        (0.1, 0.5, []),  # below the absolute bound
+        (30.0, 10.0, []),
+    ],
+)
+def test_find_regressions(before: float, after: float, expected: list[Regression]) -> None:
+    old = [SpanStats('send', 10, p50=before, p90=100.0, p99=100.0, max=100.0)]
+    new = [
+        SpanStats('send', 10, p50=after, p90=100.0, p99=100.0, max=100.0),
+        SpanStats('compose', 10, p50=100.0, p90=100.0, p99=100.0, max=100.0),  # not in the previous window
+    ]
+
+    assert find_regressions(old, new) == expected
+
+
+def test_pipeline_latency_command() -> None:
+    now = datetime.now(timezone.utc)
+    previous = [change(n, n, now - timedelta(hours=30, minutes=n), identify=10, compose=1, send=2) for n in range(10)]
+    current = [
+        change(n, n, now - timedelta(hours=3, minutes=n), identify=10, compose=1, send=60) for n in range(10, 20)
+    ]
+    events = [entry for entries in previous + current for entry in entries]
+    client = MagicMock()
+    # check_first_posts_for_changes in one group, the rest in another
+    client.iter_all_logs.side_effect = lambda log_group_id, **kwargs: iter(
+        [e for e in events if (e['json_payload']['pipeline_stage'] == 'detected') == (log_group_id == 'lg-check')]
+    )
+
+    with patch('tools.log_inspector.main._make_client', return_value=client):
+        result = CliRunner().invoke(
+            cli, ['pipeline-latency', 'lg-check', 'lg-rest', '--hours', '24', '--compare', '--top', '3', '--no-cache']
+        )
+
+    assert result.exit_code == 0, result.output
+    assert '10 change_log records, 10 delivered' in result.output
+    assert 'end_to_end' in result.output
+    assert result.output.count('  change_log ') == 3
+    assert 'send p50: 2.0s → 1.0m' in result.output
+    assert 'compose' not in [line.split()[1] for line in result.output.splitlines() if line.startswith('⚠️')]
+    kwargs = client.iter_all_logs.call_args.kwargs
+    assert kwargs['filter_str'].startswith('pipeline_stage="detected" OR ')
+    assert kwargs['to_time'] - kwargs['from_time'] == timedelta(hours=48)
@@ -0,0 +1,141 @@
+"""Parallel slice reading and the cache of complete slices, against a local fake of the YC Logging API."""
+
+import json
+import time
+from collections.abc import Generator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from tests.test_log_inspector.fake_logging_api import FakeLoggingAPI, make_entries
+from tests.test_log_inspector.test_yc_logging import SERVICE_ACCOUNT_KEY
+from tools.log_inspector._utils.window_cache import WindowCache
+from tools.log_inspector._utils.yc_logging import YCLoggingClient, _plan_windows
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+# all slices of this window are complete
+PAST_FROM = NOW - timedelta(hours=30, minutes=20)
+PAST_TO = NOW - timedelta(hours=24)
+
+
+@pytest.fixture
+def api() -> Generator[FakeLoggingAPI, None, None]:
+    entries = make_entries(NOW - timedelta(hours=32), NOW, timedelta(minutes=2))
+    with FakeLoggingAPI(entries, latency=0.02) as api:
+        yield api
+
+
+@pytest.fixture
+def client(api: FakeLoggingAPI, monkeypatch: pytest.MonkeyPatch) -> YCLoggingClient:
+    monkeypatch.setenv('YC_LOG_INSPECTOR_SA_JSON', json.dumps(SERVICE_ACCOUNT_KEY))
+    with patch('tools.log_inspector._utils.yc_logging.SDK', return_value=api.sdk()):
+        return YCLoggingClient()
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> Generator[WindowCache, None, None]:
+    cache = WindowCache(tmp_path / 'windows.sqlite')
+    yield cache
+    cache.close()
+
+
+def read(client: YCLoggingClient, **kwargs) -> list[str]:
+    kwargs = dict(from_time=PAST_FROM, to_time=PAST_TO, throttle_seconds=0, retries=1) | kwargs
+    return [entry['uid'] for entry in client.read_all_logs('lg-x', **kwargs)]
+
+
+@pytest.mark.parametrize('query', [dict(levels=['ERROR']), dict(page_size=20), dict(filter_str='request_id="req-30"')])
+def test_parallel_read_matches_sequential(client: YCLoggingClient, api: FakeLoggingAPI, query: dict):
+    sequential = read(client, **query)
+    assert api.max_in_flight == 1
+
+    assert read(client, workers=4, **query) == sequential
+    assert 1 < api.max_in_flight <= 4
+
+
+def test_iter_reads_slices_ahead_as_they_are_consumed(client: YCLoggingClient, api: FakeLoggingAPI):
+    expected = read(client, levels=['ERROR'])
+    api.requests.clear()
+
+    entries = client.iter_all_logs(
+        'lg-x', levels=['ERROR'], from_time=PAST_FROM, to_time=PAST_TO, throttle_seconds=0, workers=2
+    )
+    first = next(entries)
+    assert len(api.requests) <= 3  # the slice being consumed and two read ahead
+
+    assert [first['uid'], *(entry['uid'] for entry in entries)] == expected
+
+
+def test_throttle_is_shared_by_workers(client: YCLoggingClient, api: FakeLoggingAPI):
+    started = time.monotonic()
+    read(client, levels=['ERROR'], workers=4, throttle_seconds=0.05)
+
+    assert time.monotonic() - started >= (len(api.requests) - 1) * 0.05
+
+
+def test_repeated_read_uses_cache(client: YCLoggingClient, api: FakeLoggingAPI, cache: WindowCache):
+    expected = read(client, levels=['ERROR'])
+    api.requests.clear()
+
+    assert read(client, levels=['ERROR'], cache=cache, workers=4) == expected
+    assert len(api.requests) == 7  # 6 hours on the grid + the hour cut by from_time, read whole
+
+    api.requests.clear()
+    assert read(client, levels=['ERROR'], cache=cache, workers=4) == expected
+    assert not api.requests
+
+    # another query is another cache key
+    read(client, levels=['INFO'], cache=cache)
+    assert len(api.requests) == 7
+
+
+def test_recent_slices_are_not_cached(client: YCLoggingClient, api: FakeLoggingAPI, cache: WindowCache):
+    now = datetime.now(timezone.utc)
+    window = dict(from_time=now - timedelta(hours=3), to_time=now, levels=['ERROR'], cache=cache)
+    read(client, **window)
+    api.requests.clear()
+
+    read(client, **window)
+    settled = now - timedelta(minutes=10)
+    windows = _plan_windows(now - timedelta(hours=3), now, 1.0, aligned_until=settled)
+    assert len(api.requests) == len([w for w in windows if w[1] > settled])
+
+
+def test_slice_with_failed_read_is_not_cached(client: YCLoggingClient, api: FakeLoggingAPI, cache: WindowCache):
+    failing = _plan_windows(PAST_FROM, PAST_TO, 1.0, aligned_until=NOW)[2][0]
+    api.failing_since.add(failing)
+    partial = read(client, levels=['ERROR'], cache=cache)
+    api.failing_since.clear()
+    api.requests.clear()
+
+    complete = read(client, levels=['ERROR'], cache=cache)
+    assert len(api.requests) == 1
+    assert set(partial) < set(complete)
+
+
+def test_truncated_slice_is_not_cached(client: YCLoggingClient, api: FakeLoggingAPI, cache: WindowCache):
+    read(client, page_size=10, max_pages=2, cache=cache)
+    api.requests.clear()
+
+    read(client, page_size=10, max_pages=2, cache=cache)
+    assert len(api.requests) == 2 * 7
+
+
+def test_windows_are_aligned_to_grid_with_cache():
+    from_time = datetime(2026, 7, 4, 10, 37, tzinfo=timezone.utc)
+    to_time = datetime(2026, 7, 4, 13, 20, tzinfo=timezone.utc)
+    hour = timedelta(hours=1)
+
+    assert _plan_windows(from_time, to_time, 1.0, aligned_until=None) == [
+        (from_time, from_time + hour),
+        (from_time + hour, from_time + 2 * hour),
+        (from_time + 2 * hour, to_time),
+    ]
+    assert _plan_windows(from_time, to_time, 1.0, aligned_until=datetime(2026, 7, 4, 12, 30, tzinfo=timezone.utc)) == [
+        (datetime(2026, 7, 4, 10, tzinfo=timezone.utc), datetime(2026, 7, 4, 11, tzinfo=timezone.utc)),
+        (datetime(2026, 7, 4, 11, tzinfo=timezone.utc), datetime(2026, 7, 4, 12, tzinfo=timezone.utc)),
+        (datetime(2026, 7, 4, 12, tzinfo=timezone.utc), datetime(2026, 7, 4, 13, tzinfo=timezone.utc)),
+        (datetime(2026, 7, 4, 13, tzinfo=timezone.utc), to_time),
+    ]
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('maxapi')
+
+from maxapi.types.updates.message_created import MessageCreated
+
+from _dependencies.models import DialogState
+from max_bot._utils.database import db, run_db
+from max_bot._utils.handlers import DBStateFilter
+from tests.factories import db_factories
+
+
+def test_repository_is_shared():
+    assert db() is db()
+
+
+def test_run_db_runs_in_db_thread():
+    thread_name = asyncio.run(run_db(lambda: threading.current_thread().name))
+
+    assert thread_name.startswith('max_bot_db')
+
+
+def test_run_db_does_not_block_event_loop():
+    async def scenario() -> int:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await run_db(time.sleep, 0.2)  # a slow query
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) > 5
+
+
+def test_db_state_filter():
+    user_id = db_factories.UserFactory.create_sync().user_id
+    event = MessageCreated.model_validate(
+        {
+            'update_type': 'message_created',
+            'timestamp': 0,
+            'message': {
+                'sender': {'user_id': user_id, 'first_name': 'Test', 'is_bot': False, 'last_activity_time': 0},
+                'recipient': {'chat_id': user_id, 'chat_type': 'dialog'},
+                'timestamp': 0,
+                'body': {'mid': 'mid', 'seq': 0, 'text': '25'},
+            },
+        }
+    )
+    db().set_user_state(user_id, DialogState.radius_input)
+
+    assert asyncio.run(DBStateFilter(DialogState.radius_input)(event))
+    assert not asyncio.run(DBStateFilter(DialogState.input_of_coords_man)(event))
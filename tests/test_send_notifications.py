@@ -2,15 +2,18 @@
 
 import datetime
 from random import randint
-from typing import Any
+from typing import Any, Generator
+from unittest.mock import patch
 
 import pytest
 import sqlalchemy
 from polyfactory.factories import DataclassFactory
 from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
 
 from _dependencies.common.commons import sqlalchemy_get_pool
 from _dependencies.common.message_params import MessageParams
+from _dependencies.common.partitions import NOTIF_BY_USER, NOTIF_BY_USER_PARTITION_SIZE, notif_by_user_partition
 from send_notifications._utils.clients.max_notificator import MaxNotificator
 from send_notifications._utils.clients.telegram_notificator import TelegramNotificator
 from send_notifications._utils.clients.vk_notificator import VKNotificator
@@ -31,7 +34,7 @@ from send_notifications._utils.services.notification_sender import (
     _prepare_message,
 )
 from tests.common import find_model
-from tests.factories.db_factories import NotifByUserFactory, UserFactory, get_session
+from tests.factories.db_factories import NotifByUserFactory, UserFactory
 from tests.factories.db_models import NotifByUser
 
 # ─── Fixtures ──────────────────────────────────────────────────────
@@ -212,7 +215,7 @@ class FakeDBClient(DBClient):
             return list(result)
         return result
 
-    def save_sending_status_to_notif_by_user(self, message_id: int, result: str | None) -> None:
+    def save_sending_status_to_notif_by_user(self, message_id: int, change_log_id: int, result: str | None) -> None:
         self.saved_statuses[message_id] = result
         # Update message status so get_notifs_to_send() filters it out
         for msg in self.notifications:
@@ -280,18 +283,18 @@ class TestDBClient:
         db_client.get_change_log_update_time(1)
 
     def test_save_sending_status_to_notif_by_user(self, db_client: DBClient):
-        db_client.save_sending_status_to_notif_by_user(1, 'cancelled')
+        db_client.save_sending_status_to_notif_by_user(1, 1, 'cancelled')
 
     def test_check_for_number_of_notifs_to_send(self, db_client: DBClient):
         NotSentNotificationFactory.create_batch_sync(3)
         result = db_client.check_for_number_of_notifs_to_send()
         assert result >= 3  # Could be more if other tests created notifications
 
-    def test_save_sending_status_updates_correct_status(self, db_client: DBClient):
+    def test_save_sending_status_updates_correct_status(self, db_client: DBClient, session: Session):
         notification = NotSentNotificationFactory.create_sync()
-        db_client.save_sending_status_to_notif_by_user(notification.message_id, 'completed')
+        db_client.save_sending_status_to_notif_by_user(notification.message_id, notification.change_log_id, 'completed')
 
-        updated = find_model(get_session(), NotifByUser, message_id=notification.message_id)
+        updated = find_model(session, NotifByUser, message_id=notification.message_id)
         assert updated.completed is not None
         assert updated.cancelled is None
         assert updated.failed is None
@@ -308,10 +311,22 @@ class TestDBClient:
 class TestGetNotifsToSendMessenger:
     """Tests for the messenger column in get_notifs_to_send()."""
 
+    @pytest.fixture(autouse=True)
+    def _cleanup(self) -> Generator[None, None, None]:
+        """the inserted notifications are deleted afterwards"""
+        self._message_ids: list[int] = []
+        yield
+
+        with sqlalchemy_get_pool().begin() as conn:
+            conn.execute(
+                sqlalchemy.text('DELETE FROM notif_by_user WHERE message_id = ANY(:ids)'), {'ids': self._message_ids}
+            )
+
     def _insert_notification(self, messenger: str) -> int:
         """Insert a notification directly via SQL to control messenger value precisely."""
         pool = sqlalchemy_get_pool()
-        user_id = randint(10_000_000, 99_999_999)
+        # notifications are selected in the order of user_id: unsent ones of other tests must not push it out
+        user_id = -randint(10_000_000, 99_999_999)
         with pool.begin() as conn:
             result = conn.execute(
                 sqlalchemy.text("""
@@ -323,7 +338,9 @@ class TestGetNotifsToSendMessenger:
                 """),
                 {'user_id': user_id, 'messenger': messenger},
             )
-            return result.scalar()
+            message_id = result.scalar()
+        self._message_ids.append(message_id)
+        return message_id
 
     def test_messenger_defaults_to_telegram(self, db_client: DBClient):
         """NotifByUser with messenger='telegram' → MessageToSend.messenger == 'telegram'."""
@@ -354,6 +371,65 @@ class TestGetNotifsToSendMessenger:
         assert vk_match[0].messenger == 'vk'
 
 
+# ─── Category 1b: partitions of archived change_log records are not scanned ───
+
+
+# archive_notifications tests own the partitions of notif_by_user: they create, move and drop them
+@pytest.mark.xdist_group(name='archive_notifications')
+class TestNotifsToSendPartitionPruning:
+    @pytest.fixture
+    def first_lower(self, db_client: DBClient) -> Generator[int, None, None]:
+        """the lower bound of an old partition followed by a new one, far above the change_log ids of other tests"""
+        first_lower = randint(421_000, 429_000) * NOTIF_BY_USER_PARTITION_SIZE
+        change_log_ids = (first_lower, first_lower + NOTIF_BY_USER_PARTITION_SIZE)
+        for change_log_id in change_log_ids:
+            name, lower, upper = notif_by_user_partition(change_log_id)
+            db_client.create_range_partition(NOTIF_BY_USER, name, 'change_log_id', lower, upper)
+        yield first_lower
+
+        with db_client.connect() as conn:
+            for change_log_id in change_log_ids:
+                name, _, _ = notif_by_user_partition(change_log_id)
+                conn.execute(sqlalchemy.text(f'DROP TABLE IF EXISTS {name}'))
+
+    @pytest.fixture
+    def statements(self, db_client: DBClient) -> Generator[list[tuple[str, Any]], None, None]:
+        """SQL statements executed by the DB client, with their parameters"""
+        statements: list[tuple[str, Any]] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        sqlalchemy.event.listen(db_client._db, 'before_cursor_execute', capture)
+        yield statements
+        sqlalchemy.event.remove(db_client._db, 'before_cursor_execute', capture)
+
+    def explain(self, db_client: DBClient, statement: str, parameters: Any) -> str:
+        with db_client.connect() as conn:
+            cursor = conn.connection.dbapi_connection.cursor()
+            cursor.execute(f'EXPLAIN {statement}', parameters)
+            return '\n'.join(line for (line,) in cursor.fetchall())
+
+    @pytest.mark.parametrize(
+        'query',
+        [
+            lambda db_client: db_client.get_notifs_to_send(select_doubling=False),
+            lambda db_client: db_client.get_notifs_to_send(select_doubling=True),
+            lambda db_client: db_client.check_for_number_of_notifs_to_send(),
+        ],
+        ids=['to_send', 'doubling', 'number'],
+    )
+    def test_old_partitions_are_pruned(self, db_client: DBClient, first_lower: int, statements, query):
+        old, _, _ = notif_by_user_partition(first_lower)
+        new, new_lower, _ = notif_by_user_partition(first_lower + NOTIF_BY_USER_PARTITION_SIZE)
+        with patch.object(DBClient, 'get_unarchived_change_log_id', return_value=new_lower):
+            query(db_client)
+
+        plan = self.explain(db_client, *statements[-1])
+        assert new in plan
+        assert old not in plan
+
+
 # ─── Category 2: fill_vk_user_ids() — new path via user_identity_map ───
 
 
@@ -0,0 +1,137 @@
+"""Tests for the dedup stores of the VK callback endpoint."""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+import sqlalchemy
+
+from vk_bot._utils.database import DBClient
+from vk_bot._utils.event_dedup import InMemoryDedupStore, PostgresDedupStore
+from vk_bot._utils.event_dispatcher import VKEventDispatcher
+
+
+def _key() -> str:
+    return f'test:{uuid.uuid4().hex}'
+
+
+class TestInMemoryDedupStore:
+    def test_second_claim_is_duplicate(self):
+        store = InMemoryDedupStore()
+        key = _key()
+
+        assert store.claim(key)
+        assert not store.claim(key)
+        assert store.claim(_key())
+
+    def test_expired_key_is_forgotten(self):
+        store = InMemoryDedupStore(ttl_seconds=10)
+        with patch('vk_bot._utils.event_dedup.time.monotonic', side_effect=[0, 1, 20, 21]):
+            store.claim('a')
+            store.claim('b')
+            store.claim('c')  # expires a and b
+
+            assert list(store._expires_at) == ['c']
+            assert store.claim('a')
+
+    def test_size_is_bounded(self):
+        store = InMemoryDedupStore(max_size=2)
+        for key in ('a', 'b', 'c'):
+            store.claim(key)
+
+        assert list(store._expires_at) == ['b', 'c']
+
+
+# the dispatchers delete expired keys of the whole table
+@pytest.mark.xdist_group('vk_callback_events')
+class TestPostgresDedupStore:
+    def test_claimed_by_another_instance(self):
+        key = _key()
+
+        assert PostgresDedupStore(DBClient()).claim(key)
+        assert not PostgresDedupStore(DBClient()).claim(key)
+
+    def test_local_resend_does_not_query_db(self):
+        db = MagicMock()
+        db.claim_callback_event.return_value = True
+        store = PostgresDedupStore(db)
+        key = _key()
+
+        store.claim(key)
+        store.claim(key)
+
+        db.claim_callback_event.assert_called_once_with(key)
+
+    def test_failed_db_claim_does_not_claim_locally(self):
+        """the resend of an event that failed to be claimed is handled"""
+        db = MagicMock()
+        db.claim_callback_event.side_effect = [sqlalchemy.exc.OperationalError('INSERT', {}, Exception()), True]
+        store = PostgresDedupStore(db)
+        key = _key()
+
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            store.claim(key)
+
+        assert store.claim(key)
+
+    def test_released_key_is_claimed_again(self):
+        """an event that was not handled is handled when VK resends it, by any instance"""
+        key = _key()
+        store = PostgresDedupStore(DBClient())
+        store.claim(key)
+
+        store.release(key)
+
+        assert PostgresDedupStore(DBClient()).claim(key)
+
+    def test_concurrent_dispatchers(self):
+        """every event is handled by exactly one of the instances that received it"""
+        handled: list[str] = []
+        keys = [_key() for _ in range(50)]
+
+        def instance() -> None:
+            dispatcher = VKEventDispatcher(PostgresDedupStore(DBClient()))
+            dispatcher._handlers['message_new'] = lambda event_object: handled.append(event_object['key']) or 'ok'
+            for key in keys:
+                dispatcher.dispatch({'type': 'message_new', 'event_id': key, 'object': {'key': key}})
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for future in [pool.submit(instance) for _ in range(4)]:
+                future.result()
+
+        assert sorted(handled) == sorted(keys)
+
+    def test_expired_keys_are_deleted_in_batches(self):
+        db = DBClient()
+        expired_keys = [_key() for _ in range(3)]
+        fresh_key = _key()
+        with db.connect() as conn:
+            conn.execute(
+                sqlalchemy.text("""
+                    INSERT INTO vk_callback_events (event_key, received_at)
+                    SELECT unnest(CAST(:keys AS varchar[])), now() - interval '2 days'
+                """),
+                dict(keys=expired_keys),
+            )
+        db.claim_callback_event(fresh_key)
+
+        assert db.delete_expired_callback_events(ttl_seconds=24 * 60 * 60, batch_size=2) == 2
+        db.delete_expired_callback_events(ttl_seconds=24 * 60 * 60, batch_size=2)
+
+        with db.connect() as conn:
+            left = conn.execute(
+                sqlalchemy.text('SELECT event_key FROM vk_callback_events WHERE event_key = ANY(:keys)'),
+                dict(keys=[*expired_keys, fresh_key]),
+            ).scalars()
+            assert list(left) == [fresh_key]
+
+    def test_cleanup_runs_once_per_interval(self):
+        db = MagicMock()
+        db.claim_callback_event.return_value = True
+        store = PostgresDedupStore(db, cleanup_interval_seconds=60)
+
+        for _ in range(3):
+            store.claim(_key())
+
+        db.delete_expired_callback_events.assert_called_once()
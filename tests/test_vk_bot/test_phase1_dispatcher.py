@@ -11,7 +11,9 @@ These tests cover:
 import hashlib
 import json
 import random as _random
+import threading
 import time
+import uuid
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -24,14 +26,18 @@ from sqlalchemy.orm.session import Session
 from _dependencies.bot.telegram_api_wrapper import make_invite_text_for_user
 from _dependencies.common.commons import AppConfig
 from _dependencies.models import DialogState
+from tests.common import get_http_request
 from tests.factories import db_factories
+from vk_bot import main as vk_bot_main
 from vk_bot._utils.account_linking import _validate_invite_hash
 from vk_bot._utils.common import VKHandlerContext, VKMessage
 from vk_bot._utils.database import DBClient, db
 from vk_bot._utils.event_dispatcher import (
+    VKEventDispatcher,
     dispatch_event,
     handle_unknown,
 )
+from vk_bot._utils.event_queue import EventQueueFullError
 from vk_bot._utils.handlers.region_select_handlers import (
     handle_inline_pagination_back,
     handle_inline_pagination_finish,
@@ -383,7 +389,7 @@ class TestDispatcherMessageEvent:
                 'peer_id': 456,
                 'message_id': 789,
                 'payload': '{"button":"test"}',
-                'event_id': 'evt_001',
+                'event_id': f'evt_{uuid.uuid4().hex}',
             },
         }
 
@@ -429,6 +435,204 @@ class TestDispatcherOther:
         assert result == 'ok'
 
 
+def _message_new(from_id: int, conversation_message_id: int | None = None, event_id: str | None = None) -> dict:
+    event: dict = {
+        'type': 'message_new',
+        'object': {
+            'message': {
+                'from_id': from_id,
+                'peer_id': from_id,
+                'text': 'hello',
+                'conversation_message_id': conversation_message_id,
+            }
+        },
+    }
+    if event_id:
+        event['event_id'] = event_id
+    return event
+
+
+def _dispatcher_with_handler(handler: MagicMock) -> VKEventDispatcher:
+    dispatcher = VKEventDispatcher()
+    dispatcher._handlers['message_new'] = handler
+    return dispatcher
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# dispatch_event — deduplication
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class TestDispatcherDeduplication:
+    """VK resends events that were not answered in time."""
+
+    def test_resent_event_is_handled_once(self):
+        handler = MagicMock(return_value='ok')
+        dispatcher = _dispatcher_with_handler(handler)
+        event = _message_new(1, event_id=uuid.uuid4().hex)
+
+        assert dispatcher.dispatch(event) == 'ok'
+        assert dispatcher.dispatch(event) == 'ok'
+
+        handler.assert_called_once()
+
+    def test_event_handled_by_another_instance(self):
+        """a cold start or a parallel instance does not handle the event again"""
+        handler = MagicMock(return_value='ok')
+        event = _message_new(1, event_id=uuid.uuid4().hex)
+
+        _dispatcher_with_handler(handler).dispatch(event)
+        _dispatcher_with_handler(handler).dispatch(event)
+
+        handler.assert_called_once()
+
+    def test_same_message_number_in_other_conversations(self):
+        handler = MagicMock(return_value='ok')
+        dispatcher = _dispatcher_with_handler(handler)
+        conversation_message_id = _random.randint(1, 10**9)
+
+        dispatcher.dispatch(_message_new(_random.randint(1, 10**9), conversation_message_id))
+        dispatcher.dispatch(_message_new(_random.randint(1, 10**9), conversation_message_id))
+
+        assert handler.call_count == 2
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# dispatch_event — fast ack
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class TestDispatcherFastAck:
+    """Events are answered at once and handled in background."""
+
+    @pytest.fixture(autouse=True)
+    def fast_ack_config(self, mock_app_config: AppConfig):
+        mock_app_config.vk_fast_ack = True
+        mock_app_config.vk_ack_workers = 2
+        mock_app_config.vk_ack_queue_size = 1
+
+    def test_answered_before_handled(self):
+        handled = threading.Event()
+        release = threading.Event()
+
+        def slow_handler(event_object: dict) -> str:
+            release.wait(timeout=5)
+            handled.set()
+            return 'ok'
+
+        dispatcher = _dispatcher_with_handler(MagicMock(side_effect=slow_handler))
+
+        assert dispatcher.dispatch(_message_new(1)) == 'ok'
+        assert not handled.is_set()
+
+        release.set()
+        dispatcher.join()
+        assert handled.is_set()
+
+    def test_events_of_user_keep_order(self):
+        handled: list[str] = []
+
+        def handler(event_object: dict) -> str:
+            text = event_object['message']['text']
+            if text == 'first':
+                time.sleep(0.05)
+            handled.append(text)
+            return 'ok'
+
+        dispatcher = _dispatcher_with_handler(MagicMock(side_effect=handler))
+        for text in ('first', 'second'):
+            event = _message_new(1)
+            event['object']['message']['text'] = text
+            dispatcher.dispatch(event)
+            if text == 'first':
+                time.sleep(0.01)  # the worker takes the first event, the queue has room for the second one
+
+        dispatcher.join()
+        assert handled == ['first', 'second']
+
+    def test_full_queue_keeps_order_of_user(self):
+        """an event that does not fit waits for room in the queue, after the earlier events of the user"""
+        handled: list[str] = []
+
+        def handler(event_object: dict) -> str:
+            text = event_object['message']['text']
+            if text == 'first':
+                time.sleep(0.05)
+            handled.append(text)
+            return 'ok'
+
+        dispatcher = _dispatcher_with_handler(MagicMock(side_effect=handler))
+        for text in ('first', 'second', 'third'):  # the worker takes the first one, the second one fills the queue
+            event = _message_new(2)
+            event['object']['message']['text'] = text
+            assert dispatcher.dispatch(event) == 'ok'
+            time.sleep(0.01)
+
+        dispatcher.join()
+        assert handled == ['first', 'second', 'third']
+
+    def test_full_queue_fails_request_for_resend(self, mock_app_config: AppConfig):
+        mock_app_config.vk_ack_queue_timeout = 0.01
+        release = threading.Event()
+        handled: list[str] = []
+
+        def handler(event_object: dict) -> str:
+            release.wait(timeout=5)
+            handled.append(event_object['message']['text'])
+            return 'ok'
+
+        dispatcher = _dispatcher_with_handler(MagicMock(side_effect=handler))
+        events = []
+        for text in ('first', 'second', 'third'):
+            event = _message_new(2, event_id=uuid.uuid4().hex)
+            event['object']['message']['text'] = text
+            events.append(event)
+
+        for event in events[:2]:
+            dispatcher.dispatch(event)
+            time.sleep(0.01)
+        with pytest.raises(EventQueueFullError):
+            dispatcher.dispatch(events[2])
+
+        release.set()
+        dispatcher.join()
+        assert dispatcher.dispatch(events[2]) == 'ok'  # VK resends the event that was not answered
+        dispatcher.join()
+        assert handled == ['first', 'second', 'third']
+
+    def test_callback_handshake_is_answered_synchronously(self, mock_app_config: AppConfig):
+        dispatcher = VKEventDispatcher()
+
+        assert dispatcher.dispatch({'type': 'confirmation', 'group_id': 237036024}) == 'test_code'
+
+    def test_cloud_function_answers_after_queued_events(self):
+        """the instance is frozen after the answer, the queued event must not be left in the queue"""
+        handled = threading.Event()
+
+        def slow_handler(event_object: dict) -> str:
+            time.sleep(0.05)
+            handled.set()
+            return 'ok'
+
+        dispatcher = _dispatcher_with_handler(MagicMock(side_effect=slow_handler))
+        with patch.multiple(vk_bot_main, dispatch_event=dispatcher.dispatch, dispatcher=dispatcher):
+            response = vk_bot_main.main(get_http_request('POST', _message_new(1)))
+
+        assert response['body'] == 'ok'
+        assert handled.is_set()
+
+
+def test_cloud_function_flushes_dialog_history():
+    """the buffered dialog history is written before the instance is frozen"""
+    repository = MagicMock()
+
+    with patch.multiple(vk_bot_main, dispatch_event=MagicMock(side_effect=RuntimeError), db=lambda: repository):
+        with pytest.raises(RuntimeError):
+            vk_bot_main.main(get_http_request('POST', _message_new(1)))
+
+    repository.flush_dialog_history.assert_called_once()
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # handle_unknown
 # ═══════════════════════════════════════════════════════════════════════════════
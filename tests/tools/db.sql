@@ -651,11 +651,15 @@ CREATE TABLE notif_by_user__history (
 	failed timestamp NULL,
 	num_of_fails int4 NULL,
 	messenger varchar(20) DEFAULT 'telegram'::character varying NOT NULL
-);
+)
+PARTITION BY RANGE (created);
 
 CREATE INDEX IF NOT EXISTS idx_notif_by_user__history_created_message_id
 	ON notif_by_user__history (created, message_id);
 
+-- daily partitions notif_by_user__history_pYYYYMMDD are created by archive_notifications
+CREATE TABLE notif_by_user__history_default PARTITION OF notif_by_user__history DEFAULT;
+
 
 -- public.notif_stat_sending_speed определение
 
@@ -742,6 +746,8 @@ CREATE TABLE search_first_posts (
 	coords varchar NULL,
 	field_trip varchar NULL,
 	content_compact varchar NULL,
+	content_lines _varchar NULL,
+	content_line_hashes _varchar NULL,
 	CONSTRAINT search_first_posts_pkey PRIMARY KEY (id)
 );
 
@@ -762,7 +768,9 @@ CREATE TABLE search_first_posts__history (
 	num_of_checks int4 NULL,
 	coords varchar NULL,
 	field_trip varchar NULL,
-	content_compact varchar NULL
+	content_compact varchar NULL,
+	content_lines _varchar NULL,
+	content_line_hashes _varchar NULL
 );
 
 CREATE INDEX idx_search_first_posts__history_timestamp
@@ -873,6 +881,7 @@ CREATE TABLE user_coordinates (
 	user_id int8 NULL,
 	CONSTRAINT user_coordinates_pkey PRIMARY KEY (id)
 );
+CREATE INDEX idx_user_coordinates_user_id ON public.user_coordinates USING btree (user_id);
 
 
 -- public.user_forum_attributes определение
@@ -1143,6 +1152,88 @@ CREATE TABLE user_pref_search_whitelist (
 CREATE UNIQUE INDEX idx_user_search_unique ON public.user_pref_search_whitelist USING btree (user_id, search_id);
 
 
+-- public.notif_recipient_index определение
+
+-- Drop table
+
+-- DROP TABLE notif_recipient_index;
+
+CREATE TABLE notif_recipient_index (
+	forum_folder_num int4 NOT NULL,
+	user_id int8 NOT NULL,
+	multi_folder bool NOT NULL,
+	pref_ids _int4 NOT NULL,
+	topic_type_ids _int4 NOT NULL,
+	whitelist_on bool NOT NULL,
+	CONSTRAINT notif_recipient_index_pkey PRIMARY KEY (forum_folder_num, user_id)
+);
+CREATE INDEX idx_notif_recipient_index_user_id ON public.notif_recipient_index USING btree (user_id);
+
+
+-- public.archive_export_checkpoints определение
+
+-- Drop table
+
+-- DROP TABLE archive_export_checkpoints;
+
+CREATE TABLE archive_export_checkpoints (
+	table_name varchar(100) NOT NULL,
+	"day" date NOT NULL,
+	part int4 DEFAULT 1 NOT NULL,
+	object_key varchar NOT NULL,
+	"rows" int8 NOT NULL,
+	"bytes" int8 NOT NULL,
+	max_message_id int8 NOT NULL,
+	uploaded timestamp NOT NULL,
+	deleted timestamp NULL,
+	CONSTRAINT archive_export_checkpoints_pkey PRIMARY KEY (table_name, day)
+);
+
+
+-- public.forum_folder_tree определение
+
+-- Drop table
+
+-- DROP TABLE forum_folder_tree;
+
+CREATE TABLE forum_folder_tree (
+	folder_num int4 NOT NULL,
+	parent_folder_num int4 NULL,
+	change_time_str varchar NULL,
+	folder_name varchar NULL,
+	crawled_at timestamp NULL,
+	CONSTRAINT forum_folder_tree_pkey PRIMARY KEY (folder_num)
+);
+CREATE INDEX idx_forum_folder_tree_parent_folder_num ON public.forum_folder_tree USING btree (parent_folder_num);
+
+
+-- public.forum_folder_searches определение
+
+-- Drop table
+
+-- DROP TABLE forum_folder_searches;
+
+CREATE TABLE forum_folder_searches (
+	folder_num int4 NOT NULL,
+	title varchar NOT NULL,
+	change_time_str varchar NOT NULL,
+	CONSTRAINT forum_folder_searches_pkey PRIMARY KEY (folder_num, title, change_time_str)
+);
+
+
+-- public.vk_callback_events определение
+
+-- Drop table
+
+-- DROP TABLE vk_callback_events;
+
+CREATE UNLOGGED TABLE vk_callback_events (
+	event_key varchar NOT NULL,
+	received_at timestamp DEFAULT now() NOT NULL,
+	CONSTRAINT vk_callback_events_pkey PRIMARY KEY (event_key)
+);
+
+
 -- public.notif_by_user определение
 
 -- Drop table
@@ -1163,9 +1254,16 @@ CREATE TABLE notif_by_user (
 	cancelled timestamp NULL,
 	failed timestamp NULL,
 	num_of_fails int4 NULL,
-	messenger varchar(20) DEFAULT 'telegram'::character varying NOT NULL,
-	CONSTRAINT notif_by_user_pkey PRIMARY KEY (message_id)
-);
+	messenger varchar(20) DEFAULT 'telegram'::character varying NOT NULL
+)
+PARTITION BY RANGE (change_log_id);
+
+-- a primary key of a partitioned table has to include change_log_id, which is nullable
+CREATE UNIQUE INDEX IF NOT EXISTS notif_by_user_message_id_idx
+	ON notif_by_user (message_id, change_log_id);
+
+-- partitions notif_by_user_pN by ranges of change_log_id are created by archive_notifications
+CREATE TABLE notif_by_user_default PARTITION OF notif_by_user DEFAULT;
 
 -- Partial unique index to prevent duplicate unsent notifications
 CREATE UNIQUE INDEX IF NOT EXISTS notif_by_user_unique_unsent_idx
@@ -1508,3 +1606,195 @@ BEGIN
 END;
 $function$
 ;
+
+
+-- DROP FUNCTION public.create_range_partition(text, text, text, text, text);
+
+CREATE OR REPLACE FUNCTION public.create_range_partition(p_parent text, p_partition text, p_key text, p_from text, p_to text)
+ RETURNS boolean
+ LANGUAGE plpgsql
+AS $function$
+-- create partition [p_from, p_to) of p_parent if it does not exist;
+-- rows of the range already stored in the default partition <p_parent>_default are moved into it
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext(p_parent));
+    IF to_regclass(p_partition) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', p_partition, p_parent);
+    IF to_regclass(p_parent || '_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved_rows AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved_rows',
+            p_parent || '_default', p_key, p_from, p_key, p_to, p_partition
+        );
+    END IF;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', p_parent, p_partition, p_from, p_to
+    );
+    RETURN true;
+END;
+$function$
+;
+
+
+-- DROP FUNCTION public.refresh_notif_recipient_index(_int8);
+
+CREATE OR REPLACE FUNCTION public.refresh_notif_recipient_index(p_user_ids int8[])
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+-- recompute rows of the given users (all users if NULL)
+BEGIN
+    IF p_user_ids IS NULL THEN
+        -- no concurrent changes of settings, they would be lost by the rebuild
+        LOCK TABLE users, user_preferences, user_pref_topic_type, user_regional_preferences, user_pref_search_filtering
+            IN SHARE MODE;
+        DELETE FROM notif_recipient_index;
+    ELSE
+        -- refreshes of the same user are serialized until commit: the one that waited reads the
+        -- settings committed by the other with a new snapshot, so neither leaves stale rows.
+        -- Locks are taken in key order so that refreshes of several users cannot deadlock.
+        PERFORM pg_advisory_xact_lock(lock_key)
+        FROM (
+            SELECT DISTINCT hashtextextended('notif_recipient_index:' || user_id, 0) AS lock_key
+            FROM unnest(p_user_ids) AS changed(user_id)
+            ORDER BY lock_key
+        ) AS user_locks;
+
+        DELETE FROM notif_recipient_index ri
+        USING unnest(p_user_ids) AS changed(user_id)
+        WHERE ri.user_id = changed.user_id;
+    END IF;
+
+    INSERT INTO notif_recipient_index (forum_folder_num, user_id, multi_folder, pref_ids, topic_type_ids, whitelist_on)
+    WITH
+        affected_users AS (
+            SELECT u.user_id
+            FROM users u
+            WHERE (u.status IS NULL OR u.status = 'unblocked')
+                AND (p_user_ids IS NULL OR u.user_id IN (SELECT unnest(p_user_ids)))),
+        user_notif_prefs AS (
+            SELECT up.user_id, array_agg(up.pref_id) AS agg
+            FROM user_preferences up JOIN affected_users au ON au.user_id = up.user_id
+            GROUP BY up.user_id),
+        user_topic_prefs AS (
+            SELECT ut.user_id, array_agg(ut.topic_type_id) AS agg
+            FROM user_pref_topic_type ut JOIN affected_users au ON au.user_id = ut.user_id
+            GROUP BY ut.user_id),
+        user_folders AS (
+            SELECT urp.user_id, urp.forum_folder_num,
+                count(urp.forum_folder_num) OVER (PARTITION BY urp.user_id) > 1 AS multi_folder
+            FROM user_regional_preferences urp JOIN affected_users au ON au.user_id = urp.user_id)
+    SELECT DISTINCT uf.forum_folder_num, uf.user_id, uf.multi_folder, unp.agg, utp.agg,
+        EXISTS (
+            SELECT 1 FROM user_pref_search_filtering upsf
+            WHERE upsf.user_id = uf.user_id AND 'whitelist' = ANY(upsf.filter_name)
+        )
+    FROM user_folders uf
+    JOIN user_notif_prefs unp ON unp.user_id = uf.user_id
+    JOIN user_topic_prefs utp ON utp.user_id = uf.user_id
+    WHERE uf.forum_folder_num IS NOT NULL;
+END;
+$function$
+;
+
+
+-- DROP FUNCTION public.notif_recipient_index_on_change();
+
+CREATE OR REPLACE FUNCTION public.notif_recipient_index_on_change()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_notif_recipient_index(ARRAY(SELECT DISTINCT user_id FROM new_rows WHERE user_id IS NOT NULL));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_notif_recipient_index(ARRAY(SELECT DISTINCT user_id FROM old_rows WHERE user_id IS NOT NULL));
+    ELSE
+        PERFORM refresh_notif_recipient_index(ARRAY(
+            SELECT user_id FROM new_rows WHERE user_id IS NOT NULL
+            UNION
+            SELECT user_id FROM old_rows WHERE user_id IS NOT NULL
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$function$
+;
+
+-- Table Triggers
+
+create trigger notif_recipient_index_ins after
+insert
+    on
+    public.users referencing new table as new_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_upd after
+update
+    on
+    public.users referencing new table as new_rows old table as old_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_del after
+delete
+    on
+    public.users referencing old table as old_rows for each statement execute function notif_recipient_index_on_change();
+
+-- Table Triggers
+
+create trigger notif_recipient_index_ins after
+insert
+    on
+    public.user_preferences referencing new table as new_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_upd after
+update
+    on
+    public.user_preferences referencing new table as new_rows old table as old_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_del after
+delete
+    on
+    public.user_preferences referencing old table as old_rows for each statement execute function notif_recipient_index_on_change();
+
+-- Table Triggers
+
+create trigger notif_recipient_index_ins after
+insert
+    on
+    public.user_pref_topic_type referencing new table as new_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_upd after
+update
+    on
+    public.user_pref_topic_type referencing new table as new_rows old table as old_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_del after
+delete
+    on
+    public.user_pref_topic_type referencing old table as old_rows for each statement execute function notif_recipient_index_on_change();
+
+-- Table Triggers
+
+create trigger notif_recipient_index_ins after
+insert
+    on
+    public.user_regional_preferences referencing new table as new_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_upd after
+update
+    on
+    public.user_regional_preferences referencing new table as new_rows old table as old_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_del after
+delete
+    on
+    public.user_regional_preferences referencing old table as old_rows for each statement execute function notif_recipient_index_on_change();
+
+-- Table Triggers
+
+create trigger notif_recipient_index_ins after
+insert
+    on
+    public.user_pref_search_filtering referencing new table as new_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_upd after
+update
+    on
+    public.user_pref_search_filtering referencing new table as new_rows old table as old_rows for each statement execute function notif_recipient_index_on_change();
+create trigger notif_recipient_index_del after
+delete
+    on
+    public.user_pref_search_filtering referencing old table as old_rows for each statement execute function notif_recipient_index_on_change();
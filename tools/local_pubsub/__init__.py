@@ -0,0 +1,3 @@
+"""
+Local pub/sub — in-process stand-in for Yandex Message Queue to run and benchmark the pipeline locally.
+"""
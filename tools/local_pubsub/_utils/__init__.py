@@ -0,0 +1 @@
+# Local pub/sub utilities
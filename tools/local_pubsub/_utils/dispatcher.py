@@ -0,0 +1,153 @@
+"""Local transport for `_dependencies.common.yandex_tools` and a dispatcher of queued messages to functions."""
+
+import importlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+from _dependencies.common.yandex_tools import PublishFailure, set_pubsub_transport
+
+from .queues import MessageQueue, QueuedMessage
+
+Receiver = Callable[[dict, Any], Any]
+
+# topic -> cloud function, which is subscribed to it
+TOPIC_RECEIVERS = {
+    'topic_for_first_post_processing': 'identify_updates_of_first_posts.main',
+    'topic_to_run_parsing_script': 'identify_updates_of_topics.main',
+    'topic_for_notification': 'compose_notifications.main',
+    'topic_to_send_notifications': 'send_notifications.main',
+    'topic_notify_admin': 'send_debug_to_admin.main',
+    'parse_user_profile_from_forum': 'connect_to_forum.main',
+    'topic_to_archive_notifs': 'archive_notifications.main',
+}
+
+# identify -> compose -> send; check_first_posts_for_changes reads the forum, the replay imitates its effects.
+# Functions which go to external services are not dispatched by default
+PIPELINE_TOPICS = (
+    'topic_for_first_post_processing',
+    'topic_for_notification',
+    'topic_to_send_notifications',
+)
+
+
+def import_receiver(topic_name: str) -> Receiver:
+    module = importlib.import_module(TOPIC_RECEIVERS[topic_name])
+    return module.main
+
+
+def make_cloud_event(body: str) -> dict:
+    """event of a YC trigger for message queue, as `process_pubsub_message_cloud` expects it"""
+    return {
+        'messages': [
+            {
+                'event_metadata': {'event_type': 'yandex.cloud.events.messagequeue.QueueMessage'},
+                'details': {'message': {'body': body}},
+            }
+        ]
+    }
+
+
+@dataclass
+class Delivery:
+    topic_name: str
+    trace_id: str | None
+    enqueued_at: float
+    started_at: float
+    finished_at: float
+    error: str | None = None
+
+    @property
+    def queue_wait(self) -> float:
+        return self.started_at - self.enqueued_at
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+class LocalDispatcher:
+    """Runs queued messages one by one through the functions subscribed to their topics.
+
+    Messages published while a message is handled inherit its trace id,
+    so the whole chain caused by one replayed change can be measured.
+    """
+
+    def __init__(self, queue: MessageQueue, receivers: dict[str, Receiver]) -> None:
+        self.queue = queue
+        self.receivers = receivers
+        self.deliveries: list[Delivery] = []
+        self.undelivered: list[QueuedMessage] = []  # messages to topics without receivers
+        self._current_trace_id: str | None = None
+
+    def publish(self, topic_name: str, message: Any, trace_id: str | None = None) -> None:
+        body = message if isinstance(message, str) else json.dumps(message)
+        self.queue.put(QueuedMessage(topic_name=topic_name, body=body, trace_id=trace_id or self._current_trace_id))
+
+    def run(self, max_messages: int | None = None) -> list[Delivery]:
+        """dispatch messages until the queue is empty, returns deliveries of this run"""
+        first_delivery = len(self.deliveries)
+        handled = 0
+        while max_messages is None or handled < max_messages:
+            message = self.queue.get()
+            if not message:
+                break
+            handled += 1
+            self._dispatch(message)
+        return self.deliveries[first_delivery:]
+
+    def _dispatch(self, message: QueuedMessage) -> None:
+        receiver = self.receivers.get(message.topic_name)
+        if not receiver:
+            self.undelivered.append(message)
+            return
+
+        self._current_trace_id = message.trace_id
+        started_at = time.time()
+        error = None
+        try:
+            receiver(make_cloud_event(message.body), {'local_pubsub': True})
+        except Exception as exc:
+            logging.exception(f'local pub/sub: {message.topic_name} failed')
+            error = repr(exc)
+        finally:
+            self._current_trace_id = None
+
+        self.deliveries.append(
+            Delivery(
+                topic_name=message.topic_name,
+                trace_id=message.trace_id,
+                enqueued_at=message.enqueued_at,
+                started_at=started_at,
+                finished_at=time.time(),
+                error=error,
+            )
+        )
+
+
+class LocalQueueTransport:
+    """`PubSubTransport` which puts messages into the local queue of the dispatcher"""
+
+    def __init__(self, dispatcher: LocalDispatcher) -> None:
+        self._dispatcher = dispatcher
+
+    def send_message(self, topic_name: str, serialized_message: str) -> None:
+        self._dispatcher.publish(topic_name, serialized_message)
+
+    def send_message_batch(self, topic_name: str, serialized_messages: list[str]) -> list[PublishFailure]:
+        for serialized_message in serialized_messages:
+            self._dispatcher.publish(topic_name, serialized_message)
+        return []
+
+
+@contextmanager
+def local_pubsub(dispatcher: LocalDispatcher) -> Iterator[LocalDispatcher]:
+    """route all pub/sub messages of the process to the local dispatcher inside the block"""
+    previous_transport = set_pubsub_transport(LocalQueueTransport(dispatcher))
+    try:
+        yield dispatcher
+    finally:
+        set_pubsub_transport(previous_transport)
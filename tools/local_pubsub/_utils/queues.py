@@ -0,0 +1,86 @@
+"""Queue backends for the local pub/sub: in-memory and SQLite."""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Protocol
+
+
+@dataclass
+class QueuedMessage:
+    topic_name: str
+    body: str
+    trace_id: str | None = None
+    # wall-clock: a message of the SQLite queue may be put by another process
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class MessageQueue(Protocol):
+    def put(self, message: QueuedMessage) -> None: ...
+
+    def get(self) -> QueuedMessage | None: ...
+
+    def __len__(self) -> int: ...
+
+
+class InMemoryQueue:
+    """FIFO queue shared by all topics"""
+
+    def __init__(self) -> None:
+        self._messages: deque[QueuedMessage] = deque()
+        self._lock = threading.Lock()
+
+    def put(self, message: QueuedMessage) -> None:
+        with self._lock:
+            self._messages.append(message)
+
+    def get(self) -> QueuedMessage | None:
+        with self._lock:
+            return self._messages.popleft() if self._messages else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._messages)
+
+
+class SQLiteQueue:
+    """FIFO queue persisted in SQLite: messages survive a crash of the harness and can be inspected"""
+
+    def __init__(self, path: str = ':memory:') -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic_name TEXT NOT NULL,
+                body TEXT NOT NULL,
+                trace_id TEXT,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+
+    def put(self, message: QueuedMessage) -> None:
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO messages (topic_name, body, trace_id, enqueued_at) VALUES (?, ?, ?, ?)',
+                (message.topic_name, message.body, message.trace_id, message.enqueued_at),
+            )
+
+    def get(self) -> QueuedMessage | None:
+        with self._lock:
+            row = self._connection.execute(
+                'DELETE FROM messages WHERE id = (SELECT MIN(id) FROM messages) '
+                'RETURNING topic_name, body, trace_id, enqueued_at'
+            ).fetchone()
+        if not row:
+            return None
+        return QueuedMessage(topic_name=row[0], body=row[1], trace_id=row[2], enqueued_at=row[3])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,70 @@
+"""Replay of recorded forum changes through the local pipeline."""
+
+import hashlib
+import json
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+from unittest.mock import MagicMock, patch
+
+from .dispatcher import LocalDispatcher
+
+FIRST_POST_TOPIC = 'topic_for_first_post_processing'
+
+
+def load_recording(path: Path) -> list[dict[str, Any]]:
+    """Recording is JSON lines, one forum change per line:
+
+    {"search_id": 123, "first_post": "<html of the new first post version>"}
+        – the new version is saved like check_first_posts_for_changes does, then the search is sent to identify
+    {"topic": "topic_for_notification", "message": {"triggered_by_func_id": 1, "text": ""}}
+        – any message is published as is
+    """
+    lines = path.read_text(encoding='utf-8').splitlines()
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def replay_changes(dispatcher: LocalDispatcher, changes: list[dict[str, Any]], burst: bool = False) -> None:
+    """publish recorded changes; each one is dispatched to the end unless `burst` – then all are queued at once"""
+    for i, change in enumerate(changes):
+        trace_id = f'change-{i}'
+        if 'first_post' in change:
+            save_first_post_version(change['search_id'], change['first_post'])
+            dispatcher.publish(FIRST_POST_TOPIC, [change['search_id']], trace_id)
+        else:
+            dispatcher.publish(change['topic'], change['message'], trace_id)
+
+        if not burst:
+            dispatcher.run()
+
+    dispatcher.run()
+
+
+def save_first_post_version(search_id: int, content: str) -> None:
+    from check_first_posts_for_changes._utils.database import get_db_client
+
+    db_client = get_db_client()
+    db_client.mark_search_first_post_as_not_actual(search_id)
+    db_client.create_search_first_post(search_id, hashlib.md5(content.encode()).hexdigest(), content)
+
+
+@contextmanager
+def stubbed_messengers() -> Iterator[None]:
+    """send_notifications runs its full loop, but messages are 'sent' without calling messenger APIs"""
+    with ExitStack() as stack:
+        for target in (
+            'send_notifications.main.tg_api_main_account',
+            'send_notifications.main.get_default_vk_api_client',
+            'send_notifications.main.MaxClient',
+        ):
+            stack.enter_context(patch(target, MagicMock()))
+        for target in (
+            'send_notifications._utils.clients.telegram_notificator.TelegramNotificator.dispatch',
+            'send_notifications._utils.clients.vk_notificator.VKNotificator.dispatch',
+            'send_notifications._utils.clients.max_notificator.MaxNotificator.dispatch',
+        ):
+            stack.enter_context(patch(target, return_value='completed'))
+        stack.enter_context(
+            patch('send_notifications._utils.services.notification_sender.SLEEP_TIME_FOR_NEW_NOTIFS_RECHECK_SECONDS', 0)
+        )
+        yield
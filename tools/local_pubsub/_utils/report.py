@@ -0,0 +1,98 @@
+"""Latency and throughput report over deliveries of the local dispatcher."""
+
+import math
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+from .dispatcher import TOPIC_RECEIVERS, Delivery
+
+# the replay saves first post versions instead of running it, so end-to-end latency starts at identify
+NOT_MEASURED_STAGES = ['check_first_posts_for_changes']
+
+
+@dataclass
+class LatencyStats:
+    count: int
+    p50: float
+    p95: float
+    max: float
+
+    @classmethod
+    def from_values(cls, values: list[float]) -> 'LatencyStats':
+        if not values:
+            return cls(count=0, p50=0.0, p95=0.0, max=0.0)
+        ordered = sorted(values)
+        return cls(
+            count=len(ordered),
+            p50=_percentile(ordered, 50),
+            p95=_percentile(ordered, 95),
+            max=ordered[-1],
+        )
+
+
+@dataclass
+class StageReport:
+    stage: str
+    errors: int
+    duration: LatencyStats
+    queue_wait: LatencyStats
+
+
+@dataclass
+class PipelineReport:
+    stages: list[StageReport]
+    end_to_end: LatencyStats
+    traces: int
+    messages: int
+    wall_time: float
+    traces_per_second: float
+    messages_per_second: float
+    not_measured: list[str]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def build_report(deliveries: list[Delivery]) -> PipelineReport:
+    by_topic: dict[str, list[Delivery]] = defaultdict(list)
+    by_trace: dict[str, list[Delivery]] = defaultdict(list)
+    for delivery in deliveries:
+        by_topic[delivery.topic_name].append(delivery)
+        if delivery.trace_id:
+            by_trace[delivery.trace_id].append(delivery)
+
+    stages = [
+        StageReport(
+            stage=TOPIC_RECEIVERS.get(topic_name, topic_name).split('.')[0],
+            errors=sum(1 for delivery in topic_deliveries if delivery.error),
+            duration=LatencyStats.from_values([delivery.duration for delivery in topic_deliveries]),
+            queue_wait=LatencyStats.from_values([delivery.queue_wait for delivery in topic_deliveries]),
+        )
+        for topic_name, topic_deliveries in by_topic.items()
+    ]
+
+    end_to_end = [
+        max(delivery.finished_at for delivery in trace) - min(delivery.enqueued_at for delivery in trace)
+        for trace in by_trace.values()
+    ]
+
+    wall_time = 0.0
+    if deliveries:
+        wall_time = max(d.finished_at for d in deliveries) - min(d.enqueued_at for d in deliveries)
+
+    return PipelineReport(
+        stages=stages,
+        end_to_end=LatencyStats.from_values(end_to_end),
+        traces=len(by_trace),
+        messages=len(deliveries),
+        wall_time=wall_time,
+        traces_per_second=len(by_trace) / wall_time if wall_time else 0.0,
+        messages_per_second=len(deliveries) / wall_time if wall_time else 0.0,
+        not_measured=list(NOT_MEASURED_STAGES),
+    )
+
+
+def _percentile(ordered: list[float], percent: float) -> float:
+    """nearest-rank percentile of a sorted list"""
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Local pub/sub — run the cloud functions pipeline in one process, without Yandex Message Queue.
+
+All messages published through `_dependencies.common.pubsub` are put into a local queue
+(in-memory or SQLite) and dispatched to `main(event, context)` of the subscribed function
+with the same event shape as YC message queue triggers produce.
+
+Modes:
+  replay   Replay recorded forum changes through identify -> compose -> send
+           and report per-stage and end-to-end latencies and throughput.
+           check_first_posts_for_changes is not run: the replay saves the new first post versions itself.
+
+Usage:
+  uv run python -m tools.local_pubsub.main replay changes.jsonl
+  uv run python -m tools.local_pubsub.main replay changes.jsonl --backend sqlite --queue-path queue.db --json
+"""
+
+import json
+import logging
+from contextlib import ExitStack
+from pathlib import Path
+
+import click
+from dotenv import load_dotenv
+
+from tools.local_pubsub._utils.dispatcher import (
+    PIPELINE_TOPICS,
+    TOPIC_RECEIVERS,
+    LocalDispatcher,
+    import_receiver,
+    local_pubsub,
+)
+from tools.local_pubsub._utils.queues import InMemoryQueue, MessageQueue, SQLiteQueue
+from tools.local_pubsub._utils.replay import load_recording, replay_changes, stubbed_messengers
+from tools.local_pubsub._utils.report import LatencyStats, PipelineReport, build_report
+
+
+@click.group()
+def cli() -> None:
+    """Local pub/sub — run the pipeline in one process."""
+
+
+@cli.command()
+@click.argument('recording', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--backend', type=click.Choice(['memory', 'sqlite']), default='memory', show_default=True)
+@click.option('--queue-path', default=':memory:', show_default=True, help='SQLite file for the sqlite backend')
+@click.option('--burst', is_flag=True, help='Queue all changes at once instead of one by one')
+@click.option('--all-topics', is_flag=True, help='Dispatch all topics, incl. the ones calling external services')
+@click.option('--env-file', default='.env', show_default=True, help='Environment with DB connection settings')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON')
+@click.option('--verbose', is_flag=True, help='Keep INFO logs of the functions')
+def replay(
+    recording: Path,
+    backend: str,
+    queue_path: str,
+    burst: bool,
+    all_topics: bool,
+    env_file: str,
+    as_json: bool,
+    verbose: bool,
+) -> None:
+    """Replay recorded forum changes and report latencies."""
+    load_dotenv(env_file, override=True)
+    if not verbose:
+        # functions re-configure the root logger on every run, so INFO is disabled globally
+        logging.disable(logging.INFO)
+
+    queue: MessageQueue = InMemoryQueue() if backend == 'memory' else SQLiteQueue(queue_path)
+    topics = TOPIC_RECEIVERS if all_topics else PIPELINE_TOPICS
+    dispatcher = LocalDispatcher(queue, {topic: import_receiver(topic) for topic in topics})
+
+    changes = load_recording(recording)
+    click.echo(f'⏳ Replaying {len(changes)} changes …', err=True)
+    with ExitStack() as stack:
+        stack.enter_context(stubbed_messengers())
+        stack.enter_context(local_pubsub(dispatcher))
+        replay_changes(dispatcher, changes, burst=burst)
+
+    report = build_report(dispatcher.deliveries)
+    if as_json:
+        click.echo(json.dumps(report.to_dict(), indent=2))
+    else:
+        _print_report(report)
+
+    if dispatcher.undelivered:
+        topics_skipped = sorted({message.topic_name for message in dispatcher.undelivered})
+        click.echo(f'ℹ️  {len(dispatcher.undelivered)} messages not dispatched: {", ".join(topics_skipped)}', err=True)
+
+
+def _print_report(report: PipelineReport) -> None:
+    click.echo(f'{"stage":<35} {"n":>6} {"err":>4} {"p50, s":>9} {"p95, s":>9} {"max, s":>9} {"wait p95":>9}')
+    for stage in report.stages:
+        click.echo(
+            f'{stage.stage:<35} {stage.duration.count:>6} {stage.errors:>4} '
+            f'{_format_stats(stage.duration)} {stage.queue_wait.p95:>9.3f}'
+        )
+    click.echo(f'{"end-to-end":<35} {report.end_to_end.count:>6} {"":>4} {_format_stats(report.end_to_end)}')
+    click.echo()
+    click.echo(
+        f'{report.traces} changes, {report.messages} messages in {report.wall_time:.2f} s: '
+        f'{report.traces_per_second:.2f} changes/s, {report.messages_per_second:.2f} messages/s'
+    )
+    click.echo(
+        f'not measured: {", ".join(report.not_measured)} — the replay saves first post versions instead, '
+        'end-to-end starts at identify'
+    )
+
+
+def _format_stats(stats: LatencyStats) -> str:
+    return f'{stats.p50:>9.3f} {stats.p95:>9.3f} {stats.max:>9.3f}'
+
+
+if __name__ == '__main__':
+    cli()
@@ -1,31 +1,56 @@
 """Error pattern analysis and normalization."""
 
+import heapq
+import itertools
 import re
-from collections import Counter
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+from functools import lru_cache
 
-# Patterns that normalize variable parts out of error messages.
+# Patterns that normalize variable parts out of error messages, with the substrings a message must
+# contain for the pattern to match (checked case-insensitively for IGNORECASE patterns).
 # Order matters — apply UUID before generic hash/hex.
-_NORMALIZE_PATTERNS: list[tuple[re.Pattern[str], str]] = [
-    (re.compile(r"'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'"), '<uuid>'),
-    (re.compile(r'"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"'), '<uuid>'),
-    (re.compile(r'(?<=\s)[0-9a-f]{32}(?=\s|$)'), '<hash>'),
-    (re.compile(r'0x[0-9a-fA-F]+'), '<hex>'),
-    (re.compile(r'\b\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}'), '<timestamp>'),
-    (re.compile(r'\b\d+\.\d+\.\d+\.\d+'), '<ip>'),
-    (re.compile(r'/\d+/'), '/<id>/'),
-    (re.compile(r'(?<=/)[0-9]+(?=/|$)'), '<num>'),
-    (re.compile(r'telegram_id[=:]\s*\d+', re.IGNORECASE), 'telegram_id=<id>'),
-    (re.compile(r'(?<=status[=:])\s*\d+', re.IGNORECASE), '<status>'),
-    (re.compile(r'\b\d{10,}\b'), '<large_num>'),
+_NORMALIZE_PATTERNS: list[tuple[re.Pattern[str], str, tuple[str, ...]]] = [
+    (re.compile(r"'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'"), '<uuid>', ("'", '-')),
+    (re.compile(r'"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"'), '<uuid>', ('"', '-')),
+    (re.compile(r'(?<=\s)[0-9a-f]{32}(?=\s|$)'), '<hash>', ()),
+    (re.compile(r'0x[0-9a-fA-F]+'), '<hex>', ('0x',)),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}'), '<timestamp>', ('T', ':', '-')),
+    (re.compile(r'\b\d+\.\d+\.\d+\.\d+'), '<ip>', ('.',)),
+    (re.compile(r'/\d+/'), '/<id>/', ('/',)),
+    (re.compile(r'(?<=/)[0-9]+(?=/|$)'), '<num>', ('/',)),
+    (re.compile(r'telegram_id[=:]\s*\d+', re.IGNORECASE), 'telegram_id=<id>', ('telegram_id',)),
+    (re.compile(r'(?<=status[=:])\s*\d+', re.IGNORECASE), '<status>', ('status',)),
+    (re.compile(r'\b\d{10,}\b'), '<large_num>', ()),
 ]
 
+# (pattern, replacement, required substrings, whether they are checked case-insensitively)
+_GUARDED_PATTERNS = [
+    (pattern, replacement, required, bool(pattern.flags & re.IGNORECASE))
+    for pattern, replacement, required in _NORMALIZE_PATTERNS
+]
+
+# Placeholders add none of the required substrings, so they are looked up in the original message.
+# Every pattern from <hex> on needs a digit, and placeholders have none.
+_DIGIT = re.compile(r'\d')
+_FIRST_DIGIT_PATTERN = 3
+
+_REQUEST_ID_PATTERN = re.compile(r'request_id[=:]\s*([0-9a-f-]+)', re.IGNORECASE)
+
 
+@lru_cache(maxsize=4096)
 def normalize_error(message: str) -> str:
     """Replace variable parts of an error message with stable placeholders."""
     result = message
-    for pattern, replacement in _NORMALIZE_PATTERNS:
-        result = pattern.sub(replacement, result)
+    folded = message.casefold()
+    patterns = _GUARDED_PATTERNS if _DIGIT.search(message) else _GUARDED_PATTERNS[:_FIRST_DIGIT_PATTERN]
+    for pattern, replacement, required, ignore_case in patterns:
+        text = folded if ignore_case else message
+        for part in required:
+            if part not in text:
+                break
+        else:
+            result = pattern.sub(replacement, result)
     return result
 
 
@@ -44,7 +69,7 @@ def extract_request_id(entry: dict) -> str | None:
     if not isinstance(message, str):
         return None
 
-    match = re.search(r'request_id[=:]\s*([0-9a-f-]+)', message, re.IGNORECASE)
+    match = _REQUEST_ID_PATTERN.search(message)
     if match:
         return match.group(1)
 
@@ -57,6 +82,85 @@ class ErrorGroup:
     count: int
     sample_message: str
     sample_request_ids: list[str] = field(default_factory=list)
+    first_seen: str | None = None
+    last_seen: str | None = None
+    # how much ``count`` may be overstated: the count of the group it replaced in a bounded aggregator
+    overcount: int = 0
+
+
+class ErrorAggregator:
+    """Groups ERROR-level log entries by normalized pattern as they arrive.
+
+    Keeps at most ``max_groups`` groups (None — unbounded), so memory does not grow with the number
+    of entries. When a new pattern comes to a full aggregator, the group with the lowest count is
+    replaced and the new group starts from that count (Space-Saving): a pattern that occurs more
+    than ``errors_seen / max_groups`` times is never lost, and ``count - overcount`` is a lower bound
+    of its real count. ``first_seen`` is then the first entry since the group was taken.
+    """
+
+    def __init__(self, max_groups: int | None = 1000, max_request_ids: int = 3) -> None:
+        self.max_groups = max_groups
+        self.max_request_ids = max_request_ids
+        self.entries_seen = 0
+        self.errors_seen = 0
+        self._groups: dict[str, ErrorGroup] = {}
+        # (count, order, pattern) per group; counts may be stale but never above the group's count
+        self._by_count: list[tuple[int, int, str]] = []
+        self._order = itertools.count()
+
+    def add(self, entry: dict) -> None:
+        self.entries_seen += 1
+        if entry.get('level') != 'ERROR':
+            return
+        self.errors_seen += 1
+
+        message = entry.get('message', '') or ''
+        pattern = normalize_error(message)
+        group = self._groups.get(pattern)
+        if group is None:
+            group = self._new_group(pattern, message)
+        group.count += 1
+
+        timestamp = entry.get('timestamp')
+        if timestamp:
+            if group.first_seen is None or timestamp < group.first_seen:
+                group.first_seen = timestamp
+            if group.last_seen is None or timestamp > group.last_seen:
+                group.last_seen = timestamp
+
+        if len(group.sample_request_ids) < self.max_request_ids:
+            req_id = extract_request_id(entry)
+            if req_id and req_id not in group.sample_request_ids:
+                group.sample_request_ids.append(req_id)
+
+    def add_all(self, entries: Iterable[dict]) -> 'ErrorAggregator':
+        for entry in entries:
+            self.add(entry)
+        return self
+
+    def top(self, top_n: int = 10) -> list[ErrorGroup]:
+        """Top-N groups by count (descending), ties in the order the groups appeared."""
+        return sorted(self._groups.values(), key=lambda group: group.count, reverse=True)[:top_n]
+
+    def _new_group(self, pattern: str, message: str) -> ErrorGroup:
+        overcount = 0
+        if self.max_groups is not None:
+            if len(self._groups) >= self.max_groups:
+                overcount = self._evict_smallest()
+            heapq.heappush(self._by_count, (overcount, next(self._order), pattern))
+        group = ErrorGroup(pattern=pattern, count=overcount, sample_message=message, overcount=overcount)
+        self._groups[pattern] = group
+        return group
+
+    def _evict_smallest(self) -> int:
+        """Drop the group with the lowest count; its count."""
+        while True:
+            count, order, pattern = heapq.heappop(self._by_count)
+            current = self._groups[pattern].count
+            if current == count:
+                del self._groups[pattern]
+                return count
+            heapq.heappush(self._by_count, (current, order, pattern))
 
 
 def group_errors(
@@ -68,33 +172,5 @@ def group_errors(
 
     Returns top-N groups sorted by occurrence count (descending).
     """
-    error_entries = [e for e in entries if e.get('level') == 'ERROR']
-    if not error_entries:
-        return []
-
-    pattern_counter: Counter[str] = Counter()
-    pattern_samples: dict[str, str] = {}
-    pattern_request_ids: dict[str, list[str]] = {}
-
-    for entry in error_entries:
-        message = entry.get('message', '') or ''
-        pattern = normalize_error(message)
-        pattern_counter[pattern] += 1
-
-        if pattern not in pattern_samples:
-            pattern_samples[pattern] = message
-
-        req_id = extract_request_id(entry)
-        if req_id and req_id not in pattern_request_ids.setdefault(pattern, []):
-            if len(pattern_request_ids[pattern]) < max_request_ids:
-                pattern_request_ids[pattern].append(req_id)
-
-    return [
-        ErrorGroup(
-            pattern=pattern,
-            count=count,
-            sample_message=pattern_samples[pattern],
-            sample_request_ids=pattern_request_ids.get(pattern, []),
-        )
-        for pattern, count in pattern_counter.most_common(top_n)
-    ]
+    aggregator = ErrorAggregator(max_groups=None, max_request_ids=max_request_ids)
+    return aggregator.add_all(entries).top(top_n)
@@ -0,0 +1,184 @@
+"""Latency of the notification pipeline from the ``pipeline_stage`` events of the function logs.
+
+A forum change goes through check_first_posts_for_changes (``detected``, by search number),
+identify_updates_* (``change_logged``, the change_log record is created), compose_notifications
+(``composed``) and send_notifications (``sent``, the first delivered notification). Events after
+detection carry ``change_log_id``, so an item is one change_log record; its detection is the
+latest ``detected`` event for the same search at or before the record was created.
+"""
+
+import math
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from tools.log_inspector._utils.yc_logging import _entry_time
+
+# values of PipelineStage in src/_dependencies/common/pipeline_events.py, in pipeline order
+DETECTED = 'detected'
+CHANGE_LOGGED = 'change_logged'
+COMPOSED = 'composed'
+SENT = 'sent'
+STAGES = (DETECTED, CHANGE_LOGGED, COMPOSED, SENT)
+
+# measured spans: name -> (from stage, to stage)
+SPANS: dict[str, tuple[str, str]] = {
+    'identify': (DETECTED, CHANGE_LOGGED),
+    'compose': (CHANGE_LOGGED, COMPOSED),
+    'send': (COMPOSED, SENT),
+    'end_to_end': (DETECTED, SENT),
+}
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+
+@dataclass
+class PipelineItem:
+    """One change_log record and the time it reached each stage."""
+
+    change_log_id: int
+    search_num: int | None = None
+    times: dict[str, datetime] = field(default_factory=dict)
+
+    @property
+    def start(self) -> datetime:
+        return min(self.times.values())
+
+    @property
+    def delivered(self) -> bool:
+        return SENT in self.times
+
+    def latency(self, span: str) -> float | None:
+        """Seconds between the stages of ``span`` or None if one of them is not in the logs."""
+        from_stage, to_stage = SPANS[span]
+        if from_stage not in self.times or to_stage not in self.times:
+            return None
+        return (self.times[to_stage] - self.times[from_stage]).total_seconds()
+
+
+@dataclass
+class SpanStats:
+    span: str
+    count: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+@dataclass
+class Regression:
+    span: str
+    quantile: str
+    before: float
+    after: float
+
+    @property
+    def ratio(self) -> float:
+        return self.after / self.before if self.before else math.inf
+
+
+def _as_int(value: Any) -> int | None:
+    # numbers come back from the JSON payload as floats
+    return None if value is None else int(value)
+
+
+def correlate(entries: Iterable[dict]) -> list[PipelineItem]:
+    """Collect pipeline events into items, ordered by the time they entered the pipeline.
+
+    Repeated events of a stage (redelivered messages, several send runs) count by the earliest one.
+    Entries without ``pipeline_stage`` are skipped, so the whole log can be passed.
+    """
+    detections: dict[int, list[datetime]] = defaultdict(list)
+    items: dict[int, PipelineItem] = {}
+    for entry in entries:
+        payload = entry.get('json_payload') or {}
+        stage = payload.get('pipeline_stage')
+        if stage not in STAGES:
+            continue
+        ts = _entry_time(entry)
+        search_num = _as_int(payload.get('search_num'))
+        if stage == DETECTED:
+            if search_num is not None:
+                detections[search_num].append(ts)
+            continue
+
+        change_log_id = _as_int(payload.get('change_log_id'))
+        if change_log_id is None:
+            continue
+        item = items.setdefault(change_log_id, PipelineItem(change_log_id))
+        if item.search_num is None:
+            item.search_num = search_num
+        if stage not in item.times or ts < item.times[stage]:
+            item.times[stage] = ts
+
+    for times in detections.values():
+        times.sort()
+    for item in items.values():
+        logged = item.times.get(CHANGE_LOGGED)
+        if logged is None or item.search_num is None:
+            continue
+        search_detections = detections.get(item.search_num, [])
+        i = bisect_right(search_detections, logged)
+        if i:
+            item.times[DETECTED] = search_detections[i - 1]
+
+    return sorted(items.values(), key=lambda item: item.start)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+
+def span_stats(items: Iterable[PipelineItem]) -> list[SpanStats]:
+    """Percentiles of every span that has at least one measurement."""
+    items = list(items)
+    stats = []
+    for span in SPANS:
+        values = sorted(value for item in items if (value := item.latency(span)) is not None)
+        if not values:
+            continue
+        stats.append(
+            SpanStats(
+                span=span,
+                count=len(values),
+                p50=_percentile(values, QUANTILES['p50']),
+                p90=_percentile(values, QUANTILES['p90']),
+                p99=_percentile(values, QUANTILES['p99']),
+                max=values[-1],
+            )
+        )
+    return stats
+
+
+def slowest(items: Iterable[PipelineItem], top_n: int = 10, span: str = 'end_to_end') -> list[PipelineItem]:
+    """Items with the longest ``span``, slowest first."""
+    measured = [item for item in items if item.latency(span) is not None]
+    return sorted(measured, key=lambda item: item.latency(span) or 0.0, reverse=True)[:top_n]
+
+
+def find_regressions(
+    before: list[SpanStats],
+    after: list[SpanStats],
+    threshold: float = 1.5,
+    min_seconds: float = 1.0,
+) -> list[Regression]:
+    """Percentiles that grew at least ``threshold`` times and by at least ``min_seconds``.
+
+    The absolute bound keeps sub-second noise (0.1 s → 0.3 s) out of the report.
+    """
+    previous = {stats.span: stats for stats in before}
+    regressions = []
+    for stats in after:
+        old = previous.get(stats.span)
+        if old is None:
+            continue
+        for quantile in QUANTILES:
+            old_value, new_value = getattr(old, quantile), getattr(stats, quantile)
+            if new_value >= old_value * threshold and new_value - old_value >= min_seconds:
+                regressions.append(Regression(stats.span, quantile, old_value, new_value))
+    return regressions
@@ -0,0 +1,53 @@
+"""On-disk cache of log windows that are already complete.
+
+A window is stored once it has ended long enough ago for YC to have ingested all its entries and it
+was read in full (no failed pages, no truncation). The key is the log group, the query (levels and
+filter) and the window bounds, so a repeated ``top-errors`` or ``trace`` only fetches the windows
+it has not seen yet.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'log_inspector' / 'windows.sqlite'
+
+
+class WindowCache:
+    """SQLite file with the entries of complete windows, one row per window."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS windows (
+                log_group_id TEXT NOT NULL,
+                query TEXT NOT NULL,
+                from_time TEXT NOT NULL,
+                to_time TEXT NOT NULL,
+                entries TEXT NOT NULL,
+                PRIMARY KEY (log_group_id, query, from_time, to_time)
+            )
+        """)
+
+    def get(self, log_group_id: str, query: str, from_time: datetime, to_time: datetime) -> list[dict[str, Any]] | None:
+        """Entries of the window or None if it is not cached."""
+        row = self._conn.execute(
+            'SELECT entries FROM windows WHERE log_group_id=? AND query=? AND from_time=? AND to_time=?',
+            (log_group_id, query, from_time.isoformat(), to_time.isoformat()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(
+        self, log_group_id: str, query: str, from_time: datetime, to_time: datetime, entries: list[dict[str, Any]]
+    ) -> None:
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?, ?)',
+                (log_group_id, query, from_time.isoformat(), to_time.isoformat(), json.dumps(entries)),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
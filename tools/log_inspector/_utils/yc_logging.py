@@ -6,7 +6,11 @@ Uses YC_LOG_INSPECTOR_SA_JSON environment variable for authentication.
 import json
 import logging
 import os
+import threading
 import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Any
@@ -20,6 +24,8 @@ from yandex.cloud.logging.v1.log_reading_service_pb2 import Criteria, ReadReques
 from yandex.cloud.logging.v1.log_reading_service_pb2_grpc import LogReadingServiceStub
 from yandexcloud import SDK
 
+from tools.log_inspector._utils.window_cache import WindowCache
+
 logger = logging.getLogger(__name__)
 
 _ENV_VAR = 'YC_LOG_INSPECTOR_SA_JSON'
@@ -45,6 +51,11 @@ _THROTTLE_SECONDS = 0.3
 # YC caps Criteria.page_size at 1000.
 _MAX_PAGE_SIZE = 1000
 
+# A window that ended earlier than this is complete in YC and may be cached.
+_CACHE_SETTLE = timedelta(minutes=10)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
 class AuthError(RuntimeError):
     """Authentication-related errors."""
@@ -84,6 +95,17 @@ def _entry_to_dict(entry: Any) -> dict[str, Any]:
     return d
 
 
+def _entry_time(entry: dict[str, Any]) -> datetime:
+    """Entry timestamp as an aware UTC datetime (protobuf timestamps come back naive)."""
+    ts = datetime.fromisoformat(entry['timestamp'])
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _query_key(levels: list[str] | None, filter_str: str | None) -> str:
+    """Cache key part for what is read from a window."""
+    return json.dumps({'levels': sorted(lvl.upper() for lvl in levels or []), 'filter': filter_str or ''})
+
+
 def _dedupe_by_uid(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
     """Drop duplicate entries by 'uid', keeping the first occurrence."""
     seen: set[str] = set()
@@ -98,6 +120,21 @@ def _dedupe_by_uid(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return deduped
 
 
+class _Throttle:
+    """Keeps Read requests of all threads at least ``interval`` seconds apart."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self, interval: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + interval
+        time.sleep(start_at - now)
+
+
 class YCLoggingClient:
     """YC Logging gRPC client using yandexcloud SDK.
 
@@ -108,6 +145,9 @@ class YCLoggingClient:
         self._sdk = _make_sdk()
         self._log_group_stub = self._sdk.client(LogGroupServiceStub)
         self._log_reading_stub = self._sdk.client(LogReadingServiceStub)
+        self._throttle = _Throttle()
+        # per thread: whether the window being read lost a page or was cut short
+        self._window_state = threading.local()
 
     # ── Log Groups ───────────────────────────────────────────────────
 
@@ -184,6 +224,8 @@ class YCLoggingClient:
         retries: int = 3,
         page_size: int = 1000,
         throttle_seconds: float = _THROTTLE_SECONDS,
+        workers: int = 1,
+        cache: WindowCache | None = None,
     ) -> list[dict[str, Any]]:
         """Read all matching log entries.
 
@@ -204,6 +246,13 @@ class YCLoggingClient:
         Read requests are throttled (``throttle_seconds``) to respect YC's
         ~5 requests/second limit; transient gRPC errors are retried.
 
+        Slices are read by a pool of ``workers`` threads; the throttle is
+        shared, so workers only overlap the latency of requests. With a
+        ``cache`` the slices are aligned to the ``slice_hours`` grid: a slice
+        that ended ``_CACHE_SETTLE`` ago is read whole, stored if it was read
+        in full and taken from the cache next time; the entries are then cut
+        to ``from_time`` / ``to_time``.
+
         Args:
             log_group_id: YC log group id.
             levels: log levels to filter by (e.g. ['ERROR']).
@@ -215,6 +264,49 @@ class YCLoggingClient:
             retries: how many times to retry a failed Read call.
             page_size: page size for Read requests (max 1000).
             throttle_seconds: pause between Read requests (~0.3-0.5s).
+            workers: how many slices are read at the same time.
+            cache: cache of complete slices (used only with slicing).
+        """
+        return _dedupe_by_uid(
+            list(
+                self.iter_all_logs(
+                    log_group_id,
+                    levels=levels,
+                    filter_str=filter_str,
+                    from_time=from_time,
+                    to_time=to_time,
+                    max_pages=max_pages,
+                    slice_hours=slice_hours,
+                    retries=retries,
+                    page_size=page_size,
+                    throttle_seconds=throttle_seconds,
+                    workers=workers,
+                    cache=cache,
+                )
+            )
+        )
+
+    def iter_all_logs(
+        self,
+        log_group_id: str,
+        *,
+        levels: list[str] | None = None,
+        filter_str: str | None = None,
+        from_time: datetime | None = None,
+        to_time: datetime | None = None,
+        max_pages: int = 500,
+        slice_hours: float = 1.0,
+        retries: int = 3,
+        page_size: int = 1000,
+        throttle_seconds: float = _THROTTLE_SECONDS,
+        workers: int = 1,
+        cache: WindowCache | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield the entries of ``read_all_logs`` slice by slice, in time order.
+
+        At most ``workers`` slices are read ahead, so memory does not grow
+        with the window. Entries are deduplicated by ``uid`` within a slice
+        (slices do not overlap). Arguments are the same as ``read_all_logs``.
         """
         if from_time is None:
             from_time = datetime.now(timezone.utc) - timedelta(hours=1)
@@ -223,41 +315,59 @@ class YCLoggingClient:
 
         page_size = max(1, min(page_size, _MAX_PAGE_SIZE))
 
-        entries: list[dict[str, Any]] = []
-        if slice_hours and slice_hours > 0:
-            t = from_time
-            while t < to_time:
-                chunk_to = min(t + timedelta(hours=slice_hours), to_time)
-                entries.extend(
-                    self._read_window(
-                        log_group_id,
-                        levels=levels,
-                        filter_str=filter_str,
-                        from_time=t,
-                        to_time=chunk_to,
-                        max_pages=max_pages,
-                        retries=retries,
-                        page_size=page_size,
-                        throttle_seconds=throttle_seconds,
-                    )
-                )
-                t = chunk_to
-        else:
-            entries.extend(
-                self._read_window(
+        if not slice_hours or slice_hours <= 0:
+            cache = None
+        settled = datetime.now(timezone.utc) - _CACHE_SETTLE
+        query = _query_key(levels, filter_str)
+        windows = iter(_plan_windows(from_time, to_time, slice_hours, aligned_until=settled if cache else None))
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # (window, cached entries or the future reading the window), in time order
+            ahead: deque[tuple[tuple[datetime, datetime], list[dict[str, Any]] | Future]] = deque()
+
+            def read_ahead() -> None:
+                window = next(windows, None)
+                if window is None:
+                    return
+                cached = cache.get(log_group_id, query, *window) if cache else None
+                if cached is not None:
+                    ahead.append((window, cached))
+                    return
+                future = pool.submit(
+                    self._read_complete_window,
                     log_group_id,
                     levels=levels,
                     filter_str=filter_str,
-                    from_time=from_time,
-                    to_time=to_time,
+                    from_time=window[0],
+                    to_time=window[1],
                     max_pages=max_pages,
                     retries=retries,
                     page_size=page_size,
                     throttle_seconds=throttle_seconds,
                 )
-            )
-
-        return _dedupe_by_uid(entries)
+                ahead.append((window, future))
+
+            for _ in range(max(1, workers)):
+                read_ahead()
+            while ahead:
+                window, result = ahead.popleft()
+                if isinstance(result, Future):
+                    entries, complete = result.result()
+                    if cache and complete and window[1] <= settled:
+                        cache.put(log_group_id, query, *window, entries)
+                else:
+                    entries = result
+                read_ahead()
+
+                if cache:
+                    entries = [e for e in entries if from_time <= _entry_time(e) < to_time]
+                yield from _dedupe_by_uid(entries)
+
+    def _read_complete_window(self, log_group_id: str, **kwargs: Any) -> tuple[list[dict[str, Any]], bool]:
+        """Read one time slice; the entries and whether the slice was read in full."""
+        self._window_state.incomplete = False
+        entries = self._read_window(log_group_id, **kwargs)
+        return entries, not self._window_state.incomplete
 
     def _read_window(
         self,
@@ -329,7 +439,10 @@ class YCLoggingClient:
         )
         entries = page.get('entries', [])
 
-        if len(entries) < page_size or to_time - from_time <= _MIN_WINDOW:
+        if len(entries) < page_size:
+            return entries
+        if to_time - from_time <= _MIN_WINDOW:
+            self._mark_incomplete()
             return entries
 
         mid = from_time + (to_time - from_time) / 2
@@ -398,6 +511,8 @@ class YCLoggingClient:
             page_token = result.get('next_page_token')
             if not page_token or not batch:
                 break
+        else:
+            self._mark_incomplete()
 
         return entries
 
@@ -423,7 +538,7 @@ class YCLoggingClient:
         while True:
             try:
                 if throttle_seconds > 0:
-                    time.sleep(throttle_seconds)
+                    self._throttle.wait(throttle_seconds)
                 return self.read_logs(
                     log_group_id,
                     levels=levels,
@@ -443,8 +558,42 @@ class YCLoggingClient:
                         from_time,
                         to_time,
                     )
+                    self._mark_incomplete()
                     return {'entries': [], 'next_page_token': None}
                 time.sleep(1 * attempt)
 
+    def _mark_incomplete(self) -> None:
+        """Keep the window being read by this thread out of the cache."""
+        self._window_state.incomplete = True
+
     def close(self) -> None:
         """No-op for compatibility; gRPC channels managed by SDK."""
+
+
+def _plan_windows(
+    from_time: datetime, to_time: datetime, slice_hours: float, *, aligned_until: datetime | None
+) -> list[tuple[datetime, datetime]]:
+    """Split the window into slices of ``slice_hours`` (one window if slicing is off).
+
+    With ``aligned_until`` (caching) the slices follow the UTC grid of ``slice_hours``, so they are
+    the same from run to run; a grid slice that ends by ``aligned_until`` is kept whole even if it
+    starts before ``from_time``, later slices are cut to the window.
+    """
+    if not slice_hours or slice_hours <= 0:
+        return [(from_time, to_time)]
+
+    step = timedelta(hours=slice_hours)
+    if aligned_until is None:
+        t = from_time
+    else:
+        t = _EPOCH + (from_time - _EPOCH) // step * step
+
+    windows: list[tuple[datetime, datetime]] = []
+    while t < to_time:
+        grid_to = t + step
+        if aligned_until is not None and grid_to <= aligned_until:
+            windows.append((t, grid_to))
+        else:
+            windows.append((max(t, from_time), min(grid_to, to_time)))
+        t = grid_to
+    return windows
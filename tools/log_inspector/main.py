@@ -9,6 +9,9 @@ Ref: https://github.com/volodkindv/la_searcher_bot/issues/5
 Modes:
   top-errors   Aggregate ERROR logs, group by pattern, show top-N with request_ids.
   trace        Get all logs for a specific request_id to reconstruct the full picture.
+  pipeline-latency
+               Correlate pipeline_stage events across function logs: per-stage and
+               end-to-end latency percentiles, slowest changes, regressions.
   list-groups  List available log groups in a YC folder.
   raw          Raw JSON dump for programmatic use.
 
@@ -18,6 +21,7 @@ Auth:
 Usage:
   uv run python tools/log_inspector/main.py top-errors <log-group-id> --hours 24 --top 10
   uv run python tools/log_inspector/main.py trace <log-group-id> <request-id> --hours 24
+  uv run python tools/log_inspector/main.py pipeline-latency <log-group-id>... --hours 24 --compare
   uv run python tools/log_inspector/main.py list-groups <folder-id>
   uv run python tools/log_inspector/main.py raw <log-group-id> --hours 1 --level ERROR
 
@@ -30,17 +34,34 @@ Known YC Logging quirks (handled automatically):
     `to_time` is applied client-side. The window is split into
     `--slice-hours` chunks (default 1h).
   * gRPC UNAVAILABLE / transient errors are retried per request.
+
+Slices are read by `--workers` threads (requests stay throttled to YC's rate
+limit) and complete slices are cached in `~/.cache/log_inspector/windows.sqlite`,
+so a repeated query only fetches new data; `--no-cache` reads everything again.
 """
 
+import itertools
 import json
 import sys
 from datetime import datetime, timedelta, timezone
 
 import click
 
-from tools.log_inspector._utils.analytics import group_errors
+from tools.log_inspector._utils.analytics import ErrorAggregator
+from tools.log_inspector._utils.pipeline import (
+    STAGES,
+    PipelineItem,
+    SpanStats,
+    correlate,
+    find_regressions,
+    slowest,
+    span_stats,
+)
+from tools.log_inspector._utils.window_cache import WindowCache
 from tools.log_inspector._utils.yc_logging import AuthError, YCLoggingClient
 
+_PIPELINE_FILTER = ' OR '.join(f'pipeline_stage="{stage}"' for stage in STAGES)
+
 _COLORS = {
     'ERROR': 'red',
     'FATAL': 'red',
@@ -60,34 +81,40 @@ def cli() -> None:
 @click.option('--hours', default=24, show_default=True, help='Time window (hours)')
 @click.option('--top', default=10, show_default=True, help='Number of top error patterns')
 @click.option('--slice-hours', default=1.0, show_default=True, help='Window slice size (hours) for stable pagination')
-def top_errors(log_group_id: str, hours: int, top: int, slice_hours: float) -> None:
+@click.option('--workers', default=4, show_default=True, help='Slices read at the same time')
+@click.option('--no-cache', is_flag=True, help='Do not use the cache of complete slices')
+def top_errors(log_group_id: str, hours: int, top: int, slice_hours: float, workers: int, no_cache: bool) -> None:
     """Aggregate ERROR logs by normalized pattern."""
     client = _make_client()
     to_time = datetime.now(timezone.utc)
     from_time = to_time - timedelta(hours=hours)
 
     click.echo(f'⏳ Fetching ERROR logs for the last {hours}h …', err=True)
-    entries = client.read_all_logs(
-        log_group_id,
-        levels=['ERROR'],
-        from_time=from_time,
-        to_time=to_time,
-        slice_hours=slice_hours,
+    aggregator = ErrorAggregator().add_all(
+        client.iter_all_logs(
+            log_group_id,
+            levels=['ERROR'],
+            from_time=from_time,
+            to_time=to_time,
+            slice_hours=slice_hours,
+            workers=workers,
+            cache=_make_cache(no_cache),
+        )
     )
-    error_entries = [e for e in entries if e.get('level') == 'ERROR']
     click.echo(
-        f'📊 Found {len(error_entries)} ERROR entries (out of {len(entries)} total).\n',
+        f'📊 Found {aggregator.errors_seen} ERROR entries (out of {aggregator.entries_seen} total).\n',
         err=True,
     )
 
-    if not error_entries:
+    if not aggregator.errors_seen:
         click.secho('✅ No ERROR entries in the selected window.', fg='green')
         return
 
-    groups = group_errors(error_entries, top_n=top)
+    groups = aggregator.top(top)
     for i, group in enumerate(groups):
         click.echo('=' * 80)
-        click.echo(f'#{i + 1}  —  {group.count} occurrences')
+        occurrences = f'≥{group.count - group.overcount}' if group.overcount else str(group.count)
+        click.echo(f'#{i + 1}  —  {occurrences} occurrences, {group.first_seen} … {group.last_seen}')
         click.echo('=' * 80)
         click.echo(group.sample_message[:600])
         if group.sample_request_ids:
@@ -102,8 +129,18 @@ def top_errors(log_group_id: str, hours: int, top: int, slice_hours: float) -> N
 @click.argument('request_id')
 @click.option('--hours', default=24, show_default=True, help='Time window (hours)')
 @click.option('--slice-hours', default=1.0, show_default=True, help='Window slice size (hours) for stable pagination')
+@click.option('--workers', default=4, show_default=True, help='Slices read at the same time')
+@click.option('--no-cache', is_flag=True, help='Do not use the cache of complete slices')
 @click.option('--filter', '-f', help='Custom filter expression (overrides request_id filter)')
-def trace(log_group_id: str, request_id: str, hours: int, slice_hours: float, filter: str | None) -> None:
+def trace(
+    log_group_id: str,
+    request_id: str,
+    hours: int,
+    slice_hours: float,
+    workers: int,
+    no_cache: bool,
+    filter: str | None,
+) -> None:
     """Trace all log entries for a specific request_id."""
     client = _make_client()
     to_time = datetime.now(timezone.utc)
@@ -118,6 +155,8 @@ def trace(log_group_id: str, request_id: str, hours: int, slice_hours: float, fi
         from_time=from_time,
         to_time=to_time,
         slice_hours=slice_hours,
+        workers=workers,
+        cache=_make_cache(no_cache),
     )
     click.echo(f'📊 Found {len(entries)} entries.\n', err=True)
 
@@ -136,6 +175,85 @@ def trace(log_group_id: str, request_id: str, hours: int, slice_hours: float, fi
         click.echo()
 
 
+@cli.command()
+@click.argument('log_group_ids', nargs=-1, required=True)
+@click.option('--hours', default=24, show_default=True, help='Time window (hours)')
+@click.option('--compare', is_flag=True, help='Compare with the previous window of the same length')
+@click.option('--top', default=10, show_default=True, help='Number of slowest changes to show')
+@click.option('--slice-hours', default=1.0, show_default=True, help='Window slice size (hours) for stable pagination')
+@click.option('--workers', default=4, show_default=True, help='Slices read at the same time')
+@click.option('--no-cache', is_flag=True, help='Do not use the cache of complete slices')
+@click.option('--filter', '-f', help='Custom filter expression (overrides the pipeline_stage filter)')
+def pipeline_latency(
+    log_group_ids: tuple[str, ...],
+    hours: int,
+    compare: bool,
+    top: int,
+    slice_hours: float,
+    workers: int,
+    no_cache: bool,
+    filter: str | None,
+) -> None:
+    """Latency of forum changes from detection to the first sent notification.
+
+    Pass the log groups of check_first_posts_for_changes, identify_updates_*,
+    compose_notifications and send_notifications (or one group they all log to).
+    """
+    client = _make_client()
+    cache = _make_cache(no_cache)
+    to_time = datetime.now(timezone.utc)
+    split_time = to_time - timedelta(hours=hours)
+    from_time = split_time - timedelta(hours=hours) if compare else split_time
+
+    click.echo(f'⏳ Fetching pipeline events for the last {hours}h from {len(log_group_ids)} log group(s) …', err=True)
+    items = correlate(
+        itertools.chain.from_iterable(
+            client.iter_all_logs(
+                log_group_id,
+                filter_str=filter or _PIPELINE_FILTER,
+                from_time=from_time,
+                to_time=to_time,
+                slice_hours=slice_hours,
+                workers=workers,
+                cache=cache,
+            )
+            for log_group_id in log_group_ids
+        )
+    )
+    current = [item for item in items if item.start >= split_time]
+    previous = [item for item in items if item.start < split_time]
+
+    delivered = sum(item.delivered for item in current)
+    click.echo(
+        f'📊 {len(current)} change_log records, {delivered} delivered, {len(current) - delivered} without a sent event.\n',
+        err=True,
+    )
+    if not current:
+        click.echo('No pipeline events in the selected window.')
+        return
+
+    stats = span_stats(current)
+    _echo_span_stats(stats)
+
+    click.echo()
+    click.echo(f'🐢 Slowest changes (end-to-end), top {top}:')
+    for item in slowest(current, top):
+        click.echo(_format_item(item))
+
+    if compare:
+        click.echo()
+        regressions = find_regressions(span_stats(previous), stats)
+        click.echo(f'📈 Against the previous {hours}h ({len(previous)} change_log records):')
+        if not regressions:
+            click.secho(f'✅ No regressions against the previous {hours}h.', fg='green')
+        for regression in regressions:
+            click.secho(
+                f'⚠️  {regression.span} {regression.quantile}: {_format_seconds(regression.before)} → '
+                f'{_format_seconds(regression.after)} (×{regression.ratio:.1f})',
+                fg='yellow',
+            )
+
+
 @cli.command()
 @click.argument('folder_id')
 def list_groups(folder_id: str) -> None:
@@ -152,7 +270,9 @@ def list_groups(folder_id: str) -> None:
 @click.option('--hours', default=1, show_default=True, help='Time window (hours)')
 @click.option('--level', default='ERROR', show_default=True, help='Log level filter')
 @click.option('--slice-hours', default=1.0, show_default=True, help='Window slice size (hours) for stable pagination')
-def raw(log_group_id: str, hours: int, level: str, slice_hours: float) -> None:
+@click.option('--workers', default=4, show_default=True, help='Slices read at the same time')
+@click.option('--no-cache', is_flag=True, help='Do not use the cache of complete slices')
+def raw(log_group_id: str, hours: int, level: str, slice_hours: float, workers: int, no_cache: bool) -> None:
     """Dump raw JSON for a time window."""
     client = _make_client()
     to_time = datetime.now(timezone.utc)
@@ -164,10 +284,45 @@ def raw(log_group_id: str, hours: int, level: str, slice_hours: float) -> None:
         from_time=from_time,
         to_time=to_time,
         slice_hours=slice_hours,
+        workers=workers,
+        cache=_make_cache(no_cache),
     )
     click.echo(json.dumps(entries, indent=2, ensure_ascii=False))
 
 
+def _echo_span_stats(stats: list[SpanStats]) -> None:
+    click.echo(f'{"stage":<12}{"count":>8}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}')
+    for row in stats:
+        click.echo(
+            f'{row.span:<12}{row.count:>8}'
+            + ''.join(f'{_format_seconds(value):>10}' for value in (row.p50, row.p90, row.p99, row.max))
+        )
+
+
+def _format_item(item: PipelineItem) -> str:
+    spans = ', '.join(
+        f'{span} {_format_seconds(latency)}'
+        for span in ('identify', 'compose', 'send')
+        if (latency := item.latency(span)) is not None
+    )
+    return (
+        f'  change_log {item.change_log_id} (search {item.search_num}): '
+        f'{_format_seconds(item.latency("end_to_end") or 0.0)} — {spans}, since {item.start:%Y-%m-%d %H:%M:%S}'
+    )
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f'{seconds:.1f}s'
+    if seconds < 3600:
+        return f'{seconds / 60:.1f}m'
+    return f'{seconds / 3600:.1f}h'
+
+
+def _make_cache(no_cache: bool) -> WindowCache | None:
+    return None if no_cache else WindowCache()
+
+
 def _make_client() -> YCLoggingClient:
     try:
         return YCLoggingClient()